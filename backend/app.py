@@ -1,12 +1,36 @@
 import os
 import asyncio
+import json
 import logging
+import secrets
+import time
+import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Header, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from graph.build_graph import build_support_agent
-from utils.azure_blob_sync import get_blob_sync
+from utils.agent_executor import ExecutorSaturated, RunCancelled, agent_executor
+from utils.checkpoint_retention import get_checkpoint_compactor
+from utils.checkpointer import CheckpointConflictError, persist_run
+from utils.conversation import ConversationSession
+from utils.metrics import collect_stats
+from utils.prefork import get_memory_stats
+from utils.query_batch import QueryBatch
+from utils.startup import startup
+from vectorstore.knowledge_base import knowledge_base
+from config.settings import (
+    ADMIN_API_KEY,
+    USE_AZURE_BLOB_STORAGE,
+    APPLICATIONINSIGHTS_CONNECTION_STRING,
+    USE_APPLICATION_INSIGHTS,
+    PRELOAD_KNOWLEDGE_BASE,
+    QUERY_BATCH_CONCURRENCY,
+    QUERY_BATCH_MAX_CONCURRENCY,
+    QUERY_BATCH_MAX_ITEMS
+)
 import uvicorn
 
 from pydantic import BaseModel
@@ -18,59 +42,182 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Application Insights Integration (Optional)
+# Application Insights Integration (Optional), set up by init_telemetry() in each worker
 telemetry_client = None
-try:
-    from config.settings import (
-        APPLICATIONINSIGHTS_CONNECTION_STRING,
-        USE_APPLICATION_INSIGHTS
-    )
-    
-    if USE_APPLICATION_INSIGHTS and APPLICATIONINSIGHTS_CONNECTION_STRING:
-        try:
-            from opencensus.ext.azure.log_exporter import AzureLogHandler
-            from applicationinsights import TelemetryClient
-            
-            # Add Azure Log Handler
-            logger.addHandler(
-                AzureLogHandler(connection_string=APPLICATIONINSIGHTS_CONNECTION_STRING)
+
+def init_telemetry():
+    """
+    Start the Application Insights pipeline. Runs during warm-up rather than at
+    import: the SDK is slow to import, and the exporter thread would not
+    survive the fork from a preloading gunicorn master anyway.
+
+    Telemetry calls and log records only enqueue; a background thread exports
+    them in batches, so the request path never waits on Application Insights.
+    """
+    global telemetry_client
+    from utils.telemetry import TelemetryLogHandler, get_telemetry_pipeline
+    pipeline = get_telemetry_pipeline(APPLICATIONINSIGHTS_CONNECTION_STRING)
+    if pipeline is None:
+        logger.warning("Application Insights not available, telemetry disabled")
+        return
+    pipeline.start()
+    logger.addHandler(TelemetryLogHandler(pipeline))
+    telemetry_client = pipeline
+    logger.info("✓ Application Insights enabled")
+
+
+async def call_support_agent_async(agent, prompt, user_session_id, verbose=False, is_disconnected=None):
+    def run_agent(run):
+        for attempt in range(2):
+            events = agent.stream(
+                {"customer_query": prompt},
+                {"configurable": {"thread_id": user_session_id}, "callbacks": run.callbacks()},
+                stream_mode="values",
             )
-            
-            # Initialize telemetry client
-            telemetry_client = TelemetryClient(APPLICATIONINSIGHTS_CONNECTION_STRING)
-            logger.info("✓ Application Insights enabled")
-        except ImportError as ie:
-            logger.warning(f"Application Insights packages not installed: {str(ie)}")
-            logger.info("Install with: pip install opencensus-ext-azure applicationinsights")
-    else:
-        logger.info("Application Insights disabled in configuration")
-except Exception as e:
-    logger.warning(f"Failed to initialize Application Insights: {str(e)}")
-    telemetry_client = None
-
-
-async def call_support_agent_async(agent, prompt, user_session_id, verbose=False):
-    loop = asyncio.get_event_loop()
-    def run_agent():
-        events = agent.stream(
-            {"customer_query": prompt},
-            {"configurable": {"thread_id": user_session_id}},
-            stream_mode="values",
-        )
-        last_event = None
-        for event in events:
-            if verbose:
-                print(event)
-            last_event = event
-        return last_event['final_response'] if last_event else None
-    result = await loop.run_in_executor(None, run_agent)
-    return result
+            last_event = None
+            for event in events:
+                if run.cancelled.is_set():
+                    raise RunCancelled()
+                if verbose:
+                    print(event)
+                last_event = event
+            # The run's coalesced checkpoint is saved before it is answered
+            try:
+                persist_run(agent.checkpointer, user_session_id)
+            except CheckpointConflictError as e:
+                if attempt:
+                    raise
+                # Another worker answered on this thread meanwhile: answer again on top of its turn
+                logger.warning(f"{str(e)}; re-running the query")
+                continue
+            return last_event['final_response'] if last_event else None
+    # Dedicated pool: see utils.agent_executor for sizing, queue limit and metrics
+    return await agent_executor.run(run_agent, is_disconnected=is_disconnected)
+
+def restore_knowledge_base():
+    global blob_sync
+    # Imported on first use so workers without blob storage never load the Blob SDK
+    from utils.azure_blob_sync import get_blob_sync
+    blob_sync = get_blob_sync(str(knowledge_base.persist_directory))
+    # A knowledge base preloaded by the gunicorn master was restored there before the fork
+    if blob_sync and not knowledge_base.is_loaded and blob_sync.restore_on_startup():
+        logger.info("✓ ChromaDB data restored from Azure Blob Storage")
+
+def preload():
+    """
+    Restore and load the knowledge base in the gunicorn master (preload_app),
+    before the workers fork, so its documents, BM25/FAQ indexes and vector
+    index pages are shared copy-on-write instead of loaded once per worker.
+
+    Called from the when_ready hook in gunicorn.conf.py. Workers find the
+    snapshot loaded and only create their own clients; if preloading fails,
+    each worker loads the knowledge base during warm-up as before.
+    """
+    global blob_sync
+    if not PRELOAD_KNOWLEDGE_BASE:
+        return
+    start = time.perf_counter()
+    try:
+        if USE_AZURE_BLOB_STORAGE:
+            restore_knowledge_base()
+        knowledge_base.load()
+        logger.info(f"✓ Knowledge base preloaded before fork in {time.perf_counter() - start:.1f}s")
+    except Exception as e:
+        logger.warning(f"Knowledge base preload failed, workers will load it themselves: {str(e)}")
+    finally:
+        # Its HTTP sessions must not be shared; each worker creates its own
+        blob_sync = None
+        memory = get_memory_stats()
+        if "rss_mb" in memory:
+            logger.info(f"Master RSS before fork: {memory['rss_mb']} MB (shared with workers until written)")
+
+def initialize_agent():
+    global agent
+    try:
+        agent = build_support_agent(retriever)
+        logger.info("Support agent initialized successfully")
+        
+        # Track initialization event
+        if telemetry_client:
+            telemetry_client.track_event("agent_initialized", {"status": "success"})
+    except Exception as e:
+        # Track initialization failure
+        if telemetry_client:
+            telemetry_client.track_exception()
+            telemetry_client.track_event("agent_initialized", {"status": "failed", "error": str(e)})
+        raise
+
+async def warm_up():
+    """
+    Restore and load the knowledge base while telemetry is set up and the agent
+    graph and its checkpointer are built; the two chains run in parallel.
+    """
+    async def knowledge_base_steps():
+        if USE_AZURE_BLOB_STORAGE:
+            try:
+                await startup.run("blob_restore", restore_knowledge_base)
+            except Exception:
+                pass  # Logged by the tracker; the knowledge base is rebuilt from source instead
+        else:
+            startup.skip("blob_restore", "USE_AZURE_BLOB_STORAGE is off")
+        await startup.run("knowledge_base", knowledge_base.load)
+
+    async def agent_steps():
+        if USE_APPLICATION_INSIGHTS and APPLICATIONINSIGHTS_CONNECTION_STRING:
+            try:
+                await startup.run("telemetry", init_telemetry)
+            except Exception:
+                pass  # Logged by the tracker; the agent runs without telemetry
+        else:
+            startup.skip("telemetry", "Application Insights disabled in configuration")
+        await startup.run("agent", initialize_agent)
+
+    await asyncio.gather(knowledge_base_steps(), agent_steps(), return_exceptions=True)
+    startup.finish()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs in every worker process (after gunicorn forks). Warm-up runs as a
+    # task so the worker accepts connections (/health, /ready) right away;
+    # per-process background threads start once it is done.
+    startup.register("telemetry", required=False)
+    startup.register("blob_restore", required=False)
+    startup.register("knowledge_base")
+    startup.register("agent")
+    # A failed first load is retried by the watcher; readiness follows the live knowledge base
+    knowledge_base.add_reload_listener(lambda version: startup.mark_ready("knowledge_base"))
+    services = []
+
+    async def start():
+        await warm_up()
+        knowledge_base.start_watcher()
+        compactor = get_checkpoint_compactor(agent.checkpointer) if agent is not None else None
+        backup_scheduler = None
+        if blob_sync is not None:
+            from utils.backup_scheduler import get_backup_scheduler
+            backup_scheduler = get_backup_scheduler(blob_sync, knowledge_base)
+        for service in (compactor, backup_scheduler):
+            if service:
+                service.start()
+                services.append(service)
+
+    warm_up_task = asyncio.create_task(start())
+    yield
+    warm_up_task.cancel()
+    knowledge_base.stop_watcher()
+    for service in services:
+        service.stop()
+    if telemetry_client:
+        telemetry_client.stop()
+    if agent is not None and hasattr(agent.checkpointer, "close"):
+        agent.checkpointer.close()
 
 # --- FastAPI app ---
 app = FastAPI(
     title="Customer Support Agent API",
     description="AI-Powered Customer Support Agent using LangGraph and Azure OpenAI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware to allow frontend requests
@@ -94,37 +241,10 @@ if not os.getenv("AZURE_OPENAI_API_KEY"):
 # retriever = create_vector_db(docs)
 retriever = None
 
-# Initialize Azure Blob Storage sync for ChromaDB (Optional)
+# Azure Blob Storage sync for ChromaDB (optional) and the agent are set up by
+# warm_up() in each worker, so importing this module does no I/O
 blob_sync = None
-try:
-    blob_sync = get_blob_sync()
-    if blob_sync:
-        # Try to download existing ChromaDB data from blob storage
-        logger.info("Checking for existing ChromaDB backup in Azure Blob Storage...")
-        if blob_sync.download_chromadb():
-            logger.info("✓ ChromaDB data restored from Azure Blob Storage")
-        else:
-            logger.info("No existing ChromaDB backup found in Azure Blob Storage")
-except Exception as e:
-    logger.warning(f"Azure Blob Storage initialization failed: {str(e)}")
-    blob_sync = None
-
-# Initialize agent with error handling
-try:
-    agent = build_support_agent(retriever)
-    logger.info("Support agent initialized successfully")
-    
-    # Track initialization event
-    if telemetry_client:
-        telemetry_client.track_event("agent_initialized", {"status": "success"})
-except Exception as e:
-    logger.error(f"Failed to initialize support agent: {str(e)}")
-    agent = None
-    
-    # Track initialization failure
-    if telemetry_client:
-        telemetry_client.track_exception()
-        telemetry_client.track_event("agent_initialized", {"status": "failed", "error": str(e)})
+agent = None
 
 @app.get("/")
 async def root():
@@ -138,9 +258,9 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint for Azure App Service"""
+    """Health check endpoint for Azure App Service (liveness; see /ready for warm-up)"""
     health_status = {
-        "status": "healthy",
+        "status": "healthy" if startup.is_finished else "starting",
         "timestamp": datetime.utcnow().isoformat(),
         "agent_initialized": agent is not None,
         "environment": os.getenv("ENVIRONMENT", "production"),
@@ -149,7 +269,7 @@ async def health_check():
         "application_insights": telemetry_client is not None
     }
     
-    if agent is None:
+    if agent is None and startup.is_finished:
         health_status["status"] = "unhealthy"
         health_status["error"] = "Agent not initialized"
         return JSONResponse(status_code=503, content=health_status)
@@ -160,6 +280,41 @@ async def health_check():
     
     return health_status
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the knowledge base and agent are warm, with each component's state and timing"""
+    status = startup.get_status()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content=status, headers={"Retry-After": "5"})
+    return status
+
+@app.get("/metrics")
+async def metrics():
+    """Runtime metrics from registered components (retrieval, caches, etc.)"""
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        **collect_stats()
+    }
+
+@app.post("/admin/reload-knowledge-base")
+async def reload_knowledge_base(x_admin_key: Optional[str] = Header(default=None)):
+    """
+    Rebuild the knowledge base in the background and swap it in when ready.
+
+    Requires the X-Admin-Key header to match ADMIN_API_KEY. Other workers pick
+    up source changes through their watchers within KB_WATCH_INTERVAL_SECONDS.
+    """
+    if not ADMIN_API_KEY:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not secrets.compare_digest(x_admin_key or "", ADMIN_API_KEY):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
+
+    started = knowledge_base.request_reload()
+    return {
+        "status": "reload_started" if started else "reload_in_progress",
+        "current_version": knowledge_base.current().version if knowledge_base.is_loaded else None
+    }
+
 # Request model for better API documentation
 class QueryRequest(BaseModel):
     message: str
@@ -173,7 +328,7 @@ class QueryResponse(BaseModel):
     category: str = None
 
 @app.post("/query", response_model=QueryResponse)
-async def query_endpoint(request: QueryRequest):
+async def query_endpoint(request: QueryRequest, http_request: Request):
     """
     Main endpoint for customer support queries (JSON body)
     
@@ -185,9 +340,12 @@ async def query_endpoint(request: QueryRequest):
         logger.warning("Empty message received")
         raise HTTPException(status_code=400, detail="Message cannot be empty")
     
-    if agent is None:
-        logger.error("Agent not initialized")
-        raise HTTPException(status_code=503, detail="Service unavailable - agent not initialized")
+    if not startup.is_finished:
+        raise HTTPException(status_code=503, detail="Service warming up", headers={"Retry-After": "5"})
+    
+    if agent is None or not startup.is_ready:
+        logger.error("Agent or knowledge base not initialized")
+        raise HTTPException(status_code=503, detail="Service unavailable - startup failed, see /ready")
     
     try:
         logger.info(f"Processing query for thread {request.thread_id}")
@@ -196,7 +354,9 @@ async def query_endpoint(request: QueryRequest):
         if telemetry_client:
             telemetry_client.track_event("query_received", {"thread_id": request.thread_id})
         
-        result = await call_support_agent_async(agent, request.message, request.thread_id, verbose=False)
+        result = await call_support_agent_async(
+            agent, request.message, request.thread_id, verbose=False, is_disconnected=http_request.is_disconnected
+        )
         logger.info(f"Query processed successfully for thread {request.thread_id}")
         
         # Track successful query
@@ -212,6 +372,22 @@ async def query_endpoint(request: QueryRequest):
             status="success",
             thread_id=request.thread_id
         )
+    except ExecutorSaturated as e:
+        logger.warning(f"Rejected query for thread {request.thread_id}: {str(e)}")
+        if telemetry_client:
+            telemetry_client.track_metric("query_rejected", 1)
+        raise HTTPException(status_code=503, detail="Service busy, retry later", headers={"Retry-After": "2"})
+    except RunCancelled:
+        logger.info(f"Query for thread {request.thread_id} cancelled, client disconnected")
+        if telemetry_client:
+            telemetry_client.track_metric("query_cancelled", 1)
+        # 499: client closed request (nobody receives this response)
+        raise HTTPException(status_code=499, detail="Client disconnected")
+    except CheckpointConflictError as e:
+        logger.warning(f"Query for thread {request.thread_id} kept conflicting with another worker: {str(e)}")
+        if telemetry_client:
+            telemetry_client.track_metric("query_conflict", 1)
+        raise HTTPException(status_code=409, detail="Conversation was updated concurrently, retry")
     except Exception as e:
         logger.error(f"Error processing query for thread {request.thread_id}: {str(e)}")
         
@@ -226,8 +402,172 @@ async def query_endpoint(request: QueryRequest):
         
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
 
+class BatchQueryItem(BaseModel):
+    message: str
+    thread_id: Optional[str] = None
+
+class BatchQueryRequest(BaseModel):
+    items: List[BatchQueryItem]
+    concurrency: Optional[int] = None
+
+@app.post("/query/batch")
+async def batch_query_endpoint(request: BatchQueryRequest):
+    """
+    Answer many queries in one request, streaming results as NDJSON
+    
+    Request body:
+    - items: List of {message, thread_id}; items without a thread_id get their own thread
+    - concurrency: Items answered in parallel (optional, capped by QUERY_BATCH_MAX_CONCURRENCY)
+    
+    Each line is one item's result as it completes (index, thread_id, status,
+    response, category, sentiment, seconds), in completion order; items of
+    the same thread_id run in input order. The last line is a summary with
+    "done": true.
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="Items cannot be empty")
+    if len(request.items) > QUERY_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {QUERY_BATCH_MAX_ITEMS} items per batch")
+    empty = [index for index, item in enumerate(request.items) if not item.message]
+    if empty:
+        raise HTTPException(status_code=400, detail=f"Message cannot be empty (items {empty[:10]})")
+    
+    if not startup.is_finished:
+        raise HTTPException(status_code=503, detail="Service warming up", headers={"Retry-After": "5"})
+    
+    if agent is None or not startup.is_ready:
+        logger.error("Agent or knowledge base not initialized")
+        raise HTTPException(status_code=503, detail="Service unavailable - startup failed, see /ready")
+    
+    batch_id = uuid.uuid4().hex[:8]
+    items = [
+        (item.message, item.thread_id or f"batch-{batch_id}-{index}")
+        for index, item in enumerate(request.items)
+    ]
+    concurrency = min(request.concurrency or QUERY_BATCH_CONCURRENCY, QUERY_BATCH_MAX_CONCURRENCY)
+    embeddings = getattr(knowledge_base.current().retriever.vectorstore, "embeddings", None)
+    batch = QueryBatch(agent, items, concurrency=concurrency, embeddings=embeddings)
+    logger.info(f"Processing batch {batch_id}: {len(items)} items, concurrency {batch.concurrency}")
+    
+    try:
+        # Items run on the agent executor like single queries: refuse the batch while it is full
+        batch.admit(agent_executor)
+    except ExecutorSaturated as e:
+        logger.warning(f"Rejected batch {batch_id}: {str(e)}")
+        if telemetry_client:
+            telemetry_client.track_metric("batch_rejected", 1)
+        raise HTTPException(status_code=503, detail="Service busy, retry later", headers={"Retry-After": "2"})
+    
+    loop = asyncio.get_running_loop()
+    results: asyncio.Queue = asyncio.Queue()
+    
+    def emit(result):
+        try:
+            loop.call_soon_threadsafe(results.put_nowait, result)
+        except RuntimeError:
+            # Event loop closed (shutdown); nobody is reading anymore
+            batch.cancel()
+    
+    async def stream():
+        runner = asyncio.create_task(batch.arun(emit))
+        try:
+            while True:
+                result = await results.get()
+                yield json.dumps(result) + "\n"
+                if result.get("done"):
+                    break
+        finally:
+            # Client disconnected or the batch finished: start no further items
+            batch.cancel()
+            runner.cancel()
+        
+        logger.info(
+            f"Batch {batch_id} done: {result['succeeded']} succeeded, {result['failed']} failed "
+            f"in {result['seconds']:.1f}s ({result['items_per_second']:.1f} items/s)"
+        )
+        if telemetry_client:
+            telemetry_client.track_event("batch_completed", {
+                "batch_id": batch_id,
+                "items": str(result["items"]),
+                "failed": str(result["failed"]),
+            })
+            telemetry_client.track_metric("batch_items_per_second", result["items_per_second"])
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.websocket("/ws/{thread_id}")
+async def conversation_endpoint(websocket: WebSocket, thread_id: str):
+    """
+    Conversation on one thread over a WebSocket, with streamed replies
+    
+    Client messages (JSON):
+    - {"type": "message", "message": "..."}: ask; cancels the reply in flight, if any
+    - {"type": "cancel"}: cancel the reply in flight
+    
+    Server events (JSON), each with the turn number it belongs to:
+    - ready (on connect), started, progress (node, category, sentiment),
+      token (content), then one of response (response, category, sentiment),
+      cancelled or error (detail)
+    
+    The thread's checkpoint stays in memory while the connection is open.
+    """
+    await websocket.accept()
+    if not startup.is_finished or agent is None or not startup.is_ready:
+        await websocket.send_json({"type": "error", "detail": "Service unavailable, retry later"})
+        # 1013: Try Again Later
+        await websocket.close(code=1013)
+        return
+    
+    session = ConversationSession(agent, thread_id)
+    session.open()
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    
+    def emit(event):
+        try:
+            loop.call_soon_threadsafe(events.put_nowait, event)
+        except RuntimeError:
+            # Event loop closed (shutdown); nobody is reading anymore
+            session.cancel()
+    
+    async def send_events():
+        while True:
+            event = await events.get()
+            await websocket.send_json(event)
+            if event["type"] == "response" and telemetry_client:
+                telemetry_client.track_metric("conversation_turn_seconds", event["seconds"])
+    
+    sender = asyncio.create_task(send_events())
+    logger.info(f"Conversation opened for thread {thread_id}")
+    if telemetry_client:
+        telemetry_client.track_event("conversation_opened", {"thread_id": thread_id})
+    try:
+        await websocket.send_json({"type": "ready", "thread_id": thread_id})
+        while True:
+            data = await websocket.receive_json()
+            kind = data.get("type", "message") if isinstance(data, dict) else None
+            if kind == "cancel":
+                session.cancel()
+            elif kind == "message" and isinstance(data.get("message"), str) and data["message"].strip():
+                turn = session.new_turn(data["message"])
+                try:
+                    agent_executor.submit(session.answer, emit, run=turn)
+                except ExecutorSaturated as e:
+                    logger.warning(f"Rejected conversation turn for thread {thread_id}: {str(e)}")
+                    emit({"type": "error", "turn": turn.number, "detail": "Service busy, retry later"})
+            else:
+                emit({"type": "error", "detail": "Expected a non-empty message or a cancel"})
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.warning(f"Conversation for thread {thread_id} closed: {str(e)}")
+    finally:
+        session.close()
+        sender.cancel()
+        logger.info(f"Conversation closed for thread {thread_id} after {session.turns} turns")
+
 @app.post("/support-agent")
-async def support_agent_endpoint(query: str, uid: str):
+async def support_agent_endpoint(query: str, uid: str, http_request: Request):
     """
     Legacy endpoint for customer support queries (query parameters)
     Maintained for backwards compatibility
@@ -237,7 +577,7 @@ async def support_agent_endpoint(query: str, uid: str):
     - uid: Unique user session identifier
     """
     request = QueryRequest(message=query, thread_id=uid)
-    response = await query_endpoint(request)
+    response = await query_endpoint(request, http_request)
     return {"result": response.response, "status": response.status}
 
 if __name__ == "__main__":
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+"""
+Checkpoint Serialization Benchmark
+Stored size and CPU cost of Table Storage checkpoint encodings on multi-turn
+conversation threads built from the knowledge base documents.
+
+Each turn produces the checkpoint the support graph persists (query, category,
+sentiment, response) plus a growing message history, so sizes reflect how
+threads grow over a conversation.
+
+Usage (from backend/):
+    python -m benchmarks.checkpoint_serde
+    python -m benchmarks.checkpoint_serde --threads 50 --turns 20
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from data.load_documents import load_documents
+from utils.checkpoint_serde import ZSTD_AVAILABLE, CheckpointEntityCodec
+from vectorstore.faq_index import parse_faq_text
+
+
+def print_header(text):
+    print(f"\n{'='*60}")
+    print(f"  {text}")
+    print(f"{'='*60}\n")
+
+
+def build_threads(faqs, threads: int, turns: int, seed: int = 7):
+    """
+    Simulate conversation threads and return every turn's checkpoint.
+    """
+    rng = random.Random(seed)
+    checkpoints = []
+    for _ in range(threads):
+        checkpoint = empty_checkpoint()
+        history = []
+        for turn in range(1, turns + 1):
+            question, answer = rng.choice(faqs)
+            history = history + [HumanMessage(content=question), AIMessage(content=answer)]
+            checkpoint = {
+                **checkpoint,
+                "channel_values": {
+                    "customer_query": question,
+                    "query_category": rng.choice(["Technical", "Billing", "General"]),
+                    "query_sentiment": rng.choice(["Positive", "Negative", "Neutral"]),
+                    "final_response": answer,
+                    "messages": history,
+                },
+                "channel_versions": {
+                    channel: f"{turn * 4:032}.{rng.random():016}"
+                    for channel in ("customer_query", "query_category", "query_sentiment", "final_response", "messages")
+                },
+            }
+            checkpoints.append((turn, checkpoint))
+    return checkpoints
+
+
+def stored_size(properties: dict) -> int:
+    return sum(len(properties[f"checkpoint_{i}"]) for i in range(properties["checkpoint_chunks"]))
+
+
+def json_size(checkpoint) -> int:
+    # The original checkpointer stored json.dumps(checkpoint) in one property
+    return len(json.dumps(checkpoint).encode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Size and CPU trade-off of checkpoint encodings")
+    parser.add_argument("--documents", default="./data/router_agent_documents.json")
+    parser.add_argument("--threads", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=12)
+    args = parser.parse_args()
+
+    docs = load_documents(args.documents)
+    faqs = [parsed for parsed in (parse_faq_text(doc.page_content) for doc in docs) if parsed]
+    checkpoints = build_threads(faqs, args.threads, args.turns)
+    serde = JsonPlusSerializer()
+
+    print_header(f"{args.threads} threads x {args.turns} turns = {len(checkpoints)} checkpoints")
+
+    json_failures = 0
+    for _, checkpoint in checkpoints:
+        try:
+            json_size(checkpoint)
+        except TypeError:
+            json_failures += 1
+    print(f"  json.dumps (previous format): {json_failures}/{len(checkpoints)} checkpoints not serializable")
+
+    codecs = [("none", 0), ("zlib", 6)]
+    if ZSTD_AVAILABLE:
+        codecs += [("zstd", 1), ("zstd", 3), ("zstd", 9)]
+    else:
+        print("  zstandard not installed, skipping zstd")
+
+    print(f"\n  {'encoding':<14}{'avg bytes':>11}{'max bytes':>11}{'ratio':>8}{'max chunks':>12}{'enc µs':>9}{'dec µs':>9}")
+    baseline = None
+    for codec_name, level in codecs:
+        codec = CheckpointEntityCodec(codec=codec_name, level=level)
+        sizes, chunks = [], []
+        encode_s = decode_s = 0.0
+        for _, checkpoint in checkpoints:
+            start = time.perf_counter()
+            properties = codec.pack("checkpoint", serde.dumps_typed(checkpoint))
+            encode_s += time.perf_counter() - start
+
+            start = time.perf_counter()
+            serde.loads_typed(codec.unpack("checkpoint", properties))
+            decode_s += time.perf_counter() - start
+
+            sizes.append(stored_size(properties))
+            chunks.append(properties["checkpoint_chunks"])
+
+        avg = sum(sizes) / len(sizes)
+        baseline = baseline or avg
+        label = "msgpack" if codec_name == "none" else f"{codec_name}-{level}"
+        print(
+            f"  {label:<14}{avg:>11,.0f}{max(sizes):>11,}{baseline / avg:>8.2f}{max(chunks):>12}"
+            f"{encode_s * 1e6 / len(checkpoints):>9.0f}{decode_s * 1e6 / len(checkpoints):>9.0f}"
+        )
+
+    print_header(f"Stored size by turn ({label})")
+    for turn in range(1, args.turns + 1):
+        turn_sizes = [
+            stored_size(codec.pack("checkpoint", serde.dumps_typed(checkpoint)))
+            for t, checkpoint in checkpoints if t == turn
+        ]
+        print(f"  turn {turn:>3}: {sum(turn_sizes) / len(turn_sizes):>9,.0f} bytes")
+
+    print("\n  µs = encode/decode time per checkpoint including msgpack serialization.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+"""
+Checkpoint Throughput Benchmark
+Concurrent checkpoint flush throughput of the Table Storage checkpointer for
+different partition shard counts, against Azurite or a real storage account.
+
+Start the emulator first:
+    azurite-table --tableHost 127.0.0.1 --tablePort 10002
+
+Usage (from backend/):
+    python -m benchmarks.checkpoint_throughput
+    python -m benchmarks.checkpoint_throughput --shards 1 4 16 --threads 500 --concurrency 64
+    python -m benchmarks.checkpoint_throughput --connection-string "<storage account connection string>"
+
+Azurite does not enforce per-partition throughput limits, so emulator runs show
+client-side overhead and partition spread; the single-partition ceiling
+(~2,000 entities/s) only shows up against a storage account.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from langgraph.checkpoint.base import empty_checkpoint
+
+from utils.azure_checkpointer import AzureTableCheckpointer, partition_for
+
+# Well-known Azurite development account (public, emulator only)
+AZURITE_CONNECTION_STRING = (
+    "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;"
+    "AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRz6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;"
+    "TableEndpoint=http://127.0.0.1:10002/devstoreaccount1;"
+)
+
+
+def print_header(text):
+    print(f"\n{'='*60}")
+    print(f"  {text}")
+    print(f"{'='*60}\n")
+
+
+def run_workload(checkpointer: AzureTableCheckpointer, threads: int, turns: int, concurrency: int) -> dict:
+    """
+    Each conversation thread writes `turns` checkpoints, flushing after every
+    turn as the API does at the end of a run.
+    """
+    def conversation(index: int):
+        thread_id = f"bench-{index}"
+        config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+        latencies = []
+        for turn in range(turns):
+            checkpoint = empty_checkpoint()
+            checkpoint["channel_values"] = {"customer_query": f"question {turn} " * 20, "final_response": "answer " * 80}
+            config = checkpointer.put(config, checkpoint, {"source": "loop", "step": turn}, {})
+            start = time.perf_counter()
+            checkpointer.flush(thread_id)
+            latencies.append((time.perf_counter() - start) * 1000)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = [ms for result in pool.map(conversation, range(threads)) for ms in result]
+    elapsed = time.perf_counter() - start
+
+    stats = checkpointer.get_stats()
+    partitions = Counter(partition_for(f"bench-{i}", checkpointer.partition_shards) for i in range(threads))
+    latencies.sort()
+    return {
+        "flushes_per_second": len(latencies) / elapsed,
+        "entities_per_second": 2 * stats["transactions"] / elapsed,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+        "partitions": len(partitions),
+        "hottest_partition_share": max(partitions.values()) / threads,
+        "failures": stats["flush_failures"],
+        "conflicts": stats["write_conflicts"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkpoint flush throughput by partition shard count")
+    parser.add_argument("--connection-string", default=AZURITE_CONNECTION_STRING)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--threads", type=int, default=200, help="Conversation threads")
+    parser.add_argument("--turns", type=int, default=5, help="Checkpoints flushed per thread")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark tables")
+    args = parser.parse_args()
+
+    print_header(f"{args.threads} threads x {args.turns} turns, concurrency {args.concurrency}")
+    print(f"  {'shards':>6}{'flush/s':>10}{'entity/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'hot share':>11}{'failed':>8}")
+
+    for shards in args.shards:
+        table_name = f"checkpointbench{shards}x{int(time.time())}"
+        checkpointer = AzureTableCheckpointer(
+            connection_string=args.connection_string,
+            table_name=table_name,
+            flush_interval=3600,
+            partition_shards=shards,
+            legacy_fallback=False
+        )
+        if not checkpointer.table_client:
+            print("  Could not connect to Table Storage (is Azurite running?)")
+            return 1
+        try:
+            result = run_workload(checkpointer, args.threads, args.turns, args.concurrency)
+        finally:
+            checkpointer.close()
+            if not args.keep:
+                from azure.data.tables import TableServiceClient
+                TableServiceClient.from_connection_string(args.connection_string).delete_table(table_name)
+
+        print(
+            f"  {shards:>6}{result['flushes_per_second']:>10.0f}{result['entities_per_second']:>10.0f}"
+            f"{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}{result['hottest_partition_share']:>11.0%}"
+            f"{result['failures'] + result['conflicts']:>8}"
+        )
+
+    print("\n  Each flush is one transaction writing the history row and the head row.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""
+Checkpointer Latency Benchmark
+Per-run and per-read checkpoint overhead of the in-memory, SQLite and Azure
+Table Storage checkpointers on a graph shaped like the support agent
+(prefetch -> categorize -> sentiment -> respond), with no LLM calls.
+
+Usage (from backend/):
+    python -m benchmarks.checkpointer_latency
+    python -m benchmarks.checkpointer_latency --backends memory sqlite azure_table
+    python -m benchmarks.checkpointer_latency --connection-string "<connection string>"
+
+azure_table defaults to the Azurite emulator and is skipped if it is not reachable.
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TypedDict
+
+from langgraph.graph import END, START, StateGraph
+
+from benchmarks.checkpoint_throughput import AZURITE_CONNECTION_STRING
+
+
+class BenchState(TypedDict):
+    customer_query: str
+    query_category: str
+    query_sentiment: str
+    final_response: str
+
+
+def print_header(text):
+    print(f"\n{'='*60}")
+    print(f"  {text}")
+    print(f"{'='*60}\n")
+
+
+def build_graph(checkpointer):
+    graph = StateGraph(BenchState)
+    graph.add_node("prefetch_retrieval", lambda state: {})
+    graph.add_node("categorize_inquiry", lambda state: {"query_category": "Technical"})
+    graph.add_node("analyze_sentiment", lambda state: {"query_sentiment": "Neutral"})
+    graph.add_node("generate_response", lambda state: {"final_response": "Thanks for reaching out. " * 30})
+    graph.add_edge(START, "prefetch_retrieval")
+    graph.add_edge("prefetch_retrieval", "categorize_inquiry")
+    graph.add_edge("categorize_inquiry", "analyze_sentiment")
+    graph.add_edge("analyze_sentiment", "generate_response")
+    graph.add_edge("generate_response", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def create_checkpointer(backend: str, directory: str, connection_string: str):
+    if backend == "memory":
+        from utils.memory_checkpointer import BoundedMemorySaver
+        return BoundedMemorySaver()
+    if backend == "sqlite":
+        from utils.sqlite_checkpointer import SQLiteCheckpointer
+        return SQLiteCheckpointer(str(Path(directory) / "checkpoints.sqlite3"))
+    if backend == "azure_table":
+        from utils.azure_checkpointer import AzureTableCheckpointer
+        checkpointer = AzureTableCheckpointer(
+            connection_string=connection_string,
+            table_name=f"latencybench{int(time.time())}",
+            flush_interval=3600
+        )
+        return checkpointer if checkpointer.table_client else None
+    raise ValueError(f"Unknown backend '{backend}'")
+
+
+def run_backend(agent, checkpointer, threads: int, turns: int, concurrency: int) -> dict:
+    def conversation(index: int):
+        config = {"configurable": {"thread_id": f"latency-{index}"}}
+        run_ms, read_ms = [], []
+        for turn in range(turns):
+            start = time.perf_counter()
+            agent.invoke({"customer_query": f"My device will not boot after update {turn}"}, config)
+            # The API flushes after every run; only the Table checkpointer buffers
+            if hasattr(checkpointer, "flush"):
+                checkpointer.flush(config["configurable"]["thread_id"])
+            run_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            checkpointer.get_tuple(config)
+            read_ms.append((time.perf_counter() - start) * 1000)
+        return run_ms, read_ms
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(conversation, range(threads)))
+    elapsed = time.perf_counter() - start
+
+    run_ms = sorted(ms for runs, _ in results for ms in runs)
+    read_ms = sorted(ms for _, reads in results for ms in reads)
+    return {
+        "runs_per_second": len(run_ms) / elapsed,
+        "run_p50": statistics.median(run_ms),
+        "run_p95": run_ms[int(len(run_ms) * 0.95) - 1],
+        "read_p50": statistics.median(read_ms),
+        "read_p95": read_ms[int(len(read_ms) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkpointer overhead per graph run")
+    parser.add_argument("--backends", nargs="+", default=["memory", "sqlite", "azure_table"])
+    parser.add_argument("--connection-string", default=AZURITE_CONNECTION_STRING)
+    parser.add_argument("--threads", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent runs (like gunicorn threads)")
+    args = parser.parse_args()
+
+    print_header(f"{args.threads} threads x {args.turns} turns, concurrency {args.concurrency}")
+    print(f"  {'backend':<13}{'runs/s':>8}{'run p50':>10}{'run p95':>10}{'read p50':>10}{'read p95':>10}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in args.backends:
+            try:
+                checkpointer = create_checkpointer(backend, directory, args.connection_string)
+            except Exception as e:
+                print(f"  {backend:<13}unavailable: {str(e)}")
+                continue
+            if checkpointer is None:
+                print(f"  {backend:<13}skipped (Table Storage not reachable)")
+                continue
+
+            result = run_backend(build_graph(checkpointer), checkpointer, args.threads, args.turns, args.concurrency)
+            print(
+                f"  {backend:<13}{result['runs_per_second']:>8.0f}{result['run_p50']:>10.2f}{result['run_p95']:>10.2f}"
+                f"{result['read_p50']:>10.2f}{result['read_p95']:>10.2f}"
+            )
+            if backend == "azure_table":
+                from azure.data.tables import TableServiceClient
+                checkpointer.close()
+                TableServiceClient.from_connection_string(args.connection_string).delete_table(checkpointer.table_name)
+
+    print("\n  Latencies in ms. A run includes all step checkpoints and, for Table Storage, the flush.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+"""
+Fork Memory Benchmark
+Per-worker memory of the gunicorn preload_app setup: a master imports the app,
+forks N workers, and each worker runs a full garbage collection and touches
+the knowledge base, as it would while serving. Worker memory is then read from
+/proc/<pid>/smaps_rollup while all workers are alive.
+
+Variants (each in a fresh master process):
+    load_after_fork  the app is preloaded, each worker loads its own knowledge base
+    preload          the knowledge base is also loaded in the master before fork
+    preload_freeze   as preload, with gc disabled while loading and gc.freeze() before fork
+
+Private_Dirty is what each worker copied or allocated for itself; the total
+PSS (master plus workers) is the real footprint of the whole server.
+
+Usage (from backend/):
+    python -m benchmarks.fork_memory
+    python -m benchmarks.fork_memory --workers 4 --offline   # local indexes only, no Azure OpenAI
+
+Linux only. Unset Azure OpenAI settings get the placeholders used by
+benchmarks.import_time; without reachable Azure OpenAI use --offline, which
+loads the documents, BM25 and FAQ indexes but not the vector index.
+"""
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks.import_time import BACKEND_DIR, PLACEHOLDER_ENV
+
+VARIANTS = ("load_after_fork", "preload", "preload_freeze")
+
+
+def print_header(text):
+    print(f"\n{'='*60}")
+    print(f"  {text}")
+    print(f"{'='*60}\n")
+
+
+def load_knowledge_base(offline: bool):
+    """
+    Load the knowledge base (or only its local indexes) in this process.
+
+    Returns:
+        Object kept alive by the caller: the snapshot, or (docs, BM25, FAQ)
+    """
+    if not offline:
+        from vectorstore.knowledge_base import knowledge_base
+        return knowledge_base.load()
+
+    from data.load_documents import load_documents
+    from vectorstore.bm25_index import BM25Index
+    from vectorstore.faq_index import FAQIndex
+    from vectorstore.knowledge_base import knowledge_base
+    docs = load_documents(str(knowledge_base.source_path))
+    return docs, BM25Index(docs), FAQIndex.from_documents(docs)
+
+
+def serve_like(loaded, offline: bool):
+    """
+    What a worker does to inherited state while serving: collect and read.
+    """
+    gc.collect()
+    if offline:
+        docs, bm25, faq = loaded
+    else:
+        docs, bm25, faq = None, loaded.retriever.bm25, loaded.faq_index
+    for question, _, category in faq.entries:
+        bm25.search(question, k=3)
+        faq.lookup(question, category)
+    if docs:
+        sum(len(doc.page_content) for doc in docs)
+
+
+def run_variant(variant: str, workers: int, offline: bool) -> dict:
+    """
+    Act as the gunicorn master for one variant (runs in its own process).
+    """
+    from utils.prefork import read_smaps_rollup
+
+    freeze = variant == "preload_freeze"
+    if freeze:
+        gc.disable()
+    import app  # noqa: F401  (what preload_app imports)
+    loaded = load_knowledge_base(offline) if variant != "load_after_fork" else None
+    if freeze:
+        gc.freeze()
+
+    release_read, release_write = os.pipe()
+    ready_read, ready_write = os.pipe()
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(release_write)
+            if freeze:
+                gc.enable()
+            serve_like(loaded or load_knowledge_base(offline), offline)
+            os.write(ready_write, b".")
+            os.read(release_read, 1)  # Blocks until the master has measured everyone
+            os._exit(0)
+        pids.append(pid)
+
+    for _ in range(workers):
+        os.read(ready_read, 1)
+    worker_memory = [read_smaps_rollup(f"/proc/{pid}/smaps_rollup") for pid in pids]
+    master_memory = read_smaps_rollup()
+    os.close(release_write)
+    for pid in pids:
+        os.waitpid(pid, 0)
+    return {"master": master_memory, "workers": worker_memory}
+
+
+def measure(variant: str, workers: int, offline: bool) -> dict:
+    env = dict(os.environ)
+    for key, value in PLACEHOLDER_ENV.items():
+        env.setdefault(key, value)
+    command = [sys.executable, "-m", "benchmarks.fork_memory", "--variant", variant, "--workers", str(workers)]
+    if offline:
+        command.append("--offline")
+    result = subprocess.run(command, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{variant} failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker memory with and without pre-fork sharing")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--offline", action="store_true", help="Local indexes only (no Azure OpenAI calls)")
+    parser.add_argument("--variant", choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.workers, args.offline)))
+        return 0
+    if not Path("/proc/self/smaps_rollup").exists():
+        print("smaps_rollup not available (Linux only)")
+        return 1
+
+    print_header(f"{args.workers} workers, {'local indexes only' if args.offline else 'full knowledge base'}")
+    print(f"  {'variant':<18}{'worker PSS':>12}{'private dirty':>15}{'shared':>10}{'total PSS':>12}")
+    for variant in VARIANTS:
+        result = measure(variant, args.workers, args.offline)
+        workers = result["workers"]
+        pss = sum(memory["Pss"] for memory in workers) / len(workers) / 1024
+        private_dirty = sum(memory["Private_Dirty"] for memory in workers) / len(workers) / 1024
+        shared = sum(memory["Shared_Clean"] + memory["Shared_Dirty"] for memory in workers) / len(workers) / 1024
+        total = (result["master"]["Pss"] + sum(memory["Pss"] for memory in workers)) / 1024
+        print(f"  {variant:<18}{pss:>9.1f} MB{private_dirty:>12.1f} MB{shared:>7.1f} MB{total:>9.1f} MB")
+    print("\n  Per-worker columns are averages; total PSS includes the master.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+"""
+Hedged Requests Benchmark
+Tail latency of short model calls with and without hedging, using
+utils.hedging.HedgedCaller on a simulated model: log-normal latencies
+around --median-ms, with --straggler-rate of calls taking --straggler-ms
+longer (a slow replica, a queued request). Latencies are independent per
+attempt, like a duplicate landing on another backend.
+
+The first --warmup calls of each run fill the latency window and are not
+reported. Reports p50/p95/p99/max of what callers saw, the hedge rate, how
+often the hedge answered first, and the extra model calls sent.
+
+Usage (from backend/):
+    python -m benchmarks.hedging
+    python -m benchmarks.hedging --calls 2000 --straggler-rate 0.02 --max-hedge-rate 0.05
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from utils.hedging import HedgedCaller
+
+
+def print_header(text):
+    print(f"\n{'='*60}")
+    print(f"  {text}")
+    print(f"{'='*60}\n")
+
+
+class SimulatedModel:
+    """
+    Sleeps for a sampled latency per call and counts calls.
+    """
+
+    def __init__(self, median_ms: float, straggler_rate: float, straggler_ms: float, seed: int):
+        self.median_ms = median_ms
+        self.straggler_rate = straggler_rate
+        self.straggler_ms = straggler_ms
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self) -> str:
+        with self._lock:
+            self.calls += 1
+            ms = self.median_ms * self._random.lognormvariate(0, 0.25)
+            if self._random.random() < self.straggler_rate:
+                ms += self.straggler_ms
+        time.sleep(ms / 1000)
+        return "ok"
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def run(args, hedged: bool) -> dict:
+    model = SimulatedModel(args.median_ms, args.straggler_rate, args.straggler_ms, args.seed)
+    caller = HedgedCaller(
+        max_workers=args.concurrency * 2 + 4,
+        min_samples=min(20, args.warmup),
+        max_hedge_rate=args.max_hedge_rate
+    )
+
+    def one(_) -> float:
+        start = time.perf_counter()
+        caller.call("classifier", model, model if hedged else None)
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, range(args.warmup)))
+        stats_before = caller.get_stats()["classifier"]
+        calls_before = model.calls
+        latencies = list(pool.map(one, range(args.calls)))
+    stats = caller.get_stats()["classifier"]
+    hedges = stats["hedged"] - stats_before["hedged"]
+    return {
+        "latencies": latencies,
+        "hedge_rate": hedges / args.calls,
+        "hedge_wins": stats["hedge_wins"] - stats_before["hedge_wins"],
+        "hedges": hedges,
+        "extra_calls": (model.calls - calls_before) / args.calls - 1,
+        "hedge_delay_ms": stats["hedge_delay_ms"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tail latency with and without hedged model calls")
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--median-ms", type=float, default=40.0)
+    parser.add_argument("--straggler-rate", type=float, default=0.03)
+    parser.add_argument("--straggler-ms", type=float, default=1000.0)
+    parser.add_argument("--max-hedge-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print_header(
+        f"{args.calls} calls, concurrency {args.concurrency}: median {args.median_ms:.0f} ms, "
+        f"{args.straggler_rate:.0%} +{args.straggler_ms:.0f} ms"
+    )
+    results = {name: run(args, hedged) for name, hedged in (("unhedged", False), ("hedged", True))}
+
+    print(f"  {'':<10}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'hedge rate':>12}{'hedge wins':>12}{'extra calls':>13}")
+    for name, result in results.items():
+        latencies = result["latencies"]
+        print(
+            f"  {name:<10}{percentile(latencies, 0.5):>6.0f} ms{percentile(latencies, 0.95):>6.0f} ms"
+            f"{percentile(latencies, 0.99):>6.0f} ms{max(latencies):>6.0f} ms"
+            f"{result['hedge_rate']:>12.1%}{result['hedge_wins']:>12}{result['extra_calls']:>13.1%}"
+        )
+    hedged_p99 = percentile(results["hedged"]["latencies"], 0.99)
+    unhedged_p99 = percentile(results["unhedged"]["latencies"], 0.99)
+    print(f"\n  Hedge delay (observed p95): {results['hedged']['hedge_delay_ms']} ms")
+    print(f"  p99 {unhedged_p99:.0f} ms -> {hedged_p99:.0f} ms ({1 - hedged_p99 / unhedged_p99:.0%} lower)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+"""
+Import Time Benchmark
+Cold import cost of the API module (what every new gunicorn worker or
+scale-out instance pays before it can serve), broken down per module and per
+top-level package from Python's -X importtime trace.
+
+Each run imports the module in a fresh interpreter. The check fails (exit
+code 1) if the median import time exceeds the budget, or if a module that
+should only be loaded on first use (optional integrations) is imported.
+
+Usage (from backend/):
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --runs 5 --budget-ms 3000
+    python -m benchmarks.import_time --module main --top 30
+
+Azure OpenAI settings that are unset get placeholder values in the child
+process, because the LLM clients are constructed at import; nothing is called.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Optional integrations that must not be loaded just by importing the app
+LAZY_MODULES = [
+    "IPython",
+    "opencensus",
+    "applicationinsights",
+    "azure.storage.blob",
+    "azure.data.tables",
+]
+
+PLACEHOLDER_ENV = {
+    "AZURE_OPENAI_API_KEY": "import-time-benchmark",
+    "AZURE_OPENAI_ENDPOINT": "https://import-time-benchmark.invalid",
+    "AZURE_DEPLOYMENT_NAME": "import-time-benchmark",
+}
+
+
+def print_header(text):
+    print(f"\n{'='*60}")
+    print(f"  {text}")
+    print(f"{'='*60}\n")
+
+
+def parse_importtime(trace: str) -> List[Tuple[str, int, int]]:
+    """
+    Parse -X importtime output.
+
+    Returns:
+        (module, self µs, cumulative µs) in import order
+    """
+    modules = []
+    for line in trace.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (field.strip() for field in line[len("import time:"):].split("|"))
+        modules.append((name, int(self_us), int(cumulative_us)))
+    return modules
+
+
+def import_once(module: str) -> Tuple[float, List[Tuple[str, int, int]]]:
+    """
+    Import module in a fresh interpreter.
+
+    Returns:
+        (wall seconds for the import statement, parsed importtime trace)
+    """
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; "
+        "print(time.perf_counter() - start)"
+    )
+    env = dict(os.environ)
+    for key, value in PLACEHOLDER_ENV.items():
+        env.setdefault(key, value)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    seconds = float(result.stdout.strip().splitlines()[-1])
+    return seconds, parse_importtime(result.stderr)
+
+
+def by_package(modules: List[Tuple[str, int, int]]) -> Dict[str, int]:
+    totals: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in modules:
+        totals[name.split(".")[0]] += self_us
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold import cost of the API module")
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET_MS", "4000")))
+    parser.add_argument("--lazy", nargs="*", default=LAZY_MODULES, help="Modules that must not be imported")
+    args = parser.parse_args()
+
+    print_header(f"import {args.module}: {args.runs} cold runs")
+    runs = []
+    for run in range(args.runs):
+        seconds, modules = import_once(args.module)
+        runs.append((seconds, modules))
+        print(f"  run {run + 1}: {seconds * 1000:8.0f} ms  ({len(modules)} modules)")
+    median_ms = statistics.median(seconds for seconds, _ in runs) * 1000
+    # Break down the fastest run; slower ones mostly add scheduler noise
+    _, modules = min(runs, key=lambda run: run[0])
+
+    print_header(f"Top {args.top} top-level packages (self time, fastest run)")
+    packages = by_package(modules)
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {package:<40}{self_us / 1000:>9.1f} ms")
+
+    print_header(f"Top {args.top} project and direct imports (cumulative, fastest run)")
+    direct = [
+        (name.strip(), cumulative_us) for name, _, cumulative_us in modules
+        if len(name) - len(name.lstrip()) <= 2
+    ]
+    for name, cumulative_us in sorted(direct, key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<40}{cumulative_us / 1000:>9.1f} ms")
+
+    loaded = {name.strip() for name, _, _ in modules}
+    eager = [module for module in args.lazy if module in loaded]
+
+    print_header("Result")
+    print(f"  median import time: {median_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    print(f"  lazily loaded integrations imported eagerly: {', '.join(eager) or 'none'}")
+    failed = median_ms > args.budget_ms or bool(eager)
+    print(f"  {'FAIL' if failed else 'OK'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
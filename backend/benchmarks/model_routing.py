@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+"""
+Model Routing Benchmark
+Latency, token use and cost of per-node model configurations on a recorded
+traffic mix. Each message goes through the categorize and sentiment nodes
+(and with --generate the response node it routes to) exactly as in the
+graph, with the configuration's models in MODEL_CONFIGS.
+
+A configuration overrides MODEL_CONFIGS fields per role (classifier,
+sentiment, generator); a bare role sets the deployment:
+    small:classifier=gpt-4o-mini,sentiment=gpt-4o-mini
+    capped:classifier=gpt-4o-mini,classifier.max_tokens=16,classifier.timeout_seconds=5
+Without --config it compares the configured models with the previous setup,
+every node on AZURE_DEPLOYMENT_NAME at temperature 1. The first configuration
+is the reference for classification agreement.
+
+Traffic is the main.py --batch input (NDJSON or a JSON array of
+{"message"} objects); records with a "category" also score classification
+accuracy. Without --traffic the knowledge base FAQ questions are used,
+labelled with their category. Cost uses --price DEPLOYMENT=INPUT/OUTPUT in
+USD per million tokens, with token counts from the API's usage reports.
+
+Usage (from backend/):
+    python -m benchmarks.model_routing
+    python -m benchmarks.model_routing --config small:classifier=gpt-4o-mini,sentiment=gpt-4o-mini \\
+        --price gpt-4o=2.5/10 --price gpt-4o-mini=0.15/0.6
+    python -m benchmarks.model_routing --traffic traffic.ndjson --generate --limit 50
+
+Needs reachable Azure OpenAI deployments; --generate also loads the knowledge base.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from langchain_community.callbacks import get_openai_callback
+
+from config.settings import AZURE_DEPLOYMENT_NAME
+from data.load_documents import load_documents
+from models.llm import MODEL_CONFIGS, ModelConfig
+from nodes.categorize import categorize_inquiry
+from nodes.router import determine_route
+from nodes.sentiment import analyze_inquiry_sentiment
+from vectorstore.faq_index import parse_faq_text
+
+ROLES = ("classifier", "sentiment", "generator")
+FIELD_TYPES = {"deployment": str, "temperature": float, "max_tokens": int, "timeout_seconds": float}
+
+
+def print_header(text):
+    print(f"\n{'='*60}")
+    print(f"  {text}")
+    print(f"{'='*60}\n")
+
+
+def parse_config(spec: str, base: Dict[str, ModelConfig]) -> Tuple[str, Dict[str, ModelConfig]]:
+    """
+    Parse NAME:ROLE[.FIELD]=VALUE,... into a full role -> ModelConfig mapping.
+    """
+    name, _, overrides = spec.partition(":")
+    configs = dict(base)
+    for override in filter(None, overrides.split(",")):
+        key, _, value = override.partition("=")
+        role, _, field = key.strip().partition(".")
+        field = field or "deployment"
+        if role not in ROLES or field not in FIELD_TYPES:
+            raise ValueError(f"Unknown setting {key!r} in configuration {name!r}")
+        parsed = FIELD_TYPES[field](value)
+        if field in ("max_tokens", "timeout_seconds") and not parsed:
+            parsed = None
+        configs[role] = configs[role]._replace(**{field: parsed})
+    return name or "unnamed", configs
+
+
+def parse_price(spec: str) -> Tuple[str, Tuple[float, float]]:
+    deployment, _, prices = spec.partition("=")
+    prompt_price, _, completion_price = prices.partition("/")
+    return deployment, (float(prompt_price), float(completion_price or prompt_price))
+
+
+def load_traffic(path: Optional[str], documents: str) -> List[dict]:
+    """
+    Traffic records as {"message", "category"} (category lowercased, or None).
+    """
+    if path is None:
+        docs = load_documents(documents)
+        return [
+            {"message": parsed[0], "category": str(doc.metadata.get("category", "")).lower() or None}
+            for doc, parsed in ((doc, parse_faq_text(doc.page_content)) for doc in docs) if parsed
+        ]
+    with (sys.stdin if path == "-" else open(path, encoding="utf-8")) as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        records = json.loads(text)
+    else:
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [
+        {"message": record["message"], "category": (record.get("category") or "").lower() or None}
+        for record in records
+    ]
+
+
+def answer(item: dict, generate: bool) -> dict:
+    """
+    Run one message through the nodes, timing each model role.
+    """
+    from nodes.responses import (
+        generate_billing_response,
+        generate_general_response,
+        generate_technical_response
+    )
+    responders = {
+        "generate_technical_response": generate_technical_response,
+        "generate_billing_response": generate_billing_response,
+        "generate_general_response": generate_general_response,
+    }
+    steps = [("classifier", categorize_inquiry), ("sentiment", analyze_inquiry_sentiment)]
+    state = {"customer_query": item["message"]}
+    result = {"ms": {}, "tokens": {}}
+    try:
+        for role, node in steps + ([("generator", None)] if generate else []):
+            if node is None:
+                node = responders.get(determine_route(state))
+                if node is None:
+                    break  # Escalated: no model call
+            with get_openai_callback() as usage:
+                start = time.perf_counter()
+                state = node(dict(state))
+                result["ms"][role] = (time.perf_counter() - start) * 1000
+            result["tokens"][role] = (usage.prompt_tokens, usage.completion_tokens)
+    except Exception as e:
+        result["error"] = str(e)
+    result["category"] = state.get("query_category")
+    result["sentiment"] = state.get("query_sentiment")
+    return result
+
+
+def run_configuration(configs: Dict[str, ModelConfig], items: List[dict], generate: bool, concurrency: int) -> List[dict]:
+    original = dict(MODEL_CONFIGS)
+    MODEL_CONFIGS.update(configs)
+    try:
+        # Untimed: creates the clients and opens their connections
+        answer(items[0], generate)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(lambda item: answer(item, generate), items))
+    finally:
+        MODEL_CONFIGS.clear()
+        MODEL_CONFIGS.update(original)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def cost_per_1k_queries(
+    configs: Dict[str, ModelConfig],
+    results: List[dict],
+    prices: Dict[str, Tuple[float, float]]
+) -> Optional[float]:
+    total = 0.0
+    for result in results:
+        for role, (prompt_tokens, completion_tokens) in result["tokens"].items():
+            price = prices.get(configs[role].deployment)
+            if price is None:
+                return None
+            total += (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+    return total / len(results) * 1000
+
+
+def report(
+    name: str,
+    configs: Dict[str, ModelConfig],
+    results: List[dict],
+    items: List[dict],
+    reference: Optional[List[dict]],
+    prices: Dict[str, Tuple[float, float]]
+) -> dict:
+    ok = [result for result in results if "error" not in result]
+    print_header(f"{name}: {len(ok)}/{len(results)} messages answered")
+    for role in ROLES:
+        latencies = [result["ms"][role] for result in ok if role in result["ms"]]
+        if not latencies:
+            continue
+        config = configs[role]
+        prompt_tokens = statistics.mean(result["tokens"][role][0] for result in ok if role in result["tokens"])
+        completion_tokens = statistics.mean(result["tokens"][role][1] for result in ok if role in result["tokens"])
+        print(
+            f"  {role:<11}{config.deployment:<22}T={config.temperature:<4}max {str(config.max_tokens):<5}"
+            f"p50 {statistics.median(latencies):7.0f} ms  p95 {percentile(latencies, 0.95):7.0f} ms  "
+            f"tokens {prompt_tokens:6.0f} in {completion_tokens:5.0f} out"
+        )
+
+    # Classification runs before every route, so it is on the critical path of every message
+    classification = [result["ms"]["classifier"] + result["ms"]["sentiment"] for result in ok]
+    labelled = [(result, item) for result, item in zip(results, items) if item["category"] and "error" not in result]
+    accuracy = (
+        sum((result["category"] or "").lower() == item["category"] for result, item in labelled) / len(labelled)
+        if labelled else None
+    )
+    agreement = None
+    if reference is not None:
+        pairs = [(a, b) for a, b in zip(results, reference) if "error" not in a and "error" not in b]
+        agreement = sum(
+            a["category"] == b["category"] and a["sentiment"] == b["sentiment"] for a, b in pairs
+        ) / len(pairs) if pairs else None
+    summary = {
+        "name": name,
+        "errors": len(results) - len(ok),
+        "classification_p50": statistics.median(classification) if classification else 0.0,
+        "classification_p95": percentile(classification, 0.95),
+        "cost": cost_per_1k_queries(configs, ok, prices) if ok else None,
+        "accuracy": accuracy,
+        "agreement": agreement,
+    }
+    errors = [result["error"] for result in results if "error" in result]
+    if errors:
+        print(f"\n  {len(errors)} errors, e.g.: {errors[0][:200]}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency and cost per node model configuration")
+    parser.add_argument("--config", action="append", default=[], help="NAME:ROLE[.FIELD]=VALUE,... (repeatable)")
+    parser.add_argument("--price", action="append", default=[], help="DEPLOYMENT=INPUT/OUTPUT USD per 1M tokens")
+    parser.add_argument("--traffic", help="Recorded messages (main.py --batch format); default: FAQ questions")
+    parser.add_argument("--documents", default="./data/router_agent_documents.json")
+    parser.add_argument("--limit", type=int, default=0, help="Use the first N messages (0 = all)")
+    parser.add_argument("--generate", action="store_true", help="Also run the response nodes")
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+
+    base = dict(MODEL_CONFIGS)
+    try:
+        previous = [
+            f"{role}{field}={value}"
+            for role in ROLES
+            for field, value in (("", AZURE_DEPLOYMENT_NAME), (".temperature", 1), (".max_tokens", 0))
+        ]
+        specs = args.config or ["configured:", "single:" + ",".join(previous)]
+        configurations = [parse_config(spec, base) for spec in specs]
+        prices = dict(parse_price(spec) for spec in args.price)
+    except ValueError as e:
+        parser.error(str(e))
+
+    items = load_traffic(args.traffic, args.documents)
+    if args.limit:
+        items = items[:args.limit]
+    if not items:
+        print("No traffic to replay")
+        return 1
+    if args.generate:
+        from vectorstore.knowledge_base import knowledge_base
+        knowledge_base.load()
+
+    labelled = sum(1 for item in items if item["category"])
+    print_header(
+        f"{len(items)} messages ({labelled} labelled), {len(configurations)} configurations, "
+        f"concurrency {args.concurrency}{', with generation' if args.generate else ''}"
+    )
+
+    summaries = []
+    reference = None
+    for name, configs in configurations:
+        results = run_configuration(configs, items, args.generate, max(1, args.concurrency))
+        summaries.append(report(name, configs, results, items, reference, prices))
+        if reference is None:
+            reference = results
+
+    print_header("Summary (classification = categorize + sentiment, the path every message takes)")
+    print(f"  {'configuration':<16}{'p50':>9}{'p95':>9}{'$/1k queries':>14}{'accuracy':>10}{'agreement':>11}{'errors':>8}")
+    for summary in summaries:
+        cost = f"{summary['cost']:.4f}" if summary["cost"] is not None else "n/a"
+        accuracy = f"{summary['accuracy']:.1%}" if summary["accuracy"] is not None else "n/a"
+        agreement = f"{summary['agreement']:.1%}" if summary["agreement"] is not None else "-"
+        print(
+            f"  {summary['name']:<16}{summary['classification_p50']:>6.0f} ms{summary['classification_p95']:>6.0f} ms"
+            f"{cost:>14}{accuracy:>10}{agreement:>11}{summary['errors']:>8}"
+        )
+    if not args.price:
+        print("\n  Pass --price DEPLOYMENT=INPUT/OUTPUT (USD per 1M tokens) to compare cost.")
+    return 1 if any(summary["errors"] == len(items) for summary in summaries) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+"""
+Quantized Index Benchmark
+Recall@k, size and query latency of float16/int8 knowledge base indexes
+versus exact float32 search, on the knowledge base documents.
+
+Queries must not be stored in the index: a stored question is its own nearest
+neighbour by a wide margin, so any index finds it. By default each FAQ
+question is held out in turn (leave-one-out): its entry is left out of the
+index and the question is searched against the rest. --queries uses
+paraphrased or recorded messages (main.py --batch format, or one per line)
+against the full index instead.
+
+Size columns: disk is the index directory, backup what Blob backups upload
+(the float32 re-rank copy stays local, see utils.azure_blob_sync).
+
+Usage (from backend/):
+    python -m benchmarks.quantized_index               # Azure OpenAI embeddings
+    python -m benchmarks.quantized_index --synthetic   # offline, hashed bag-of-words vectors
+    python -m benchmarks.quantized_index --queries paraphrases.ndjson
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from data.load_documents import load_documents
+from vectorstore.bm25_index import tokenize
+from vectorstore.faq_index import parse_faq_text
+from utils.azure_blob_sync import LOCAL_ONLY_NAMES
+from vectorstore.quantized_store import QUANTIZED_FORMATS, QuantizedVectorStore
+
+
+def print_header(text):
+    print(f"\n{'='*60}")
+    print(f"  {text}")
+    print(f"{'='*60}\n")
+
+
+class SyntheticEmbeddings:
+    """
+    Offline stand-in: sum of a fixed random vector per term, normalized.
+    Keeps lexical neighbours close so recall numbers stay meaningful.
+    """
+
+    def __init__(self, dimension: int = 1536):
+        self.dimension = dimension
+
+    def _term_vector(self, term: str) -> np.ndarray:
+        return np.random.default_rng(zlib.crc32(term.encode())).standard_normal(self.dimension)
+
+    def embed_query(self, text: str):
+        vector = np.zeros(self.dimension)
+        for term in tokenize(text) or ["empty"]:
+            vector += self._term_vector(term)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def exact_top_k(doc_vectors: np.ndarray, query_vector: np.ndarray, k: int) -> List[int]:
+    docs = doc_vectors / np.linalg.norm(doc_vectors, axis=1, keepdims=True)
+    return np.argsort(-(docs @ (query_vector / np.linalg.norm(query_vector))))[:k].tolist()
+
+
+def load_queries(path: str) -> List[str]:
+    with (sys.stdin if path == "-" else open(path, encoding="utf-8")) as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        records = json.loads(text)
+    else:
+        lines = [line for line in text.splitlines() if line.strip()]
+        records = [json.loads(line) if line.lstrip().startswith("{") else line for line in lines]
+    return [record["message"] if isinstance(record, dict) else str(record) for record in records]
+
+
+def index_size(directory: Path) -> Tuple[int, int]:
+    files = [path for path in directory.iterdir() if path.is_file()]
+    disk = sum(path.stat().st_size for path in files)
+    return disk, disk - sum(path.stat().st_size for path in files if path.name in LOCAL_ONLY_NAMES)
+
+
+def evaluate(
+    docs,
+    doc_vectors: np.ndarray,
+    queries: List[Tuple[np.ndarray, Optional[int]]],
+    index_format: str,
+    rerank: bool,
+    args
+) -> dict:
+    """
+    Recall@k against exact float32 search over the same documents, and ms per query.
+    A query with a held-out document index is searched against an index without it.
+    """
+    hits, total, elapsed = 0, 0, 0.0
+    with tempfile.TemporaryDirectory() as tmp:
+        for held_out in sorted({held_out for _, held_out in queries}, key=lambda i: -1 if i is None else i):
+            keep = [i for i in range(len(docs)) if i != held_out]
+            directory = Path(tmp) / f"index-{held_out}"
+            QuantizedVectorStore.build([docs[i] for i in keep], doc_vectors[keep], str(directory), index_format, keep_exact=rerank)
+            store = QuantizedVectorStore(str(directory), None, rerank=rerank, rerank_candidates=args.rerank_candidates)
+            position = {doc.page_content: row for row, doc in enumerate(store.documents)}
+            for query_vector, query_held_out in queries:
+                if query_held_out != held_out:
+                    continue
+                expected = set(exact_top_k(doc_vectors[keep], query_vector, args.k))
+                start = time.perf_counter()
+                results = store.similarity_search_by_vector_with_relevance_scores(query_vector, k=args.k)
+                elapsed += time.perf_counter() - start
+                hits += len({position[doc.page_content] for doc, _ in results} & expected)
+                total += len(expected)
+
+        directory = Path(tmp) / "full"
+        QuantizedVectorStore.build(docs, doc_vectors, str(directory), index_format, keep_exact=rerank)
+        store = QuantizedVectorStore(str(directory), None, rerank=rerank)
+        disk, backup = index_size(directory)
+        return {
+            "recall": hits / total if total else 0.0,
+            "ms_per_query": elapsed * 1000 / len(queries),
+            "resident_bytes": store.nbytes()["resident_bytes"],
+            "disk_bytes": disk,
+            "backup_bytes": backup,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs size for quantized knowledge base indexes")
+    parser.add_argument("--documents", default="./data/router_agent_documents.json")
+    parser.add_argument("--queries", help="Paraphrased/recorded queries; default: held-out FAQ questions")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--rerank-candidates", type=int, default=12)
+    parser.add_argument("--synthetic", action="store_true", help="Use offline synthetic embeddings")
+    args = parser.parse_args()
+
+    docs = load_documents(args.documents)
+    if args.queries:
+        texts = load_queries(args.queries)
+        held_out = [None] * len(texts)
+    else:
+        faq = [(i, parse_faq_text(doc.page_content)) for i, doc in enumerate(docs)]
+        texts = [parsed[0] for _, parsed in faq if parsed]
+        held_out = [i for i, parsed in faq if parsed]
+    if not texts:
+        print("No queries")
+        return 1
+
+    if args.synthetic:
+        embedding = SyntheticEmbeddings()
+    else:
+        from vectorstore.chroma_store import create_embeddings
+        embedding = create_embeddings()
+
+    print_header("Embedding documents and queries")
+    doc_vectors = np.array(embedding.embed_documents([doc.page_content for doc in docs]), dtype=np.float32)
+    query_vectors = np.array(embedding.embed_documents(texts), dtype=np.float32)
+    queries = list(zip(query_vectors, held_out))
+    print(
+        f"  {len(docs)} documents, {len(texts)} {'queries' if args.queries else 'held-out questions'}, "
+        f"dimension {doc_vectors.shape[1]}"
+    )
+
+    float32_bytes = doc_vectors.nbytes
+    print_header(f"Recall@{args.k} vs float32 exact search")
+    print(f"  {'format':<10}{'rerank':<8}{'recall':>8}{'resident':>12}{'ratio':>8}{'disk':>12}{'backup':>12}{'ms/query':>10}")
+    print(f"  {'float32':<10}{'-':<8}{1.0:>8.3f}{float32_bytes:>12,}{1.0:>8.2f}{float32_bytes:>12,}{float32_bytes:>12,}{'-':>10}")
+    for index_format in QUANTIZED_FORMATS:
+        for rerank in (False, True):
+            result = evaluate(docs, doc_vectors, queries, index_format, rerank, args)
+            print(
+                f"  {index_format:<10}{'yes' if rerank else 'no':<8}{result['recall']:>8.3f}"
+                f"{result['resident_bytes']:>12,}{float32_bytes / result['resident_bytes']:>8.2f}"
+                f"{result['disk_bytes']:>12,}{result['backup_bytes']:>12,}{result['ms_per_query']:>10.3f}"
+            )
+
+    print("\n  resident = vectors + scales + norms held in memory; disk includes documents.json and,")
+    print("  with rerank, the local float32 copy (float32 row: raw vectors only).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
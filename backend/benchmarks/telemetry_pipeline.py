@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+"""
+Telemetry Pipeline Benchmark
+Cost of telemetry calls on the request path, measured against a local
+stand-in for the Application Insights ingestion endpoint.
+
+Compares the applicationinsights TelemetryClient (sends synchronously from the
+calling thread whenever its queue fills) with TelemetryPipeline (enqueue only,
+batched export from a background thread). The collector can be slowed down or
+made to fail, and a small queue shows dropping under overload.
+
+It then prints the pipeline's accounting next to what the collector received.
+The accounting itself (every call exported, dropped or failed exactly once)
+is covered by tests/test_telemetry.py.
+
+Usage (from backend/):
+    python -m benchmarks.telemetry_pipeline
+    python -m benchmarks.telemetry_pipeline --collector-delay-ms 200 --queue-size 500
+    python -m benchmarks.telemetry_pipeline --collector-status 500
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from applicationinsights import TelemetryClient
+from applicationinsights.channel import SynchronousQueue, SynchronousSender, TelemetryChannel
+
+from utils.telemetry import ApplicationInsightsExporter, TelemetryPipeline
+
+INSTRUMENTATION_KEY = "00000000-0000-0000-0000-000000000000"
+
+
+def print_header(text):
+    print(f"\n{'='*60}")
+    print(f"  {text}")
+    print(f"{'='*60}\n")
+
+
+class LocalCollector:
+    """
+    Ingestion endpoint stand-in: counts the envelopes POSTed to /v2/track.
+    """
+
+    def __init__(self, delay_ms: float = 0.0, status: int = 200):
+        self.delay_ms = delay_ms
+        self.status = status
+        self.requests = 0
+        self.items = 0
+        self.item_types = {}
+        self._lock = threading.Lock()
+        collector = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                envelopes = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                time.sleep(collector.delay_ms / 1000)
+                if collector.status < 300:
+                    with collector._lock:
+                        collector.requests += 1
+                        collector.items += len(envelopes)
+                        for envelope in envelopes:
+                            kind = envelope["data"]["baseType"]
+                            collector.item_types[kind] = collector.item_types.get(kind, 0) + 1
+                self.send_response(collector.status)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"{}")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def reset(self):
+        with self._lock:
+            self.requests = self.items = 0
+            self.item_types = {}
+
+    def close(self):
+        self.server.shutdown()
+
+
+def simulate_requests(client, requests: int, threads: int) -> list:
+    """
+    The telemetry calls query_endpoint makes per request, from several threads.
+
+    Returns:
+        Per-request telemetry time in ms
+    """
+    def one_request(i):
+        start = time.perf_counter()
+        client.track_event("query_received", {"thread_id": f"t{i % 50}"})
+        client.track_metric("query_success", 1)
+        client.track_event("query_completed", {"thread_id": f"t{i % 50}", "status": "success"})
+        if i % 20 == 0:
+            try:
+                raise ValueError("simulated failure")
+            except ValueError:
+                client.track_exception()
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(one_request, range(requests)))
+
+
+def calls_per_run(requests: int) -> int:
+    return requests * 3 + len(range(0, requests, 20))
+
+
+def report(name: str, latencies: list):
+    ordered = sorted(latencies)
+    p99 = ordered[int(len(ordered) * 0.99) - 1]
+    print(
+        f"  {name:<22} p50 {statistics.median(ordered):7.3f} ms   p99 {p99:8.3f} ms   "
+        f"max {ordered[-1]:8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Telemetry on the request path vs batched export")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--collector-delay-ms", type=float, default=50.0)
+    parser.add_argument("--collector-status", type=int, default=200)
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    collector = LocalCollector(args.collector_delay_ms, args.collector_status)
+    calls = calls_per_run(args.requests)
+    print_header(
+        f"{args.requests} requests ({calls} telemetry calls), {args.threads} threads, "
+        f"collector +{args.collector_delay_ms:.0f} ms, HTTP {args.collector_status}"
+    )
+
+    if args.collector_status < 300:
+        # The SDK's flush retries failed items forever, so only run it against a healthy collector
+        sdk_queue = SynchronousQueue(SynchronousSender(f"{collector.url}/v2/track"))
+        sdk_client = TelemetryClient(INSTRUMENTATION_KEY, TelemetryChannel(queue=sdk_queue))
+        report("TelemetryClient", simulate_requests(sdk_client, args.requests, args.threads))
+        sdk_client.flush()
+        collector.reset()
+
+    pipeline = TelemetryPipeline(
+        ApplicationInsightsExporter(f"InstrumentationKey={INSTRUMENTATION_KEY};IngestionEndpoint={collector.url}/"),
+        max_queue_size=args.queue_size,
+        batch_size=args.batch_size,
+        flush_interval_seconds=0.5
+    )
+    pipeline.start()
+    report("TelemetryPipeline", simulate_requests(pipeline, args.requests, args.threads))
+    drain_start = time.perf_counter()
+    pipeline.stop(timeout=120)
+    drain_seconds = time.perf_counter() - drain_start
+    collector.close()
+
+    stats = pipeline.get_stats()
+    print_header("Pipeline accounting")
+    for key in ("enqueued", "exported", "dropped", "failed", "batches", "queued"):
+        print(f"  {key:<12}{stats[key]:>8}")
+    print(f"  drained in {drain_seconds:.1f}s after the last call")
+    print(f"  collector received {collector.items} items in {collector.requests} requests: {collector.item_types}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
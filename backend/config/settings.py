@@ -10,6 +10,38 @@ AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
 AZURE_API_VERSION = os.getenv("AZURE_API_VERSION", "2024-02-15-preview")
 AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
 
+# Per-node models (benchmarks/model_routing.py compares configurations):
+# classifier = categorize_inquiry, sentiment = analyze_inquiry_sentiment, generator = response nodes.
+# Deployments default to AZURE_DEPLOYMENT_NAME; max tokens 0 = no limit
+LLM_CLASSIFIER_DEPLOYMENT = os.getenv("LLM_CLASSIFIER_DEPLOYMENT", AZURE_DEPLOYMENT_NAME)
+LLM_CLASSIFIER_TEMPERATURE = float(os.getenv("LLM_CLASSIFIER_TEMPERATURE", "0"))
+LLM_CLASSIFIER_MAX_TOKENS = int(os.getenv("LLM_CLASSIFIER_MAX_TOKENS", "64"))
+LLM_CLASSIFIER_TIMEOUT_SECONDS = float(os.getenv("LLM_CLASSIFIER_TIMEOUT_SECONDS", "10"))
+LLM_SENTIMENT_DEPLOYMENT = os.getenv("LLM_SENTIMENT_DEPLOYMENT", LLM_CLASSIFIER_DEPLOYMENT)
+LLM_SENTIMENT_TEMPERATURE = float(os.getenv("LLM_SENTIMENT_TEMPERATURE", "0"))
+LLM_SENTIMENT_MAX_TOKENS = int(os.getenv("LLM_SENTIMENT_MAX_TOKENS", "64"))
+LLM_SENTIMENT_TIMEOUT_SECONDS = float(os.getenv("LLM_SENTIMENT_TIMEOUT_SECONDS", "10"))
+LLM_GENERATOR_DEPLOYMENT = os.getenv("LLM_GENERATOR_DEPLOYMENT", AZURE_DEPLOYMENT_NAME)
+LLM_GENERATOR_TEMPERATURE = float(os.getenv("LLM_GENERATOR_TEMPERATURE", "1"))
+LLM_GENERATOR_MAX_TOKENS = int(os.getenv("LLM_GENERATOR_MAX_TOKENS", "0"))
+LLM_GENERATOR_TIMEOUT_SECONDS = float(os.getenv("LLM_GENERATOR_TIMEOUT_SECONDS", "60"))
+# Model call timeouts adapt to recent latency: p99 x multiplier, at least the minimum, at most the role's timeout
+LLM_ADAPTIVE_TIMEOUTS = os.getenv("LLM_ADAPTIVE_TIMEOUTS", "true").lower() == "true"
+LLM_TIMEOUT_P99_MULTIPLIER = float(os.getenv("LLM_TIMEOUT_P99_MULTIPLIER", "3"))
+LLM_TIMEOUT_MIN_SECONDS = float(os.getenv("LLM_TIMEOUT_MIN_SECONDS", "5"))
+# Hedged requests: a call with no reply by the role's observed p95 is sent again, first reply wins
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true"
+LLM_HEDGE_ROLES = [role.strip() for role in os.getenv("LLM_HEDGE_ROLES", "classifier,sentiment").split(",") if role.strip()]
+LLM_HEDGE_DEPLOYMENT = os.getenv("LLM_HEDGE_DEPLOYMENT")  # Secondary deployment for duplicates (default: the role's own)
+LLM_HEDGE_MAX_RATE = float(os.getenv("LLM_HEDGE_MAX_RATE", "0.1"))  # Fraction of recent calls that may be hedged
+# Latency percentiles per role: recent calls kept, and calls needed before timeouts adapt and hedging starts
+LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "500"))
+LLM_LATENCY_MIN_SAMPLES = int(os.getenv("LLM_LATENCY_MIN_SAMPLES", "20"))
+LLM_CALL_WORKERS = int(os.getenv("LLM_CALL_WORKERS", "64"))
+# Changing the embedding deployment rebuilds the vector index on the next load
+EMBEDDING_DEPLOYMENT = os.getenv("EMBEDDING_DEPLOYMENT", "text-embedding-3-small")
+EMBEDDING_TIMEOUT_SECONDS = float(os.getenv("EMBEDDING_TIMEOUT_SECONDS", "30"))
+
 # ChromaDB Configuration
 CHROMA_TELEMETRY_ENABLED = os.getenv("CHROMA_TELEMETRY_ENABLED", "False")
 
@@ -20,8 +52,25 @@ AZURE_STORAGE_ACCOUNT_KEY = os.getenv("AZURE_STORAGE_ACCOUNT_KEY")
 AZURE_TABLE_NAME = os.getenv("AZURE_TABLE_NAME", "checkpoints")
 AZURE_BLOB_CONTAINER_NAME = os.getenv("AZURE_BLOB_CONTAINER_NAME", "chromadb")
 
+# Blob sync transfers: files in flight, and parallel blocks/ranges per large file
+BLOB_SYNC_MAX_CONCURRENCY = int(os.getenv("BLOB_SYNC_MAX_CONCURRENCY", "8"))
+BLOB_SYNC_BLOCK_CONCURRENCY = int(os.getenv("BLOB_SYNC_BLOCK_CONCURRENCY", "4"))
+BLOB_SYNC_BLOCK_SIZE_MB = int(os.getenv("BLOB_SYNC_BLOCK_SIZE_MB", "4"))
+# Backup layout: files (one blob per index file, delta sync) | snapshot (one tar.zst archive + catalog)
+BLOB_BACKUP_MODE = os.getenv("BLOB_BACKUP_MODE", "files").lower()
+BLOB_SNAPSHOT_COMPRESSION_LEVEL = int(os.getenv("BLOB_SNAPSHOT_COMPRESSION_LEVEL", "3"))
+# Background ChromaDB backups (one worker per instance uploads)
+BLOB_BACKUP_INTERVAL_SECONDS = float(os.getenv("BLOB_BACKUP_INTERVAL_SECONDS", "3600"))  # 0 disables scheduled backups
+BLOB_BACKUP_DEBOUNCE_SECONDS = float(os.getenv("BLOB_BACKUP_DEBOUNCE_SECONDS", "60"))  # after index changes, 0 disables
+BLOB_RESTORE_ON_STARTUP = os.getenv("BLOB_RESTORE_ON_STARTUP", "missing").lower()  # missing | always | never
+
 # Application Insights Configuration
 APPLICATIONINSIGHTS_CONNECTION_STRING = os.getenv("APPLICATIONINSIGHTS_CONNECTION_STRING")
+# Telemetry is queued in memory and exported in batches; items beyond the queue size are dropped
+TELEMETRY_QUEUE_SIZE = int(os.getenv("TELEMETRY_QUEUE_SIZE", "10000"))
+TELEMETRY_BATCH_SIZE = int(os.getenv("TELEMETRY_BATCH_SIZE", "100"))
+TELEMETRY_FLUSH_INTERVAL_SECONDS = float(os.getenv("TELEMETRY_FLUSH_INTERVAL_SECONDS", "5"))
+TELEMETRY_EXPORT_TIMEOUT_SECONDS = float(os.getenv("TELEMETRY_EXPORT_TIMEOUT_SECONDS", "10"))
 
 # Environment
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
@@ -30,3 +79,76 @@ ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
 USE_AZURE_TABLE_STORAGE = os.getenv("USE_AZURE_TABLE_STORAGE", "false").lower() == "true"
 USE_AZURE_BLOB_STORAGE = os.getenv("USE_AZURE_BLOB_STORAGE", "false").lower() == "true"
 USE_APPLICATION_INSIGHTS = os.getenv("USE_APPLICATION_INSIGHTS", "true").lower() == "true"
+
+# Checkpointer backend: auto (Table Storage if USE_AZURE_TABLE_STORAGE, else memory) | azure_table | sqlite | memory
+CHECKPOINTER_BACKEND = os.getenv("CHECKPOINTER_BACKEND", "auto").lower()
+
+# Table Storage checkpoints are buffered and flushed at run end or on this timer
+CHECKPOINT_FLUSH_INTERVAL_SECONDS = float(os.getenv("CHECKPOINT_FLUSH_INTERVAL_SECONDS", "2"))
+CHECKPOINT_COMPRESSION = os.getenv("CHECKPOINT_COMPRESSION", "zstd").lower()  # zstd | zlib | none
+CHECKPOINT_COMPRESSION_LEVEL = int(os.getenv("CHECKPOINT_COMPRESSION_LEVEL", "3"))
+CHECKPOINT_CACHE_SIZE = int(os.getenv("CHECKPOINT_CACHE_SIZE", "1024"))  # threads cached per worker, 0 disables
+CHECKPOINT_CACHE_TTL_SECONDS = float(os.getenv("CHECKPOINT_CACHE_TTL_SECONDS", "30"))
+# Threads are hashed into this many partitions; changing it requires migrate_partitions()
+CHECKPOINT_PARTITION_SHARDS = int(os.getenv("CHECKPOINT_PARTITION_SHARDS", "16"))
+CHECKPOINT_LEGACY_PARTITION_FALLBACK = os.getenv("CHECKPOINT_LEGACY_PARTITION_FALLBACK", "true").lower() == "true"
+
+# In-memory checkpointer bounds (used when Table Storage is off)
+CHECKPOINT_MEMORY_MAX_PER_THREAD = int(os.getenv("CHECKPOINT_MEMORY_MAX_PER_THREAD", "10"))
+CHECKPOINT_MEMORY_MAX_THREADS = int(os.getenv("CHECKPOINT_MEMORY_MAX_THREADS", "2000"))
+CHECKPOINT_MEMORY_THREAD_TTL_SECONDS = float(os.getenv("CHECKPOINT_MEMORY_THREAD_TTL_SECONDS", "3600"))
+CHECKPOINT_SPILL_PATH = os.getenv("CHECKPOINT_SPILL_PATH")  # e.g. ./checkpoint_spill.sqlite3; unset disables spilling
+CHECKPOINT_SPILL_TTL_SECONDS = float(os.getenv("CHECKPOINT_SPILL_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# SQLite checkpointer (WAL), shared by all workers on a node
+CHECKPOINT_SQLITE_PATH = os.getenv("CHECKPOINT_SQLITE_PATH", "./checkpoints.sqlite3")
+CHECKPOINT_SQLITE_MAX_PER_THREAD = int(os.getenv("CHECKPOINT_SQLITE_MAX_PER_THREAD", "20"))
+
+# Checkpoint retention, applied by a background compactor in each worker
+CHECKPOINT_RETENTION_KEEP_LAST = int(os.getenv("CHECKPOINT_RETENTION_KEEP_LAST", "20"))  # per thread, 0 = unlimited
+CHECKPOINT_RETENTION_FINAL_ONLY_PER_RUN = os.getenv("CHECKPOINT_RETENTION_FINAL_ONLY_PER_RUN", "true").lower() == "true"
+CHECKPOINT_RETENTION_THREAD_TTL_SECONDS = float(os.getenv("CHECKPOINT_RETENTION_THREAD_TTL_SECONDS", str(30 * 24 * 3600)))  # 0 = never
+CHECKPOINT_COMPACTION_INTERVAL_SECONDS = float(os.getenv("CHECKPOINT_COMPACTION_INTERVAL_SECONDS", "900"))  # 0 disables
+CHECKPOINT_COMPACTION_BATCH_SIZE = int(os.getenv("CHECKPOINT_COMPACTION_BATCH_SIZE", "100"))
+
+# Retrieval Configuration
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()  # vector | hybrid | fast_path
+BM25_FAST_PATH_MIN_SCORE = float(os.getenv("BM25_FAST_PATH_MIN_SCORE", "5.0"))
+BM25_FAST_PATH_MARGIN = float(os.getenv("BM25_FAST_PATH_MARGIN", "1.5"))
+
+# Speculative retrieval: start the knowledge base search while classification runs
+RETRIEVAL_PREFETCH_ENABLED = os.getenv("RETRIEVAL_PREFETCH_ENABLED", "true").lower() == "true"
+RETRIEVAL_PREFETCH_WORKERS = int(os.getenv("RETRIEVAL_PREFETCH_WORKERS", "4"))
+RETRIEVAL_PREFETCH_CANDIDATES = int(os.getenv("RETRIEVAL_PREFETCH_CANDIDATES", "9"))
+
+# FAQ direct answers: reuse the stored answer when the query matches a stored question
+FAQ_DIRECT_ANSWER_ENABLED = os.getenv("FAQ_DIRECT_ANSWER_ENABLED", "true").lower() == "true"
+FAQ_MATCH_THRESHOLD = float(os.getenv("FAQ_MATCH_THRESHOLD", "0.85"))
+
+# Knowledge base hot reload
+KB_SOURCE_PATH = os.getenv("KB_SOURCE_PATH", "./data/router_agent_documents.json")
+KB_PERSIST_DIRECTORY = os.getenv("KB_PERSIST_DIRECTORY", "./knowledge_base")
+KB_WATCH_INTERVAL_SECONDS = float(os.getenv("KB_WATCH_INTERVAL_SECONDS", "30"))
+
+# Gunicorn preload_app: load the knowledge base in the master so workers share it copy-on-write
+PRELOAD_KNOWLEDGE_BASE = os.getenv("PRELOAD_KNOWLEDGE_BASE", "true").lower() == "true"
+GC_FREEZE_BEFORE_FORK = os.getenv("GC_FREEZE_BEFORE_FORK", "true").lower() == "true"
+
+# Batch queries (/query/batch and main.py --batch)
+QUERY_BATCH_CONCURRENCY = int(os.getenv("QUERY_BATCH_CONCURRENCY", "8"))
+QUERY_BATCH_MAX_CONCURRENCY = int(os.getenv("QUERY_BATCH_MAX_CONCURRENCY", "32"))
+QUERY_BATCH_MAX_ITEMS = int(os.getenv("QUERY_BATCH_MAX_ITEMS", "1000"))
+
+# Agent runs: dedicated thread pool per worker, separate from the default executor
+AGENT_EXECUTOR_WORKERS = int(os.getenv("AGENT_EXECUTOR_WORKERS", "16"))
+AGENT_EXECUTOR_MAX_QUEUE = int(os.getenv("AGENT_EXECUTOR_MAX_QUEUE", "64"))  # waiting runs before 503 (0 = unbounded)
+AGENT_EXECUTOR_DISCONNECT_POLL_SECONDS = float(os.getenv("AGENT_EXECUTOR_DISCONNECT_POLL_SECONDS", "0.5"))
+
+# Admin endpoints are disabled unless a key is configured
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+
+# Vector index format: chroma (HNSW, float32) | float16 | int8 (scalar-quantized)
+VECTOR_INDEX_FORMAT = os.getenv("VECTOR_INDEX_FORMAT", "chroma").lower()
+# Exact re-ranking keeps a float32 copy of the vectors on local disk (not backed up), larger than chroma's
+VECTOR_INDEX_RERANK = os.getenv("VECTOR_INDEX_RERANK", "false").lower() == "true"
+VECTOR_INDEX_RERANK_CANDIDATES = int(os.getenv("VECTOR_INDEX_RERANK_CANDIDATES", "12"))
@@ -10,6 +10,12 @@ def load_documents(json_path: str) -> List[Document]:
     with open(json_path, "r") as f:
         knowledge_base = json.load(f)
 
+    return parse_documents(knowledge_base)
+
+def parse_documents(knowledge_base: List[dict]) -> List[Document]:
+    """
+    Convert parsed knowledge base entries ({'text': ..., 'metadata': ...}) into Documents.
+    """
     processed_docs = []
     for doc in tqdm(knowledge_base, desc="Processing documents"):
         metadata = doc.get('metadata', {})
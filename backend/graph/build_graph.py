@@ -4,10 +4,16 @@ from langgraph.checkpoint.memory import MemorySaver
 from models.schema import CustomerSupportState
 from nodes.categorize import categorize_inquiry
 from nodes.sentiment import analyze_inquiry_sentiment
-from nodes.responses import generate_technical_response, generate_billing_response, generate_general_response
+from nodes.responses import (
+    prefetch_retrieval,
+    generate_technical_response,
+    generate_billing_response,
+    generate_general_response
+)
 from nodes.escalate import escalate_to_human_agent
 from nodes.router import determine_route
-from utils.azure_checkpointer import get_checkpointer
+from utils.checkpointer import get_checkpointer
+from config.settings import RETRIEVAL_PREFETCH_ENABLED
 import logging
 
 logger = logging.getLogger(__name__)
@@ -43,7 +49,13 @@ def build_support_agent(retriever):
     graph.add_edge("generate_general_response", END)
     graph.add_edge("escalate_to_human_agent", END)
 
-    graph.set_entry_point("categorize_inquiry")
+    if RETRIEVAL_PREFETCH_ENABLED:
+        # Kick off retrieval first so it overlaps with the classification calls
+        graph.add_node("prefetch_retrieval", prefetch_retrieval)
+        graph.add_edge("prefetch_retrieval", "categorize_inquiry")
+        graph.set_entry_point("prefetch_retrieval")
+    else:
+        graph.set_entry_point("categorize_inquiry")
     
     # Use Azure Table Storage checkpointer if configured, otherwise fall back to in-memory
     memory = get_checkpointer()
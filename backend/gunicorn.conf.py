@@ -36,6 +36,13 @@ tmp_upload_dir = None
 # Preload application code before worker processes are forked
 preload_app = True
 
+# Workers share the preloaded app copy-on-write; keep the master's collector
+# from touching (and freeing holes in) those pages while it loads. The first
+# pre_fork freezes them and turns gc back on. See utils/prefork.py
+if preload_app:
+    from utils.prefork import disable_gc_for_preload
+    disable_gc_for_preload()
+
 # Server hooks
 def on_starting(server):
     """Called just before the master process is initialized."""
@@ -47,14 +54,21 @@ def on_reload(server):
 
 def when_ready(server):
     """Called just after the server is started."""
+    if preload_app:
+        # Load the knowledge base once here so the workers share it
+        from app import preload
+        preload()
     server.log.info(f"Gunicorn server is ready. Listening on {bind}")
 
 def pre_fork(server, worker):
     """Called just prior to forking the worker subprocess."""
-    pass
+    from utils.prefork import freeze_before_fork
+    freeze_before_fork()
 
 def post_fork(server, worker):
     """Called after a worker has been forked."""
+    from utils.prefork import after_fork_in_child
+    after_fork_in_child()
     server.log.info(f"Worker spawned (pid: {worker.pid})")
 
 def worker_int(worker):
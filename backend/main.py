@@ -1,13 +1,18 @@
 
 import os
+import sys
 import json
+import argparse
+import threading
+import uuid
 from langchain.docstore.document import Document
 from tqdm import tqdm
 from vectorstore.chroma_store import create_vector_db
 from graph.build_graph import build_support_agent
+from vectorstore.knowledge_base import knowledge_base
+from utils.query_batch import QueryBatch
+from config.settings import QUERY_BATCH_CONCURRENCY
 import asyncio
-from IPython.display import Markdown
-from IPython.display import display, Image, Markdown
 
 # Load documents from JSON file
 #def load_documents(json_path):
@@ -34,21 +39,98 @@ def call_support_agent(agent, prompt, user_session_id, verbose=False):
     for event in events:
         if verbose:
             print(event)
-    display(Markdown(event['final_response']))
+    try:
+        # Only needed for notebook rendering; plain terminals just print
+        from IPython.display import Markdown, display
+        display(Markdown(event['final_response']))
+    except ImportError:
+        print(event['final_response'])
     return event['final_response']
 
 
+def read_batch_items(path):
+    """
+    Read (message, thread_id) items from NDJSON (one {"message", "thread_id"}
+    object per line) or a JSON array of such objects. "-" reads stdin.
+    Items without a thread_id get their own thread, unique to this run, so a
+    persistent checkpointer never answers them on top of an earlier run's items.
+    """
+    with (sys.stdin if path == "-" else open(path, encoding="utf-8")) as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        records = json.loads(text)
+    else:
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    batch_id = uuid.uuid4().hex[:8]
+    return [
+        (record["message"], record.get("thread_id") or f"batch-{batch_id}-{index}")
+        for index, record in enumerate(records)
+    ]
+
+
+def run_batch(agent, items, concurrency, output=sys.stdout):
+    """
+    Answer items with bounded concurrency, writing one NDJSON result line per
+    item as it completes and a final summary line.
+    """
+    embeddings = getattr(knowledge_base.current().retriever.vectorstore, "embeddings", None)
+    batch = QueryBatch(agent, items, concurrency=concurrency, embeddings=embeddings)
+    progress = tqdm(total=len(items), desc="Answering", unit="item", file=sys.stderr)
+    # Results arrive from the batch's worker threads
+    lock = threading.Lock()
+
+    def emit(result):
+        with lock:
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            if not result.get("done"):
+                progress.update(1)
+
+    try:
+        summary = batch.run(emit)
+    finally:
+        progress.close()
+    return summary
+
+
 # Global agent instance for CLI usage
 os.environ['OPENAI_API_KEY'] = "AZURE_OPENAI_API_KEY"
 #docs = load_documents("C:\\Users\\patimsur\\OneDrive - Tietoevry\\AI\\Agents\\LangGraph\\New customer\\data\\router_agent_documents.json")
 #retriever = create_vector_db(docs)
 retriever = None
+knowledge_base.load()
 agent = build_support_agent(retriever)
 
 if __name__ == "__main__":
     # For CLI usage
-    print("ok")
-    uid = "suraj"
-    query = "do you support on-prem models?"
-    call_support_agent(agent, query, uid, verbose=True)
+    parser = argparse.ArgumentParser(description="Customer support agent CLI")
+    parser.add_argument("--batch", metavar="FILE", help="Answer the items in FILE (NDJSON or JSON array, - for stdin)")
+    parser.add_argument("--concurrency", type=int, default=QUERY_BATCH_CONCURRENCY)
+    parser.add_argument("--output", metavar="FILE", help="Write NDJSON results to FILE instead of stdout")
+    args = parser.parse_args()
+
+    try:
+        if args.batch:
+            items = read_batch_items(args.batch)
+            if args.output:
+                with open(args.output, "w", encoding="utf-8") as output:
+                    summary = run_batch(agent, items, args.concurrency, output)
+            else:
+                summary = run_batch(agent, items, args.concurrency)
+            print(
+                f"{summary['succeeded']} succeeded, {summary['failed']} failed in {summary['seconds']:.1f}s "
+                f"({summary['items_per_second']:.1f} items/s)",
+                file=sys.stderr
+            )
+            sys.exit(1 if summary["failed"] or "error" in summary else 0)
+
+        print("ok")
+        uid = "suraj"
+        query = "do you support on-prem models?"
+        call_support_agent(agent, query, uid, verbose=True)
+    finally:
+        # Write out buffered checkpoints: the Table Storage I/O thread is a daemon and dies with the process
+        close = getattr(agent.checkpointer, "close", None)
+        if close is not None:
+            close()
     # To run the API: uvicorn main:app --reload
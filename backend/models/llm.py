@@ -1,18 +1,118 @@
-
 from langchain_openai.chat_models import AzureChatOpenAI
 import os
+import threading
+from typing import Callable, NamedTuple, Optional, TypeVar
 from config.settings import (
     AZURE_OPENAI_API_KEY,
     AZURE_OPENAI_ENDPOINT,
-    AZURE_DEPLOYMENT_NAME,
-    AZURE_API_VERSION
+    AZURE_API_VERSION,
+    LLM_CLASSIFIER_DEPLOYMENT,
+    LLM_CLASSIFIER_TEMPERATURE,
+    LLM_CLASSIFIER_MAX_TOKENS,
+    LLM_CLASSIFIER_TIMEOUT_SECONDS,
+    LLM_SENTIMENT_DEPLOYMENT,
+    LLM_SENTIMENT_TEMPERATURE,
+    LLM_SENTIMENT_MAX_TOKENS,
+    LLM_SENTIMENT_TIMEOUT_SECONDS,
+    LLM_GENERATOR_DEPLOYMENT,
+    LLM_GENERATOR_TEMPERATURE,
+    LLM_GENERATOR_MAX_TOKENS,
+    LLM_GENERATOR_TIMEOUT_SECONDS,
+    LLM_HEDGING_ENABLED,
+    LLM_HEDGE_ROLES,
+    LLM_HEDGE_DEPLOYMENT
 )
+from utils.hedging import model_calls
 
-# Initialize the AzureChatOpenAI model
-llm = AzureChatOpenAI(
-    deployment_name=AZURE_DEPLOYMENT_NAME,
-    azure_endpoint=AZURE_OPENAI_ENDPOINT,
-    openai_api_version=AZURE_API_VERSION,
-    openai_api_key=AZURE_OPENAI_API_KEY,
-    temperature=1
-)
+T = TypeVar("T")
+
+
+class ModelConfig(NamedTuple):
+    deployment: str
+    temperature: float = 1
+    max_tokens: Optional[int] = None  # None: no limit
+    timeout_seconds: Optional[float] = None  # Per request attempt
+
+
+def _config(deployment, temperature, max_tokens, timeout_seconds) -> ModelConfig:
+    return ModelConfig(deployment, temperature, max_tokens or None, timeout_seconds or None)
+
+
+# Model per graph node role:
+#   classifier  categorize_inquiry
+#   sentiment   analyze_inquiry_sentiment
+#   generator   generate_*_response
+MODEL_CONFIGS = {
+    "classifier": _config(
+        LLM_CLASSIFIER_DEPLOYMENT, LLM_CLASSIFIER_TEMPERATURE, LLM_CLASSIFIER_MAX_TOKENS, LLM_CLASSIFIER_TIMEOUT_SECONDS
+    ),
+    "sentiment": _config(
+        LLM_SENTIMENT_DEPLOYMENT, LLM_SENTIMENT_TEMPERATURE, LLM_SENTIMENT_MAX_TOKENS, LLM_SENTIMENT_TIMEOUT_SECONDS
+    ),
+    "generator": _config(
+        LLM_GENERATOR_DEPLOYMENT, LLM_GENERATOR_TEMPERATURE, LLM_GENERATOR_MAX_TOKENS, LLM_GENERATOR_TIMEOUT_SECONDS
+    ),
+}
+
+_models = {}
+_models_pid = None
+_models_lock = threading.Lock()
+
+
+def get_llm(role: str = "generator") -> AzureChatOpenAI:
+    """
+    Return the model configured for a graph node role (see MODEL_CONFIGS).
+    """
+    return get_model(MODEL_CONFIGS[role])
+
+
+def get_model(config: ModelConfig) -> AzureChatOpenAI:
+    """
+    Return the AzureChatOpenAI model for a configuration, shared in this process.
+
+    Models are created on first use in each process: their HTTP connection
+    pools must not be inherited across the fork from a preloading gunicorn master.
+    """
+    global _models_pid
+    pid = os.getpid()
+    if _models_pid != pid:
+        with _models_lock:
+            if _models_pid != pid:
+                _models.clear()
+                _models_pid = pid
+    model = _models.get(config)
+    if model is None:
+        with _models_lock:
+            model = _models.get(config)
+            if model is None:
+                model = AzureChatOpenAI(
+                    deployment_name=config.deployment,
+                    azure_endpoint=AZURE_OPENAI_ENDPOINT,
+                    openai_api_version=AZURE_API_VERSION,
+                    openai_api_key=AZURE_OPENAI_API_KEY,
+                    temperature=config.temperature,
+                    max_tokens=config.max_tokens,
+                    timeout=config.timeout_seconds
+                )
+                _models[config] = model
+    return model
+
+
+def invoke_model(role: str, call: Callable[[AzureChatOpenAI], T]) -> T:
+    """
+    Run call(model) with the role's model, under its adaptive timeout and hedged
+    if hedging is enabled for the role (see utils/hedging.py).
+
+    Args:
+        role: Graph node role (see MODEL_CONFIGS)
+        call: Makes the request with the given model; may run twice when hedged
+
+    Returns:
+        The result of the first attempt to answer
+    """
+    config = MODEL_CONFIGS[role]
+    hedge = None
+    if LLM_HEDGING_ENABLED and role in LLM_HEDGE_ROLES:
+        hedge_config = config._replace(deployment=LLM_HEDGE_DEPLOYMENT) if LLM_HEDGE_DEPLOYMENT else config
+        hedge = lambda: call(get_model(hedge_config))
+    return model_calls.call(role, lambda: call(get_model(config)), hedge, timeout_ceiling=config.timeout_seconds)
@@ -7,6 +7,7 @@ class CustomerSupportState(TypedDict):
     query_category: str
     query_sentiment: str
     final_response: str
+    retrieval_prefetch_id: str
 
 # Model to validate query category output from LLM
 class QueryCategory(BaseModel):
@@ -1,20 +1,7 @@
 from models.schema import CustomerSupportState, QueryCategory
-from langchain_openai.chat_models import AzureChatOpenAI
+from models.llm import invoke_model
+from utils.query_batch import shared_result
 import os
-from config.settings import (
-    AZURE_OPENAI_API_KEY,
-    AZURE_OPENAI_ENDPOINT,
-    AZURE_DEPLOYMENT_NAME,
-    AZURE_API_VERSION
-)
-
-llm = AzureChatOpenAI(
-    deployment_name=AZURE_DEPLOYMENT_NAME,
-    azure_endpoint=AZURE_OPENAI_ENDPOINT,
-    openai_api_version=AZURE_API_VERSION,
-    openai_api_key=AZURE_OPENAI_API_KEY,
-    temperature=1
-)
 
 def categorize_inquiry(support_state: CustomerSupportState) -> CustomerSupportState:
     query = support_state['customer_query']
@@ -35,6 +22,9 @@ def categorize_inquiry(support_state: CustomerSupportState) -> CustomerSupportSt
 
                           Query:{query}
     """
-    result = llm.with_structured_output(QueryCategory).invoke(prompt)
+    # Identical messages in a batch are categorized once
+    result = shared_result(
+        "category", query, lambda: invoke_model("classifier", lambda llm: llm.with_structured_output(QueryCategory).invoke(prompt))
+    )
     support_state['query_category'] = result.categorized_topic
     return support_state
@@ -1,5 +1,8 @@
 from models.schema import CustomerSupportState
+from utils.prefetch import retrieval_prefetch
 
 def escalate_to_human_agent(support_state: CustomerSupportState) -> CustomerSupportState:
+    # No knowledge base answer on this route; drop the speculative retrieval
+    retrieval_prefetch.cancel(support_state.get('retrieval_prefetch_id'))
     support_state['final_response'] = "Apologies, we are really sorry! Someone from our team will be reaching out to you shortly!"
     return support_state
@@ -1,42 +1,72 @@
 from models.schema import CustomerSupportState
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai.chat_models import AzureChatOpenAI
+from models.llm import invoke_model
 import os
-from vectorstore.chroma_store import create_vector_db
-from langchain.docstore.document import Document
-from tqdm import tqdm
-import json
+from vectorstore.bm25_index import matches_filter
+from vectorstore.knowledge_base import knowledge_base
+from utils.metrics import register_stats_provider
+from utils.prefetch import retrieval_prefetch
+import logging
 from config.settings import (
-    AZURE_OPENAI_API_KEY,
-    AZURE_OPENAI_ENDPOINT,
-    AZURE_DEPLOYMENT_NAME,
-    AZURE_API_VERSION
+    RETRIEVAL_PREFETCH_CANDIDATES,
+    FAQ_DIRECT_ANSWER_ENABLED
 )
 
-llm = AzureChatOpenAI(
-    deployment_name=AZURE_DEPLOYMENT_NAME,
-    azure_endpoint=AZURE_OPENAI_ENDPOINT,
-    openai_api_version=AZURE_API_VERSION,
-    openai_api_key=AZURE_OPENAI_API_KEY,
-    temperature=1
-)
-def load_documents(json_path):
-    with open(json_path, "r") as f:
-        knowledge_base = json.load(f)
-    processed_docs = []
-    for doc in tqdm(knowledge_base):
-        metadata = doc['metadata']
-        data = doc['text']
-        processed_docs.append(Document(page_content=data, metadata=metadata))
-    return processed_docs
-docs = load_documents("./data/router_agent_documents.json")
-retriever = create_vector_db(docs)
+logger = logging.getLogger(__name__)
+
+# The knowledge base is loaded by the app's warm-up (or main.py), not at import
+register_stats_provider("knowledge_base", knowledge_base.get_stats)
+register_stats_provider("retrieval", lambda: knowledge_base.current().retriever.get_stats())
+register_stats_provider("retrieval_prefetch", retrieval_prefetch.get_stats)
+register_stats_provider("faq_direct_answers", lambda: knowledge_base.current().faq_index.get_stats())
+
+def _search_snapshot(snapshot, query: str):
+    return snapshot.version, snapshot.retriever.invoke(query, k=RETRIEVAL_PREFETCH_CANDIDATES)
+
+def prefetch_retrieval(support_state: CustomerSupportState) -> CustomerSupportState:
+    # Retrieval only depends on the query, so start it (unfiltered, across all
+    # categories) while categorize/sentiment run; post-filtered in generate_response
+    query = support_state['customer_query']
+    support_state['retrieval_prefetch_id'] = retrieval_prefetch.submit(
+        _search_snapshot, knowledge_base.current(), query
+    )
+    return support_state
+
+def take_prefetched_docs(support_state: CustomerSupportState, kb, metadata_filter: dict):
+    future = retrieval_prefetch.take(support_state.get('retrieval_prefetch_id'))
+    if future is None:
+        return None
+    try:
+        version, candidates = future.result()
+    except Exception as e:
+        logger.warning(f"Speculative retrieval failed, retrying inline: {str(e)}")
+        return None
+    if version != kb.version:
+        # A reload landed in between; answer from the request's snapshot only
+        logger.debug(f"Discarding prefetched retrieval from knowledge base {version} (request uses {kb.version})")
+        return None
+    k = kb.retriever.k
+    relevant_docs = [doc for doc in candidates if matches_filter(doc.metadata, metadata_filter)][:k]
+    # Fewer than k for this category among the global candidates: the filtered search finds more
+    return relevant_docs if len(relevant_docs) >= k else None
 
 def generate_response(support_state: CustomerSupportState, category: str) -> CustomerSupportState:
     query = support_state['customer_query']
     metadata_filter = {'category': category.lower()}
-    retriever.search_kwargs['filter'] = metadata_filter
-    relevant_docs = retriever.invoke(query)
+    # Hold one snapshot for the whole request so a concurrent reload can't mix versions
+    kb = knowledge_base.current()
+
+    if FAQ_DIRECT_ANSWER_ENABLED:
+        match = kb.faq_index.lookup(query, category)
+        if match:
+            logger.debug(f"FAQ direct answer (similarity {match.similarity:.2f}): {match.question}")
+            retrieval_prefetch.cancel(support_state.get('retrieval_prefetch_id'))
+            support_state['final_response'] = match.answer
+            return support_state
+
+    relevant_docs = take_prefetched_docs(support_state, kb, metadata_filter)
+    if relevant_docs is None:
+        relevant_docs = kb.retriever.invoke(query, metadata_filter=metadata_filter)
     retrieved_content = "".join(doc.page_content for doc in relevant_docs)
 
     prompt = ChatPromptTemplate.from_template(f"""
@@ -49,8 +79,9 @@ def generate_response(support_state: CustomerSupportState, category: str) -> Cus
     {{relevant_content}}
     """)
 
-    chain = prompt | llm
-    reply = chain.invoke({"customer_query": query, "relevant_content": retrieved_content}).content
+    reply = invoke_model(
+        "generator", lambda llm: (prompt | llm).invoke({"customer_query": query, "relevant_content": retrieved_content})
+    ).content
     support_state['final_response'] = reply
     return support_state
 
@@ -1,21 +1,7 @@
 from models.schema import CustomerSupportState, QuerySentiment
-from langchain_openai.chat_models import AzureChatOpenAI
+from models.llm import invoke_model
+from utils.query_batch import shared_result
 import os
-from config.settings import (
-    AZURE_OPENAI_API_KEY,
-    AZURE_OPENAI_ENDPOINT,
-    AZURE_DEPLOYMENT_NAME,
-    AZURE_API_VERSION
-)
-
-
-llm = AzureChatOpenAI(
-    deployment_name=AZURE_DEPLOYMENT_NAME,
-    azure_endpoint=AZURE_OPENAI_ENDPOINT,
-    openai_api_version=AZURE_API_VERSION,
-    openai_api_key=AZURE_OPENAI_API_KEY,
-    temperature=1
-)
 
 def analyze_inquiry_sentiment(support_state: CustomerSupportState) -> CustomerSupportState:
     query = support_state['customer_query']
@@ -25,6 +11,9 @@ def analyze_inquiry_sentiment(support_state: CustomerSupportState) -> CustomerSu
     Query:
     {query}
     """
-    result = llm.with_structured_output(QuerySentiment).invoke(prompt)
+    # Identical messages in a batch are scored once
+    result = shared_result(
+        "sentiment", query, lambda: invoke_model("sentiment", lambda llm: llm.with_structured_output(QuerySentiment).invoke(prompt))
+    )
     support_state['query_sentiment'] = result.sentiment
     return support_state
@@ -0,0 +1,214 @@
+"""
+Shared test fixtures.
+
+Tests run from backend/ (python -m pytest), importing modules the way the app
+does; this file puts backend/ on sys.path when pytest is started elsewhere.
+
+InMemoryTableClient stands in for azure.data.tables.aio.TableClient, so the
+Table Storage checkpointer can be exercised without Azurite or network access.
+The checkpointers are driven through a one-node graph (build_graph) that
+appends each input message and records the history it saw, so a lost or
+stale turn shows up in the answer.
+
+LocalCollector stands in for the Application Insights ingestion endpoint.
+"""
+
+import itertools
+import json
+import operator
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Annotated, List, TypedDict
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+from azure.data.tables import TableEntity, TableTransactionError, UpdateMode
+from langgraph.graph import END, StateGraph
+
+
+class InMemoryTableClient:
+    """
+    The subset of the async TableClient the checkpointer uses, over a dict.
+
+    Entities get a fresh ETag on every write; conditional updates and deletes
+    and create-if-absent fail like the service does (412 / 409 / 404), and a
+    failing transaction writes nothing. Two checkpointers sharing one instance
+    behave like two workers sharing a table.
+    """
+
+    def __init__(self):
+        self.rows = {}  # (PartitionKey, RowKey) -> (properties, etag)
+        self.calls = {"get_entity": 0, "query_entities": 0, "list_entities": 0, "submit_transaction": 0}
+        self._etags = itertools.count(1)
+
+    # --- helpers --------------------------------------------------------------
+
+    def _entity(self, properties: dict, etag: str, select=None) -> TableEntity:
+        entity = TableEntity({k: v for k, v in properties.items() if select is None or k in select})
+        entity._metadata = {"etag": etag, "timestamp": None}
+        return entity
+
+    def _write(self, entity: dict, mode=UpdateMode.REPLACE) -> str:
+        key = (entity["PartitionKey"], entity["RowKey"])
+        properties = dict(entity)
+        if mode == UpdateMode.MERGE and key in self.rows:
+            properties = {**self.rows[key][0], **properties}
+        etag = f'W/"{next(self._etags)}"'
+        self.rows[key] = (properties, etag)
+        return etag
+
+    def _check(self, kind: str, entity: dict, options: dict):
+        key = (entity["PartitionKey"], entity["RowKey"])
+        if kind == "create" and key in self.rows:
+            raise ResourceExistsError("The specified entity already exists.")
+        if kind in ("update", "delete"):
+            if key not in self.rows:
+                raise ResourceNotFoundError("The specified resource does not exist.")
+            etag = options.get("etag")
+            if etag is not None and etag != self.rows[key][1]:
+                raise ResourceModifiedError("The update condition specified in the request was not satisfied.")
+
+    def _apply(self, kind: str, entity: dict, options: dict) -> dict:
+        self._check(kind, entity, options)
+        if kind == "delete":
+            del self.rows[(entity["PartitionKey"], entity["RowKey"])]
+            return {}
+        return {"etag": self._write(entity, options.get("mode", UpdateMode.REPLACE))}
+
+    def _matches(self, query_filter: str, parameters: dict, key) -> bool:
+        partition, row = key
+        if partition != parameters["pk"]:
+            return False
+        if "RowKey ge @low" in query_filter:
+            return parameters["low"] <= row < parameters["high"]
+        return True
+
+    # --- TableClient API --------------------------------------------------------
+
+    async def get_entity(self, partition_key: str, row_key: str, select=None, **kwargs) -> TableEntity:
+        self.calls["get_entity"] += 1
+        if (partition_key, row_key) not in self.rows:
+            raise ResourceNotFoundError("The specified resource does not exist.")
+        properties, etag = self.rows[(partition_key, row_key)]
+        return self._entity(properties, etag, select)
+
+    async def query_entities(self, query_filter: str, parameters=None, results_per_page=None, select=None, **kwargs):
+        self.calls["query_entities"] += 1
+        for key in sorted(self.rows):
+            if self._matches(query_filter, parameters or {}, key):
+                properties, etag = self.rows[key]
+                yield self._entity(properties, etag, select)
+
+    async def list_entities(self, **kwargs):
+        self.calls["list_entities"] += 1
+        for key in sorted(self.rows):
+            properties, etag = self.rows[key]
+            yield self._entity(properties, etag)
+
+    async def submit_transaction(self, operations):
+        self.calls["submit_transaction"] += 1
+        snapshot = dict(self.rows)
+        results = []
+        try:
+            for index, (kind, entity, *options) in enumerate(operations):
+                results.append(self._apply(kind, entity, options[0] if options else {}))
+        except (ResourceExistsError, ResourceModifiedError, ResourceNotFoundError) as e:
+            self.rows = snapshot
+            error = TableTransactionError(message=f"{index}:{e.message}")
+            error.status_code = 409 if isinstance(e, ResourceExistsError) else 412 if isinstance(e, ResourceModifiedError) else 404
+            raise error
+        return results
+
+    async def create_entity(self, entity: dict, **kwargs) -> dict:
+        return self._apply("create", entity, {})
+
+    async def upsert_entity(self, entity: dict, mode=UpdateMode.MERGE, **kwargs) -> dict:
+        return {"etag": self._write(entity, mode)}
+
+    async def update_entity(self, entity: dict, mode=UpdateMode.MERGE, **kwargs) -> dict:
+        return self._apply("update", entity, {"mode": mode, **kwargs})
+
+    async def delete_entity(self, partition_key: str, row_key: str, **kwargs):
+        # Like the service client, deleting a missing entity is not an error
+        self.rows.pop((partition_key, row_key), None)
+
+
+@pytest.fixture
+def table_client():
+    return InMemoryTableClient()
+
+
+class ConversationState(TypedDict):
+    messages: Annotated[List[str], operator.add]
+    seen: List[str]
+
+
+def build_graph(checkpointer):
+    """
+    Compile a one-node graph whose answer ("seen") is every message of the thread so far.
+    """
+    graph = StateGraph(ConversationState)
+    graph.add_node("answer", lambda state: {"seen": list(state["messages"])})
+    graph.set_entry_point("answer")
+    graph.add_edge("answer", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def thread_config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+class LocalCollector:
+    """
+    Ingestion endpoint stand-in: keeps the envelopes POSTed to /v2/track.
+
+    Set status to make it reject batches, or delay_ms to slow it down.
+    """
+
+    def __init__(self):
+        self.status = 200
+        self.delay_ms = 0.0
+        self.requests = 0
+        self.envelopes = []
+        self._lock = threading.Lock()
+        collector = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                envelopes = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                time.sleep(collector.delay_ms / 1000)
+                with collector._lock:
+                    collector.requests += 1
+                    if collector.status < 300:
+                        collector.envelopes += envelopes
+                self.send_response(collector.status)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"{}")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.connection_string = (
+            f"InstrumentationKey=00000000-0000-0000-0000-000000000000;IngestionEndpoint={self.url}/"
+        )
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def collector():
+    collector = LocalCollector()
+    yield collector
+    collector.close()
@@ -0,0 +1,224 @@
+"""
+Tests for the Table Storage checkpointer (utils.azure_checkpointer) against InMemoryTableClient.
+"""
+
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+
+from conftest import build_graph, thread_config
+from utils.azure_checkpointer import (
+    LEGACY_PARTITION_KEY,
+    AzureTableCheckpointer,
+    CheckpointCache,
+    partition_for,
+)
+from utils.checkpoint_retention import RetentionPolicy
+from utils.checkpointer import CheckpointConflictError, persist_run
+
+
+@pytest.fixture
+def make_checkpointer(table_client):
+    checkpointers = []
+
+    def make(**kwargs) -> AzureTableCheckpointer:
+        kwargs.setdefault("flush_interval", 3600)
+        kwargs.setdefault("cache", CheckpointCache(max_entries=100, ttl_seconds=30))
+        checkpointer = AzureTableCheckpointer(table_client=table_client, **kwargs)
+        checkpointers.append(checkpointer)
+        return checkpointer
+
+    yield make
+    for checkpointer in checkpointers:
+        checkpointer.close()
+
+
+def rows_of(table_client, thread_id: str) -> dict:
+    return {
+        row_key: properties
+        for (_, row_key), (properties, _) in table_client.rows.items()
+        if row_key.startswith(f"{thread_id}|")
+    }
+
+
+def ask(graph, checkpointer, thread_id: str, message: str) -> list:
+    state = graph.invoke({"messages": [message]}, thread_config(thread_id))
+    persist_run(checkpointer, thread_id)
+    return state["seen"]
+
+
+def test_run_is_coalesced_into_one_transaction(table_client, make_checkpointer):
+    checkpointer = make_checkpointer()
+    graph = build_graph(checkpointer)
+
+    graph.invoke({"messages": ["hello"]}, thread_config("t1"))
+    assert table_client.rows == {}
+    assert checkpointer.get_stats()["checkpoints_buffered"] > 1
+
+    checkpointer.flush("t1")
+    assert table_client.calls["submit_transaction"] == 1
+    assert len(rows_of(table_client, "t1")) == 2
+    stats = checkpointer.get_stats()
+    assert stats["entities_flushed"] == 1
+    assert stats["coalescing_ratio"] > 1
+    assert stats["pending_threads"] == 0
+
+
+def test_buffered_checkpoint_is_read_before_flush(make_checkpointer):
+    checkpointer = make_checkpointer()
+    graph = build_graph(checkpointer)
+
+    graph.invoke({"messages": ["one"]}, thread_config("t1"))
+    assert graph.invoke({"messages": ["two"]}, thread_config("t1"))["seen"] == ["one", "two"]
+
+
+def test_late_writes_do_not_replace_a_newer_checkpoint(make_checkpointer):
+    checkpointer = make_checkpointer()
+    first, second = empty_checkpoint(), empty_checkpoint()
+    first_config = checkpointer.put(thread_config("t1"), first, {"source": "input", "step": -1}, {})
+    checkpointer.put(first_config, second, {"source": "loop", "step": 0}, {})
+    # put() and put_writes() run on LangGraph's background executor without ordering
+    checkpointer.put_writes(first_config, [("messages", "late")], "task")
+    assert checkpointer.get_stats()["late_writes_dropped"] == 1
+
+    checkpointer.flush("t1")
+    assert checkpointer.get_tuple(thread_config("t1")).checkpoint["id"] == second["id"]
+
+
+def test_writes_before_their_checkpoint_are_kept(make_checkpointer):
+    checkpointer = make_checkpointer()
+    first, second = empty_checkpoint(), empty_checkpoint()
+    first_config = checkpointer.put(thread_config("t1"), first, {"source": "input", "step": -1}, {})
+    second_config = {"configurable": {**first_config["configurable"], "checkpoint_id": second["id"]}}
+    checkpointer.put_writes(second_config, [("messages", "early")], "task")
+    checkpointer.put(first_config, second, {"source": "loop", "step": 0}, {})
+
+    checkpointer.flush("t1")
+    saved = checkpointer.get_tuple(thread_config("t1"))
+    assert saved.checkpoint["id"] == second["id"]
+    assert saved.pending_writes == [("task", "messages", "early")]
+
+
+def test_head_and_history_rows_are_written_together(table_client, make_checkpointer):
+    checkpointer = make_checkpointer()
+    graph = build_graph(checkpointer)
+    ask(graph, checkpointer, "t1", "one")
+    ask(graph, checkpointer, "t1", "two")
+
+    rows = rows_of(table_client, "t1")
+    head = rows.pop("t1||head")
+    assert len(rows) == 2
+    newest = min(rows)  # inverted checkpoint ids: the newest row sorts first
+    assert head["checkpoint_id"] == rows[newest]["checkpoint_id"]
+    assert head["parent_checkpoint_id"] == rows[max(rows)]["checkpoint_id"]
+    assert {key[0] for key in table_client.rows} == {partition_for("t1", 16)}
+    assert table_client.calls["submit_transaction"] == 2
+
+
+def test_worker_sees_turn_written_by_another_worker(make_checkpointer):
+    first, second = make_checkpointer(), make_checkpointer()
+    first_graph, second_graph = build_graph(first), build_graph(second)
+
+    ask(first_graph, first, "t1", "one")
+    ask(second_graph, second, "t1", "two")
+    # first still has its own head cached; the ETag check must catch that it moved
+    assert ask(first_graph, first, "t1", "three") == ["one", "two", "three"]
+    assert first.get_stats()["cache"]["stale"] >= 1
+
+
+def test_concurrent_turns_conflict_instead_of_losing_one(table_client, make_checkpointer):
+    first, second = make_checkpointer(), make_checkpointer()
+    first_graph, second_graph = build_graph(first), build_graph(second)
+    ask(first_graph, first, "t1", "one")
+
+    first_graph.invoke({"messages": ["from first"]}, thread_config("t1"))
+    ask(second_graph, second, "t1", "from second")
+    with pytest.raises(CheckpointConflictError):
+        persist_run(first, "t1")
+    assert first.get_stats()["write_conflicts"] == 1
+
+    head = rows_of(table_client, "t1")["t1||head"]
+    assert first.get_tuple(thread_config("t1")).checkpoint["id"] == head["checkpoint_id"]
+    assert ask(first_graph, first, "t1", "from first") == ["one", "from second", "from first"]
+
+
+def test_conflict_of_timer_flush_is_raised_to_the_run(make_checkpointer):
+    first, second = make_checkpointer(), make_checkpointer()
+    first_graph, second_graph = build_graph(first), build_graph(second)
+    ask(first_graph, first, "t1", "one")
+
+    first_graph.invoke({"messages": ["from first"]}, thread_config("t1"))
+    ask(second_graph, second, "t1", "from second")
+    # What the background timer does: flush everything, nobody waiting for the thread
+    first.flush()
+    with pytest.raises(CheckpointConflictError):
+        first.flush("t1")
+    # Raised once; a new run from the current head starts clean
+    first.flush("t1")
+
+
+def test_pinned_thread_is_still_validated(make_checkpointer):
+    first, second = make_checkpointer(), make_checkpointer()
+    first_graph, second_graph = build_graph(first), build_graph(second)
+    first.pin_thread("t1")
+    try:
+        ask(first_graph, first, "t1", "one")
+        ask(second_graph, second, "t1", "two")
+        assert ask(first_graph, first, "t1", "three") == ["one", "two", "three"]
+    finally:
+        first.unpin_thread("t1")
+
+
+def test_compaction_keeps_final_checkpoint_of_each_run(table_client, make_checkpointer):
+    checkpointer = make_checkpointer()
+    graph = build_graph(checkpointer)
+    for _ in range(3):
+        # Timer-style flushes after each step, so every step leaves a history row
+        for message in ("a", "b"):
+            graph.invoke({"messages": [message]}, thread_config("t1"))
+            checkpointer.flush("t1")
+
+    before = len(rows_of(table_client, "t1")) - 1
+    result = checkpointer.compact(RetentionPolicy(keep_last=2))
+    assert result["threads_scanned"] == 1
+    assert result["checkpoints_deleted"] == before - 2
+    assert len(rows_of(table_client, "t1")) == 3
+    assert checkpointer.compact(RetentionPolicy(keep_last=2))["checkpoints_deleted"] == 0
+    assert build_graph(checkpointer).invoke({"messages": ["c"]}, thread_config("t1"))["seen"][-2:] == ["b", "c"]
+
+
+def test_compaction_expires_idle_threads(table_client, make_checkpointer):
+    checkpointer = make_checkpointer()
+    graph = build_graph(checkpointer)
+    ask(graph, checkpointer, "idle", "one")
+    for key, (properties, etag) in list(table_client.rows.items()):
+        table_client.rows[key] = ({**properties, "updated_at": "2000-01-01T00:00:00"}, etag)
+    ask(graph, checkpointer, "active", "two")
+
+    result = checkpointer.compact(RetentionPolicy(thread_ttl_seconds=3600))
+    assert result["threads_expired"] == 1
+    assert rows_of(table_client, "idle") == {}
+    assert len(rows_of(table_client, "active")) == 2
+    assert checkpointer.get_tuple(thread_config("idle")) is None
+
+
+def test_legacy_partition_fallback_and_migration(table_client, make_checkpointer):
+    legacy = make_checkpointer(partition_shards=1)
+    ask(build_graph(legacy), legacy, "t1", "one")
+    assert {key[0] for key in table_client.rows} == {LEGACY_PARTITION_KEY}
+
+    sharded = make_checkpointer(partition_shards=16)
+    assert sharded.get_tuple(thread_config("t1")) is not None
+    assert sharded.get_stats()["legacy_partition_reads"] == 1
+
+    stats = sharded.migrate_partitions()
+    assert stats["moved"] == 2
+    assert {key[0] for key in table_client.rows} == {partition_for("t1", 16)}
+    assert ask(build_graph(sharded), sharded, "t1", "two") == ["one", "two"]
+
+
+def test_legacy_fallback_can_be_disabled(make_checkpointer):
+    legacy = make_checkpointer(partition_shards=1)
+    ask(build_graph(legacy), legacy, "t1", "one")
+
+    sharded = make_checkpointer(partition_shards=16, legacy_fallback=False)
+    assert sharded.get_tuple(thread_config("t1")) is None
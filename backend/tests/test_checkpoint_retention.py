@@ -0,0 +1,62 @@
+"""
+Tests for checkpoint compaction (utils.checkpoint_retention) on the SQLite and in-memory savers.
+"""
+
+import pytest
+
+from conftest import build_graph, thread_config
+from utils.checkpoint_retention import RetentionPolicy
+from utils.memory_checkpointer import BoundedMemorySaver
+from utils.sqlite_checkpointer import SQLiteCheckpointer
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "checkpoints.sqlite3")
+
+
+def checkpoint_ids(checkpointer, thread_id: str) -> list:
+    return [t.checkpoint["id"] for t in checkpointer.list(thread_config(thread_id))]
+
+
+def test_memory_compaction_keeps_final_checkpoint_of_each_run():
+    checkpointer = BoundedMemorySaver(max_checkpoints_per_thread=0)
+    graph = build_graph(checkpointer)
+    for message in ("one", "two", "three"):
+        graph.invoke({"messages": [message]}, thread_config("t1"))
+    per_run = len(checkpoint_ids(checkpointer, "t1")) // 3
+
+    result = checkpointer.compact(RetentionPolicy(final_only_per_run=True))
+    assert result["checkpoints_deleted"] == 2 * (per_run - 1)
+    assert len(checkpoint_ids(checkpointer, "t1")) == per_run + 2
+    assert checkpointer.compact(RetentionPolicy(final_only_per_run=True))["checkpoints_deleted"] == 0
+    assert graph.invoke({"messages": ["four"]}, thread_config("t1"))["seen"] == ["one", "two", "three", "four"]
+
+
+def test_sqlite_compaction_keeps_final_checkpoint_of_each_run(path):
+    checkpointer = SQLiteCheckpointer(path, max_checkpoints_per_thread=0)
+    graph = build_graph(checkpointer)
+    for message in ("one", "two", "three"):
+        graph.invoke({"messages": [message]}, thread_config("t1"))
+    per_run = len(checkpoint_ids(checkpointer, "t1")) // 3
+    latest = checkpoint_ids(checkpointer, "t1")[0]
+
+    result = checkpointer.compact(RetentionPolicy(final_only_per_run=True))
+    assert result["checkpoints_deleted"] == 2 * (per_run - 1)
+    assert len(checkpoint_ids(checkpointer, "t1")) == per_run + 2
+    assert checkpoint_ids(checkpointer, "t1")[0] == latest
+    # Collapsed runs keep their boundary, so a second pass deletes nothing
+    assert checkpointer.compact(RetentionPolicy(final_only_per_run=True))["checkpoints_deleted"] == 0
+
+
+def test_sqlite_compaction_expires_idle_threads(path):
+    checkpointer = SQLiteCheckpointer(path)
+    graph = build_graph(checkpointer)
+    graph.invoke({"messages": ["one"]}, thread_config("idle"))
+    checkpointer._connection().execute("UPDATE checkpoints SET created_at = 0 WHERE thread_id = 'idle'")
+    graph.invoke({"messages": ["two"]}, thread_config("active"))
+
+    result = checkpointer.compact(RetentionPolicy(thread_ttl_seconds=3600))
+    assert result["threads_expired"] == 1
+    assert checkpointer.get_tuple(thread_config("idle")) is None
+    assert checkpointer.get_tuple(thread_config("active")) is not None
@@ -0,0 +1,86 @@
+"""
+Tests for dropping stale knowledge base collections (vectorstore.knowledge_base).
+"""
+
+import json
+import os
+import time
+
+import pytest
+
+from vectorstore.hybrid_retriever import QUANTIZED_SUBDIRECTORY
+from vectorstore.knowledge_base import (
+    COLLECTION_PREFIX,
+    LIVE_VERSIONS_FILE,
+    KnowledgeBaseManager,
+    KnowledgeBaseSnapshot,
+)
+
+WATCH_INTERVAL = 30.0
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = KnowledgeBaseManager(persist_directory=str(tmp_path), watch_interval=WATCH_INTERVAL)
+    manager._snapshot = KnowledgeBaseSnapshot("v3", None, None, 0, "")
+    manager._previous_version = "v2"
+    for version in ("v1", "v2", "v3"):
+        (tmp_path / QUANTIZED_SUBDIRECTORY / f"{COLLECTION_PREFIX}{version}").mkdir(parents=True)
+    return manager
+
+
+def record(manager, entries: dict):
+    (manager.persist_directory / LIVE_VERSIONS_FILE).write_text(json.dumps(entries))
+
+
+def remaining(manager) -> set:
+    root = manager.persist_directory / QUANTIZED_SUBDIRECTORY
+    return {path.name[len(COLLECTION_PREFIX):] for path in root.iterdir()}
+
+
+def dead_pid() -> int:
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0)
+    os.waitpid(pid, 0)
+    return pid
+
+
+def test_version_of_lagging_worker_is_kept(manager):
+    # The parent process stands in for a worker that has not converged yet
+    record(manager, {str(os.getppid()): {"versions": ["v1"], "recorded_at": time.time() - WATCH_INTERVAL}})
+    manager._drop_stale_collections()
+    assert remaining(manager) == {"v1", "v2", "v3"}
+
+
+def test_version_nobody_recorded_recently_is_dropped(manager):
+    stale = time.time() - 3 * WATCH_INTERVAL
+    record(manager, {str(os.getppid()): {"versions": ["v1"], "recorded_at": stale}})
+    manager._drop_stale_collections()
+    assert remaining(manager) == {"v2", "v3"}
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_version_of_exited_worker_is_dropped(manager):
+    record(manager, {str(dead_pid()): {"versions": ["v1"], "recorded_at": time.time()}})
+    manager._drop_stale_collections()
+    assert remaining(manager) == {"v2", "v3"}
+    assert list(json.loads((manager.persist_directory / LIVE_VERSIONS_FILE).read_text())) == [str(os.getpid())]
+
+
+def test_unreadable_marker_drops_nothing(manager):
+    (manager.persist_directory / LIVE_VERSIONS_FILE).write_text("{not json")
+    manager._drop_stale_collections()
+    assert remaining(manager) == {"v1", "v2", "v3"}
+    # Rewritten with this worker's entry, so the next pass can decide
+    manager._drop_stale_collections()
+    assert remaining(manager) == {"v2", "v3"}
+
+
+def test_stopped_worker_releases_its_versions(manager):
+    marker = manager.persist_directory / LIVE_VERSIONS_FILE
+    assert manager._update_live_versions() == {"v2", "v3"}
+    assert json.loads(marker.read_text())[str(os.getpid())]["versions"] == ["v3", "v2"]
+
+    manager.stop_watcher()
+    assert json.loads(marker.read_text()) == {}
@@ -0,0 +1,62 @@
+"""
+Tests for the bounded in-memory checkpointer (utils.memory_checkpointer).
+"""
+
+from conftest import build_graph, thread_config
+from utils.memory_checkpointer import BoundedMemorySaver
+
+
+def checkpoint_ids(checkpointer, thread_id: str) -> list:
+    return [t.checkpoint["id"] for t in checkpointer.list(thread_config(thread_id))]
+
+
+def test_history_is_pruned_per_thread():
+    checkpointer = BoundedMemorySaver(max_checkpoints_per_thread=4)
+    unbounded = BoundedMemorySaver(max_checkpoints_per_thread=0)
+    for saver in (checkpointer, unbounded):
+        graph = build_graph(saver)
+        for message in ("one", "two", "three"):
+            graph.invoke({"messages": [message]}, thread_config("t1"))
+
+    assert len(checkpoint_ids(checkpointer, "t1")) == 4
+    # Channel values only the pruned checkpoints referenced go too
+    assert checkpointer.get_stats()["blobs"] < unbounded.get_stats()["blobs"]
+    graph = build_graph(checkpointer)
+    assert graph.invoke({"messages": ["four"]}, thread_config("t1"))["seen"] == ["one", "two", "three", "four"]
+
+
+def test_least_recently_used_thread_is_evicted():
+    checkpointer = BoundedMemorySaver(max_threads=2)
+    graph = build_graph(checkpointer)
+    for thread_id in ("a", "b", "c"):
+        graph.invoke({"messages": [thread_id]}, thread_config(thread_id))
+
+    stats = checkpointer.get_stats()
+    assert stats["threads"] == 2
+    assert stats["evicted_lru"] == 1
+    assert checkpointer.get_tuple(thread_config("a")) is None
+
+
+def test_evicted_thread_is_restored_from_spill(tmp_path):
+    checkpointer = BoundedMemorySaver(max_threads=1, spill_path=str(tmp_path / "spill.sqlite3"))
+    graph = build_graph(checkpointer)
+    graph.invoke({"messages": ["one"]}, thread_config("a"))
+    graph.invoke({"messages": ["other"]}, thread_config("b"))
+
+    assert checkpointer.get_stats()["spilled"] == 1
+    assert graph.invoke({"messages": ["two"]}, thread_config("a"))["seen"] == ["one", "two"]
+    assert checkpointer.get_stats()["restored"] == 1
+
+
+def test_pinned_thread_is_not_evicted():
+    checkpointer = BoundedMemorySaver(max_threads=1)
+    graph = build_graph(checkpointer)
+    checkpointer.pin_thread("a")
+    graph.invoke({"messages": ["one"]}, thread_config("a"))
+    graph.invoke({"messages": ["other"]}, thread_config("b"))
+
+    assert checkpointer.get_tuple(thread_config("a")) is not None
+    checkpointer.unpin_thread("a")
+    checkpointer.sweep()
+    assert checkpointer.get_stats()["threads"] == 1
+
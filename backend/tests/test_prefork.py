@@ -0,0 +1,106 @@
+"""
+Tests for pre-fork sharing: gc handling in the master (utils.prefork) and
+per-process Chroma clients (vectorstore.chroma_store.ProcessLocalChroma).
+"""
+
+import gc
+import json
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+from langchain.docstore.document import Document
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+
+from utils import prefork
+from vectorstore.chroma_store import ProcessLocalChroma
+
+
+@pytest.fixture
+def gc_state():
+    enabled = gc.isenabled()
+    yield
+    gc.unfreeze()
+    prefork._gc_disabled_for_preload = False
+    (gc.enable if enabled else gc.disable)()
+
+
+def test_master_reenables_gc_after_first_freeze(gc_state):
+    prefork.disable_gc_for_preload()
+    assert not gc.isenabled()
+
+    frozen_before = gc.get_freeze_count()
+    prefork.freeze_before_fork()
+    assert gc.isenabled()
+    assert gc.get_freeze_count() > frozen_before
+
+    # Later forks (workers recycled after max_requests) keep freezing
+    prefork.freeze_before_fork()
+    assert gc.isenabled()
+
+
+def test_gc_left_alone_when_already_disabled(gc_state):
+    gc.disable()
+    prefork.disable_gc_for_preload()
+    prefork.freeze_before_fork()
+    # gc was not turned off for the preload, so it is not turned on either
+    assert not gc.isenabled()
+
+
+class KeywordEmbeddings(Embeddings):
+    """
+    Deterministic embeddings: one dimension per keyword.
+    """
+
+    KEYWORDS = ("refund", "shipping", "password", "invoice")
+
+    def _embed(self, text):
+        return [float(keyword in text.lower()) + 0.01 for keyword in self.KEYWORDS]
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_worker_reopens_chroma_collection(tmp_path):
+    db = Chroma(
+        collection_name="knowledge_base_test",
+        embedding_function=KeywordEmbeddings(),
+        collection_metadata={"hnsw:space": "cosine"},
+        persist_directory=str(tmp_path)
+    )
+    db.add_documents([Document(page_content=f"How do I get a {topic}?") for topic in KeywordEmbeddings.KEYWORDS])
+    store = ProcessLocalChroma(db, collection_name="knowledge_base_test", persist_directory=str(tmp_path))
+
+    def top_result():
+        return store.similarity_search_with_relevance_scores("refund please", k=1)[0][0].page_content
+
+    expected = top_result()
+    # Client objects are thin; the system behind them holds the SQLite connections
+    master_system = store._get()._client._system
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            result = {"top": top_result(), "own_system": store._get()._client._system is not master_system}
+        except Exception as e:
+            result = {"error": repr(e)}
+        os.write(write_fd, json.dumps(result).encode())
+        os._exit(0)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as pipe:
+        result = json.loads(pipe.read() or "{}")
+    os.waitpid(pid, 0)
+
+    assert result == {"top": expected, "own_system": True}
+    # The master keeps its own store
+    assert store._get()._client._system is master_system
+    assert top_result() == expected
@@ -0,0 +1,37 @@
+"""
+Tests for taking speculative retrieval results in the response nodes (nodes.responses).
+"""
+
+from types import SimpleNamespace
+
+from langchain.docstore.document import Document
+
+from nodes.responses import take_prefetched_docs
+from utils.prefetch import retrieval_prefetch
+
+BILLING = {"category": "billing"}
+
+
+def snapshot(version: str, k: int = 3):
+    return SimpleNamespace(version=version, retriever=SimpleNamespace(k=k))
+
+
+def prefetched(version: str, categories: list) -> dict:
+    docs = [Document(page_content=str(i), metadata={"category": c}) for i, c in enumerate(categories)]
+    return {"retrieval_prefetch_id": retrieval_prefetch.submit(lambda: (version, docs))}
+
+
+def test_matching_candidates_are_used():
+    state = prefetched("v1", ["billing", "technical", "billing", "billing", "billing"])
+    docs = take_prefetched_docs(state, snapshot("v1"), BILLING)
+    assert [doc.page_content for doc in docs] == ["0", "2", "3"]
+
+
+def test_too_few_matches_fall_back_to_filtered_search():
+    state = prefetched("v1", ["billing", "technical", "general"])
+    assert take_prefetched_docs(state, snapshot("v1"), BILLING) is None
+
+
+def test_result_from_another_snapshot_is_discarded():
+    state = prefetched("v1", ["billing"] * 3)
+    assert take_prefetched_docs(state, snapshot("v2"), BILLING) is None
@@ -0,0 +1,66 @@
+"""
+Tests for the SQLite checkpointer (utils.sqlite_checkpointer).
+"""
+
+import threading
+
+import pytest
+
+from conftest import build_graph, thread_config
+from utils.sqlite_checkpointer import SQLiteCheckpointer
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "checkpoints.sqlite3")
+
+
+def checkpoint_ids(checkpointer, thread_id: str) -> list:
+    return [t.checkpoint["id"] for t in checkpointer.list(thread_config(thread_id))]
+
+
+def test_turns_are_visible_to_other_workers(path):
+    first, second = SQLiteCheckpointer(path), SQLiteCheckpointer(path)
+
+    build_graph(first).invoke({"messages": ["one"]}, thread_config("t1"))
+    # put() returns after the commit, so the next request may land on any worker
+    assert build_graph(second).invoke({"messages": ["two"]}, thread_config("t1"))["seen"] == ["one", "two"]
+
+
+def test_concurrent_writes_share_transactions(path):
+    checkpointer = SQLiteCheckpointer(path)
+    graph = build_graph(checkpointer)
+
+    threads = [
+        threading.Thread(target=graph.invoke, args=({"messages": ["hi"]}, thread_config(f"t{i}")))
+        for i in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = checkpointer.get_stats()
+    assert stats["write_failures"] == 0
+    assert stats["transactions"] <= stats["write_requests"]
+    assert all(checkpointer.get_tuple(thread_config(f"t{i}")) is not None for i in range(8))
+
+
+def test_history_is_pruned_per_thread(path):
+    checkpointer = SQLiteCheckpointer(path, max_checkpoints_per_thread=4)
+    graph = build_graph(checkpointer)
+    for message in ("one", "two", "three"):
+        graph.invoke({"messages": [message]}, thread_config("t1"))
+
+    assert len(checkpoint_ids(checkpointer, "t1")) == 4
+    assert checkpointer.get_stats()["pruned_checkpoints"] > 0
+    assert graph.invoke({"messages": ["four"]}, thread_config("t1"))["seen"] == ["one", "two", "three", "four"]
+
+
+def test_delete_thread(path):
+    checkpointer = SQLiteCheckpointer(path)
+    build_graph(checkpointer).invoke({"messages": ["one"]}, thread_config("t1"))
+
+    checkpointer.delete_thread("t1")
+    assert checkpointer.get_tuple(thread_config("t1")) is None
+    assert checkpoint_ids(checkpointer, "t1") == []
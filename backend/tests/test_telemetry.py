@@ -0,0 +1,153 @@
+"""
+Tests for the batched telemetry pipeline (utils.telemetry) against LocalCollector.
+"""
+
+import gc
+import threading
+import time
+import types
+import weakref
+
+import pytest
+
+from utils.telemetry import ApplicationInsightsExporter, ExceptionInfo, TelemetryPipeline
+
+
+@pytest.fixture
+def make_pipeline(collector):
+    pipelines = []
+
+    def make(**kwargs) -> TelemetryPipeline:
+        kwargs.setdefault("flush_interval_seconds", 0.05)
+        pipeline = TelemetryPipeline(ApplicationInsightsExporter(collector.connection_string), **kwargs)
+        pipelines.append(pipeline)
+        return pipeline
+
+    yield make
+    for pipeline in pipelines:
+        pipeline.stop(timeout=10)
+
+
+def assert_accounted(stats: dict, calls: int):
+    assert stats["enqueued"] + stats["dropped"] == calls
+    assert stats["queued"] == 0
+    assert stats["enqueued"] == stats["exported"] + stats["failed"]
+
+
+def test_every_item_is_exported_once(collector, make_pipeline):
+    pipeline = make_pipeline(batch_size=7)
+    pipeline.start()
+    for i in range(50):
+        pipeline.track_event("query_received", {"thread_id": f"t{i}"})
+        pipeline.track_metric("query_success", 1)
+    pipeline.stop(timeout=10)
+
+    stats = pipeline.get_stats()
+    assert_accounted(stats, 100)
+    assert stats["exported"] == len(collector.envelopes) == 100
+    assert stats["dropped"] == stats["failed"] == 0
+    assert collector.requests == stats["batches"] >= 100 // 7
+    kinds = {envelope["data"]["baseType"] for envelope in collector.envelopes}
+    assert kinds == {"EventData", "MetricData"}
+
+
+def test_full_queue_drops_without_blocking(collector, make_pipeline):
+    collector.delay_ms = 300
+    pipeline = make_pipeline(max_queue_size=10, batch_size=5)
+    pipeline.start()
+
+    start = time.perf_counter()
+    for i in range(200):
+        pipeline.track_event("query_received")
+    elapsed = time.perf_counter() - start
+    # Well under one collector round trip: callers never waited for the exporter
+    assert elapsed < 0.2
+
+    pipeline.stop(timeout=10)
+    stats = pipeline.get_stats()
+    assert stats["dropped"] >= 200 - 10 - 5
+    assert_accounted(stats, 200)
+    assert stats["exported"] == len(collector.envelopes)
+
+
+def test_failed_batches_are_counted_and_discarded(collector, make_pipeline):
+    collector.status = 500
+    pipeline = make_pipeline(batch_size=10)
+    pipeline.start()
+    for i in range(30):
+        pipeline.track_event("query_received")
+    pipeline.stop(timeout=10)
+
+    stats = pipeline.get_stats()
+    assert_accounted(stats, 30)
+    assert stats["failed"] == 30
+    assert stats["exported"] == 0
+    assert "500" in stats["last_error"]
+    # One attempt per batch, no retries
+    assert collector.requests == 3
+
+
+def test_exception_is_captured_without_its_traceback(collector, make_pipeline):
+    pipeline = make_pipeline()
+
+    class RequestState:
+        pass
+
+    def failing_request():
+        state = RequestState()
+        ref = weakref.ref(state)
+        try:
+            raise ValueError("simulated failure")
+        except ValueError:
+            pipeline.track_exception(properties={"endpoint": "/query"})
+        return ref
+
+    state_ref = failing_request()
+    gc.collect()
+    # The failed request's frames (and their locals) are not kept alive by the queue
+    assert state_ref() is None
+    item = pipeline._queue.queue[0]
+    assert not any(isinstance(arg, types.TracebackType) for arg in item.args)
+    info = item.args[0]
+    assert isinstance(info, ExceptionInfo)
+    assert (info.type_name, info.message) == ("ValueError", "simulated failure")
+    assert info.frames[-1][2] == "failing_request"
+
+    pipeline.start()
+    pipeline.stop(timeout=10)
+    [envelope] = collector.envelopes
+    data = envelope["data"]["baseData"]
+    assert data["properties"] == {"endpoint": "/query"}
+    [details] = data["exceptions"]
+    assert details["typeName"] == "ValueError"
+    assert details["parsedStack"][0]["method"] == "failing_request"
+
+
+def test_exception_outside_handler_is_still_tracked(collector, make_pipeline):
+    pipeline = make_pipeline()
+    pipeline.track_exception()
+    pipeline.start()
+    pipeline.stop(timeout=10)
+
+    assert pipeline.get_stats()["exported"] == 1
+    assert collector.envelopes[0]["data"]["baseType"] == "ExceptionData"
+
+
+def test_tracking_calls_are_thread_safe(collector, make_pipeline):
+    pipeline = make_pipeline(max_queue_size=100, batch_size=20)
+    pipeline.start()
+
+    def track():
+        for _ in range(100):
+            pipeline.track_metric("query_success", 1)
+
+    threads = [threading.Thread(target=track) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pipeline.stop(timeout=10)
+
+    stats = pipeline.get_stats()
+    assert_accounted(stats, 800)
+    assert stats["exported"] == len(collector.envelopes)
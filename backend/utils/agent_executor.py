@@ -0,0 +1,289 @@
+"""
+Agent Executor
+Dedicated, bounded thread pool for support agent (graph) runs.
+
+Graph nodes are synchronous, so a run holds a thread from start to finish.
+On the event loop's default executor runs competed with everything else that
+uses it and queued without limit or visibility. This pool has its own
+threads (AGENT_EXECUTOR_WORKERS); when AGENT_EXECUTOR_MAX_QUEUE runs are
+already waiting for one, submit() raises ExecutorSaturated instead of
+queueing more.
+
+Each run is timed from submission: queue wait until a thread picks it up,
+then run time. A run can be cancelled (e.g. the client disconnected): if it
+is still queued when run() cancels it, it never starts; once running,
+CancelOnToken stops its model calls at the next token and the run function
+checks run.cancelled between graph steps.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from utils.metrics import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+# Import settings with fallback
+try:
+    from config.settings import (
+        AGENT_EXECUTOR_WORKERS,
+        AGENT_EXECUTOR_MAX_QUEUE,
+        AGENT_EXECUTOR_DISCONNECT_POLL_SECONDS
+    )
+except ImportError:
+    AGENT_EXECUTOR_WORKERS = 16
+    AGENT_EXECUTOR_MAX_QUEUE = 64
+    AGENT_EXECUTOR_DISCONNECT_POLL_SECONDS = 0.5
+
+# Runs whose timings the percentiles in get_stats() are computed from
+TIMING_WINDOW = 1000
+
+
+class RunCancelled(Exception):
+    pass
+
+
+class ExecutorSaturated(Exception):
+    pass
+
+
+class CancelOnToken(BaseCallbackHandler):
+    """
+    Aborts the model calls of a cancelled run; raise_error makes LangChain propagate the exception.
+    """
+
+    raise_error = True
+
+    def __init__(self, cancelled: threading.Event):
+        self.cancelled = cancelled
+
+    def _check(self):
+        if self.cancelled.is_set():
+            raise RunCancelled()
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self._check()
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._check()
+
+    def on_llm_new_token(self, token, **kwargs):
+        self._check()
+
+
+class AgentRun:
+    """
+    Cancellation flag and timings of one submitted run.
+    """
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self.submitted_at = time.perf_counter()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def callbacks(self) -> list:
+        """
+        Callbacks to pass in the graph config so model calls stop when the run is cancelled.
+        """
+        return [CancelOnToken(self.cancelled)]
+
+    @property
+    def queue_wait_ms(self) -> float:
+        end = self.started_at if self.started_at is not None else time.perf_counter()
+        return (end - self.submitted_at) * 1000
+
+    @property
+    def run_ms(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return (end - self.started_at) * 1000
+
+
+def _percentiles(samples) -> dict:
+    ordered = sorted(samples)
+    if not ordered:
+        return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+    return {
+        "p50": round(ordered[len(ordered) // 2], 1),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+        "max": round(ordered[-1], 1),
+    }
+
+
+class AgentExecutor:
+    """
+    Thread pool for graph runs with a bounded wait queue and per-run timings.
+    """
+
+    def __init__(self, max_workers: int = 16, max_queue: int = 64, name: str = "agent-run"):
+        """
+        Initialize the executor.
+
+        Args:
+            max_workers: Runs executing at once
+            max_queue: Runs allowed to wait for a thread (0 = unbounded)
+            name: Thread name prefix
+        """
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max_queue
+        self.name = name
+        # Created in the process that first submits: pool threads do not survive a fork
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queued = 0
+        self._queue_waits: deque = deque(maxlen=TIMING_WINDOW)
+        self._run_times: deque = deque(maxlen=TIMING_WINDOW)
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "rejected": 0,
+            "peak_active": 0,
+            "peak_queued": 0,
+        }
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        pid = os.getpid()
+        if self._executor_pid != pid:
+            with self._lock:
+                if self._executor_pid != pid:
+                    self._active = self._queued = 0
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+                    self._executor_pid = pid
+        return self._executor
+
+    def submit(self, fn: Callable[..., Any], *args, run: Optional[AgentRun] = None) -> Tuple[AgentRun, Future]:
+        """
+        Queue fn(run, *args) on the pool, in the caller's context.
+
+        Args:
+            fn: Blocking function; receives the AgentRun first
+            run: Run to use (e.g. an AgentRun subclass carrying request state)
+
+        Raises:
+            ExecutorSaturated: If max_queue runs are already waiting for a thread
+        """
+        executor = self._get_executor()
+        run = run or AgentRun()
+        with self._lock:
+            if self.max_queue > 0 and self._active + self._queued >= self.max_workers + self.max_queue:
+                self._stats["rejected"] += 1
+                raise ExecutorSaturated(
+                    f"{self._active} agent runs active and {self._queued} queued (limit {self.max_queue})"
+                )
+            self._queued += 1
+            self._stats["submitted"] += 1
+            self._stats["peak_queued"] = max(self._stats["peak_queued"], self._queued)
+        future = executor.submit(contextvars.copy_context().run, self._call, run, fn, args)
+        future.add_done_callback(self._on_done)
+        return run, future
+
+    async def run(
+        self,
+        fn: Callable[..., Any],
+        *args,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        poll_seconds: float = AGENT_EXECUTOR_DISCONNECT_POLL_SECONDS
+    ) -> Any:
+        """
+        Run fn(run, *args) on the pool and wait for its result.
+
+        Args:
+            fn: Blocking function; receives the AgentRun first
+            is_disconnected: Polled while waiting (e.g. Request.is_disconnected); when it
+                returns True the run is cancelled and RunCancelled is raised
+            poll_seconds: Interval between is_disconnected checks
+
+        Raises:
+            ExecutorSaturated: If the queue is full
+            RunCancelled: If the client disconnected
+        """
+        run, future = self.submit(fn, *args)
+        waiter = asyncio.wrap_future(future)
+        try:
+            while True:
+                done, _ = await asyncio.wait({waiter}, timeout=poll_seconds if is_disconnected else None)
+                if done:
+                    return waiter.result()
+                if await is_disconnected():
+                    logger.info(f"Client disconnected, cancelling agent run after {run.queue_wait_ms + run.run_ms:.0f} ms")
+                    raise RunCancelled()
+        except (asyncio.CancelledError, RunCancelled):
+            run.cancel()
+            future.cancel()
+            # Nobody awaits the abandoned run; consume its outcome so asyncio doesn't log it
+            waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+            raise
+
+    def _call(self, run: AgentRun, fn: Callable[..., Any], args: tuple) -> Any:
+        run.started_at = time.perf_counter()
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+            self._stats["peak_active"] = max(self._stats["peak_active"], self._active)
+            self._queue_waits.append(run.queue_wait_ms)
+        outcome = "failed"
+        try:
+            result = fn(run, *args)
+            outcome = "completed"
+            return result
+        except Exception:
+            if run.cancelled.is_set():
+                outcome = "cancelled"
+            raise
+        finally:
+            run.finished_at = time.perf_counter()
+            with self._lock:
+                self._active -= 1
+                self._stats[outcome] += 1
+                self._run_times.append(run.run_ms)
+
+    def _on_done(self, future: Future):
+        # Cancelled before a thread picked it up: _call never ran
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+                self._stats["cancelled"] += 1
+
+    def get_stats(self) -> dict:
+        """
+        Report active and queued runs, outcome counts and queue-wait/run-time percentiles (ms).
+        """
+        with self._lock:
+            stats = dict(
+                self._stats,
+                active=self._active,
+                queued=self._queued,
+                max_workers=self.max_workers,
+                max_queue=self.max_queue,
+                queue_wait_ms=_percentiles(self._queue_waits),
+                run_ms=_percentiles(self._run_times),
+            )
+        stats["utilization"] = round(stats["active"] / self.max_workers, 3)
+        return stats
+
+
+# Shared pool for graph runs of this worker
+agent_executor = AgentExecutor(
+    max_workers=AGENT_EXECUTOR_WORKERS,
+    max_queue=AGENT_EXECUTOR_MAX_QUEUE
+)
+
+register_stats_provider("agent_executor", agent_executor.get_stats)
@@ -2,19 +2,68 @@
 Azure Blob Storage Integration for ChromaDB Persistence
 Provides backup and restore capabilities for ChromaDB using Azure Blob Storage (Free Tier)
 
+Transfers use the async blob client: several files move at once, large files
+are uploaded as parallel blocks and downloaded as parallel ranges, and
+downloads stream straight to disk instead of buffering whole index files.
+The sync methods wrap the async ones.
+
+Each backup carries a manifest (<prefix>/.manifest.json) of file sizes and
+SHA-256 hashes, so uploads only send changed files (and delete removed ones)
+and restores only fetch files that differ locally. Local hashes are cached in
+.blob_sync_state.json (keyed by size and mtime) so unchanged files are not
+re-read.
+
+With mode="snapshot" a backup is instead a single compressed tar archive
+(snapshots/<name>/<timestamp>.tar.zst), streamed to Blob Storage as staged
+blocks while the directory is read and streamed back into the extractor on
+restore, without a temporary archive on disk either way. A catalog blob
+(catalog.json) records every snapshot, so listing is one read and deleting a
+backup is one blob delete plus a catalog update.
+
 Compatible with Azure SDK and ChromaDB.
 """
 
+import asyncio
+import base64
+import hashlib
+import json
 import logging
+import os
+import random
+import shutil
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.metrics import register_stats_provider
+from utils.snapshot_archive import (
+    SNAPSHOT_EXTENSIONS,
+    ArchiveBlockWriter,
+    ChunkQueueReader,
+    extract_archive,
+    snapshot_codec,
+    write_archive
+)
+from vectorstore.quantized_store import EXACT_VECTORS_FILE
 
 logger = logging.getLogger(__name__)
 
+try:
+    import fcntl
+except ImportError:
+    # Windows local development runs a single process; no cross-worker lock needed
+    fcntl = None
+
 # Conditional imports for Azure services
 try:
     from azure.storage.blob import BlobServiceClient, ContainerClient
-    from azure.core.exceptions import ResourceNotFoundError
+    from azure.storage.blob.aio import BlobServiceClient as AsyncBlobServiceClient
+    from azure.core import MatchConditions
+    from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
     AZURE_BLOB_AVAILABLE = True
 except ImportError:
     AZURE_BLOB_AVAILABLE = False
@@ -25,12 +74,176 @@ try:
     from config.settings import (
         AZURE_STORAGE_CONNECTION_STRING,
         AZURE_BLOB_CONTAINER_NAME,
-        USE_AZURE_BLOB_STORAGE
+        USE_AZURE_BLOB_STORAGE,
+        BLOB_SYNC_MAX_CONCURRENCY,
+        BLOB_SYNC_BLOCK_CONCURRENCY,
+        BLOB_SYNC_BLOCK_SIZE_MB,
+        BLOB_BACKUP_MODE,
+        BLOB_SNAPSHOT_COMPRESSION_LEVEL,
+        BLOB_RESTORE_ON_STARTUP
     )
 except ImportError:
     AZURE_STORAGE_CONNECTION_STRING = None
     AZURE_BLOB_CONTAINER_NAME = "chromadb"
     USE_AZURE_BLOB_STORAGE = False
+    BLOB_SYNC_MAX_CONCURRENCY = 8
+    BLOB_SYNC_BLOCK_CONCURRENCY = 4
+    BLOB_SYNC_BLOCK_SIZE_MB = 4
+    BLOB_BACKUP_MODE = "files"
+    BLOB_SNAPSHOT_COMPRESSION_LEVEL = 3
+    BLOB_RESTORE_ON_STARTUP = "missing"
+
+PROGRESS_LOG_INTERVAL_SECONDS = 5.0
+MANIFEST_NAME = ".manifest.json"
+MANIFEST_VERSION = 1
+LOCAL_STATE_NAME = ".blob_sync_state.json"
+# Never backed up: sync bookkeeping, and the quantized index's float32 re-rank copy,
+# which would outweigh the index itself
+LOCAL_ONLY_NAMES = (LOCAL_STATE_NAME, EXACT_VECTORS_FILE)
+SNAPSHOT_PREFIX = "snapshots"
+CATALOG_NAME = "catalog.json"
+CATALOG_VERSION = 1
+CATALOG_UPDATE_ATTEMPTS = 5
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_manifest(root: Path, previous: Optional[Dict[str, dict]] = None) -> Dict[str, dict]:
+    """
+    Describe every file under root by size, mtime and SHA-256.
+    
+    Args:
+        root: Directory to scan
+        previous: Earlier result; hashes of files with unchanged size and mtime are reused
+        
+    Returns:
+        Dict mapping POSIX relative path to {"size", "mtime_ns", "sha256"}
+    """
+    previous = previous or {}
+    files = {}
+    for file_path in root.rglob("*"):
+        if not file_path.is_file() or file_path.name in LOCAL_ONLY_NAMES:
+            continue
+        relative_path = file_path.relative_to(root).as_posix()
+        stat = file_path.stat()
+        known = previous.get(relative_path)
+        if known and known.get("size") == stat.st_size and known.get("mtime_ns") == stat.st_mtime_ns:
+            sha256 = known["sha256"]
+        else:
+            sha256 = _sha256(file_path)
+        files[relative_path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+    return files
+
+
+def _same_content(local: Optional[dict], remote: Optional[dict]) -> bool:
+    return bool(local and remote and remote.get("sha256")) and (
+        local["size"] == remote["size"] and local["sha256"] == remote["sha256"]
+    )
+
+
+def _manifest_document(files: Dict[str, dict]) -> dict:
+    # mtimes are local to this machine and do not belong in the shared manifest
+    return {
+        "version": MANIFEST_VERSION,
+        "created_at": datetime.utcnow().isoformat(),
+        "files": {path: {"size": entry["size"], "sha256": entry["sha256"]} for path, entry in sorted(files.items())},
+    }
+
+
+def _load_local_state(root: Path) -> Dict[str, dict]:
+    try:
+        return json.loads((root / LOCAL_STATE_NAME).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_local_state(root: Path, files: Dict[str, dict]):
+    try:
+        (root / LOCAL_STATE_NAME).write_text(json.dumps(files))
+    except OSError as e:
+        logger.warning(f"Could not save blob sync state: {str(e)}")
+
+
+def _run_sync(coro):
+    """
+    Run a coroutine to completion from sync code, also when called from a thread
+    that already runs an event loop (asyncio.run cannot nest).
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+class TransferProgress:
+    """
+    Byte and file progress of one upload/download, logged every few seconds.
+    """
+    
+    def __init__(self, operation: str, total_files: int, total_bytes: int):
+        self.operation = operation
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.files = 0
+        self.bytes = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self._last_log = self.started
+    
+    def hook(self):
+        """
+        Progress callback for one blob (the SDK reports cumulative bytes per blob).
+        """
+        reported = 0
+        
+        async def progress_hook(current: int, total: Optional[int]):
+            nonlocal reported
+            self.advance(current - reported)
+            reported = current
+        
+        return progress_hook
+    
+    def advance(self, nbytes: int):
+        self.bytes += nbytes
+        now = time.perf_counter()
+        if now - self._last_log >= PROGRESS_LOG_INTERVAL_SECONDS:
+            self._last_log = now
+            logger.info(f"ChromaDB {self.operation} in progress: {self.describe()}")
+    
+    def file_done(self):
+        self.files += 1
+    
+    def finish(self) -> dict:
+        self.elapsed = time.perf_counter() - self.started
+        return self.snapshot()
+    
+    def snapshot(self) -> dict:
+        elapsed = self.elapsed or time.perf_counter() - self.started
+        return {
+            "operation": self.operation,
+            "files": self.files,
+            "total_files": self.total_files,
+            "bytes": self.bytes,
+            "total_bytes": self.total_bytes,
+            "seconds": round(elapsed, 3),
+            "mb_per_second": round(self.bytes / elapsed / 1e6, 2) if elapsed else 0.0,
+        }
+    
+    def describe(self) -> str:
+        stats = self.snapshot()
+        return (
+            f"{stats['files']}/{stats['total_files']} files, "
+            f"{stats['bytes'] / 1e6:.1f}/{stats['total_bytes'] / 1e6:.1f} MB "
+            f"in {stats['seconds']:.1f}s ({stats['mb_per_second']:.1f} MB/s)"
+        )
 
 
 class ChromaDBAzureBlobSync:
@@ -43,7 +256,12 @@ class ChromaDBAzureBlobSync:
         self,
         connection_string: Optional[str] = None,
         container_name: str = "chromadb",
-        local_path: str = "./knowledge_base"
+        local_path: str = "./knowledge_base",
+        max_concurrency: int = 8,
+        block_concurrency: int = 4,
+        block_size: int = 4 * 1024 * 1024,
+        mode: str = "files",
+        compression_level: int = 3
     ):
         """
         Initialize Azure Blob Storage sync for ChromaDB.
@@ -52,6 +270,11 @@ class ChromaDBAzureBlobSync:
             connection_string: Azure Storage connection string
             container_name: Name of the blob container
             local_path: Local path to ChromaDB files
+            max_concurrency: Files transferred at the same time
+            block_concurrency: Parallel blocks/ranges per large file
+            block_size: Block and download chunk size in bytes
+            mode: "files" (one blob per file, delta sync) or "snapshot" (one archive per backup)
+            compression_level: zstd/gzip level of snapshot archives
         """
         if not AZURE_BLOB_AVAILABLE:
             raise ImportError(
@@ -62,7 +285,23 @@ class ChromaDBAzureBlobSync:
         self.connection_string = connection_string or AZURE_STORAGE_CONNECTION_STRING
         self.container_name = container_name
         self.local_path = Path(local_path)
+        self.max_concurrency = max(1, max_concurrency)
+        self.block_concurrency = max(1, block_concurrency)
+        self.block_size = block_size
+        self.mode = mode if mode in ("files", "snapshot") else "files"
+        self.compression_level = compression_level
         self.container_client: Optional[ContainerClient] = None
+        self._progress: Optional[TransferProgress] = None
+        self._stats = {
+            "uploads": 0,
+            "downloads": 0,
+            "failures": 0,
+            "files_skipped": 0,
+            "blobs_deleted": 0,
+            "snapshots": 0,
+            "last_upload": None,
+            "last_download": None,
+        }
         
         if self.connection_string:
             try:
@@ -86,51 +325,130 @@ class ChromaDBAzureBlobSync:
         else:
             logger.warning("No Azure Storage connection string provided. Blob sync disabled.")
     
-    def upload_chromadb(self, backup_name: Optional[str] = None) -> bool:
+    def _async_service(self) -> "AsyncBlobServiceClient":
+        # Payloads above block_size go up as parallel staged blocks and come down as parallel ranges
+        return AsyncBlobServiceClient.from_connection_string(
+            self.connection_string,
+            max_single_put_size=self.block_size,
+            max_block_size=self.block_size,
+            max_single_get_size=self.block_size,
+            max_chunk_get_size=self.block_size
+        )
+    
+    async def _aread_manifest(self, container, backup_prefix: str) -> Optional[dict]:
+        try:
+            downloader = await container.download_blob(f"{backup_prefix}/{MANIFEST_NAME}")
+            return json.loads(await downloader.readall())
+        except ResourceNotFoundError:
+            return None
+    
+    async def aupload_chromadb(self, backup_name: Optional[str] = None, source_path: Optional[str] = None) -> bool:
         """
-        Upload ChromaDB files to Azure Blob Storage.
+        Upload changed ChromaDB files to Azure Blob Storage, up to max_concurrency
+        files at a time, delete blobs of removed files, then publish the manifest.
         
         Args:
             backup_name: Optional backup name prefix
+            source_path: Directory to upload instead of local_path (e.g. a consistent copy)
             
         Returns:
             True if successful, False otherwise
         """
+        if self.mode == "snapshot":
+            return await self.aupload_snapshot(backup_name, source_path)
+        
         if not self.container_client:
             logger.warning("Blob storage not configured. Skipping upload.")
             return False
         
-        if not self.local_path.exists():
-            logger.warning(f"ChromaDB path does not exist: {self.local_path}")
+        root = Path(source_path) if source_path else self.local_path
+        if not root.exists():
+            logger.warning(f"ChromaDB path does not exist: {root}")
             return False
         
         try:
             backup_prefix = backup_name or "current"
-            uploaded_count = 0
+            local = await asyncio.to_thread(build_manifest, root, _load_local_state(root))
+            semaphore = asyncio.Semaphore(self.max_concurrency)
             
-            # Upload all files in the knowledge base directory
-            for file_path in self.local_path.rglob("*"):
-                if file_path.is_file():
-                    # Create blob name preserving directory structure
-                    relative_path = file_path.relative_to(self.local_path)
+            async with self._async_service() as blob_service:
+                container = blob_service.get_container_client(self.container_name)
+                manifest = await self._aread_manifest(container, backup_prefix)
+                if manifest is not None:
+                    remote = manifest["files"]
+                else:
+                    # Backup written before manifests existed: every blob is of unknown content
+                    remote = {
+                        blob.name[len(backup_prefix) + 1:]: None
+                        async for blob in container.list_blobs(name_starts_with=f"{backup_prefix}/")
+                        if blob.name != f"{backup_prefix}/{MANIFEST_NAME}"
+                    }
+                changed = [path for path, entry in local.items() if not _same_content(entry, remote.get(path))]
+                removed = [path for path in remote if path not in local]
+                progress = TransferProgress("upload", len(changed), sum(local[path]["size"] for path in changed))
+                self._progress = progress
+                
+                async def upload(relative_path: str):
+                    # Blob name preserves directory structure
                     blob_name = f"{backup_prefix}/{relative_path}"
-                    
-                    # Upload file
-                    with open(file_path, "rb") as data:
-                        blob_client = self.container_client.get_blob_client(blob_name)
-                        blob_client.upload_blob(data, overwrite=True)
-                        uploaded_count += 1
-                        logger.debug(f"Uploaded: {blob_name}")
-            
-            logger.info(f"ChromaDB uploaded to Azure Blob Storage: {uploaded_count} files")
+                    async with semaphore:
+                        with open(root / relative_path, "rb") as data:
+                            await container.upload_blob(
+                                blob_name,
+                                data,
+                                overwrite=True,
+                                max_concurrency=self.block_concurrency,
+                                progress_hook=progress.hook()
+                            )
+                    progress.file_done()
+                    logger.debug(f"Uploaded: {blob_name}")
+                
+                async def delete(relative_path: str):
+                    async with semaphore:
+                        try:
+                            await container.delete_blob(f"{backup_prefix}/{relative_path}")
+                        except ResourceNotFoundError:
+                            pass
+                
+                await asyncio.gather(*(upload(path) for path in changed))
+                await asyncio.gather(*(delete(path) for path in removed))
+                # The manifest goes last, so it never lists content that is not uploaded yet
+                if changed or removed or manifest is None:
+                    await container.upload_blob(
+                        f"{backup_prefix}/{MANIFEST_NAME}",
+                        json.dumps(_manifest_document(local), indent=1),
+                        overwrite=True
+                    )
+            
+            _save_local_state(root, local)
+            self._stats["uploads"] += 1
+            self._stats["files_skipped"] += len(local) - len(changed)
+            self._stats["blobs_deleted"] += len(removed)
+            self._stats["last_upload"] = dict(progress.finish(), skipped=len(local) - len(changed), deleted=len(removed))
+            if changed or removed:
+                logger.info(
+                    f"ChromaDB uploaded to Azure Blob Storage: {progress.describe()}, "
+                    f"{len(local) - len(changed)} unchanged, {len(removed)} removed"
+                )
+            else:
+                logger.info(f"ChromaDB backup '{backup_prefix}' already up to date ({len(local)} files)")
             return True
         except Exception as e:
+            self._stats["failures"] += 1
             logger.error(f"Error uploading ChromaDB to blob storage: {str(e)}")
             return False
+        finally:
+            self._progress = None
     
-    def download_chromadb(self, backup_name: Optional[str] = None) -> bool:
+    async def adownload_chromadb(self, backup_name: Optional[str] = None) -> bool:
         """
-        Download ChromaDB files from Azure Blob Storage.
+        Restore ChromaDB files from Azure Blob Storage.
+        
+        Files whose size and hash match the backup manifest are reused; the rest
+        are streamed to disk, up to max_concurrency at a time. Everything is
+        assembled in a staging directory that replaces local_path only once
+        complete, so a failed restore leaves the local copy untouched. Callers
+        must not have the database open while it is replaced.
         
         Args:
             backup_name: Optional backup name prefix to restore from
@@ -138,42 +456,480 @@ class ChromaDBAzureBlobSync:
         Returns:
             True if successful, False otherwise
         """
+        if self.mode == "snapshot":
+            return await self.adownload_snapshot(backup_name)
+        
         if not self.container_client:
             logger.warning("Blob storage not configured. Skipping download.")
             return False
         
+        staging = self.local_path.with_name(f".{self.local_path.name}.staging-{os.getpid()}")
         try:
             backup_prefix = backup_name or "current"
-            downloaded_count = 0
-            
-            # List and download all blobs with the prefix
-            blob_list = self.container_client.list_blobs(name_starts_with=backup_prefix)
+            semaphore = asyncio.Semaphore(self.max_concurrency)
             
-            for blob in blob_list:
-                # Remove prefix from blob name to get relative path
-                relative_path = blob.name.replace(f"{backup_prefix}/", "", 1)
-                local_file_path = self.local_path / relative_path
+            async with self._async_service() as blob_service:
+                container = blob_service.get_container_client(self.container_name)
+                manifest = await self._aread_manifest(container, backup_prefix)
+                if manifest is not None:
+                    wanted = manifest["files"]
+                else:
+                    # Backup written before manifests existed: nothing can be verified or reused
+                    wanted = {
+                        blob.name[len(backup_prefix) + 1:]: {"size": blob.size, "sha256": None}
+                        async for blob in container.list_blobs(name_starts_with=f"{backup_prefix}/")
+                    }
+                if not wanted:
+                    logger.warning(f"No ChromaDB backup found with prefix: {backup_prefix}")
+                    return False
                 
-                # Create parent directories
-                local_file_path.parent.mkdir(parents=True, exist_ok=True)
+                local = {}
+                if self.local_path.exists():
+                    local = await asyncio.to_thread(build_manifest, self.local_path, _load_local_state(self.local_path))
+                current = {path for path, entry in wanted.items() if _same_content(local.get(path), entry)}
+                if len(current) == len(wanted) == len(local):
+                    self._stats["downloads"] += 1
+                    self._stats["files_skipped"] += len(current)
+                    logger.info(f"ChromaDB already matches backup '{backup_prefix}' ({len(current)} files)")
+                    return True
                 
-                # Download blob
-                blob_client = self.container_client.get_blob_client(blob.name)
-                with open(local_file_path, "wb") as download_file:
-                    download_file.write(blob_client.download_blob().readall())
+                missing = [path for path in wanted if path not in current]
+                progress = TransferProgress("download", len(missing), sum(wanted[path]["size"] for path in missing))
+                self._progress = progress
+                shutil.rmtree(staging, ignore_errors=True)
+                staging.mkdir(parents=True)
+                for path in current:
+                    (staging / path).parent.mkdir(parents=True, exist_ok=True)
+                    # Hard links make reusing unchanged (possibly large) index files free
+                    try:
+                        os.link(self.local_path / path, staging / path)
+                    except OSError:
+                        shutil.copy2(self.local_path / path, staging / path)
+                
+                async def download(relative_path: str):
+                    target = staging / relative_path
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    async with semaphore:
+                        downloader = await container.download_blob(
+                            f"{backup_prefix}/{relative_path}",
+                            max_concurrency=self.block_concurrency,
+                            progress_hook=progress.hook()
+                        )
+                        with open(target, "wb") as download_file:
+                            await downloader.readinto(download_file)
+                    expected = wanted[relative_path]["sha256"]
+                    if expected and await asyncio.to_thread(_sha256, target) != expected:
+                        raise ValueError(f"Checksum mismatch for {relative_path} (backup changed during restore?)")
+                    progress.file_done()
+                    logger.debug(f"Downloaded: {relative_path}")
                 
-                downloaded_count += 1
-                logger.debug(f"Downloaded: {blob.name}")
+                await asyncio.gather(*(download(path) for path in missing))
             
-            if downloaded_count > 0:
-                logger.info(f"ChromaDB downloaded from Azure Blob Storage: {downloaded_count} files")
-                return True
-            else:
-                logger.warning(f"No ChromaDB backup found with prefix: {backup_prefix}")
-                return False
+            self._swap_into_place(staging)
+            _save_local_state(self.local_path, await asyncio.to_thread(build_manifest, self.local_path, {
+                path: dict(entry, mtime_ns=(self.local_path / path).stat().st_mtime_ns)
+                for path, entry in wanted.items() if entry["sha256"]
+            }))
+            self._stats["downloads"] += 1
+            self._stats["files_skipped"] += len(current)
+            self._stats["last_download"] = dict(progress.finish(), skipped=len(current))
+            logger.info(
+                f"ChromaDB downloaded from Azure Blob Storage: {progress.describe()}, {len(current)} unchanged"
+            )
+            return True
         except Exception as e:
+            self._stats["failures"] += 1
             logger.error(f"Error downloading ChromaDB from blob storage: {str(e)}")
             return False
+        finally:
+            self._progress = None
+            shutil.rmtree(staging, ignore_errors=True)
+    
+    async def _aread_catalog(self, container) -> Tuple[dict, Optional[str]]:
+        """
+        Read the snapshot catalog.
+        
+        Returns:
+            (catalog, etag), with an empty catalog and None if there is none yet
+        """
+        try:
+            downloader = await container.download_blob(CATALOG_NAME)
+            return json.loads(await downloader.readall()), downloader.properties.etag
+        except ResourceNotFoundError:
+            return {"version": CATALOG_VERSION, "backups": {}}, None
+    
+    async def _aupdate_catalog(self, container, update: Callable[[dict], Any]) -> Any:
+        """
+        Apply update to the catalog and write it back only if nobody changed it
+        in between (ETag check); retried with fresh contents on conflict.
+        
+        Returns:
+            Whatever update returned on the attempt that was written
+        """
+        for attempt in range(CATALOG_UPDATE_ATTEMPTS):
+            catalog, etag = await self._aread_catalog(container)
+            result = update(catalog)
+            data = json.dumps(catalog, indent=1)
+            try:
+                if etag:
+                    await container.upload_blob(
+                        CATALOG_NAME, data, overwrite=True, etag=etag, match_condition=MatchConditions.IfNotModified
+                    )
+                else:
+                    await container.upload_blob(CATALOG_NAME, data, overwrite=False)
+                return result
+            except (ResourceModifiedError, ResourceExistsError):
+                await asyncio.sleep(random.uniform(0.05, 0.2) * (attempt + 1))
+        raise RuntimeError(f"Backup catalog changed {CATALOG_UPDATE_ATTEMPTS} times while updating it")
+    
+    async def _astage_archive(self, blob_client, root: Path, codec: str, progress: TransferProgress) -> dict:
+        """
+        Stream a tar archive of root into uncommitted blocks of blob_client.
+        
+        The archive is written by a worker thread; its compressed blocks pass
+        through a bounded queue and are staged up to block_concurrency at a time,
+        so only about 2 x block_concurrency blocks are ever held in memory.
+        
+        Returns:
+            Dict with block_ids (in archive order), files, archive_bytes and sha256
+        """
+        loop = asyncio.get_running_loop()
+        blocks: asyncio.Queue = asyncio.Queue(maxsize=self.block_concurrency)
+        aborted = threading.Event()
+        
+        def emit(block: bytes):
+            if aborted.is_set():
+                raise RuntimeError("Snapshot upload aborted")
+            asyncio.run_coroutine_threadsafe(blocks.put(block), loop).result()
+        
+        writer = ArchiveBlockWriter(emit, codec=codec, block_size=self.block_size, level=self.compression_level)
+        
+        def produce() -> int:
+            try:
+                return write_archive(
+                    root,
+                    writer,
+                    exclude=LOCAL_ONLY_NAMES,
+                    on_file=lambda path: (progress.file_done(), progress.advance(path.stat().st_size))
+                )
+            finally:
+                asyncio.run_coroutine_threadsafe(blocks.put(None), loop)
+        
+        producer = asyncio.ensure_future(asyncio.to_thread(produce))
+        semaphore = asyncio.Semaphore(self.block_concurrency)
+        block_ids: List[str] = []
+        staged: List[asyncio.Future] = []
+        drained = False
+        
+        async def stage(block_id: str, block: bytes):
+            try:
+                await blob_client.stage_block(block_id, block, length=len(block))
+            finally:
+                semaphore.release()
+        
+        try:
+            while (block := await blocks.get()) is not None:
+                await semaphore.acquire()
+                # Block ids of one blob must all have the same length
+                block_id = base64.b64encode(f"{len(block_ids):010d}".encode()).decode()
+                block_ids.append(block_id)
+                staged.append(asyncio.ensure_future(stage(block_id, block)))
+                for task in staged:
+                    if task.done() and task.exception():
+                        raise task.exception()
+            drained = True
+            await asyncio.gather(*staged)
+            files = await producer
+            return {
+                "block_ids": block_ids,
+                "files": files,
+                "archive_bytes": writer.archive_bytes,
+                "sha256": writer.sha256.hexdigest(),
+            }
+        except BaseException:
+            aborted.set()
+            for task in staged:
+                task.cancel()
+            if not drained:
+                # Unblock the writer thread so it sees the abort and exits
+                while await blocks.get() is not None:
+                    pass
+            await asyncio.gather(producer, *staged, return_exceptions=True)
+            raise
+    
+    async def aupload_snapshot(self, backup_name: Optional[str] = None, source_path: Optional[str] = None) -> bool:
+        """
+        Upload ChromaDB as one compressed archive and record it in the catalog.
+        
+        The archive is streamed as it is built (no temporary file) into a new,
+        timestamped blob, which only becomes the backup once its block list is
+        committed and the catalog points at it. The archive it replaces is kept
+        for restores that may still be reading it; the one before that is deleted.
+        
+        Args:
+            backup_name: Optional backup name
+            source_path: Directory to archive instead of local_path
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        if not self.container_client:
+            logger.warning("Blob storage not configured. Skipping upload.")
+            return False
+        
+        root = Path(source_path) if source_path else self.local_path
+        if not root.exists():
+            logger.warning(f"ChromaDB path does not exist: {root}")
+            return False
+        
+        try:
+            backup_prefix = backup_name or "current"
+            codec = snapshot_codec()
+            blob_name = f"{SNAPSHOT_PREFIX}/{backup_prefix}/{datetime.utcnow():%Y%m%dT%H%M%S%f}{SNAPSHOT_EXTENSIONS[codec]}"
+            total_files, total_bytes = 0, 0
+            for file_path in root.rglob("*"):
+                if file_path.is_file() and file_path.name not in LOCAL_ONLY_NAMES:
+                    total_files += 1
+                    total_bytes += file_path.stat().st_size
+            progress = TransferProgress("snapshot upload", total_files, total_bytes)
+            self._progress = progress
+            
+            async with self._async_service() as blob_service:
+                container = blob_service.get_container_client(self.container_name)
+                blob_client = container.get_blob_client(blob_name)
+                archive = await self._astage_archive(blob_client, root, codec, progress)
+                await blob_client.commit_block_list(archive.pop("block_ids"))
+                entry = dict(
+                    archive,
+                    bytes=total_bytes,
+                    blob=blob_name,
+                    codec=codec,
+                    created_at=datetime.utcnow().isoformat()
+                )
+                
+                def publish(catalog: dict) -> Optional[str]:
+                    replaced = catalog["backups"].get(backup_prefix)
+                    catalog["backups"][backup_prefix] = dict(entry, previous_blob=replaced["blob"] if replaced else None)
+                    return replaced.get("previous_blob") if replaced else None
+                
+                try:
+                    stale = await self._aupdate_catalog(container, publish)
+                except Exception:
+                    await container.delete_blob(blob_name)
+                    raise
+                if stale:
+                    try:
+                        await container.delete_blob(stale)
+                        self._stats["blobs_deleted"] += 1
+                    except ResourceNotFoundError:
+                        pass
+            
+            self._stats["uploads"] += 1
+            self._stats["snapshots"] += 1
+            self._stats["last_upload"] = dict(progress.finish(), archive_bytes=entry["archive_bytes"])
+            logger.info(
+                f"ChromaDB snapshot uploaded to Azure Blob Storage: {progress.describe()}, "
+                f"{entry['archive_bytes'] / 1e6:.1f} MB as {codec}"
+            )
+            return True
+        except Exception as e:
+            self._stats["failures"] += 1
+            logger.error(f"Error uploading ChromaDB snapshot to blob storage: {str(e)}")
+            return False
+        finally:
+            self._progress = None
+    
+    async def adownload_snapshot(self, backup_name: Optional[str] = None) -> bool:
+        """
+        Restore ChromaDB from a snapshot archive.
+        
+        Ranges of the archive are fetched block_concurrency at a time and fed in
+        order to an extractor thread that decompresses and unpacks them into a
+        staging directory while the download continues. The archive checksum is
+        verified before the staging directory replaces local_path.
+        
+        Args:
+            backup_name: Optional backup name to restore from
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        if not self.container_client:
+            logger.warning("Blob storage not configured. Skipping download.")
+            return False
+        
+        staging = self.local_path.with_name(f".{self.local_path.name}.staging-{os.getpid()}")
+        try:
+            backup_prefix = backup_name or "current"
+            
+            async with self._async_service() as blob_service:
+                container = blob_service.get_container_client(self.container_name)
+                catalog, _ = await self._aread_catalog(container)
+                entry = catalog["backups"].get(backup_prefix)
+                if not entry:
+                    logger.warning(f"No ChromaDB snapshot found with name: {backup_prefix}")
+                    return False
+                
+                progress = TransferProgress("snapshot download", entry["files"], entry["bytes"])
+                self._progress = progress
+                shutil.rmtree(staging, ignore_errors=True)
+                staging.mkdir(parents=True)
+                
+                blob_client = container.get_blob_client(entry["blob"])
+                properties = await blob_client.get_blob_properties()
+                
+                async def fetch(offset: int) -> bytes:
+                    downloader = await blob_client.download_blob(
+                        offset=offset,
+                        length=min(self.block_size, properties.size - offset),
+                        etag=properties.etag,
+                        match_condition=MatchConditions.IfNotModified
+                    )
+                    return await downloader.readall()
+                
+                source = ChunkQueueReader(max_chunks=self.block_concurrency)
+                extractor = asyncio.ensure_future(asyncio.to_thread(
+                    extract_archive,
+                    source,
+                    entry["codec"],
+                    staging,
+                    on_file=lambda member: (progress.file_done(), progress.advance(member.size))
+                ))
+                digest = hashlib.sha256()
+                offsets = iter(range(0, properties.size, self.block_size))
+                fetches = deque(asyncio.ensure_future(fetch(offset)) for _, offset in zip(range(self.block_concurrency), offsets))
+                try:
+                    while fetches:
+                        chunk = await fetches.popleft()
+                        offset = next(offsets, None)
+                        if offset is not None:
+                            fetches.append(asyncio.ensure_future(fetch(offset)))
+                        digest.update(chunk)
+                        if not await asyncio.to_thread(source.feed, chunk):
+                            break
+                finally:
+                    for task in fetches:
+                        task.cancel()
+                    await asyncio.gather(*fetches, return_exceptions=True)
+                    await asyncio.to_thread(source.feed, None)
+                    outcome = (await asyncio.gather(extractor, return_exceptions=True))[0]
+                if isinstance(outcome, BaseException):
+                    raise outcome
+                if digest.hexdigest() != entry["sha256"]:
+                    raise ValueError(f"Checksum mismatch for snapshot {entry['blob']}")
+            
+            self._swap_into_place(staging)
+            self._stats["downloads"] += 1
+            self._stats["last_download"] = dict(progress.finish(), archive_bytes=properties.size)
+            logger.info(f"ChromaDB snapshot downloaded from Azure Blob Storage: {progress.describe()}")
+            return True
+        except Exception as e:
+            self._stats["failures"] += 1
+            logger.error(f"Error downloading ChromaDB snapshot from blob storage: {str(e)}")
+            return False
+        finally:
+            self._progress = None
+            shutil.rmtree(staging, ignore_errors=True)
+    
+    async def _adelete_snapshot(self, backup_name: str) -> int:
+        async with self._async_service() as blob_service:
+            container = blob_service.get_container_client(self.container_name)
+            
+            def remove(catalog: dict) -> Optional[dict]:
+                return catalog["backups"].pop(backup_name, None)
+            
+            entry = await self._aupdate_catalog(container, remove)
+            deleted = 0
+            for blob_name in (entry["blob"], entry.get("previous_blob")) if entry else ():
+                if not blob_name:
+                    continue
+                try:
+                    await container.delete_blob(blob_name)
+                    deleted += 1
+                except ResourceNotFoundError:
+                    pass
+            return deleted
+    
+    async def _alist_snapshots(self) -> list:
+        async with self._async_service() as blob_service:
+            catalog, _ = await self._aread_catalog(blob_service.get_container_client(self.container_name))
+            return sorted(catalog["backups"])
+    
+    def _swap_into_place(self, staging: Path):
+        """
+        Replace local_path with the staging directory (two renames, then cleanup).
+        """
+        previous = self.local_path.with_name(f".{self.local_path.name}.old-{os.getpid()}")
+        shutil.rmtree(previous, ignore_errors=True)
+        if self.local_path.exists():
+            os.replace(self.local_path, previous)
+        os.replace(staging, self.local_path)
+        shutil.rmtree(previous, ignore_errors=True)
+    
+    def upload_chromadb(self, backup_name: Optional[str] = None, source_path: Optional[str] = None) -> bool:
+        """
+        Upload ChromaDB files to Azure Blob Storage (blocking wrapper of aupload_chromadb).
+        
+        Args:
+            backup_name: Optional backup name prefix
+            source_path: Directory to upload instead of local_path
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        return _run_sync(self.aupload_chromadb(backup_name, source_path))
+    
+    def download_chromadb(self, backup_name: Optional[str] = None) -> bool:
+        """
+        Download ChromaDB files from Azure Blob Storage (blocking wrapper of adownload_chromadb).
+        
+        Args:
+            backup_name: Optional backup name prefix to restore from
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        return _run_sync(self.adownload_chromadb(backup_name))
+    
+    def restore_on_startup(self, policy: str = BLOB_RESTORE_ON_STARTUP) -> bool:
+        """
+        Restore local_path from the backup when a worker starts.
+        
+        Workers start concurrently; a lock file next to local_path lets the
+        first one restore while the others wait and then find the index in place.
+        
+        Args:
+            policy: "missing" (only if local_path is empty), "always" or "never"
+            
+        Returns:
+            True if a backup was restored
+        """
+        if policy == "never":
+            return False
+        
+        lock_path = self.local_path.with_name(f".{self.local_path.name}.restore.lock")
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if policy == "missing" and self.local_path.exists() and any(self.local_path.iterdir()):
+                logger.info(f"Local ChromaDB index found at {self.local_path}, skipping restore")
+                return False
+            return self.download_chromadb()
+    
+    def get_stats(self) -> dict:
+        """
+        Report transfer counts, the last upload/download (files, bytes, MB/s)
+        and the progress of a transfer in flight.
+        """
+        progress = self._progress
+        return dict(
+            self._stats,
+            mode=self.mode,
+            max_concurrency=self.max_concurrency,
+            block_concurrency=self.block_concurrency,
+            in_progress=progress.snapshot() if progress else None
+        )
     
     def list_backups(self) -> list:
         """
@@ -186,12 +942,17 @@ class ChromaDBAzureBlobSync:
             return []
         
         try:
+            if self.mode == "snapshot":
+                # One catalog read instead of enumerating every blob
+                return _run_sync(self._alist_snapshots())
+            
             blob_list = self.container_client.list_blobs()
             # Extract unique backup prefixes
             backups = set()
             for blob in blob_list:
                 backup_name = blob.name.split("/")[0]
-                backups.add(backup_name)
+                if backup_name not in (SNAPSHOT_PREFIX, CATALOG_NAME):
+                    backups.add(backup_name)
             
             return sorted(list(backups))
         except Exception as e:
@@ -212,6 +973,11 @@ class ChromaDBAzureBlobSync:
             return False
         
         try:
+            if self.mode == "snapshot":
+                deleted_count = _run_sync(self._adelete_snapshot(backup_name))
+                logger.info(f"Deleted snapshot backup '{backup_name}': {deleted_count} archives")
+                return True
+            
             blob_list = self.container_client.list_blobs(name_starts_with=backup_name)
             deleted_count = 0
             
@@ -242,9 +1008,15 @@ def get_blob_sync(local_path: str = "./knowledge_base") -> Optional[ChromaDBAzur
             sync = ChromaDBAzureBlobSync(
                 connection_string=AZURE_STORAGE_CONNECTION_STRING,
                 container_name=AZURE_BLOB_CONTAINER_NAME,
-                local_path=local_path
+                local_path=local_path,
+                max_concurrency=BLOB_SYNC_MAX_CONCURRENCY,
+                block_concurrency=BLOB_SYNC_BLOCK_CONCURRENCY,
+                block_size=BLOB_SYNC_BLOCK_SIZE_MB * 1024 * 1024,
+                mode=BLOB_BACKUP_MODE,
+                compression_level=BLOB_SNAPSHOT_COMPRESSION_LEVEL
             )
             if sync.container_client:
+                register_stats_provider("blob_sync", sync.get_stats)
                 logger.info("✓ Azure Blob Storage sync enabled for ChromaDB")
                 return sync
         except Exception as e:
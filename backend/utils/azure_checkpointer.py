@@ -2,21 +2,98 @@
 Azure Table Storage Checkpointer for LangGraph
 Provides persistent session storage using Azure Table Storage (Free Tier)
 
-This is a simple implementation that stores serialized checkpoint data.
+Implements the full LangGraph checkpoint saver interface (get_tuple, list, put,
+put_writes and their async variants) on top of the async Tables client.
+
+Writes are buffered (write-behind): the many per-step checkpoints of one graph
+run are coalesced in memory and only the latest checkpoint per thread, with its
+pending writes, is flushed - at run end via flush() or on a short timer. That
+turns N Table operations per request into about one.
+
+Entity layout:
+    PartitionKey  "checkpoint-<crc32(thread_id) % shards>"   ("checkpoint" if shards <= 1)
+    RowKey        "<thread_id>|<checkpoint_ns>|<inverted checkpoint_id>"   history
+                  "<thread_id>|<checkpoint_ns>|head"                       latest
+Checkpoint ids are time-ordered UUIDs; inverting their hex digits makes the
+newest checkpoint of a thread sort first. Sharding spreads threads across
+partitions (one partition tops out around 2,000 entities/s) while keeping a
+thread's rows together, so the history row and head row of a flush are
+written in a single entity group transaction. The head row holds a copy of the
+latest checkpoint, so "latest" is a point read, and its ETag guards updates:
+a worker only moves the head if it still points at the checkpoint the run
+started from, so concurrent workers cannot clobber each other's thread state.
+
+Each worker keeps an LRU cache of head rows it wrote or read. Before a cached
+head is used, a point read of the head row's checkpoint_id (no payload)
+compares its ETag, so a head another worker moved is always re-read; the
+cache saves downloading and decoding the payload, not the round trip.
+If the head still moves between a run's read and its flush, the flush raises
+CheckpointConflictError instead of writing: the run was answered from stale
+state, and the caller fails or re-runs it (see utils.checkpointer.persist_run).
+
+Rows from the single-partition layout are still read as a fallback;
+migrate_partitions() moves them (or rows written with another shard count).
+
+Payloads are msgpack-serialized, compressed and chunked across properties by
+utils.checkpoint_serde, so large threads stay within Table entity limits.
+
+compact() applies a RetentionPolicy (utils.checkpoint_retention) one partition
+at a time, deleting in entity group transactions. Rows carry a plain run_start
+property so compaction never has to download or decode payloads.
+
+The table client can be injected, so the saver can run against Azurite or any
+local Table-API stand-in.
+
 Compatible with LangGraph 0.2.64 and Azure SDK.
 """
 
-import json
+import asyncio
 import logging
-from typing import Optional, Iterator, Tuple
-from datetime import datetime
+import os
+import random
+import threading
+import time
+import weakref
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+
+try:
+    from langgraph.checkpoint.base import get_checkpoint_metadata
+except ImportError:
+    def get_checkpoint_metadata(config: RunnableConfig, metadata: CheckpointMetadata) -> CheckpointMetadata:
+        return metadata
+
+from utils.checkpoint_retention import RetentionPolicy, is_run_start
+from utils.checkpointer import CheckpointConflictError
+from utils.checkpoint_serde import (
+    CheckpointEntityCodec,
+    EntityTooLargeError,
+    estimate_entity_size,
+    get_checkpoint_codec
+)
 
 logger = logging.getLogger(__name__)
 
 # Conditional imports for Azure services
 try:
-    from azure.data.tables import TableServiceClient, TableClient
-    from azure.core.exceptions import ResourceNotFoundError
+    from azure.core import MatchConditions
+    from azure.data.tables import TableTransactionError, UpdateMode
+    from azure.data.tables.aio import TableServiceClient, TableClient
+    from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
     AZURE_TABLES_AVAILABLE = True
 except ImportError:
     AZURE_TABLES_AVAILABLE = False
@@ -27,187 +104,1145 @@ try:
     from config.settings import (
         AZURE_STORAGE_CONNECTION_STRING,
         AZURE_TABLE_NAME,
-        USE_AZURE_TABLE_STORAGE
+        CHECKPOINT_FLUSH_INTERVAL_SECONDS,
+        CHECKPOINT_CACHE_SIZE,
+        CHECKPOINT_CACHE_TTL_SECONDS,
+        CHECKPOINT_PARTITION_SHARDS,
+        CHECKPOINT_LEGACY_PARTITION_FALLBACK
     )
 except ImportError:
     AZURE_STORAGE_CONNECTION_STRING = None
     AZURE_TABLE_NAME = "checkpoints"
-    USE_AZURE_TABLE_STORAGE = False
+    CHECKPOINT_FLUSH_INTERVAL_SECONDS = 2.0
+    CHECKPOINT_CACHE_SIZE = 1024
+    CHECKPOINT_CACHE_TTL_SECONDS = 30.0
+    CHECKPOINT_PARTITION_SHARDS = 16
+    CHECKPOINT_LEGACY_PARTITION_FALLBACK = True
+
+LEGACY_PARTITION_KEY = "checkpoint"
+HEAD_ROW = "head"
+MAX_TRANSACTION_OPERATIONS = 100
+MAX_TRANSACTION_BYTES = 3_500_000  # Entity group transactions are capped at 4 MB
+MAX_RECORDED_CONFLICTS = 1024
+_INVERT_HEX = str.maketrans("0123456789abcdef", "fedcba9876543210")
+
+
+def partition_for(thread_id: str, shards: int) -> str:
+    """
+    Stable partition key of a thread (crc32, not hash(), which is per-process).
+    """
+    if shards <= 1:
+        return LEGACY_PARTITION_KEY
+    return f"{LEGACY_PARTITION_KEY}-{zlib.crc32(str(thread_id).encode()) % shards:04d}"
+
+
+def _row_prefix(thread_id: str, checkpoint_ns: Optional[str] = None) -> str:
+    # RowKeys may not contain / \ # ?; quoting also keeps "|" unambiguous
+    prefix = f"{quote(str(thread_id), safe='')}|"
+    if checkpoint_ns is not None:
+        prefix += f"{quote(checkpoint_ns, safe='')}|"
+    return prefix
+
+
+def _row_key(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> str:
+    return _row_prefix(thread_id, checkpoint_ns) + checkpoint_id.lower().translate(_INVERT_HEX)
+
+
+def _head_key(thread_id: str, checkpoint_ns: str) -> str:
+    return _row_prefix(thread_id, checkpoint_ns) + HEAD_ROW
+
+
+def _is_head(entity: dict) -> bool:
+    return entity["RowKey"].rsplit("|", 1)[-1] == HEAD_ROW
+
+
+def _etag(entity) -> Optional[str]:
+    return getattr(entity, "metadata", {}).get("etag")
+
+
+def _prefix_filter(partition: str, prefix: str) -> Tuple[str, dict]:
+    # "|" + 1 == "}": every RowKey starting with prefix sorts below the upper bound
+    return (
+        "PartitionKey eq @pk and RowKey ge @low and RowKey lt @high",
+        {"pk": partition, "low": prefix, "high": prefix[:-1] + "}"},
+    )
+
+
+class CheckpointCache:
+    """
+    Bounded per-worker LRU of the latest persisted checkpoint per thread,
+    stored with the ETag of its head row. Entries are only used after the
+    checkpointer has checked that ETag against the table.
+
+    Pinned threads (open conversations) are neither evicted nor expired, but
+    their entries are validated like any other: another worker (a second tab,
+    a /query call) can still write the thread.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 30.0):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Threads kept; 0 disables caching
+            ttl_seconds: How long a cached payload is reused before it is read in full again
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[dict, str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # thread_id -> number of open pins
+        self._pinned: Dict[str, int] = {}
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "stale": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key: Tuple[str, str], checkpoint_id: Optional[str] = None) -> Optional[Tuple[dict, str]]:
+        """
+        Return (record, etag) if cached within the TTL (and is checkpoint_id, when given).
+        The caller must validate the ETag, then report the outcome with validated().
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (checkpoint_id and entry[0]["checkpoint_id"] != checkpoint_id):
+                self._stats["misses"] += 1
+                return None
+            if key[0] not in self._pinned and time.monotonic() - entry[2] > self.ttl_seconds:
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            return entry[0], entry[1]
+
+    def validated(self, key: Tuple[str, str], current: bool):
+        """
+        Record the ETag check of an entry returned by get(); a stale entry is dropped.
+        """
+        with self._lock:
+            if current:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+            else:
+                self._entries.pop(key, None)
+                self._stats["stale"] += 1
+                self._stats["misses"] += 1
+
+    def peek(self, key: Tuple[str, str]) -> Optional[Tuple[dict, str]]:
+        """
+        Return (record, etag) regardless of age; used to attempt conditional writes.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            return (entry[0], entry[1]) if entry else None
+
+    def set(self, key: Tuple[str, str], record: dict, etag: str):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (record, etag, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next((k for k in self._entries if k[0] not in self._pinned), None)
+                if oldest is None:
+                    break
+                del self._entries[oldest]
+                self._stats["evictions"] += 1
+
+    def invalidate(self, key: Tuple[str, str]):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._stats["invalidations"] += 1
 
+    def pin(self, thread_id: str):
+        with self._lock:
+            self._pinned[thread_id] = self._pinned.get(thread_id, 0) + 1
 
-class AzureTableCheckpointer:
+    def unpin(self, thread_id: str):
+        with self._lock:
+            pins = self._pinned.pop(thread_id, 0) - 1
+            if pins > 0:
+                self._pinned[thread_id] = pins
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(
+                self._stats, entries=len(self._entries), max_entries=self.max_entries, pinned_threads=len(self._pinned)
+            )
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        stats["payload_reads_avoided"] = stats["hits"]
+        return stats
+
+
+class AzureTableCheckpointer(BaseCheckpointSaver[str]):
     """
-    Simple LangGraph checkpointer that uses Azure Table Storage for persistence.
+    LangGraph checkpoint saver backed by Azure Table Storage with write-behind batching.
     Compatible with Azure Free Tier (20,000 operations/month free).
-    
-    This stores checkpoint data as JSON-serialized strings in Azure Tables.
+
+    All Table I/O runs on a private event loop thread that owns the async client,
+    so both the sync API (used by graph.stream) and the async API share one client.
     """
-    
+
     def __init__(
         self,
         connection_string: Optional[str] = None,
-        table_name: str = "checkpoints"
+        table_name: str = "checkpoints",
+        flush_interval: float = 2.0,
+        partition_shards: int = 16,
+        legacy_fallback: bool = True,
+        *,
+        table_client: Optional[Any] = None,
+        serde: Optional[Any] = None,
+        entity_codec: Optional[CheckpointEntityCodec] = None,
+        cache: Optional[CheckpointCache] = None
     ):
         """
         Initialize Azure Table Storage checkpointer.
-        
+
         Args:
-            connection_string: Azure Storage connection string
+            connection_string: Azure Storage connection string (Azurite works too)
             table_name: Name of the table to use
+            flush_interval: Seconds between background flushes of buffered checkpoints
+            partition_shards: Number of partitions threads are hashed into (1 = single partition)
+            legacy_fallback: Also read the single-partition layout for unmigrated threads
+            table_client: Pre-built async TableClient or compatible stand-in
+            serde: LangGraph serializer (defaults to JsonPlusSerializer)
+            entity_codec: Compression/chunking of payloads into entity properties
+            cache: Read-through cache of head rows (defaults to configured size/TTL)
         """
-        if not AZURE_TABLES_AVAILABLE:
+        if not AZURE_TABLES_AVAILABLE and table_client is None:
             raise ImportError(
                 "azure-data-tables package is required for Azure Table Storage checkpointer. "
                 "Install with: pip install azure-data-tables>=12.4.0"
             )
-        
+        super().__init__(serde=serde)
+
         self.connection_string = connection_string or AZURE_STORAGE_CONNECTION_STRING
         self.table_name = table_name
+        self.flush_interval = flush_interval
+        self._injected_client = table_client
+        self.entity_codec = entity_codec or get_checkpoint_codec()
+        self.cache = cache or CheckpointCache(CHECKPOINT_CACHE_SIZE, CHECKPOINT_CACHE_TTL_SECONDS)
+        self.partition_shards = partition_shards
+        self.legacy_fallback = legacy_fallback and partition_shards > 1
         self.table_client: Optional[TableClient] = None
-        
-        if self.connection_string:
+
+        # (thread_id, checkpoint_ns) -> latest unflushed checkpoint record
+        self._pending: Dict[Tuple[str, str], dict] = {}
+        self._pending_lock = threading.Lock()
+        # (thread_id, checkpoint_ns) -> checkpoint_id -> writes that arrived before put() of that checkpoint
+        self._early_writes: Dict[Tuple[str, str], Dict[str, dict]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_pid: Optional[int] = None
+        self._loop_lock = threading.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        # (thread_id, checkpoint_ns) -> conflict of a flush no caller has seen yet (see flush())
+        self._conflicts: "OrderedDict[Tuple[str, str], CheckpointConflictError]" = OrderedDict()
+        # Serializes flushes of one thread, so writes never overtake their checkpoint
+        self._flush_locks: "weakref.WeakValueDictionary[Tuple[str, str], asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._stats = {
+            "checkpoints_buffered": 0,
+            "writes_buffered": 0,
+            "late_writes_dropped": 0,
+            "entities_flushed": 0,
+            "flushes": 0,
+            "flush_failures": 0,
+            "table_reads": 0,
+            "write_conflicts": 0,
+            "transactions": 0,
+            "legacy_partition_reads": 0,
+            "compacted_checkpoints": 0,
+            "expired_threads": 0,
+        }
+
+        if self.connection_string or table_client is not None:
             try:
-                # Create table service client
-                table_service = TableServiceClient.from_connection_string(
-                    self.connection_string
-                )
-                
-                # Create table if it doesn't exist
-                table_service.create_table_if_not_exists(table_name)
-                
-                # Get table client
-                self.table_client = table_service.get_table_client(table_name)
+                self._ensure_loop()
                 logger.info(f"Azure Table Storage checkpointer initialized: {table_name}")
             except Exception as e:
                 logger.error(f"Failed to initialize Azure Table Storage: {str(e)}")
                 self.table_client = None
+                if self._loop is not None:
+                    self._loop.call_soon_threadsafe(self._loop.stop)
+                    self._loop_pid = None
         else:
             logger.warning("No Azure Storage connection string provided. Checkpointer disabled.")
-    
-    def get(self, config: dict) -> Optional[dict]:
+
+    # --- event loop plumbing -------------------------------------------------
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        # Threads do not survive fork: a worker forked from a preloaded master
+        # gets a fresh loop thread and client on first use
+        if self._loop_pid == os.getpid():
+            return self._loop
+        with self._loop_lock:
+            if self._loop_pid == os.getpid():
+                return self._loop
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="azure-table-checkpointer", daemon=True).start()
+            self._loop = loop
+            self._loop_pid = os.getpid()
+            self.table_client = asyncio.run_coroutine_threadsafe(self._astart(), loop).result()
+            return loop
+
+    async def _astart(self):
+        self._flush_task = asyncio.get_running_loop().create_task(self._flush_periodically())
+        if self._injected_client is not None:
+            return self._injected_client
+        table_service = TableServiceClient.from_connection_string(self.connection_string)
+        try:
+            await table_service.create_table_if_not_exists(self.table_name)
+        except Exception:
+            self._flush_task.cancel()
+            await table_service.close()
+            raise
+        return table_service.get_table_client(self.table_name)
+
+    async def _astop(self):
+        self._flush_task.cancel()
+        try:
+            await self._flush_task
+        except asyncio.CancelledError:
+            pass
+        if self._injected_client is None:
+            await self.table_client.close()
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    async def _arun(self, coro):
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()))
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self._flush()
+            except Exception as e:
+                logger.error(f"Background checkpoint flush failed: {str(e)}")
+
+    def _partition(self, thread_id: str) -> str:
+        return partition_for(thread_id, self.partition_shards)
+
+    # --- record <-> entity ---------------------------------------------------
+
+    def _to_entity(self, thread_id: str, checkpoint_ns: str, record: dict) -> dict:
+        entity = {
+            "PartitionKey": self._partition(thread_id),
+            "RowKey": _row_key(thread_id, checkpoint_ns, record["checkpoint_id"]),
+            "thread_id": str(thread_id),
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": record["checkpoint_id"],
+            "parent_checkpoint_id": record["parent_checkpoint_id"] or "",
+            "run_start": bool(record.get("run_start")),
+            "updated_at": datetime.utcnow().isoformat()
+        }
+        entity.update(self.entity_codec.pack("checkpoint", record["checkpoint"]))
+        entity.update(self.entity_codec.pack("metadata", record["metadata"]))
+        entity.update(self.entity_codec.pack("writes", self.serde.dumps_typed([
+            [task_id, channel, value[0], value[1], task_path]
+            for task_id, channel, value, task_path in record["writes"].values()
+        ])))
+        self.entity_codec.check_entity_size(entity)
+        return entity
+
+    def _from_entity(self, entity: dict) -> dict:
+        writes = {}
+        typed_writes = self.entity_codec.unpack("writes", entity, legacy_property="writes")
+        if typed_writes:
+            for idx, (task_id, channel, value_type, value, task_path) in enumerate(
+                self.serde.loads_typed(typed_writes)
+            ):
+                writes[(task_id, idx)] = (task_id, channel, (value_type, value), task_path)
+        return {
+            "checkpoint_id": entity["checkpoint_id"],
+            "parent_checkpoint_id": entity.get("parent_checkpoint_id") or None,
+            "checkpoint": self.entity_codec.unpack("checkpoint", entity, legacy_property="checkpoint_data"),
+            "metadata": self.entity_codec.unpack("metadata", entity, legacy_property="metadata"),
+            "writes": writes,
+            "run_start": bool(entity.get("run_start")),
+        }
+
+    def _to_tuple(self, thread_id: str, checkpoint_ns: str, record: dict) -> CheckpointTuple:
+        def config_for(checkpoint_id):
+            return {
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            }
+
+        return CheckpointTuple(
+            config=config_for(record["checkpoint_id"]),
+            checkpoint=self.serde.loads_typed(record["checkpoint"]),
+            metadata=self.serde.loads_typed(record["metadata"]),
+            parent_config=config_for(record["parent_checkpoint_id"]) if record["parent_checkpoint_id"] else None,
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed(value))
+                for task_id, channel, value, _ in record["writes"].values()
+            ],
+        )
+
+    # --- Table I/O (runs on the checkpointer loop) ---------------------------
+
+    async def _aread_record(self, thread_id: str, checkpoint_ns: str, checkpoint_id: Optional[str]) -> Optional[dict]:
+        key = (thread_id, checkpoint_ns)
+        cached = self.cache.get(key, checkpoint_id)
+        if cached is not None:
+            # Another worker may have moved the head since it was cached
+            _, etag = await self._aread_head_id(thread_id, checkpoint_ns)
+            self.cache.validated(key, etag == cached[1])
+            if etag == cached[1]:
+                return cached[0]
+
+        partition = self._partition(thread_id)
+        record, etag = await self._aread_from_partition(partition, thread_id, checkpoint_ns, checkpoint_id)
+        if record is not None:
+            if etag:
+                self.cache.set(key, record, etag)
+            return record
+
+        if self.legacy_fallback and partition != LEGACY_PARTITION_KEY:
+            # Rows written before partitions were sharded (see migrate_partitions)
+            record, _ = await self._aread_from_partition(LEGACY_PARTITION_KEY, thread_id, checkpoint_ns, checkpoint_id)
+            if record is not None:
+                self._stats["legacy_partition_reads"] += 1
+        return record
+
+    async def _aread_from_partition(
+        self,
+        partition: str,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: Optional[str]
+    ) -> Tuple[Optional[dict], Optional[str]]:
         """
-        Retrieve checkpoint for a configuration.
-        
-        Args:
-            config: Configuration dict with thread_id
-            
+        Read a checkpoint (or the head, if checkpoint_id is None) from one partition.
+
         Returns:
-            Checkpoint dict or None
+            (record, head ETag) - the ETag is only set for head reads
         """
-        if not self.table_client:
-            return None
-        
-        thread_id = config.get("configurable", {}).get("thread_id")
-        if not thread_id:
-            return None
-        
+        self._stats["table_reads"] += 1
         try:
-            # Query entity from table
-            entity = self.table_client.get_entity(
-                partition_key="checkpoint",
-                row_key=str(thread_id)
+            if checkpoint_id:
+                entity = await self.table_client.get_entity(
+                    partition_key=partition,
+                    row_key=_row_key(thread_id, checkpoint_ns, checkpoint_id)
+                )
+                return self._from_entity(entity), None
+
+            head = await self.table_client.get_entity(
+                partition_key=partition,
+                row_key=_head_key(thread_id, checkpoint_ns)
             )
-            
-            # Deserialize checkpoint data
-            checkpoint_data = json.loads(entity.get("checkpoint_data", "{}"))
-            logger.debug(f"Retrieved checkpoint for thread {thread_id}")
-            return checkpoint_data
-            
+            return self._from_entity(head), _etag(head)
         except ResourceNotFoundError:
-            logger.debug(f"No checkpoint found for thread {thread_id}")
+            if checkpoint_id or partition != LEGACY_PARTITION_KEY:
+                return None, None
+
+        # Legacy threads written before head rows existed
+        query_filter, parameters = _prefix_filter(partition, _row_prefix(thread_id, checkpoint_ns))
+        async for entity in self.table_client.query_entities(
+            query_filter, parameters=parameters, results_per_page=1
+        ):
+            if not _is_head(entity):
+                return self._from_entity(entity), None
+        return None, None
+
+    async def _aread_head_id(self, thread_id: str, checkpoint_ns: str) -> Tuple[Optional[str], Optional[str]]:
+        self._stats["table_reads"] += 1
+        try:
+            head = await self.table_client.get_entity(
+                partition_key=self._partition(thread_id),
+                row_key=_head_key(thread_id, checkpoint_ns),
+                select=["checkpoint_id"]
+            )
+            return head["checkpoint_id"], _etag(head)
+        except ResourceNotFoundError:
+            return None, None
+
+    async def _aquery_records(self, thread_id: Optional[str], checkpoint_ns: Optional[str]) -> List[Tuple[str, str, dict]]:
+        if thread_id is None:
+            self._stats["table_reads"] += 1
+            entities = [entity async for entity in self.table_client.list_entities()]
+        else:
+            partitions = [self._partition(thread_id)]
+            if self.legacy_fallback and partitions[0] != LEGACY_PARTITION_KEY:
+                partitions.append(LEGACY_PARTITION_KEY)
+            entities = []
+            for partition in partitions:
+                self._stats["table_reads"] += 1
+                query_filter, parameters = _prefix_filter(partition, _row_prefix(thread_id, checkpoint_ns))
+                entities += [entity async for entity in self.table_client.query_entities(query_filter, parameters=parameters)]
+
+        records = {}
+        for entity in entities:
+            if _is_head(entity) or "thread_id" not in entity:
+                continue
+            # A partially migrated row can exist in both partitions; the first (sharded) copy wins
+            records.setdefault(
+                (entity["thread_id"], entity["checkpoint_ns"], entity["checkpoint_id"]),
+                (entity["thread_id"], entity["checkpoint_ns"], self._from_entity(entity))
+            )
+        return list(records.values())
+
+    async def _flush(self, keys: Optional[List[Tuple[str, str]]] = None) -> int:
+        with self._pending_lock:
+            selected = list(self._pending) if keys is None else [key for key in keys if key in self._pending]
+            batch = {key: self._pending.pop(key) for key in selected}
+        if not batch:
+            return 0
+
+        # Threads live in independent partitions, so they are written concurrently
+        results = await asyncio.gather(*(
+            self._aflush_record(thread_id, checkpoint_ns, record)
+            for (thread_id, checkpoint_ns), record in batch.items()
+        ))
+        flushed = sum(results)
+        self._stats["flushes"] += 1
+        self._stats["entities_flushed"] += flushed
+        return flushed
+
+    async def _aflush_record(self, thread_id: str, checkpoint_ns: str, record: dict) -> bool:
+        key = (thread_id, checkpoint_ns)
+        lock = self._flush_locks.get(key)
+        if lock is None:
+            lock = self._flush_locks[key] = asyncio.Lock()
+        try:
+            async with lock:
+                await self._apersist(thread_id, checkpoint_ns, record)
+            return True
+        except CheckpointConflictError as e:
+            # Not re-queued: the run's state is stale, so it must be failed or re-run
+            self._stats["write_conflicts"] += 1
+            self.cache.invalidate(key)
+            logger.warning(str(e))
+            with self._pending_lock:
+                self._conflicts[key] = e
+                self._conflicts.move_to_end(key)
+                while len(self._conflicts) > MAX_RECORDED_CONFLICTS:
+                    self._conflicts.popitem(last=False)
+        except EntityTooLargeError as e:
+            # Retrying cannot help; drop it rather than re-queue forever
+            self._stats["flush_failures"] += 1
+            logger.error(f"Dropping checkpoint for thread {thread_id}: {str(e)}")
+        except Exception as e:
+            self._stats["flush_failures"] += 1
+            logger.error(f"Error saving checkpoint for thread {thread_id}: {str(e)}")
+            with self._pending_lock:
+                # Re-queue unless a newer checkpoint was buffered meanwhile
+                self._pending.setdefault((thread_id, checkpoint_ns), record)
+        return False
+
+    async def _apersist(self, thread_id: str, checkpoint_ns: str, record: dict):
+        """
+        Write the history row and move the head row to it in one partition
+        transaction, only if the head still points at the checkpoint the run
+        started from.
+
+        Raises:
+            CheckpointConflictError: If another worker moved the head first; nothing is written
+        """
+        if record["checkpoint"] is None:
+            # Writes against an already persisted checkpoint (resumed run)
+            base = await self._aread_record(thread_id, checkpoint_ns, record["checkpoint_id"])
+            if base is None:
+                logger.warning(f"Dropping writes for unknown checkpoint {record['checkpoint_id']} of thread {thread_id}")
+                return
+            record = {**base, "writes": {**base["writes"], **record["writes"]}}
+            expected_head = record["checkpoint_id"]
+        else:
+            expected_head = record["parent_checkpoint_id"]
+
+        key = (thread_id, checkpoint_ns)
+        entity = self._to_entity(thread_id, checkpoint_ns, record)
+        head = {**entity, "RowKey": _head_key(thread_id, checkpoint_ns)}
+        cached = self.cache.peek(key)
+        etag = cached[1] if cached and cached[0]["checkpoint_id"] == expected_head else None
+
+        current_head = expected_head
+        for _ in range(3):
+            if etag is None:
+                current_head, etag = await self._aread_head_id(thread_id, checkpoint_ns)
+                if current_head is not None and current_head != expected_head:
+                    break
+            operations = [("upsert", entity, {"mode": UpdateMode.REPLACE})]
+            if etag is None:
+                operations.append(("create", head))
+            else:
+                operations.append(("update", head, {
+                    "mode": UpdateMode.REPLACE, "etag": etag, "match_condition": MatchConditions.IfNotModified
+                }))
+            try:
+                results = await self.table_client.submit_transaction(operations)
+                self._stats["transactions"] += 1
+                self.cache.set(key, record, results[1]["etag"])
+                return
+            except TableTransactionError as e:
+                if getattr(e, "status_code", None) not in (409, 412):
+                    raise
+                # Head changed since we read it; re-check who owns it now
+                etag = None
+
+        # Another worker advanced this thread first. Its head stays, and ours is not
+        # written at all: it was computed without that worker's turn
+        raise CheckpointConflictError(
+            f"Checkpoint {record['checkpoint_id']} of thread {thread_id} was based on {expected_head}, "
+            f"but the thread is now at {current_head}"
+        )
+
+    async def _amigrate_partitions(self, delete_source: bool) -> dict:
+        stats = {"scanned": 0, "moved": 0, "heads_kept": 0, "skipped": 0, "transactions": 0}
+        batches: Dict[str, List[dict]] = {}
+
+        async def move(target: str, entities: List[dict]):
+            await self.table_client.submit_transaction([
+                ("upsert", {**entity, "PartitionKey": target}, {"mode": UpdateMode.REPLACE}) for entity in entities
+            ])
+            stats["transactions"] += 1
+            if delete_source:
+                sources: Dict[str, List[dict]] = {}
+                for entity in entities:
+                    sources.setdefault(entity["PartitionKey"], []).append(entity)
+                for source_entities in sources.values():
+                    await self.table_client.submit_transaction([("delete", entity) for entity in source_entities])
+                    stats["transactions"] += 1
+            stats["moved"] += len(entities)
+
+        async for entity in self.table_client.list_entities():
+            stats["scanned"] += 1
+            if "thread_id" not in entity:
+                stats["skipped"] += 1
+                continue
+            target = self._partition(entity["thread_id"])
+            if entity["PartitionKey"] == target:
+                continue
+
+            if _is_head(entity):
+                # Never overwrite a head already advanced in the target partition
+                try:
+                    await self.table_client.create_entity({**entity, "PartitionKey": target})
+                    stats["moved"] += 1
+                except ResourceExistsError:
+                    stats["heads_kept"] += 1
+                if delete_source:
+                    await self.table_client.delete_entity(partition_key=entity["PartitionKey"], row_key=entity["RowKey"])
+                continue
+
+            batch = batches.setdefault(target, [])
+            if len(batch) == MAX_TRANSACTION_OPERATIONS or (
+                sum(estimate_entity_size(e) for e in batch) + estimate_entity_size(entity) > MAX_TRANSACTION_BYTES
+            ):
+                await move(target, batch)
+                batch.clear()
+            batch.append(entity)
+
+        for target, batch in batches.items():
+            if batch:
+                await move(target, batch)
+        return stats
+
+    async def _acompact(self, policy: RetentionPolicy, batch_size: int) -> dict:
+        partitions = [LEGACY_PARTITION_KEY] if self.partition_shards <= 1 else [
+            f"{LEGACY_PARTITION_KEY}-{shard:04d}" for shard in range(self.partition_shards)
+        ]
+        if self.legacy_fallback:
+            partitions.append(LEGACY_PARTITION_KEY)
+        result = {"threads_scanned": 0, "checkpoints_deleted": 0, "threads_expired": 0}
+        for partition in partitions:
+            await self._acompact_partition(partition, policy, batch_size, result)
+        self._stats["compacted_checkpoints"] += result["checkpoints_deleted"]
+        self._stats["expired_threads"] += result["threads_expired"]
+        return result
+
+    async def _acompact_partition(self, partition: str, policy: RetentionPolicy, batch_size: int, result: dict):
+        # thread_id -> checkpoint_ns -> head row and history rows (keys and markers only, no payloads)
+        threads: Dict[str, Dict[str, dict]] = {}
+        self._stats["table_reads"] += 1
+        async for entity in self.table_client.query_entities(
+            "PartitionKey eq @pk",
+            parameters={"pk": partition},
+            select=["PartitionKey", "RowKey", "thread_id", "checkpoint_ns", "checkpoint_id", "run_start", "updated_at"]
+        ):
+            if not entity.get("thread_id"):
+                continue
+            group = threads.setdefault(entity["thread_id"], {}).setdefault(
+                entity.get("checkpoint_ns") or "", {"head": None, "rows": []}
+            )
+            if _is_head(entity):
+                group["head"] = entity
+            else:
+                group["rows"].append(entity)
+
+        with self._pending_lock:
+            buffered = {thread_id for thread_id, _ in self._pending}
+        now = time.time()
+        operations = []
+        for thread_id, namespaces in threads.items():
+            result["threads_scanned"] += 1
+            entities = [e for group in namespaces.values() for e in [group["head"], *group["rows"]] if e is not None]
+            updated = [
+                datetime.fromisoformat(e["updated_at"]).replace(tzinfo=timezone.utc).timestamp()
+                for e in entities if e.get("updated_at")
+            ]
+            if thread_id not in buffered and updated and policy.is_expired(max(updated), now):
+                if await self._aexpire_thread(namespaces, batch_size):
+                    result["threads_expired"] += 1
+                    for checkpoint_ns in namespaces:
+                        self.cache.invalidate((thread_id, checkpoint_ns))
+                continue
+
+            for group in namespaces.values():
+                head_id = group["head"]["checkpoint_id"] if group["head"] is not None else None
+                rows = {e["checkpoint_id"]: e for e in group["rows"]}
+                delete, promote = policy.plan([(e["checkpoint_id"], bool(e.get("run_start"))) for e in group["rows"]])
+                operations += [
+                    ("update", {"PartitionKey": partition, "RowKey": rows[checkpoint_id]["RowKey"], "run_start": True},
+                     {"mode": UpdateMode.MERGE})
+                    for checkpoint_id in promote
+                ]
+                deletes = [checkpoint_id for checkpoint_id in delete if checkpoint_id != head_id]
+                operations += [("delete", {"PartitionKey": partition, "RowKey": rows[cid]["RowKey"]}) for cid in deletes]
+                result["checkpoints_deleted"] += len(deletes)
+
+        # Rows of different threads share the partition, so deletes are batched across threads
+        for start in range(0, len(operations), batch_size):
+            await self._asubmit_compaction(operations[start:start + batch_size])
+
+    async def _aexpire_thread(self, namespaces: Dict[str, dict], batch_size: int) -> bool:
+        """
+        Delete every row of an idle thread. Head rows go first and only if
+        unchanged since the scan, so a thread that just became active again is kept.
+        """
+        heads = [group["head"] for group in namespaces.values() if group["head"] is not None]
+        rows = [e for group in namespaces.values() for e in group["rows"]]
+        operations = [
+            ("delete", head, {"etag": _etag(head), "match_condition": MatchConditions.IfNotModified}) for head in heads
+        ] + [("delete", row) for row in rows]
+        first = operations[:batch_size]
+        try:
+            await self.table_client.submit_transaction(first)
+            self._stats["transactions"] += 1
+        except TableTransactionError:
+            # Head moved (or already deleted by another worker)
+            return False
+        for start in range(batch_size, len(operations), batch_size):
+            await self._asubmit_compaction(operations[start:start + batch_size])
+        return True
+
+    async def _asubmit_compaction(self, operations: List[tuple]):
+        try:
+            await self.table_client.submit_transaction(operations)
+            self._stats["transactions"] += 1
+            return
+        except TableTransactionError:
+            # One row already gone (e.g. another worker compacted it) fails the whole batch
+            pass
+        for kind, entity, *_ in operations:
+            try:
+                if kind == "delete":
+                    await self.table_client.delete_entity(partition_key=entity["PartitionKey"], row_key=entity["RowKey"])
+                else:
+                    await self.table_client.update_entity(entity, mode=UpdateMode.MERGE)
+            except ResourceNotFoundError:
+                pass
+
+    # --- LangGraph saver interface -------------------------------------------
+
+    def _forget_conflict(self, thread_id: str, checkpoint_ns: str, checkpoint_id: Optional[str]):
+        # A run starting from the current head is not affected by an earlier run's conflict
+        if not checkpoint_id:
+            with self._pending_lock:
+                self._conflicts.pop((thread_id, checkpoint_ns), None)
+
+    def _pending_tuple(self, thread_id: str, checkpoint_ns: str, checkpoint_id: Optional[str]) -> Optional[CheckpointTuple]:
+        with self._pending_lock:
+            record = self._pending.get((thread_id, checkpoint_ns))
+        if record is None or record["checkpoint"] is None:
+            return None
+        if checkpoint_id and record["checkpoint_id"] != checkpoint_id:
+            return None
+        return self._to_tuple(thread_id, checkpoint_ns, record)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """
+        Retrieve a checkpoint tuple (latest for the thread unless checkpoint_id is set).
+        Buffered, not yet flushed checkpoints are returned first.
+        """
+        if not self.table_client:
+            return None
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+
+        if pending := self._pending_tuple(thread_id, checkpoint_ns, checkpoint_id):
+            return pending
+        self._forget_conflict(thread_id, checkpoint_ns, checkpoint_id)
+        try:
+            record = self._run(self._aread_record(thread_id, checkpoint_ns, checkpoint_id))
+        except Exception as e:
+            logger.error(f"Error retrieving checkpoint for thread {thread_id}: {str(e)}")
+            return None
+        return self._to_tuple(thread_id, checkpoint_ns, record) if record else None
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        if not self.table_client:
             return None
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+
+        if pending := self._pending_tuple(thread_id, checkpoint_ns, checkpoint_id):
+            return pending
+        self._forget_conflict(thread_id, checkpoint_ns, checkpoint_id)
+        try:
+            record = await self._arun(self._aread_record(thread_id, checkpoint_ns, checkpoint_id))
         except Exception as e:
             logger.error(f"Error retrieving checkpoint for thread {thread_id}: {str(e)}")
             return None
-    
-    def put(self, config: dict, checkpoint: dict) -> dict:
+        return self._to_tuple(thread_id, checkpoint_ns, record) if record else None
+
+    def _list_tuples(
+        self,
+        config: Optional[RunnableConfig],
+        persisted: List[Tuple[str, str, dict]],
+        filter: Optional[Dict[str, Any]],
+        before: Optional[RunnableConfig],
+        limit: Optional[int]
+    ) -> Iterator[CheckpointTuple]:
+        configurable = config["configurable"] if config else {}
+        thread_filter = configurable.get("thread_id")
+        ns_filter = configurable.get("checkpoint_ns")
+        id_filter = get_checkpoint_id(config) if config else None
+        before_id = get_checkpoint_id(before) if before else None
+
+        with self._pending_lock:
+            buffered = [
+                (thread_id, checkpoint_ns, record)
+                for (thread_id, checkpoint_ns), record in self._pending.items()
+                if record["checkpoint"] is not None
+                and (thread_filter is None or thread_id == thread_filter)
+                and (ns_filter is None or checkpoint_ns == ns_filter)
+            ]
+        seen = {(t, n, r["checkpoint_id"]) for t, n, r in buffered}
+        candidates = buffered + [item for item in persisted if (item[0], item[1], item[2]["checkpoint_id"]) not in seen]
+        candidates.sort(key=lambda item: item[2]["checkpoint_id"], reverse=True)
+
+        for thread_id, checkpoint_ns, record in candidates:
+            if id_filter and record["checkpoint_id"] != id_filter:
+                continue
+            if before_id and record["checkpoint_id"] >= before_id:
+                continue
+            checkpoint_tuple = self._to_tuple(thread_id, checkpoint_ns, record)
+            if filter and not all(checkpoint_tuple.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+            yield checkpoint_tuple
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[CheckpointTuple]:
         """
-        Store checkpoint for a configuration.
-        
-        Args:
-            config: Configuration dict with thread_id
-            checkpoint: Checkpoint dict to store
-            
-        Returns:
-            The stored configuration
+        List checkpoints newest first, including buffered ones.
         """
         if not self.table_client:
-            return config
-        
-        thread_id = config.get("configurable", {}).get("thread_id")
-        if not thread_id:
-            return config
-        
+            return
+        configurable = config["configurable"] if config else {}
         try:
-            # Create entity
-            entity = {
-                "PartitionKey": "checkpoint",
-                "RowKey": str(thread_id),
-                "checkpoint_data": json.dumps(checkpoint),
-                "timestamp": datetime.utcnow().isoformat(),
-                "updated_at": datetime.utcnow().isoformat()
-            }
-            
-            # Upsert entity (insert or update)
-            self.table_client.upsert_entity(entity)
-            logger.debug(f"Checkpoint saved for thread {thread_id}")
-            
+            persisted = self._run(self._aquery_records(configurable.get("thread_id"), configurable.get("checkpoint_ns")))
         except Exception as e:
-            logger.error(f"Error saving checkpoint for thread {thread_id}: {str(e)}")
-        
-        return config
-    
-    def list(self, config: dict) -> Iterator[Tuple[dict, dict]]:
+            logger.error(f"Error listing checkpoints: {str(e)}")
+            persisted = []
+        yield from self._list_tuples(config, persisted, filter, before, limit)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[CheckpointTuple]:
+        if not self.table_client:
+            return
+        configurable = config["configurable"] if config else {}
+        try:
+            persisted = await self._arun(
+                self._aquery_records(configurable.get("thread_id"), configurable.get("checkpoint_ns"))
+            )
+        except Exception as e:
+            logger.error(f"Error listing checkpoints: {str(e)}")
+            persisted = []
+        for checkpoint_tuple in self._list_tuples(config, persisted, filter, before, limit):
+            yield checkpoint_tuple
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
         """
-        List checkpoints for a configuration.
-        
+        Buffer a checkpoint. It replaces any earlier unflushed checkpoint of the
+        same thread; the flushed row keeps the last persisted checkpoint as parent.
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        record = {
+            "checkpoint_id": checkpoint["id"],
+            "parent_checkpoint_id": config["configurable"].get("checkpoint_id"),
+            "checkpoint": self.serde.dumps_typed(checkpoint),
+            "metadata": self.serde.dumps_typed(get_checkpoint_metadata(config, metadata)),
+            "writes": {},
+            "run_start": is_run_start(metadata),
+        }
+        key = (thread_id, checkpoint_ns)
+        with self._pending_lock:
+            previous = self._pending.get(key)
+            if previous is not None and previous["checkpoint"] is None and previous["checkpoint_id"] == checkpoint["id"]:
+                # Its writes were buffered before it (put and put_writes are not ordered)
+                record["writes"] = previous["writes"]
+                previous = None
+            early = self._early_writes.pop(key, None)
+            if early:
+                record["writes"].update(early.pop(checkpoint["id"], {}))
+                newer = {checkpoint_id: writes for checkpoint_id, writes in early.items() if checkpoint_id > checkpoint["id"]}
+                if newer:
+                    self._early_writes[key] = newer
+            if previous is not None:
+                record["parent_checkpoint_id"] = (
+                    previous["checkpoint_id"] if previous["checkpoint"] is None else previous["parent_checkpoint_id"]
+                )
+                # The flushed row stands for every checkpoint coalesced into it, including a run start
+                record["run_start"] = record["run_start"] or bool(previous.get("run_start"))
+            self._pending[key] = record
+            self._stats["checkpoints_buffered"] += 1
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        """
+        Buffer intermediate writes for the checkpoint in config.
+
+        LangGraph submits put() and put_writes() without ordering between them,
+        so writes may arrive after a newer checkpoint was buffered, or before
+        their own. Checkpoint ids increase within a thread: writes for an
+        older checkpoint are dropped, as put() drops them when they arrive in
+        order, and writes for a newer one are held until its put().
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        key = (thread_id, checkpoint_ns)
+
+        with self._pending_lock:
+            record = self._pending.get(key)
+            if record is None:
+                record = {
+                    "checkpoint_id": checkpoint_id,
+                    "parent_checkpoint_id": None,
+                    "checkpoint": None,
+                    "metadata": None,
+                    "writes": {},
+                }
+                self._pending[key] = record
+            if record["checkpoint_id"] == checkpoint_id:
+                buffered = record["writes"]
+            elif checkpoint_id > record["checkpoint_id"]:
+                buffered = self._early_writes.setdefault(key, {}).setdefault(checkpoint_id, {})
+            else:
+                # Never let them displace the newer buffered checkpoint
+                self._stats["late_writes_dropped"] += len(writes)
+                return
+            for idx, (channel, value) in enumerate(writes):
+                inner_key = (task_id, WRITES_IDX_MAP.get(channel, idx))
+                if inner_key[1] >= 0 and inner_key in buffered:
+                    continue
+                buffered[inner_key] = (task_id, channel, self.serde.dumps_typed(value), task_path)
+            self._stats["writes_buffered"] += len(writes)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        return self.put_writes(config, writes, task_id, task_path)
+
+    def pin_thread(self, thread_id: str):
+        """
+        Keep a thread's latest checkpoint cached until unpin_thread(), e.g. while
+        its conversation is open; pins are counted. The cached head is still
+        checked against the table (ETag) before each use.
+        """
+        self.cache.pin(thread_id)
+
+    def unpin_thread(self, thread_id: str):
+        self.cache.unpin(thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # --- write-behind control ------------------------------------------------
+
+    def flush(self, thread_id: Optional[str] = None, wait: bool = True) -> None:
+        """
+        Persist buffered checkpoints now (all threads, or one thread's namespaces).
+
         Args:
-            config: Configuration dict
-            
-        Yields:
-            Tuples of (config, checkpoint)
+            thread_id: Only flush this thread
+            wait: Block until the Table writes complete
+
+        Raises:
+            CheckpointConflictError: With thread_id and wait, if a checkpoint of the
+                thread (flushed now or by the timer during its run) lost the head
+                to another worker. The run must be failed or re-run.
         """
         if not self.table_client:
             return
-        
-        thread_id = config.get("configurable", {}).get("thread_id")
-        if not thread_id:
+        with self._pending_lock:
+            keys = None if thread_id is None else [key for key in self._pending if key[0] == thread_id]
+        if keys != []:
+            future = asyncio.run_coroutine_threadsafe(self._flush(keys), self._ensure_loop())
+            if not wait:
+                return
+            future.result()
+        if thread_id is not None and wait:
+            self._raise_conflict(thread_id)
+
+    async def aflush(self, thread_id: Optional[str] = None) -> None:
+        if not self.table_client:
+            return
+        with self._pending_lock:
+            keys = None if thread_id is None else [key for key in self._pending if key[0] == thread_id]
+        await self._arun(self._flush(keys))
+        if thread_id is not None:
+            self._raise_conflict(thread_id)
+
+    def _raise_conflict(self, thread_id: str):
+        with self._pending_lock:
+            keys = [key for key in self._conflicts if key[0] == thread_id]
+            conflicts = [self._conflicts.pop(key) for key in keys]
+        if conflicts:
+            raise conflicts[0]
+
+    def migrate_partitions(self, delete_source: bool = True) -> dict:
+        """
+        Move rows into the partition their thread hashes to under the current
+        shard count (single-partition rows, or rows from another shard count).
+        Heads already present in the target partition are kept. Safe to re-run.
+
+        Args:
+            delete_source: Delete rows from their old partition after copying
+
+        Returns:
+            Counts of scanned/moved rows and transactions
+        """
+        if not self.table_client:
+            return {}
+        self.flush(wait=True)
+        stats = self._run(self._amigrate_partitions(delete_source))
+        logger.info(f"✓ Checkpoint partition migration complete: {stats}")
+        return stats
+
+    def compact(self, policy: RetentionPolicy, batch_size: int = 100) -> dict:
+        """
+        Apply a retention policy: delete idle threads and history rows the policy
+        does not keep. Only keys and markers are read; deletes are batched per
+        partition in entity group transactions.
+
+        Args:
+            policy: What to keep
+            batch_size: Operations per transaction (at most 100)
+
+        Returns:
+            Counts of threads scanned, checkpoints deleted and threads expired
+        """
+        if not self.table_client:
+            return {}
+        return self._run(self._acompact(policy, max(1, min(batch_size, MAX_TRANSACTION_OPERATIONS))))
+
+    def close(self) -> None:
+        """
+        Flush everything and stop the I/O loop (call on shutdown).
+        """
+        if self._loop_pid != os.getpid() or not self.table_client:
             return
-        
         try:
-            # Get checkpoint for this thread
-            checkpoint = self.get(config)
-            if checkpoint:
-                yield (config, checkpoint)
-        except Exception as e:
-            logger.error(f"Error listing checkpoints: {str(e)}")
-    
-def get_checkpointer():
+            self.flush(wait=True)
+            self._run(self._astop())
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_pid = None
+
+    def get_stats(self) -> dict:
+        """
+        Report buffering efficiency: checkpoints/writes received vs entities written.
+        """
+        with self._pending_lock:
+            pending = len(self._pending)
+        stats = dict(
+            self._stats,
+            pending_threads=pending,
+            partition_shards=self.partition_shards,
+            cache=self.cache.get_stats(),
+            serialization=self.entity_codec.get_stats()
+        )
+        received = stats["checkpoints_buffered"]
+        stats["coalescing_ratio"] = received / stats["entities_flushed"] if stats["entities_flushed"] else 0.0
+        return stats
+
+
+def get_azure_table_checkpointer() -> Optional[AzureTableCheckpointer]:
     """
-    Factory function to get the appropriate checkpointer based on configuration.
-    Falls back to in-memory if Azure Table Storage is not available.
-    
+    Factory function for the configured Azure Table Storage checkpointer.
+
     Returns:
-        Checkpointer instance (Azure Table Storage or in-memory MemorySaver)
+        AzureTableCheckpointer, or None if Table Storage is not configured or unreachable
     """
-    # Try Azure Table Storage if configured
-    if USE_AZURE_TABLE_STORAGE and AZURE_STORAGE_CONNECTION_STRING and AZURE_TABLES_AVAILABLE:
-        try:
-            checkpointer = AzureTableCheckpointer(
-                connection_string=AZURE_STORAGE_CONNECTION_STRING,
-                table_name=AZURE_TABLE_NAME
-            )
-            if checkpointer.table_client:
-                logger.info("✓ Using Azure Table Storage for persistent checkpoints")
-                return checkpointer
-        except Exception as e:
-            logger.warning(f"Failed to create Azure Table checkpointer: {str(e)}")
-    
-    # Fallback to in-memory
-    logger.info("Using in-memory checkpointer (sessions will not persist across restarts)")
-    try:
-        from langgraph.checkpoint.memory import MemorySaver
-        return MemorySaver()
-    except ImportError:
-        logger.error("LangGraph checkpoint module not available")
+    if not AZURE_STORAGE_CONNECTION_STRING or not AZURE_TABLES_AVAILABLE:
         return None
+    checkpointer = AzureTableCheckpointer(
+        connection_string=AZURE_STORAGE_CONNECTION_STRING,
+        table_name=AZURE_TABLE_NAME,
+        flush_interval=CHECKPOINT_FLUSH_INTERVAL_SECONDS,
+        partition_shards=CHECKPOINT_PARTITION_SHARDS,
+        legacy_fallback=CHECKPOINT_LEGACY_PARTITION_FALLBACK
+    )
+    return checkpointer if checkpointer.table_client else None
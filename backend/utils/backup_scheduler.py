@@ -0,0 +1,320 @@
+"""
+Scheduled ChromaDB Backups
+Backs up the knowledge base index to Blob Storage from a background thread.
+
+A backup runs every interval_seconds and debounce_seconds after the last
+index change (knowledge base reloads notify the scheduler), so a burst of
+reloads produces one upload.
+
+The index is first copied to a local backup directory while holding the
+knowledge base index lock, which keeps builds and collection drops in every
+worker out, but not queries. SQLite files are copied with the online backup
+API, other files with shutil.copy2 (mtimes are kept, so the sync's hash cache
+stays valid between runs). The upload then runs from the copy without the lock.
+
+In a multi-worker deployment, only the worker holding an exclusive file lock
+next to the index performs backups; if it exits, another worker takes over on
+its next tick.
+"""
+
+import logging
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Iterable, Optional, Tuple
+
+from utils.azure_blob_sync import LOCAL_STATE_NAME
+from utils.metrics import register_stats_provider
+from vectorstore.knowledge_base import BUILD_LOCK_FILE, LIVE_VERSIONS_FILE
+from vectorstore.quantized_store import EXACT_VECTORS_FILE
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:
+    # Windows local development runs a single process; every scheduler leads
+    fcntl = None
+
+# Import settings with fallback
+try:
+    from config.settings import (
+        BLOB_BACKUP_INTERVAL_SECONDS,
+        BLOB_BACKUP_DEBOUNCE_SECONDS
+    )
+except ImportError:
+    BLOB_BACKUP_INTERVAL_SECONDS = 3600.0
+    BLOB_BACKUP_DEBOUNCE_SECONDS = 60.0
+
+SQLITE_HEADER = b"SQLite format 3\x00"
+# Rolled into the main database file by the backup API
+SQLITE_SIDE_SUFFIXES = ("-wal", "-shm", "-journal")
+
+
+def _is_sqlite(path: Path) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+
+
+def _backup_sqlite(source: Path, target: Path):
+    src = sqlite3.connect(f"{source.resolve().as_uri()}?mode=ro", uri=True)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst)
+        # A restored copy must not depend on a -wal file that is not part of the backup
+        dst.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        dst.close()
+        src.close()
+
+
+def fingerprint_directory(root: Path, exclude: Iterable[str] = ()) -> Tuple:
+    """
+    Cheap change detector: relative path, size and mtime of every file.
+
+    SQLite -wal files are included, since committed writes can sit there
+    without touching the main database file.
+    """
+    excluded = set(exclude) | {LOCAL_STATE_NAME}
+    return tuple(sorted(
+        (path.relative_to(root).as_posix(), stat.st_size, stat.st_mtime_ns)
+        for path in root.rglob("*")
+        if path.is_file() and path.name not in excluded and not path.name.endswith(("-shm", "-journal"))
+        for stat in (path.stat(),)
+    ))
+
+
+def copy_index(source: Path, target: Path, exclude: Iterable[str] = ()) -> int:
+    """
+    Replace the contents of target with a consistent copy of source.
+
+    The caller must keep writers out of source (the index lock); readers may
+    continue. target's sync state file is kept.
+
+    Returns:
+        Number of files copied
+    """
+    excluded = set(exclude) | {LOCAL_STATE_NAME}
+    target.mkdir(parents=True, exist_ok=True)
+    for entry in target.iterdir():
+        if entry.name == LOCAL_STATE_NAME:
+            continue
+        if entry.is_dir():
+            shutil.rmtree(entry)
+        else:
+            entry.unlink()
+
+    files = 0
+    for path in source.rglob("*"):
+        if not path.is_file() or path.name in excluded or path.name.endswith(SQLITE_SIDE_SUFFIXES):
+            continue
+        destination = target / path.relative_to(source)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        if _is_sqlite(path):
+            _backup_sqlite(path, destination)
+        else:
+            shutil.copy2(path, destination)
+        files += 1
+    return files
+
+
+class BackupScheduler:
+    """
+    Runs blob_sync uploads of the index on a timer and after (debounced) changes.
+    """
+
+    def __init__(
+        self,
+        blob_sync: Any,
+        index_path: str,
+        index_lock: Callable[[], ContextManager],
+        interval_seconds: float = 3600.0,
+        debounce_seconds: float = 60.0,
+        exclude: Iterable[str] = ()
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            blob_sync: ChromaDBAzureBlobSync (or anything with upload_chromadb(source_path=...))
+            index_path: Live index directory
+            index_lock: Returns a context manager that keeps index writers out
+            interval_seconds: Seconds between scheduled backups; 0 disables them
+            debounce_seconds: Quiet period after a change before backing up; 0 disables change triggers
+            exclude: File names never copied (lock files and the like)
+        """
+        self.blob_sync = blob_sync
+        self.index_path = Path(index_path)
+        self.index_lock = index_lock
+        self.interval_seconds = interval_seconds
+        self.debounce_seconds = debounce_seconds
+        self.exclude = tuple(exclude)
+        self.copy_path = self.index_path.with_name(f".{self.index_path.name}.backup")
+        self.leader_lock_path = self.index_path.with_name(f".{self.index_path.name}.backup.lock")
+
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._run_lock = threading.Lock()
+        self._leader_file = None
+        self._changed_at: Optional[float] = None
+        self._backed_up: Optional[Tuple] = None
+        self._stats = {
+            "backups": 0,
+            "failures": 0,
+            "skipped_unchanged": 0,
+            "last_backup_at": None,
+            "last_backup_seconds": 0.0,
+            "last_copy_seconds": 0.0,
+            "last_reason": None,
+            "last_error": None,
+        }
+
+    def start(self):
+        """
+        Start the scheduler thread. Must be called in each worker process.
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        if self.interval_seconds <= 0 and self.debounce_seconds <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="blob-backup", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"Blob backup scheduler started (every {self.interval_seconds:.0f}s, "
+            f"{self.debounce_seconds:.0f}s after changes)"
+        )
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._leader_file:
+            self._leader_file.close()
+            self._leader_file = None
+
+    def notify_change(self, *_):
+        """
+        Record an index change; a backup follows once no change has arrived for debounce_seconds.
+        """
+        if self.debounce_seconds <= 0:
+            return
+        self._changed_at = time.monotonic()
+        self._wake.set()
+
+    def _loop(self):
+        next_scheduled = time.monotonic() + self.interval_seconds if self.interval_seconds > 0 else float("inf")
+        while not self._stop.is_set():
+            due = next_scheduled
+            if self._changed_at is not None:
+                due = min(due, self._changed_at + self.debounce_seconds)
+            self._wake.wait(max(0.0, min(due - time.monotonic(), 3600.0)))
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+
+            now = time.monotonic()
+            if self._changed_at is not None and now - self._changed_at >= self.debounce_seconds:
+                self._changed_at = None
+                self.run_once("change")
+                next_scheduled = time.monotonic() + self.interval_seconds if self.interval_seconds > 0 else float("inf")
+            elif now >= next_scheduled:
+                self.run_once("schedule")
+                next_scheduled = time.monotonic() + self.interval_seconds
+
+    def _is_leader(self) -> bool:
+        if fcntl is None or self._leader_file:
+            return True
+        lock_file = open(self.leader_lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        # Held until this process stops or exits
+        self._leader_file = lock_file
+        logger.info(f"This worker now performs blob backups (lock {self.leader_lock_path})")
+        return True
+
+    def run_once(self, reason: str = "manual") -> bool:
+        """
+        Copy the index and upload it now, if this worker is the backup leader.
+
+        Returns:
+            True if a backup was uploaded
+        """
+        if not self._is_leader() or not self._run_lock.acquire(blocking=False):
+            return False
+        try:
+            if not self.index_path.exists():
+                return False
+            start = time.perf_counter()
+            with self.index_lock():
+                fingerprint = fingerprint_directory(self.index_path, self.exclude)
+                if fingerprint == self._backed_up:
+                    self._stats["skipped_unchanged"] += 1
+                    return False
+                copy_index(self.index_path, self.copy_path, self.exclude)
+            copied = time.perf_counter()
+
+            if not self.blob_sync.upload_chromadb(source_path=str(self.copy_path)):
+                raise RuntimeError("upload failed (see blob sync log)")
+
+            self._backed_up = fingerprint
+            self._stats["backups"] += 1
+            self._stats["last_backup_at"] = time.time()
+            self._stats["last_backup_seconds"] = time.perf_counter() - start
+            self._stats["last_copy_seconds"] = copied - start
+            self._stats["last_reason"] = reason
+            self._stats["last_error"] = None
+            logger.info(
+                f"✓ ChromaDB backup ({reason}) finished in {self._stats['last_backup_seconds']:.1f}s "
+                f"(index locked for {self._stats['last_copy_seconds']:.2f}s)"
+            )
+            return True
+        except Exception as e:
+            self._stats["failures"] += 1
+            self._stats["last_error"] = str(e)
+            logger.error(f"ChromaDB backup ({reason}) failed: {str(e)}")
+            return False
+        finally:
+            self._run_lock.release()
+
+    def get_stats(self) -> dict:
+        last = self._stats["last_backup_at"]
+        return dict(
+            self._stats,
+            last_backup_age_seconds=round(time.time() - last, 1) if last else None,
+            leader=self._leader_file is not None or fcntl is None,
+            change_pending=self._changed_at is not None,
+            interval_seconds=self.interval_seconds,
+            debounce_seconds=self.debounce_seconds,
+        )
+
+
+def get_backup_scheduler(blob_sync: Any, knowledge_base: Any) -> Optional[BackupScheduler]:
+    """
+    Factory function for the background backup of the knowledge base index.
+
+    Args:
+        blob_sync: Configured blob sync, or None
+        knowledge_base: KnowledgeBaseManager whose persisted index is backed up
+
+    Returns:
+        BackupScheduler subscribed to knowledge base reloads, or None if blob sync is off
+    """
+    if blob_sync is None:
+        return None
+    scheduler = BackupScheduler(
+        blob_sync,
+        index_path=str(knowledge_base.persist_directory),
+        index_lock=knowledge_base.index_lock,
+        interval_seconds=BLOB_BACKUP_INTERVAL_SECONDS,
+        debounce_seconds=BLOB_BACKUP_DEBOUNCE_SECONDS,
+        exclude=(BUILD_LOCK_FILE, LIVE_VERSIONS_FILE, EXACT_VECTORS_FILE)
+    )
+    knowledge_base.add_reload_listener(scheduler.notify_change)
+    register_stats_provider("blob_backup", scheduler.get_stats)
+    return scheduler
@@ -0,0 +1,232 @@
+"""
+Checkpoint Retention and Compaction
+Keeps checkpoint history bounded for long-lived threads.
+
+LangGraph checkpoints every superstep, so each /query turn leaves several
+snapshots that are never read again. A RetentionPolicy says what to keep:
+
+    keep_last           the newest N checkpoints of each thread and namespace
+    final_only_per_run  only the last checkpoint of every finished run
+    thread_ttl_seconds  delete threads idle for longer than this
+
+Runs are delimited by run-start checkpoints (LangGraph saves the input of each
+invocation as a checkpoint with source "input"). When a finished run is
+collapsed to its final checkpoint, that checkpoint takes over the run-start
+mark, so later passes still see the boundary and compaction is idempotent.
+The newest checkpoint of a thread is never deleted, and the run in progress is
+left alone.
+
+Each checkpointer implements compact(policy, batch_size); CheckpointCompactor
+calls it periodically from a background thread in every worker.
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
+
+from utils.metrics import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+# Import settings with fallback
+try:
+    from config.settings import (
+        CHECKPOINT_RETENTION_KEEP_LAST,
+        CHECKPOINT_RETENTION_FINAL_ONLY_PER_RUN,
+        CHECKPOINT_RETENTION_THREAD_TTL_SECONDS,
+        CHECKPOINT_COMPACTION_INTERVAL_SECONDS,
+        CHECKPOINT_COMPACTION_BATCH_SIZE
+    )
+except ImportError:
+    CHECKPOINT_RETENTION_KEEP_LAST = 20
+    CHECKPOINT_RETENTION_FINAL_ONLY_PER_RUN = True
+    CHECKPOINT_RETENTION_THREAD_TTL_SECONDS = 30 * 24 * 3600.0
+    CHECKPOINT_COMPACTION_INTERVAL_SECONDS = 900.0
+    CHECKPOINT_COMPACTION_BATCH_SIZE = 100
+
+
+def is_run_start(metadata: Optional[dict]) -> bool:
+    """
+    Whether a checkpoint with this metadata starts a new run of the graph.
+    """
+    return bool(metadata) and metadata.get("source") == "input"
+
+
+class RetentionPolicy(NamedTuple):
+    keep_last: int = 0
+    final_only_per_run: bool = False
+    thread_ttl_seconds: float = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.keep_last > 0 or self.final_only_per_run or self.thread_ttl_seconds > 0
+
+    def is_expired(self, last_updated: float, now: Optional[float] = None) -> bool:
+        """
+        Whether a thread last written at last_updated (epoch seconds) has outlived the TTL.
+        """
+        if self.thread_ttl_seconds <= 0:
+            return False
+        return (now if now is not None else time.time()) - last_updated > self.thread_ttl_seconds
+
+    def plan(self, checkpoints: Sequence[Tuple[str, bool]]) -> Tuple[List[str], List[str]]:
+        """
+        Decide which checkpoints of one thread and namespace to drop.
+
+        Args:
+            checkpoints: (checkpoint_id, starts_run) pairs in any order
+
+        Returns:
+            (checkpoint ids to delete, kept checkpoint ids that must be marked as run starts)
+        """
+        ordered = sorted(checkpoints)
+        keep = {checkpoint_id for checkpoint_id, _ in ordered}
+        promote = []
+
+        if self.final_only_per_run:
+            starts = [index for index, (_, starts_run) in enumerate(ordered) if starts_run]
+            # Every run followed by another run start is finished; the last one may still be running
+            for begin, end in zip(starts, starts[1:]):
+                for checkpoint_id, _ in ordered[begin:end - 1]:
+                    keep.discard(checkpoint_id)
+                if end - 1 > begin:
+                    promote.append(ordered[end - 1][0])
+
+        if self.keep_last > 0:
+            for checkpoint_id in sorted(keep)[:-self.keep_last]:
+                keep.discard(checkpoint_id)
+
+        if ordered:
+            keep.add(ordered[-1][0])
+        delete = [checkpoint_id for checkpoint_id, _ in ordered if checkpoint_id not in keep]
+        return delete, [checkpoint_id for checkpoint_id in promote if checkpoint_id in keep]
+
+
+class CheckpointCompactor:
+    """
+    Runs checkpointer.compact() on a timer in a background thread.
+    """
+
+    def __init__(
+        self,
+        checkpointer: Any,
+        policy: RetentionPolicy,
+        interval_seconds: float = 900.0,
+        batch_size: int = 100
+    ):
+        """
+        Initialize the compactor.
+
+        Args:
+            checkpointer: Saver implementing compact(policy, batch_size)
+            policy: What to keep
+            interval_seconds: Seconds between compaction passes
+            batch_size: Deletes per transaction/batch
+        """
+        self.checkpointer = checkpointer
+        self.policy = policy
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "runs": 0,
+            "failures": 0,
+            "threads_scanned": 0,
+            "checkpoints_deleted": 0,
+            "threads_expired": 0,
+            "last_run_ms": 0.0,
+            "last_run_at": None,
+        }
+
+    def start(self):
+        """
+        Start periodic compaction. Must be called in each worker process.
+        """
+        if self.interval_seconds <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="checkpoint-compactor", daemon=True)
+        self._thread.start()
+        logger.info(f"Checkpoint compactor started (every {self.interval_seconds:.0f}s, policy {self.policy})")
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        # Spread the workers' passes instead of having all of them scan at once
+        if self._stop.wait(random.uniform(0.1, 1.0) * self.interval_seconds):
+            return
+        while True:
+            self.run_once()
+            if self._stop.wait(self.interval_seconds):
+                return
+
+    def run_once(self) -> dict:
+        """
+        Run one compaction pass now.
+
+        Returns:
+            Counts from the checkpointer (threads scanned, checkpoints deleted, threads expired)
+        """
+        if not self._lock.acquire(blocking=False):
+            return {}
+        start = time.perf_counter()
+        try:
+            result = self.checkpointer.compact(self.policy, batch_size=self.batch_size)
+        except Exception as e:
+            self._stats["failures"] += 1
+            logger.error(f"Checkpoint compaction failed: {str(e)}")
+            return {}
+        finally:
+            self._lock.release()
+
+        self._stats["runs"] += 1
+        for key in ("threads_scanned", "checkpoints_deleted", "threads_expired"):
+            self._stats[key] += result.get(key, 0)
+        self._stats["last_run_ms"] = (time.perf_counter() - start) * 1000
+        self._stats["last_run_at"] = time.time()
+        if result.get("checkpoints_deleted") or result.get("threads_expired"):
+            logger.info(f"✓ Checkpoint compaction: {result}")
+        return result
+
+    def get_stats(self) -> dict:
+        return dict(self._stats, policy=self.policy._asdict(), interval_seconds=self.interval_seconds)
+
+
+def get_retention_policy() -> RetentionPolicy:
+    """
+    Factory function for the configured retention policy.
+
+    Returns:
+        RetentionPolicy instance
+    """
+    return RetentionPolicy(
+        keep_last=CHECKPOINT_RETENTION_KEEP_LAST,
+        final_only_per_run=CHECKPOINT_RETENTION_FINAL_ONLY_PER_RUN,
+        thread_ttl_seconds=CHECKPOINT_RETENTION_THREAD_TTL_SECONDS
+    )
+
+
+def get_checkpoint_compactor(checkpointer: Any) -> Optional[CheckpointCompactor]:
+    """
+    Factory function for the background compactor of a checkpointer.
+
+    Returns:
+        CheckpointCompactor, or None if compaction is disabled or unsupported
+    """
+    policy = get_retention_policy()
+    if CHECKPOINT_COMPACTION_INTERVAL_SECONDS <= 0 or not policy.enabled or not hasattr(checkpointer, "compact"):
+        return None
+    compactor = CheckpointCompactor(
+        checkpointer,
+        policy,
+        interval_seconds=CHECKPOINT_COMPACTION_INTERVAL_SECONDS,
+        batch_size=CHECKPOINT_COMPACTION_BATCH_SIZE
+    )
+    register_stats_provider("checkpoint_compaction", compactor.get_stats)
+    return compactor
@@ -0,0 +1,211 @@
+"""
+Checkpoint Entity Serialization
+Compressed, chunked encoding of LangGraph checkpoint payloads for Azure Table Storage.
+
+Payloads are serialized by the LangGraph serde (msgpack, no pickle), compressed
+with zstd (zlib if zstandard is not installed) and split across as many binary
+properties as needed to stay under the 64 KB property limit. Each payload
+records its layout version and codec, so entities written with another codec
+remain readable after a configuration change.
+
+Properties written for a payload named "checkpoint":
+    checkpoint_format   layout version
+    checkpoint_codec    zstd | zlib | none
+    checkpoint_type     serde type tag (e.g. msgpack)
+    checkpoint_chunks   number of chunk properties
+    checkpoint_0..n     compressed bytes, at most 64 KB each
+"""
+
+import logging
+import time
+import zlib
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Conditional import for zstd
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Import settings with fallback
+try:
+    from config.settings import (
+        CHECKPOINT_COMPRESSION,
+        CHECKPOINT_COMPRESSION_LEVEL
+    )
+except ImportError:
+    CHECKPOINT_COMPRESSION = "zstd"
+    CHECKPOINT_COMPRESSION_LEVEL = 3
+
+SERDE_FORMAT_VERSION = 1
+CODECS = ("zstd", "zlib", "none")
+
+# Azure Table Storage limits
+MAX_PROPERTY_BYTES = 64 * 1024
+MAX_ENTITY_BYTES = 1024 * 1024
+MAX_ENTITY_PROPERTIES = 252
+
+
+class EntityTooLargeError(ValueError):
+    """Raised when an encoded checkpoint does not fit in a single Table entity."""
+
+
+def estimate_entity_size(entity: dict) -> int:
+    """
+    Approximate the billed size of a Table entity (strings are stored as UTF-16).
+    """
+    size = 4
+    for name, value in entity.items():
+        size += 8 + len(name) * 2
+        if isinstance(value, (bytes, bytearray)):
+            size += 4 + len(value)
+        elif isinstance(value, str):
+            size += 4 + len(value) * 2
+        else:
+            size += 8
+    return size
+
+
+class CheckpointEntityCodec:
+    """
+    Packs serde output into Table entity properties and back.
+    """
+
+    def __init__(self, codec: str = "zstd", level: int = 3, min_compress_bytes: int = 256):
+        """
+        Initialize the codec.
+
+        Args:
+            codec: 'zstd', 'zlib' or 'none' (zstd falls back to zlib if unavailable)
+            level: Compression level
+            min_compress_bytes: Payloads smaller than this are stored uncompressed
+        """
+        if codec not in CODECS:
+            raise ValueError(f"Unknown checkpoint codec '{codec}'. Expected one of {CODECS}")
+        if codec == "zstd" and not ZSTD_AVAILABLE:
+            logger.warning("zstandard not installed, compressing checkpoints with zlib")
+            codec = "zlib"
+        self.codec = codec
+        self.level = level
+        self.min_compress_bytes = min_compress_bytes
+        self._stats = {
+            "payloads_encoded": 0,
+            "payloads_decoded": 0,
+            "raw_bytes": 0,
+            "stored_bytes": 0,
+            "chunked_payloads": 0,
+            "encode_ms": 0.0,
+            "decode_ms": 0.0,
+        }
+
+    def compress(self, data: bytes) -> Tuple[str, bytes]:
+        if self.codec == "none" or len(data) < self.min_compress_bytes:
+            return "none", data
+        if self.codec == "zstd":
+            return "zstd", zstandard.ZstdCompressor(level=self.level).compress(data)
+        return "zlib", zlib.compress(data, self.level)
+
+    @staticmethod
+    def decompress(codec: str, data: bytes) -> bytes:
+        if codec == "none":
+            return data
+        if codec == "zstd":
+            if not ZSTD_AVAILABLE:
+                raise RuntimeError("Checkpoint was written with zstd but zstandard is not installed")
+            return zstandard.ZstdDecompressor().decompress(data)
+        if codec == "zlib":
+            return zlib.decompress(data)
+        raise ValueError(f"Unknown checkpoint codec '{codec}'")
+
+    def pack(self, name: str, typed: Tuple[str, bytes]) -> dict:
+        """
+        Encode one serde payload as entity properties.
+
+        Args:
+            name: Property name prefix
+            typed: (type tag, bytes) from serde.dumps_typed
+
+        Returns:
+            Properties to merge into the entity
+        """
+        start = time.perf_counter()
+        type_tag, data = typed
+        codec, stored = self.compress(data)
+        chunks = [stored[i:i + MAX_PROPERTY_BYTES] for i in range(0, len(stored), MAX_PROPERTY_BYTES)] or [b""]
+
+        properties = {
+            f"{name}_format": SERDE_FORMAT_VERSION,
+            f"{name}_codec": codec,
+            f"{name}_type": type_tag,
+            f"{name}_chunks": len(chunks),
+        }
+        for i, chunk in enumerate(chunks):
+            properties[f"{name}_{i}"] = chunk
+
+        self._stats["payloads_encoded"] += 1
+        self._stats["raw_bytes"] += len(data)
+        self._stats["stored_bytes"] += len(stored)
+        self._stats["chunked_payloads"] += len(chunks) > 1
+        self._stats["encode_ms"] += (time.perf_counter() - start) * 1000
+        return properties
+
+    def unpack(self, name: str, entity: dict, legacy_property: Optional[str] = None) -> Optional[Tuple[str, bytes]]:
+        """
+        Decode a payload written by pack().
+
+        Args:
+            name: Property name prefix
+            entity: Table entity
+            legacy_property: Uncompressed single-property payload to fall back to
+
+        Returns:
+            (type tag, bytes) for serde.loads_typed, or None if absent
+        """
+        if f"{name}_chunks" not in entity:
+            if legacy_property and entity.get(legacy_property) is not None:
+                return entity[f"{name}_type"], bytes(entity[legacy_property])
+            return None
+
+        version = entity.get(f"{name}_format", SERDE_FORMAT_VERSION)
+        if version > SERDE_FORMAT_VERSION:
+            raise ValueError(f"Checkpoint format {version} is newer than supported ({SERDE_FORMAT_VERSION})")
+
+        start = time.perf_counter()
+        stored = b"".join(bytes(entity[f"{name}_{i}"]) for i in range(entity[f"{name}_chunks"]))
+        data = self.decompress(entity[f"{name}_codec"], stored)
+        self._stats["payloads_decoded"] += 1
+        self._stats["decode_ms"] += (time.perf_counter() - start) * 1000
+        return entity[f"{name}_type"], data
+
+    @staticmethod
+    def check_entity_size(entity: dict):
+        """
+        Raise EntityTooLargeError if the entity exceeds Table Storage limits.
+        """
+        size = estimate_entity_size(entity)
+        if size > MAX_ENTITY_BYTES or len(entity) > MAX_ENTITY_PROPERTIES:
+            raise EntityTooLargeError(
+                f"Checkpoint entity {entity.get('RowKey')} is {size:,} bytes / {len(entity)} properties "
+                f"(limits {MAX_ENTITY_BYTES:,} bytes / {MAX_ENTITY_PROPERTIES} properties)"
+            )
+
+    def get_stats(self) -> dict:
+        """
+        Report compression ratio and CPU time spent encoding/decoding.
+        """
+        stats = dict(self._stats, codec=self.codec, level=self.level)
+        stats["compression_ratio"] = stats["raw_bytes"] / stats["stored_bytes"] if stats["stored_bytes"] else 0.0
+        return stats
+
+
+def get_checkpoint_codec() -> CheckpointEntityCodec:
+    """
+    Factory function for the configured checkpoint codec.
+
+    Returns:
+        CheckpointEntityCodec instance
+    """
+    return CheckpointEntityCodec(codec=CHECKPOINT_COMPRESSION, level=CHECKPOINT_COMPRESSION_LEVEL)
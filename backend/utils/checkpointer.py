@@ -0,0 +1,90 @@
+"""
+Checkpointer Selection
+Picks the LangGraph checkpointer for the agent from configuration.
+
+Each backend module is imported only when it is selected, so workers that keep
+checkpoints in memory or SQLite never load the Azure Tables SDK.
+"""
+
+import logging
+
+from utils.metrics import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+# Import settings with fallback
+try:
+    from config.settings import USE_AZURE_TABLE_STORAGE, CHECKPOINTER_BACKEND
+except ImportError:
+    USE_AZURE_TABLE_STORAGE = False
+    CHECKPOINTER_BACKEND = "auto"
+
+
+class CheckpointConflictError(Exception):
+    """
+    A run's checkpoint could not be saved because another worker advanced the
+    thread while it ran: the run was answered without that worker's turn.
+    """
+
+
+def persist_run(checkpointer, thread_id: str):
+    """
+    Persist a finished run's buffered checkpoint (Table Storage write-behind)
+    before its answer is used. A no-op for backends that write through.
+
+    Raises:
+        CheckpointConflictError: If the thread moved on meanwhile; re-run or fail the run
+    """
+    flush = getattr(checkpointer, "flush", None)
+    if flush is not None:
+        flush(thread_id, wait=True)
+
+
+def get_checkpointer():
+    """
+    Factory function to get the appropriate checkpointer based on configuration.
+
+    CHECKPOINTER_BACKEND selects azure_table, sqlite or memory; auto uses Azure
+    Table Storage when USE_AZURE_TABLE_STORAGE is set and memory otherwise.
+    Falls back to bounded in-memory storage if the selected backend is not available.
+
+    Returns:
+        Checkpointer instance (Azure Table Storage, SQLite or in-memory BoundedMemorySaver)
+    """
+    backend = CHECKPOINTER_BACKEND
+    if backend == "auto":
+        backend = "azure_table" if USE_AZURE_TABLE_STORAGE else "memory"
+
+    # Try Azure Table Storage if configured
+    if backend == "azure_table":
+        try:
+            from utils.azure_checkpointer import get_azure_table_checkpointer
+            checkpointer = get_azure_table_checkpointer()
+            if checkpointer:
+                register_stats_provider("checkpointer", checkpointer.get_stats)
+                logger.info("✓ Using Azure Table Storage for persistent checkpoints")
+                return checkpointer
+        except Exception as e:
+            logger.warning(f"Failed to create Azure Table checkpointer: {str(e)}")
+
+    # Local SQLite database shared by the workers on this node
+    if backend == "sqlite":
+        try:
+            from utils.sqlite_checkpointer import get_sqlite_checkpointer
+            checkpointer = get_sqlite_checkpointer()
+            register_stats_provider("checkpointer", checkpointer.get_stats)
+            logger.info(f"✓ Using SQLite for persistent checkpoints: {checkpointer.path}")
+            return checkpointer
+        except Exception as e:
+            logger.warning(f"Failed to create SQLite checkpointer: {str(e)}")
+
+    # Fallback to in-memory
+    logger.info("Using in-memory checkpointer (sessions will not persist across restarts)")
+    try:
+        from utils.memory_checkpointer import get_memory_checkpointer
+        checkpointer = get_memory_checkpointer()
+        register_stats_provider("checkpointer", checkpointer.get_stats)
+        return checkpointer
+    except ImportError:
+        logger.error("LangGraph checkpoint module not available")
+        return None
@@ -0,0 +1,220 @@
+"""
+Conversation Sessions
+State of one open conversation with the support agent (a WebSocket
+connection on /ws/{thread_id}).
+
+A session answers the messages of its thread one turn at a time and reports
+what the graph does as events:
+    started    the turn began
+    progress   a graph node finished (with the category / sentiment once known)
+    token      a piece of the reply, as the response model generates it
+    response   the final reply of the turn
+    cancelled  the turn was superseded by a new message or cancelled by the client
+    error      the turn failed (including a turn that raced one written by
+               another worker on the same thread, e.g. a second tab)
+
+A new message cancels the turn in flight. Cancelling stops the model at its
+next token (or before its next call, see utils.agent_executor) and abandons
+the graph run; the next turn starts once the cancelled one has unwound, so
+turns of a thread never overlap. While the session is open its thread is
+pinned in the checkpointer, which keeps the latest checkpoint in memory
+instead of downloading it every turn. A pin does not make it authoritative:
+it is still checked against the stored head each turn, and a turn is only
+answered once its checkpoint is saved (utils.checkpointer.persist_run).
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from utils.agent_executor import AgentRun, RunCancelled
+from utils.checkpointer import CheckpointConflictError, persist_run
+from utils.metrics import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+# Nodes whose model output is the reply shown to the customer
+RESPONSE_NODES = {
+    "generate_technical_response",
+    "generate_billing_response",
+    "generate_general_response",
+}
+
+# Node -> (event field, state field) reported when the node finishes
+PROGRESS_FIELDS = {
+    "categorize_inquiry": ("category", "query_category"),
+    "analyze_inquiry_sentiment": ("sentiment", "query_sentiment"),
+}
+
+_stats_lock = threading.Lock()
+_stats = {
+    "open": 0,
+    "sessions": 0,
+    "turns": 0,
+    "completed": 0,
+    "cancelled": 0,
+    "failed": 0,
+    "conflicts": 0,
+    "tokens": 0,
+}
+
+
+def _count(key: str, amount: int = 1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+class ConversationTurn(AgentRun):
+    """
+    One customer message, run on the agent executor.
+    """
+
+    def __init__(self, number: int, message: str):
+        super().__init__()
+        self.number = number
+        self.message = message
+
+
+class ConversationSession:
+    """
+    One open conversation on a thread.
+    """
+
+    def __init__(self, agent: Any, thread_id: str):
+        """
+        Initialize the session (call open() to pin the thread).
+
+        Args:
+            agent: Compiled LangGraph support agent
+            thread_id: Conversation thread, as used by /query
+        """
+        self.agent = agent
+        self.thread_id = thread_id
+        self.turns = 0
+        self._current: Optional[ConversationTurn] = None
+        self._state_lock = threading.Lock()
+        # Held by the running turn, so turns of this session never overlap
+        self._turn_lock = threading.Lock()
+        self._pinned = False
+
+    def open(self):
+        pin_thread = getattr(self.agent.checkpointer, "pin_thread", None)
+        if pin_thread:
+            pin_thread(self.thread_id)
+            self._pinned = True
+        _count("open")
+        _count("sessions")
+
+    def close(self):
+        """
+        Cancel the turn in flight and release the thread.
+        """
+        self.cancel()
+        if self._pinned:
+            self.agent.checkpointer.unpin_thread(self.thread_id)
+            self._pinned = False
+        _count("open", -1)
+
+    def new_turn(self, message: str) -> ConversationTurn:
+        """
+        Start a turn for message, cancelling the one in flight.
+        """
+        with self._state_lock:
+            if self._current is not None:
+                self._current.cancel()
+            self.turns += 1
+            self._current = ConversationTurn(self.turns, message)
+            return self._current
+
+    def cancel(self):
+        with self._state_lock:
+            if self._current is not None:
+                self._current.cancel()
+
+    def answer(self, turn: ConversationTurn, emit: Callable[[dict], None]) -> dict:
+        """
+        Run a turn through the agent, calling emit(event) as it progresses.
+        Blocks (submit it to the agent executor with run=turn); waits for the
+        previous turn to unwind first.
+
+        Returns:
+            The turn's last event (response, cancelled or error)
+        """
+        with self._turn_lock:
+            _count("turns")
+            if turn.cancelled.is_set():
+                return self._finish(turn, emit, {"type": "cancelled"})
+
+            start = time.perf_counter()
+            emit({"type": "started", "turn": turn.number})
+            config = {
+                "configurable": {"thread_id": self.thread_id},
+                "callbacks": turn.callbacks(),
+            }
+            state = {}
+            tokens = 0
+            try:
+                for mode, payload in self.agent.stream(
+                    {"customer_query": turn.message},
+                    config,
+                    stream_mode=["updates", "messages"],
+                ):
+                    if turn.cancelled.is_set():
+                        raise RunCancelled()
+                    if mode == "messages":
+                        chunk, metadata = payload
+                        if metadata.get("langgraph_node") in RESPONSE_NODES and chunk.content:
+                            tokens += 1
+                            emit({"type": "token", "turn": turn.number, "content": chunk.content})
+                        continue
+                    for node, update in payload.items():
+                        update = update or {}
+                        state.update(update)
+                        event = {"type": "progress", "turn": turn.number, "node": node}
+                        if node in PROGRESS_FIELDS:
+                            field, key = PROGRESS_FIELDS[node]
+                            event[field] = update.get(key)
+                        emit(event)
+                persist_run(self.agent.checkpointer, self.thread_id)
+                result = {
+                    "type": "response",
+                    "response": state.get("final_response"),
+                    "category": state.get("query_category"),
+                    "sentiment": state.get("query_sentiment"),
+                }
+            except CheckpointConflictError as e:
+                # The reply was streamed from a state that another worker has since moved on from
+                logger.warning(f"Conversation turn {turn.number} on thread {self.thread_id} conflicted: {str(e)}")
+                _count("conflicts")
+                result = {
+                    "type": "error",
+                    "detail": "The conversation was updated elsewhere (another tab or device); send the message again",
+                }
+            except Exception as e:
+                if turn.cancelled.is_set():
+                    result = {"type": "cancelled"}
+                else:
+                    logger.warning(f"Conversation turn {turn.number} on thread {self.thread_id} failed: {str(e)}")
+                    result = {"type": "error", "detail": str(e)}
+            finally:
+                _count("tokens", tokens)
+                # A cancelled or failed turn keeps the checkpoints it got to, saved in the background
+                if hasattr(self.agent.checkpointer, "flush"):
+                    self.agent.checkpointer.flush(self.thread_id, wait=False)
+            result["seconds"] = round(time.perf_counter() - start, 3)
+            return self._finish(turn, emit, result)
+
+    def _finish(self, turn: ConversationTurn, emit: Callable[[dict], None], result: dict) -> dict:
+        result["turn"] = turn.number
+        _count({"response": "completed", "cancelled": "cancelled", "error": "failed"}[result["type"]])
+        emit(result)
+        return result
+
+
+def get_conversation_stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
+
+
+register_stats_provider("conversations", get_conversation_stats)
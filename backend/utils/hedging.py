@@ -0,0 +1,290 @@
+"""
+Hedged Model Calls
+Adaptive timeouts and request hedging for Azure OpenAI calls made by the graph nodes.
+
+Every call runs on a small thread pool while the node's thread waits for it:
+    timeout  the wait is bounded by p99 of the role's recent latency times a
+             multiplier, clamped between a floor and the role's configured
+             timeout, so one stuck response fails the call instead of holding
+             the request until gunicorn kills the worker
+    hedge    for hedged roles (short classification calls), if the first
+             attempt has not answered by the role's observed p95, a duplicate
+             is sent (optionally to a secondary deployment) and whichever
+             finishes first is used. At most max_hedge_rate of recent calls
+             are hedged, so a uniformly slow backend does not get twice the load
+
+Until min_samples calls of a role have been observed there are no
+percentiles: calls only have the model's own per-attempt timeout and are
+not hedged. Abandoned
+attempts cannot be interrupted; they finish in the background (bounded by
+the model's own timeout) and their results are discarded.
+
+Only first attempts feed the percentiles, so get_stats() can compare their
+latency (what callers would have seen without hedging) with the latency
+callers actually saw.
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional, TypeVar
+
+from utils.metrics import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+# Import settings with fallback
+try:
+    from config.settings import (
+        LLM_ADAPTIVE_TIMEOUTS,
+        LLM_TIMEOUT_P99_MULTIPLIER,
+        LLM_TIMEOUT_MIN_SECONDS,
+        LLM_HEDGE_MAX_RATE,
+        LLM_LATENCY_WINDOW,
+        LLM_LATENCY_MIN_SAMPLES,
+        LLM_CALL_WORKERS
+    )
+except ImportError:
+    LLM_ADAPTIVE_TIMEOUTS = True
+    LLM_TIMEOUT_P99_MULTIPLIER = 3.0
+    LLM_TIMEOUT_MIN_SECONDS = 5.0
+    LLM_HEDGE_MAX_RATE = 0.1
+    LLM_LATENCY_WINDOW = 500
+    LLM_LATENCY_MIN_SAMPLES = 20
+    LLM_CALL_WORKERS = 64
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """
+    Rolling window of latencies (seconds) with percentiles.
+    """
+
+    def __init__(self, window: int = 500, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float, min_samples: Optional[int] = None) -> Optional[float]:
+        """
+        Latency at fraction (0-1) of the window, or None with fewer than min_samples.
+        """
+        with self._lock:
+            if len(self._samples) < max(1, self.min_samples if min_samples is None else min_samples):
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class _RoleStats:
+    def __init__(self, window: int, min_samples: int):
+        self.primary = LatencyTracker(window, min_samples)
+        self.effective = LatencyTracker(window, 1)
+        self.recent_hedges: deque = deque(maxlen=window)
+        self.counts = {"calls": 0, "hedged": 0, "hedge_wins": 0, "timeouts": 0, "errors": 0, "hedges_skipped": 0}
+
+
+class HedgedCaller:
+    """
+    Runs model calls with adaptive timeouts and optional hedging, per role.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 64,
+        window: int = 500,
+        min_samples: int = 20,
+        max_hedge_rate: float = 0.1,
+        adaptive_timeouts: bool = True,
+        timeout_multiplier: float = 3.0,
+        min_timeout_seconds: float = 5.0
+    ):
+        """
+        Initialize the caller.
+
+        Args:
+            max_workers: Threads running attempts (first attempts and hedges)
+            window: Recent calls per role the percentiles are computed from
+            min_samples: Calls of a role observed before timeouts adapt and hedging starts
+            max_hedge_rate: Fraction of recent calls of a role that may be hedged
+            adaptive_timeouts: Derive timeouts from p99; otherwise use the configured timeout
+            timeout_multiplier: Timeout = p99 x this (clamped)
+            min_timeout_seconds: Lower bound of adaptive timeouts
+        """
+        self.max_workers = max_workers
+        self.window = window
+        self.min_samples = min_samples
+        self.max_hedge_rate = max_hedge_rate
+        self.adaptive_timeouts = adaptive_timeouts
+        self.timeout_multiplier = timeout_multiplier
+        self.min_timeout_seconds = min_timeout_seconds
+        # Created in the process that first calls: pool threads do not survive a fork
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._roles: Dict[str, _RoleStats] = {}
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        pid = os.getpid()
+        if self._executor_pid != pid:
+            with self._lock:
+                if self._executor_pid != pid:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="model-call")
+                    self._executor_pid = pid
+        return self._executor
+
+    def _role(self, role: str) -> _RoleStats:
+        stats = self._roles.get(role)
+        if stats is None:
+            with self._lock:
+                stats = self._roles.setdefault(role, _RoleStats(self.window, self.min_samples))
+        return stats
+
+    def timeout_for(self, role: str, ceiling: Optional[float]) -> Optional[float]:
+        """
+        Current timeout of a role's calls in seconds, or None (only the model's own timeout applies).
+        """
+        p99 = self._role(role).primary.percentile(0.99) if self.adaptive_timeouts else None
+        if p99 is None:
+            return None
+        timeout = max(p99 * self.timeout_multiplier, self.min_timeout_seconds)
+        return min(timeout, ceiling) if ceiling else timeout
+
+    def hedge_delay_for(self, role: str) -> Optional[float]:
+        """
+        How long a first attempt may run before it is hedged (observed p95), or None while warming up.
+        """
+        return self._role(role).primary.percentile(0.95)
+
+    def call(
+        self,
+        role: str,
+        primary: Callable[[], T],
+        hedge: Optional[Callable[[], T]] = None,
+        timeout_ceiling: Optional[float] = None
+    ) -> T:
+        """
+        Run primary(), hedged with hedge() if given, within the role's adaptive timeout.
+
+        Attempts run in copies of the caller's context (callbacks, query batch).
+
+        Raises:
+            TimeoutError: If no attempt answered within the timeout
+            Exception: The first attempt's error, if it failed before a hedge was sent
+                (or the hedge's, if both failed)
+        """
+        stats = self._role(role)
+        timeout = self.timeout_for(role, timeout_ceiling)
+        start = time.perf_counter()
+        deadline = start + timeout if timeout else None
+
+        def remaining() -> Optional[float]:
+            return max(0.0, deadline - time.perf_counter()) if deadline else None
+
+        first = self._submit(primary, stats.primary)
+        pending = {first}
+        hedged = False
+        delay = self.hedge_delay_for(role) if hedge else None
+        if delay is not None:
+            done, _ = wait(pending, timeout=min(delay, remaining()) if deadline else delay)
+            if not done and (remaining() is None or remaining() > 0):
+                with self._lock:
+                    recent = stats.recent_hedges
+                    hedged = sum(recent) < self.max_hedge_rate * max(len(recent), 1)
+                    if not hedged:
+                        stats.counts["hedges_skipped"] += 1
+                if hedged:
+                    pending.add(self._submit(hedge, None))
+
+        error: Optional[BaseException] = None
+        winner: Optional[Future] = None
+        while pending and winner is None:
+            done, pending = wait(pending, timeout=remaining(), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    winner = future
+                    break
+                error = future.exception()
+        for future in pending:
+            # Not started yet: never send it; running: finishes in the background, result ignored
+            future.cancel()
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            stats.counts["calls"] += 1
+            stats.recent_hedges.append(hedged)
+            if hedged:
+                stats.counts["hedged"] += 1
+                if winner is not None and winner is not first:
+                    stats.counts["hedge_wins"] += 1
+            if winner is None:
+                stats.counts["errors" if error is not None and not pending else "timeouts"] += 1
+        if winner is not None:
+            stats.effective.record(elapsed)
+            return winner.result()
+        if error is not None and not pending:
+            raise error
+        logger.warning(f"{role} model call timed out after {elapsed:.1f}s (timeout {timeout:.1f}s)")
+        raise TimeoutError(f"{role} model call exceeded its {timeout:.1f}s timeout")
+
+    def _submit(self, fn: Callable[[], T], tracker: Optional[LatencyTracker]) -> Future:
+        def attempt():
+            start = time.perf_counter()
+            result = fn()
+            # Recorded even if the caller moved on: the percentiles must see slow responses too
+            if tracker is not None:
+                tracker.record(time.perf_counter() - start)
+            return result
+        return self._get_executor().submit(contextvars.copy_context().run, attempt)
+
+    def get_stats(self) -> dict:
+        """
+        Per role: call, hedge and timeout counts, current hedge delay and timeout,
+        and p50/p95/p99 (ms) of first attempts vs what callers saw.
+        """
+        def percentiles(tracker: LatencyTracker) -> dict:
+            values = {name: tracker.percentile(fraction, min_samples=1) for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))}
+            return {name: round(value * 1000, 1) if value is not None else None for name, value in values.items()}
+
+        report = {}
+        for role, stats in list(self._roles.items()):
+            with self._lock:
+                counts = dict(stats.counts)
+            delay = self.hedge_delay_for(role)
+            counts.update({
+                "hedge_rate": round(counts["hedged"] / counts["calls"], 4) if counts["calls"] else 0.0,
+                "hedge_delay_ms": round(delay * 1000, 1) if delay is not None else None,
+                "adaptive_timeout_seconds": self.timeout_for(role, None),
+                "first_attempt_ms": percentiles(stats.primary),
+                "effective_ms": percentiles(stats.effective),
+            })
+            report[role] = counts
+        return report
+
+
+# Shared by the graph nodes of this worker (see models.llm.invoke_model)
+model_calls = HedgedCaller(
+    max_workers=LLM_CALL_WORKERS,
+    window=LLM_LATENCY_WINDOW,
+    min_samples=LLM_LATENCY_MIN_SAMPLES,
+    max_hedge_rate=LLM_HEDGE_MAX_RATE,
+    adaptive_timeouts=LLM_ADAPTIVE_TIMEOUTS,
+    timeout_multiplier=LLM_TIMEOUT_P99_MULTIPLIER,
+    min_timeout_seconds=LLM_TIMEOUT_MIN_SECONDS
+)
+
+register_stats_provider("model_calls", model_calls.get_stats)
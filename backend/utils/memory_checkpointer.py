@@ -0,0 +1,464 @@
+"""
+Bounded In-Memory Checkpointer for LangGraph
+Drop-in replacement for MemorySaver when Azure Table Storage is not configured.
+
+MemorySaver keeps every step of every thread for the life of the worker. This
+saver keeps only the latest N checkpoints per thread (plus the channel values
+they reference) and evicts threads that are least recently used or idle past a
+TTL. Evicted threads can be spilled to a local SQLite file and are restored
+transparently the next time the thread is used. compact() applies a
+RetentionPolicy (utils.checkpoint_retention) to the threads in memory.
+Threads pinned with pin_thread() (open conversations) are never evicted.
+
+The spill file holds marshal-encoded serde payloads: it is a private cache of
+this deployment, not an interchange format, and is only readable by the same
+Python version.
+"""
+
+import logging
+import marshal
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict, defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.memory import MemorySaver
+
+from utils.checkpoint_retention import RetentionPolicy, is_run_start
+
+logger = logging.getLogger(__name__)
+
+# Import settings with fallback
+try:
+    from config.settings import (
+        CHECKPOINT_MEMORY_MAX_PER_THREAD,
+        CHECKPOINT_MEMORY_MAX_THREADS,
+        CHECKPOINT_MEMORY_THREAD_TTL_SECONDS,
+        CHECKPOINT_SPILL_PATH,
+        CHECKPOINT_SPILL_TTL_SECONDS
+    )
+except ImportError:
+    CHECKPOINT_MEMORY_MAX_PER_THREAD = 10
+    CHECKPOINT_MEMORY_MAX_THREADS = 2000
+    CHECKPOINT_MEMORY_THREAD_TTL_SECONDS = 3600.0
+    CHECKPOINT_SPILL_PATH = None
+    CHECKPOINT_SPILL_TTL_SECONDS = 7 * 24 * 3600.0
+
+SPILL_PURGE_INTERVAL_SECONDS = 60.0
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    MemorySaver with per-thread history limits, LRU/TTL thread eviction and optional disk spill.
+    """
+
+    def __init__(
+        self,
+        max_checkpoints_per_thread: int = 10,
+        max_threads: int = 2000,
+        thread_ttl_seconds: float = 3600.0,
+        spill_path: Optional[str] = None,
+        spill_ttl_seconds: float = 7 * 24 * 3600.0,
+        *,
+        serde: Optional[Any] = None
+    ):
+        """
+        Initialize the bounded saver.
+
+        Args:
+            max_checkpoints_per_thread: Checkpoints kept per thread and namespace (0 = unlimited)
+            max_threads: Threads kept in memory before the least recently used is evicted
+            thread_ttl_seconds: Evict threads idle for longer than this (0 disables)
+            spill_path: SQLite file evicted threads are written to (None disables spilling)
+            spill_ttl_seconds: Spilled threads older than this are deleted
+            serde: LangGraph serializer (defaults to JsonPlusSerializer)
+        """
+        super().__init__(serde=serde)
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+        self.max_threads = max(1, max_threads)
+        self.thread_ttl_seconds = thread_ttl_seconds
+        self.spill_path = spill_path
+        self.spill_ttl_seconds = spill_ttl_seconds
+
+        self._lock = threading.RLock()
+        # thread_id -> last access (monotonic), least recently used first
+        self._access: "OrderedDict[str, float]" = OrderedDict()
+        # Indexes so pruning and eviction never scan other threads' entries
+        self._channel_versions: Dict[Tuple[str, str, str], dict] = {}
+        self._blob_keys: Dict[Tuple[str, str], Set[Tuple[str, Any]]] = defaultdict(set)
+        self._write_keys: Dict[str, Set[Tuple[str, str, str]]] = defaultdict(set)
+        # (thread_id, checkpoint_ns, checkpoint_id) of checkpoints that start a run
+        self._run_starts: Set[Tuple[str, str, str]] = set()
+        # thread_id -> number of open pins
+        self._pinned: Dict[str, int] = {}
+
+        self._spill_conn: Optional[sqlite3.Connection] = None
+        self._spill_pid: Optional[int] = None
+        self._last_spill_purge = 0.0
+        self._stats = {
+            "pruned_checkpoints": 0,
+            "evicted_lru": 0,
+            "evicted_ttl": 0,
+            "spilled": 0,
+            "restored": 0,
+            "spill_failures": 0,
+            "compacted_checkpoints": 0,
+            "expired_threads": 0,
+        }
+
+    # --- spill store ---------------------------------------------------------
+
+    def _spill_db(self) -> Optional[sqlite3.Connection]:
+        if not self.spill_path:
+            return None
+        # SQLite connections must not cross a fork
+        if self._spill_pid != os.getpid():
+            Path(self.spill_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.spill_path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS spilled_threads ("
+                "thread_id TEXT PRIMARY KEY, payload BLOB NOT NULL, spilled_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS spilled_threads_age ON spilled_threads (spilled_at)")
+            self._spill_conn = conn
+            self._spill_pid = os.getpid()
+        return self._spill_conn
+
+    def _spill(self, thread_id: str, data: dict):
+        db = self._spill_db()
+        if db is None:
+            return
+        try:
+            payload = zlib.compress(marshal.dumps(data), 1)
+            db.execute(
+                "INSERT OR REPLACE INTO spilled_threads (thread_id, payload, spilled_at) VALUES (?, ?, ?)",
+                (thread_id, payload, time.time())
+            )
+            self._stats["spilled"] += 1
+        except Exception as e:
+            self._stats["spill_failures"] += 1
+            logger.warning(f"Failed to spill checkpoints for thread {thread_id}: {str(e)}")
+
+    def _restore(self, thread_id: str):
+        db = self._spill_db()
+        if db is None:
+            return
+        try:
+            row = db.execute("SELECT payload FROM spilled_threads WHERE thread_id = ?", (thread_id,)).fetchone()
+            if row is None:
+                return
+            db.execute("DELETE FROM spilled_threads WHERE thread_id = ?", (thread_id,))
+            data = marshal.loads(zlib.decompress(row[0]))
+        except Exception as e:
+            self._stats["spill_failures"] += 1
+            logger.warning(f"Failed to restore spilled checkpoints for thread {thread_id}: {str(e)}")
+            return
+
+        for checkpoint_ns, checkpoints in data["storage"].items():
+            self.storage[thread_id][checkpoint_ns].update(checkpoints)
+            for checkpoint_id, (checkpoint, _, _) in checkpoints.items():
+                self._channel_versions[(thread_id, checkpoint_ns, checkpoint_id)] = (
+                    self.serde.loads_typed(checkpoint)["channel_versions"]
+                )
+        for key, writes in data["writes"].items():
+            self.writes[key] = writes
+            self._write_keys[thread_id].add(key)
+        for key, blob in data["blobs"].items():
+            self.blobs[key] = blob
+            self._blob_keys[key[:2]].add(key[2:])
+        for checkpoint_ns, checkpoint_id in data.get("run_starts", ()):
+            self._run_starts.add((thread_id, checkpoint_ns, checkpoint_id))
+
+        self._touch(thread_id)
+        self._stats["restored"] += 1
+
+    def _purge_spill(self):
+        db = self._spill_db()
+        if db is None or time.monotonic() - self._last_spill_purge < SPILL_PURGE_INTERVAL_SECONDS:
+            return
+        self._last_spill_purge = time.monotonic()
+        try:
+            db.execute("DELETE FROM spilled_threads WHERE spilled_at < ?", (time.time() - self.spill_ttl_seconds,))
+        except Exception as e:
+            logger.warning(f"Failed to purge spilled checkpoints: {str(e)}")
+
+    # --- bookkeeping ---------------------------------------------------------
+
+    def _touch(self, thread_id: str):
+        self._access[thread_id] = time.monotonic()
+        self._access.move_to_end(thread_id)
+
+    def _ensure_loaded(self, thread_id: str):
+        if thread_id not in self._access:
+            self._restore(thread_id)
+
+    def _discard_empty(self, thread_id: str):
+        # MemorySaver's defaultdicts create entries for threads that were only read
+        if thread_id not in self._access:
+            self.storage.pop(thread_id, None)
+
+    def _prune(self, thread_id: str, checkpoint_ns: str):
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if self.max_checkpoints_per_thread <= 0 or len(checkpoints) <= self.max_checkpoints_per_thread:
+            return
+
+        # Checkpoint ids are time-ordered, so the smallest are the oldest
+        stale = sorted(checkpoints)[:-self.max_checkpoints_per_thread]
+        self._delete_checkpoints(thread_id, checkpoint_ns, stale)
+        self._stats["pruned_checkpoints"] += len(stale)
+
+    def _delete_checkpoints(self, thread_id: str, checkpoint_ns: str, checkpoint_ids):
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        for checkpoint_id in checkpoint_ids:
+            key = (thread_id, checkpoint_ns, checkpoint_id)
+            del checkpoints[checkpoint_id]
+            self.writes.pop(key, None)
+            self._write_keys[thread_id].discard(key)
+            self._channel_versions.pop(key, None)
+            self._run_starts.discard(key)
+
+        live = set()
+        for checkpoint_id in checkpoints:
+            live.update(self._channel_versions.get((thread_id, checkpoint_ns, checkpoint_id), {}).items())
+        blob_keys = self._blob_keys[(thread_id, checkpoint_ns)]
+        for channel, version in blob_keys - live:
+            self.blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+        blob_keys &= live
+
+    def _remove_thread(self, thread_id: str) -> dict:
+        namespaces = self.storage.pop(thread_id, {})
+        data = {"storage": {}, "writes": {}, "blobs": {}, "run_starts": []}
+        for checkpoint_ns, checkpoints in namespaces.items():
+            data["storage"][checkpoint_ns] = dict(checkpoints)
+            for checkpoint_id in checkpoints:
+                self._channel_versions.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+                if (thread_id, checkpoint_ns, checkpoint_id) in self._run_starts:
+                    self._run_starts.discard((thread_id, checkpoint_ns, checkpoint_id))
+                    data["run_starts"].append((checkpoint_ns, checkpoint_id))
+            for channel, version in self._blob_keys.pop((thread_id, checkpoint_ns), set()):
+                key = (thread_id, checkpoint_ns, channel, version)
+                if key in self.blobs:
+                    data["blobs"][key] = self.blobs.pop(key)
+        for key in self._write_keys.pop(thread_id, set()):
+            if key in self.writes:
+                data["writes"][key] = self.writes.pop(key)
+        self._access.pop(thread_id, None)
+        return data
+
+    def _evict(self):
+        now = time.monotonic()
+        while True:
+            # Least recently used thread that is not pinned
+            thread_id, last_access = next(
+                ((t, a) for t, a in self._access.items() if t not in self._pinned), (None, None)
+            )
+            if thread_id is None:
+                break
+            if len(self._access) > self.max_threads:
+                reason = "evicted_lru"
+            elif self.thread_ttl_seconds > 0 and now - last_access > self.thread_ttl_seconds:
+                reason = "evicted_ttl"
+            else:
+                break
+            data = self._remove_thread(thread_id)
+            self._stats[reason] += 1
+            if data["storage"]:
+                self._spill(thread_id, data)
+        self._purge_spill()
+
+    def pin_thread(self, thread_id: str):
+        """
+        Keep a thread in memory until unpin_thread(), restoring it from the spill file if needed.
+        Pins are counted, so each pin_thread() needs its own unpin_thread().
+        """
+        with self._lock:
+            self._ensure_loaded(thread_id)
+            self._pinned[thread_id] = self._pinned.get(thread_id, 0) + 1
+
+    def unpin_thread(self, thread_id: str):
+        with self._lock:
+            pins = self._pinned.pop(thread_id, 0) - 1
+            if pins > 0:
+                self._pinned[thread_id] = pins
+
+    def sweep(self):
+        """
+        Evict idle threads now (eviction otherwise runs on each put).
+        """
+        with self._lock:
+            self._evict()
+
+    # --- LangGraph saver interface -------------------------------------------
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            self._ensure_loaded(thread_id)
+            result = super().get_tuple(config)
+            if thread_id in self._access:
+                self._touch(thread_id)
+            self._discard_empty(thread_id)
+            return result
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[CheckpointTuple]:
+        """
+        List checkpoints. Without a thread_id only threads currently in memory are listed.
+        """
+        thread_id = config["configurable"].get("thread_id") if config else None
+        with self._lock:
+            if thread_id is not None:
+                self._ensure_loaded(thread_id)
+            items = [item for item in super().list(config, filter=filter, before=before, limit=limit)]
+            if thread_id is not None:
+                self._discard_empty(thread_id)
+        yield from items
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            self._ensure_loaded(thread_id)
+            result = super().put(config, checkpoint, metadata, new_versions)
+            self._channel_versions[(thread_id, checkpoint_ns, checkpoint["id"])] = dict(checkpoint["channel_versions"])
+            self._blob_keys[(thread_id, checkpoint_ns)].update(new_versions.items())
+            if is_run_start(metadata):
+                self._run_starts.add((thread_id, checkpoint_ns, checkpoint["id"]))
+            self._touch(thread_id)
+            self._prune(thread_id, checkpoint_ns)
+            self._evict()
+            return result
+
+    def put_writes(self, config: RunnableConfig, writes, task_id: str, task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            self._ensure_loaded(thread_id)
+            super().put_writes(config, writes, task_id, task_path)
+            self._write_keys[thread_id].add(
+                (thread_id, config["configurable"].get("checkpoint_ns", ""), config["configurable"]["checkpoint_id"])
+            )
+            self._touch(thread_id)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._remove_thread(thread_id)
+            db = self._spill_db()
+            if db is not None:
+                db.execute("DELETE FROM spilled_threads WHERE thread_id = ?", (thread_id,))
+
+    def compact(self, policy: RetentionPolicy, batch_size: int = 100) -> dict:
+        """
+        Apply a retention policy to the threads in memory and drop spilled
+        threads idle past its TTL. The lock is released every batch_size
+        threads, so requests interleave with a long pass.
+
+        Args:
+            policy: What to keep
+            batch_size: Threads handled per lock acquisition
+
+        Returns:
+            Counts of threads scanned, checkpoints deleted and threads expired
+        """
+        with self._lock:
+            thread_ids = list(self._access)
+        scanned = deleted = expired = 0
+        for start in range(0, len(thread_ids), max(1, batch_size)):
+            with self._lock:
+                now = time.monotonic()
+                for thread_id in thread_ids[start:start + batch_size]:
+                    last_access = self._access.get(thread_id)
+                    if last_access is None:
+                        continue
+                    scanned += 1
+                    if policy.is_expired(last_access, now) and thread_id not in self._pinned:
+                        self._remove_thread(thread_id)
+                        expired += 1
+                        continue
+                    for checkpoint_ns, checkpoints in self.storage[thread_id].items():
+                        delete, promote = policy.plan([
+                            (checkpoint_id, (thread_id, checkpoint_ns, checkpoint_id) in self._run_starts)
+                            for checkpoint_id in checkpoints
+                        ])
+                        self._run_starts.update((thread_id, checkpoint_ns, checkpoint_id) for checkpoint_id in promote)
+                        if delete:
+                            self._delete_checkpoints(thread_id, checkpoint_ns, delete)
+                            deleted += len(delete)
+
+        with self._lock:
+            db = self._spill_db()
+            if db is not None and policy.thread_ttl_seconds > 0:
+                try:
+                    expired += db.execute(
+                        "DELETE FROM spilled_threads WHERE spilled_at < ?", (time.time() - policy.thread_ttl_seconds,)
+                    ).rowcount
+                except Exception as e:
+                    logger.warning(f"Failed to expire spilled checkpoints: {str(e)}")
+            self._stats["compacted_checkpoints"] += deleted
+            self._stats["expired_threads"] += expired
+        return {"threads_scanned": scanned, "checkpoints_deleted": deleted, "threads_expired": expired}
+
+    def get_stats(self) -> dict:
+        """
+        Report threads, checkpoints and serialized bytes held in memory, plus eviction/spill counts.
+        """
+        with self._lock:
+            checkpoints = sum(len(c) for namespaces in self.storage.values() for c in namespaces.values())
+            payload_bytes = sum(
+                len(checkpoint[1]) + len(metadata[1])
+                for namespaces in self.storage.values()
+                for checkpoints_ in namespaces.values()
+                for checkpoint, metadata, _ in checkpoints_.values()
+            )
+            payload_bytes += sum(len(value[1]) for writes in self.writes.values() for _, _, value, _ in writes.values())
+            payload_bytes += sum(len(blob[1]) for blob in self.blobs.values())
+            stats = dict(
+                self._stats,
+                threads=len(self._access),
+                max_threads=self.max_threads,
+                pinned_threads=len(self._pinned),
+                checkpoints=checkpoints,
+                blobs=len(self.blobs),
+                payload_bytes=payload_bytes,
+            )
+            db = self._spill_db()
+            if db is not None:
+                stats["spilled_threads"] = db.execute("SELECT COUNT(*) FROM spilled_threads").fetchone()[0]
+                stats["spill_file_bytes"] = sum(
+                    path.stat().st_size for path in Path(self.spill_path).parent.glob(Path(self.spill_path).name + "*")
+                )
+        return stats
+
+
+def get_memory_checkpointer() -> BoundedMemorySaver:
+    """
+    Factory function for the configured bounded in-memory checkpointer.
+
+    Returns:
+        BoundedMemorySaver instance
+    """
+    return BoundedMemorySaver(
+        max_checkpoints_per_thread=CHECKPOINT_MEMORY_MAX_PER_THREAD,
+        max_threads=CHECKPOINT_MEMORY_MAX_THREADS,
+        thread_ttl_seconds=CHECKPOINT_MEMORY_THREAD_TTL_SECONDS,
+        spill_path=CHECKPOINT_SPILL_PATH,
+        spill_ttl_seconds=CHECKPOINT_SPILL_TTL_SECONDS
+    )
@@ -0,0 +1,39 @@
+"""
+In-Process Metrics Registry
+Components register a stats provider; the /metrics endpoint collects them.
+"""
+
+import logging
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+_providers: Dict[str, Callable[[], dict]] = {}
+
+
+def register_stats_provider(name: str, provider: Callable[[], dict]):
+    """
+    Register (or replace) a named stats provider.
+
+    Args:
+        name: Section name in the metrics payload
+        provider: Zero-argument callable returning a JSON-serializable dict
+    """
+    _providers[name] = provider
+
+
+def collect_stats() -> dict:
+    """
+    Collect stats from all registered providers.
+
+    Returns:
+        Dict mapping provider name to its stats (or an error entry)
+    """
+    stats = {}
+    for name, provider in list(_providers.items()):
+        try:
+            stats[name] = provider()
+        except Exception as e:
+            logger.warning(f"Failed to collect stats for {name}: {str(e)}")
+            stats[name] = {"error": str(e)}
+    return stats
@@ -0,0 +1,144 @@
+"""
+Speculative Prefetch Registry
+Runs work ahead of the graph node that needs it and hands the result over by id.
+
+Futures cannot live in the (checkpointed) graph state, so nodes only carry a
+prefetch id; the future itself is kept here until it is taken or cancelled.
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Import settings with fallback
+try:
+    from config.settings import RETRIEVAL_PREFETCH_WORKERS
+except ImportError:
+    RETRIEVAL_PREFETCH_WORKERS = 4
+
+
+class PrefetchRegistry:
+    """
+    Thread pool plus a table of in-flight speculative tasks keyed by id.
+    """
+
+    def __init__(self, max_workers: int = 4, ttl_seconds: float = 120.0, name: str = "prefetch"):
+        """
+        Initialize the registry.
+
+        Args:
+            max_workers: Threads available for speculative work
+            ttl_seconds: Unclaimed tasks older than this are cancelled and dropped
+            name: Thread name prefix
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_workers = max_workers
+        self.name = name
+        # Created in the process that first submits: pool threads do not survive a fork
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._pending: Dict[str, Tuple[float, Future]] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "taken": 0,
+            "taken_ready": 0,
+            "cancelled": 0,
+            "expired": 0,
+        }
+
+    def submit(self, fn: Callable, *args, **kwargs) -> str:
+        """
+        Start speculative work.
+
+        Returns:
+            Prefetch id to store in the graph state
+        """
+        prefetch_id = uuid.uuid4().hex
+        # Run in the caller's context (e.g. a query batch's prepared embeddings)
+        future = self._get_executor().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        with self._lock:
+            self._expire_locked()
+            self._pending[prefetch_id] = (time.monotonic(), future)
+            self._stats["submitted"] += 1
+        return prefetch_id
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        pid = os.getpid()
+        if self._executor_pid != pid:
+            with self._lock:
+                if self._executor_pid != pid:
+                    # Futures from the parent process never complete here
+                    self._pending.clear()
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+                    self._executor_pid = pid
+        return self._executor
+
+    def take(self, prefetch_id: Optional[str]) -> Optional[Future]:
+        """
+        Claim the future for a prefetch id.
+
+        Returns:
+            The future, or None if the id is unknown, expired or already taken
+        """
+        if not prefetch_id:
+            return None
+        with self._lock:
+            entry = self._pending.pop(prefetch_id, None)
+            if entry is None:
+                return None
+            self._stats["taken"] += 1
+            if entry[1].done():
+                self._stats["taken_ready"] += 1
+        return entry[1]
+
+    def cancel(self, prefetch_id: Optional[str]) -> bool:
+        """
+        Cancel speculative work that is no longer needed.
+
+        Work that already started runs to completion and its result is discarded.
+
+        Returns:
+            True if the id was pending
+        """
+        if not prefetch_id:
+            return False
+        with self._lock:
+            entry = self._pending.pop(prefetch_id, None)
+            if entry is None:
+                return False
+            self._stats["cancelled"] += 1
+        entry[1].cancel()
+        return True
+
+    def _expire_locked(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        expired = [key for key, (created, _) in self._pending.items() if created < cutoff]
+        for key in expired:
+            _, future = self._pending.pop(key)
+            future.cancel()
+            self._stats["expired"] += 1
+
+    def get_stats(self) -> dict:
+        """
+        Report how often prefetched results were ready when needed.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._pending)
+        stats["ready_rate"] = stats["taken_ready"] / stats["taken"] if stats["taken"] else 0.0
+        return stats
+
+
+# Shared registry for speculative knowledge base retrieval
+retrieval_prefetch = PrefetchRegistry(
+    max_workers=RETRIEVAL_PREFETCH_WORKERS,
+    name="retrieval-prefetch"
+)
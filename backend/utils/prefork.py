@@ -0,0 +1,133 @@
+"""
+Pre-fork Sharing
+Garbage collector handling and memory accounting for a preloading gunicorn master.
+
+With preload_app the master imports the app (and preloads the knowledge base)
+once; forked workers share those pages copy-on-write until they write to them.
+CPython writes to every object it scans during a collection, so the first full
+collection in each worker would copy nearly all inherited pages. The master
+therefore runs with gc disabled while it loads (no freed holes in the pages it
+is about to share) and calls gc.freeze() before every fork, which moves all
+existing objects to a permanent generation the collector never touches.
+Once the first freeze has moved the preloaded objects out of reach, the
+master re-enables gc for what it allocates afterwards; workers re-enable it
+right after the fork.
+
+Network clients, database connections and thread pools are not created here:
+each of them is created on first use in each process (see models.llm.get_llm,
+ProcessLocalEmbeddings, ProcessLocalChroma and PrefetchRegistry).
+
+Per-process memory (RSS, PSS, shared and private pages) is read from
+/proc/self/smaps_rollup and reported through /metrics.
+"""
+
+import gc
+import logging
+import os
+from typing import Optional
+
+from utils.metrics import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+# Import settings with fallback
+try:
+    from config.settings import GC_FREEZE_BEFORE_FORK
+except ImportError:
+    GC_FREEZE_BEFORE_FORK = True
+
+SMAPS_ROLLUP_PATH = "/proc/self/smaps_rollup"
+# smaps_rollup fields reported, in kB
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+# Set while disable_gc_for_preload() holds gc off in the master
+_gc_disabled_for_preload = False
+
+
+def disable_gc_for_preload():
+    """
+    Stop automatic collections in the master until the first worker is forked.
+    """
+    global _gc_disabled_for_preload
+    if GC_FREEZE_BEFORE_FORK and gc.isenabled():
+        gc.disable()
+        _gc_disabled_for_preload = True
+
+
+def freeze_before_fork():
+    """
+    Move every object allocated so far out of reach of the collector.
+
+    Called in the master before each fork (workers are re-forked after
+    max_requests), so objects allocated since the previous fork are frozen too.
+    The first call also turns gc back on in the master: collections no longer
+    touch the frozen (shared) objects, and the master must not leak cycles for
+    the rest of its life.
+    """
+    global _gc_disabled_for_preload
+    if GC_FREEZE_BEFORE_FORK:
+        gc.freeze()
+        if _gc_disabled_for_preload:
+            gc.enable()
+            _gc_disabled_for_preload = False
+
+
+def after_fork_in_child():
+    """
+    Re-enable automatic collections in a freshly forked worker.
+    """
+    if GC_FREEZE_BEFORE_FORK:
+        gc.enable()
+
+
+def read_smaps_rollup(path: str = SMAPS_ROLLUP_PATH) -> Optional[dict]:
+    """
+    Read the memory totals of a process.
+
+    Args:
+        path: smaps_rollup file (/proc/<pid>/smaps_rollup)
+
+    Returns:
+        Dict of SMAPS_FIELDS in kB, or None where smaps_rollup is not available
+    """
+    try:
+        with open(path) as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    values = {}
+    for line in lines:
+        key, _, rest = line.partition(":")
+        if key in SMAPS_FIELDS:
+            values[key] = int(rest.split()[0])
+    return values
+
+
+def get_memory_stats() -> dict:
+    """
+    Report this process's memory split into shared and private pages.
+
+    Private_Dirty is what the worker copied (or allocated) for itself; PSS
+    charges shared pages fractionally to each process that maps them, so the
+    PSS of all workers plus the master adds up to their real footprint.
+    """
+    rollup = read_smaps_rollup()
+    stats = {
+        "pid": os.getpid(),
+        "gc_enabled": gc.isenabled(),
+        "gc_frozen_objects": gc.get_freeze_count(),
+    }
+    if rollup is None:
+        return stats
+    stats.update({
+        "rss_mb": round(rollup["Rss"] / 1024, 1),
+        "pss_mb": round(rollup["Pss"] / 1024, 1),
+        "shared_mb": round((rollup["Shared_Clean"] + rollup["Shared_Dirty"]) / 1024, 1),
+        "private_mb": round((rollup["Private_Clean"] + rollup["Private_Dirty"]) / 1024, 1),
+        "private_dirty_mb": round(rollup["Private_Dirty"] / 1024, 1),
+    })
+    return stats
+
+
+register_stats_provider("process_memory", get_memory_stats)
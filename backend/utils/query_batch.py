@@ -0,0 +1,342 @@
+"""
+Batch Query Runner
+Answers many (message, thread_id) items with the support agent, with bounded
+concurrency, emitting each result as soon as it completes.
+
+Items of the same thread run one after another in input order, so a ticket's
+conversation is checkpointed in sequence; different threads run in parallel,
+up to `concurrency` items at a time. run() answers them on its own threads
+(the CLI); arun() submits every item as a run of an AgentExecutor (the API),
+so batch items share the worker's agent run limit, queue and metrics with
+single queries and conversations. admit() submits the first run, embedding
+the messages, and raises ExecutorSaturated when the pool is full; later items
+that find it full wait for one of the batch's own runs (or a short retry
+interval) instead of failing.
+
+Work shared across the items of a batch:
+    classification  identical messages (ignoring case and whitespace) are
+                    categorized and sentiment-scored once; graph nodes go
+                    through shared_result(), which is a no-op outside a batch
+    embeddings      all distinct messages are embedded up front in one
+                    embedding request; the retriever's embed_query calls are
+                    then served from the batch (prepared_query_embedding())
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from utils.agent_executor import AgentExecutor, ExecutorSaturated
+from utils.checkpointer import CheckpointConflictError, persist_run
+from utils.metrics import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+# Import settings with fallback
+try:
+    from config.settings import QUERY_BATCH_CONCURRENCY
+except ImportError:
+    QUERY_BATCH_CONCURRENCY = 8
+
+# How long arun() waits before resubmitting when the agent executor is full
+# and none of the batch's own items is running
+SATURATED_RETRY_SECONDS = 0.5
+
+_current_batch: contextvars.ContextVar[Optional["QueryBatch"]] = contextvars.ContextVar("query_batch", default=None)
+
+_stats_lock = threading.Lock()
+_stats = {
+    "batches": 0,
+    "in_progress": 0,
+    "rejected": 0,
+    "items": 0,
+    "failed": 0,
+    "shared_classifications": 0,
+    "prepared_embeddings": 0,
+    "saturated_waits": 0,
+}
+
+
+def normalize_message(message: str) -> str:
+    return " ".join(message.split()).casefold()
+
+
+def shared_result(kind: str, message: str, compute: Callable[[], Any]) -> Any:
+    """
+    Compute a per-message result once per batch.
+
+    Outside a batch this just calls compute(). Inside one, items with the same
+    normalized message share a single call, including items running concurrently.
+
+    Args:
+        kind: Result name, e.g. "category"
+        message: Customer message the result depends on
+        compute: Produces the result
+    """
+    batch = _current_batch.get()
+    if batch is None:
+        return compute()
+    return batch._shared(kind, normalize_message(message), compute)
+
+
+def prepared_query_embedding(text: str) -> Optional[List[float]]:
+    """
+    Embedding of text computed up front for the current batch, if any.
+    """
+    batch = _current_batch.get()
+    if batch is None:
+        return None
+    return batch._embeddings.get(text)
+
+
+class QueryBatch:
+    """
+    One batch of queries against a compiled support agent.
+    """
+
+    def __init__(
+        self,
+        agent: Any,
+        items: Sequence[Tuple[str, str]],
+        concurrency: int = QUERY_BATCH_CONCURRENCY,
+        embeddings: Any = None
+    ):
+        """
+        Initialize the batch.
+
+        Args:
+            agent: Compiled LangGraph support agent
+            items: (message, thread_id) pairs
+            concurrency: Threads answering items in parallel
+            embeddings: Embeddings of the retriever, to embed all messages in one request
+        """
+        self.agent = agent
+        self.items = list(items)
+        self.concurrency = max(1, concurrency)
+        self.embeddings = embeddings
+
+        self._cancelled = threading.Event()
+        self._executor: Optional[AgentExecutor] = None
+        self._prepared: Optional[Future] = None
+        self._results_lock = threading.Lock()
+        self._shared_futures: Dict[Tuple[str, str], Future] = {}
+        self._embeddings: Dict[str, List[float]] = {}
+        self._summary = {
+            "succeeded": 0,
+            "failed": 0,
+            "shared_classifications": 0,
+            "prepared_embeddings": 0,
+            "saturated_waits": 0,
+        }
+
+    def cancel(self):
+        """
+        Stop starting new items (e.g. the client went away); running items finish.
+        """
+        self._cancelled.set()
+
+    def run(self, emit: Callable[[dict], None]) -> dict:
+        """
+        Answer every item on the batch's own threads, calling emit(result) from them as each completes.
+
+        Returns:
+            Summary (also emitted last, with "done": True)
+        """
+        start = self._begin()
+        error = None
+        try:
+            self._prepare_embeddings()
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="query-batch") as pool:
+                for indexes in self._threads().values():
+                    # Each thread's items run in a context where shared_result() sees this batch
+                    context = contextvars.copy_context()
+                    pool.submit(context.run, self._run_thread, indexes, emit)
+        except Exception as e:
+            error = e
+        return self._finish(start, emit, error)
+
+    def admit(self, executor: AgentExecutor):
+        """
+        Submit the batch's first run (embedding its messages) to executor, for arun() to continue.
+
+        Raises:
+            ExecutorSaturated: If the executor's queue is full; nothing was started
+        """
+        try:
+            _, self._prepared = executor.submit(lambda run: self._prepare_embeddings())
+        except ExecutorSaturated:
+            with _stats_lock:
+                _stats["rejected"] += 1
+            raise
+        self._executor = executor
+
+    async def arun(self, emit: Callable[[dict], None]) -> dict:
+        """
+        Answer every item as a run of the executor given to admit(), calling emit(result) as each completes.
+
+        Emit is called from the executor's threads. If the task is cancelled, no
+        further items start and items already submitted finish.
+
+        Returns:
+            Summary (also emitted last, with "done": True)
+        """
+        start = self._begin()
+        error = None
+        running: Dict[asyncio.Future, deque] = {}
+        try:
+            await asyncio.wrap_future(self._prepared)
+            waiting = deque(deque(indexes) for indexes in self._threads().values())
+            while waiting or running:
+                while waiting and len(running) < self.concurrency and not self._cancelled.is_set():
+                    # The next item of a thread is submitted once the previous one finished
+                    indexes = waiting[0]
+                    try:
+                        _, future = self._executor.submit(self._run_item, indexes[0], emit)
+                    except ExecutorSaturated:
+                        with self._results_lock:
+                            self._summary["saturated_waits"] += 1
+                        break
+                    waiting.popleft()
+                    running[asyncio.wrap_future(future)] = indexes
+                if self._cancelled.is_set():
+                    waiting.clear()
+                if running:
+                    done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                    for future in done:
+                        indexes = running.pop(future)
+                        indexes.popleft()
+                        if indexes:
+                            waiting.append(indexes)
+                elif waiting:
+                    await asyncio.sleep(SATURATED_RETRY_SECONDS)
+        except asyncio.CancelledError:
+            self.cancel()
+            self._finish(start, emit, None)
+            raise
+        except Exception as e:
+            error = e
+        return self._finish(start, emit, error)
+
+    def _begin(self) -> float:
+        with _stats_lock:
+            _stats["batches"] += 1
+            _stats["in_progress"] += 1
+        return time.perf_counter()
+
+    def _finish(self, start: float, emit: Callable[[dict], None], error: Optional[Exception]) -> dict:
+        elapsed = time.perf_counter() - start
+        summary = {"done": True, "items": len(self.items), "concurrency": self.concurrency}
+        if error is not None:
+            summary["error"] = str(error)
+            logger.error(f"Query batch failed: {str(error)}")
+        with _stats_lock:
+            _stats["in_progress"] -= 1
+            _stats["items"] += self._summary["succeeded"] + self._summary["failed"]
+            _stats["failed"] += self._summary["failed"]
+            _stats["shared_classifications"] += self._summary["shared_classifications"]
+            _stats["prepared_embeddings"] += self._summary["prepared_embeddings"]
+            _stats["saturated_waits"] += self._summary["saturated_waits"]
+        summary.update(self._summary)
+        summary.update({
+            "cancelled": self._cancelled.is_set(),
+            "seconds": round(elapsed, 3),
+            "items_per_second": round((self._summary["succeeded"] + self._summary["failed"]) / elapsed, 2) if elapsed else 0.0,
+        })
+        emit(summary)
+        return summary
+
+    def _threads(self) -> Dict[str, List[int]]:
+        threads: Dict[str, List[int]] = OrderedDict()
+        for index, (_, thread_id) in enumerate(self.items):
+            threads.setdefault(thread_id, []).append(index)
+        return threads
+
+    def _prepare_embeddings(self):
+        if self.embeddings is None:
+            return
+        messages = list(dict.fromkeys(message for message, _ in self.items))
+        try:
+            vectors = self.embeddings.embed_documents(messages)
+        except Exception as e:
+            logger.warning(f"Batch embedding of {len(messages)} messages failed, embedding per item: {str(e)}")
+            return
+        self._embeddings = dict(zip(messages, vectors))
+        self._summary["prepared_embeddings"] = len(self._embeddings)
+
+    def _run_thread(self, indexes: List[int], emit: Callable[[dict], None]):
+        _current_batch.set(self)
+        for index in indexes:
+            if self._cancelled.is_set():
+                return
+            emit(self._answer(index))
+
+    def _run_item(self, run, index: int, emit: Callable[[dict], None]):
+        # Runs in a copy of arun()'s context: the setting stays local to this item
+        _current_batch.set(self)
+        emit(self._answer(index))
+
+    def _answer(self, index: int) -> dict:
+        message, thread_id = self.items[index]
+        start = time.perf_counter()
+        result = {"index": index, "thread_id": thread_id}
+        try:
+            for attempt in range(2):
+                state = self.agent.invoke(
+                    {"customer_query": message},
+                    {"configurable": {"thread_id": thread_id}}
+                )
+                # Saved before the result is emitted, so the next item of the thread builds on it
+                try:
+                    persist_run(self.agent.checkpointer, thread_id)
+                    break
+                except CheckpointConflictError as e:
+                    if attempt:
+                        raise
+                    # Another worker answered on this thread meanwhile: answer again on top of its turn
+                    logger.warning(f"{str(e)}; re-running batch item {index}")
+            result.update({
+                "status": "success",
+                "response": state.get("final_response"),
+                "category": state.get("query_category"),
+                "sentiment": state.get("query_sentiment"),
+            })
+            key = "succeeded"
+        except Exception as e:
+            logger.warning(f"Batch item {index} (thread {thread_id}) failed: {str(e)}")
+            result.update({"status": "error", "error": str(e)})
+            key = "failed"
+        result["seconds"] = round(time.perf_counter() - start, 3)
+        with self._results_lock:
+            self._summary[key] += 1
+        return result
+
+    def _shared(self, kind: str, key: str, compute: Callable[[], Any]) -> Any:
+        with self._results_lock:
+            future = self._shared_futures.get((kind, key))
+            owner = future is None
+            if owner:
+                future = self._shared_futures[(kind, key)] = Future()
+            else:
+                self._summary["shared_classifications"] += 1
+        if owner:
+            try:
+                future.set_result(compute())
+            except Exception as e:
+                future.set_exception(e)
+                # Later items with this message try again
+                with self._results_lock:
+                    self._shared_futures.pop((kind, key), None)
+        return future.result()
+
+
+def get_batch_stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
+
+
+register_stats_provider("query_batch", get_batch_stats)
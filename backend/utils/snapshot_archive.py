@@ -0,0 +1,228 @@
+"""
+Streaming Snapshot Archives
+Packs a directory into one compressed tar stream (and back) without staging
+the archive on disk.
+
+The writer side hands out fixed-size compressed blocks as the tar stream is
+produced, so an uploader can stage them as blob blocks while later files are
+still being read. The reader side is a file-like object fed with downloaded
+chunks from another thread, so extraction runs while the download continues.
+
+zstd is used when the zstandard package is installed, gzip otherwise.
+"""
+
+import gzip
+import hashlib
+import io
+import logging
+import queue
+import tarfile
+import zlib
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Conditional import for zstd compression
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+SNAPSHOT_EXTENSIONS = {"zstd": ".tar.zst", "gzip": ".tar.gz"}
+
+
+def snapshot_codec(preferred: str = "zstd") -> str:
+    """
+    Codec used for new snapshots ("zstd" falls back to "gzip" without zstandard).
+    """
+    if preferred == "zstd" and not ZSTD_AVAILABLE:
+        return "gzip"
+    return preferred if preferred in SNAPSHOT_EXTENSIONS else "gzip"
+
+
+class ArchiveBlockWriter(io.RawIOBase):
+    """
+    Write-only stream that compresses what tarfile writes and emits it in blocks.
+    """
+
+    def __init__(self, emit: Callable[[bytes], None], codec: str = "zstd", block_size: int = 4 * 1024 * 1024, level: int = 3):
+        """
+        Args:
+            emit: Called with each compressed block (all but the last are block_size long)
+            codec: "zstd" or "gzip"
+            block_size: Compressed bytes per block
+            level: Compression level
+        """
+        self.emit = emit
+        self.block_size = block_size
+        if codec == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # gzip container
+        self._buffer = bytearray()
+        self.sha256 = hashlib.sha256()
+        self.source_bytes = 0
+        self.archive_bytes = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.source_bytes += len(data)
+        self._push(self._compressor.compress(bytes(data)))
+        return len(data)
+
+    def _push(self, compressed: bytes):
+        self._buffer += compressed
+        while len(self._buffer) >= self.block_size:
+            self._emit(bytes(self._buffer[:self.block_size]))
+            del self._buffer[:self.block_size]
+
+    def _emit(self, block: bytes):
+        self.sha256.update(block)
+        self.archive_bytes += len(block)
+        self.emit(block)
+
+    def finish(self):
+        """
+        Flush the compressor and emit the last (short) block.
+        """
+        self._push(self._compressor.flush())
+        if self._buffer:
+            self._emit(bytes(self._buffer))
+            self._buffer.clear()
+
+
+def write_archive(
+    root: Path,
+    writer: ArchiveBlockWriter,
+    exclude: Iterable[str] = (),
+    on_file: Optional[Callable[[Path], None]] = None
+) -> int:
+    """
+    Stream every file under root into writer as a tar archive.
+
+    Args:
+        root: Directory to archive (paths are stored relative to it)
+        writer: Compressing block writer (finished when this returns)
+        exclude: File names to leave out
+        on_file: Called after each file is written
+
+    Returns:
+        Number of files archived
+    """
+    excluded = set(exclude)
+    files = 0
+    with tarfile.open(fileobj=writer, mode="w|") as tar:
+        for file_path in sorted(root.rglob("*")):
+            if not file_path.is_file() or file_path.name in excluded:
+                continue
+            tar.add(file_path, arcname=file_path.relative_to(root).as_posix(), recursive=False)
+            files += 1
+            if on_file:
+                on_file(file_path)
+    writer.finish()
+    return files
+
+
+class ChunkQueueReader(io.RawIOBase):
+    """
+    Read-only stream over chunks fed from another thread (None marks the end).
+    """
+
+    def __init__(self, max_chunks: int = 8):
+        self._queue: "queue.Queue[Optional[bytes]]" = queue.Queue(max_chunks)
+        self._chunk = b""
+        self._offset = 0
+        self._eof = False
+        self._abandoned = False
+
+    def readable(self) -> bool:
+        return True
+
+    def feed(self, chunk: Optional[bytes]) -> bool:
+        """
+        Queue a chunk, blocking while the queue is full.
+
+        Returns:
+            False once the consumer has stopped reading (stop feeding)
+        """
+        if self._abandoned:
+            return False
+        self._queue.put(chunk)
+        return not self._abandoned
+
+    def abandon(self):
+        """
+        Stop consuming (called by the reader side when done or failed) and
+        unblock a feeder waiting on a full queue.
+        """
+        self._abandoned = True
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def readinto(self, buffer) -> int:
+        while self._offset >= len(self._chunk):
+            if self._eof:
+                return 0
+            chunk = self._queue.get()
+            if chunk is None:
+                self._eof = True
+                return 0
+            self._chunk, self._offset = chunk, 0
+        size = min(len(buffer), len(self._chunk) - self._offset)
+        buffer[:size] = self._chunk[self._offset:self._offset + size]
+        self._offset += size
+        return size
+
+
+def extract_archive(
+    source: ChunkQueueReader,
+    codec: str,
+    target: Path,
+    on_file: Optional[Callable[[tarfile.TarInfo], None]] = None
+) -> int:
+    """
+    Decompress and extract a streamed snapshot archive into target.
+
+    Members with absolute paths, parent references or links leaving target
+    are rejected.
+
+    Args:
+        source: Reader fed with the compressed archive
+        codec: "zstd" or "gzip"
+        target: Directory to extract into
+        on_file: Called with each extracted file member
+
+    Returns:
+        Number of files extracted
+    """
+    try:
+        if codec == "zstd":
+            stream = zstandard.ZstdDecompressor().stream_reader(source)
+        else:
+            stream = gzip.GzipFile(fileobj=source, mode="rb")
+        files = 0
+        with tarfile.open(fileobj=stream, mode="r|") as tar:
+            for member in tar:
+                if hasattr(tarfile, "data_filter"):
+                    tar.extract(member, target, filter="data")
+                else:
+                    if member.name.startswith("/") or ".." in Path(member.name).parts or member.issym() or member.islnk():
+                        raise ValueError(f"Unsafe path in snapshot archive: {member.name}")
+                    tar.extract(member, target)
+                if member.isfile():
+                    files += 1
+                    if on_file:
+                        on_file(member)
+        # Drain the compressed stream so a truncated archive fails here
+        while stream.read(1024 * 1024):
+            pass
+        return files
+    finally:
+        source.abandon()
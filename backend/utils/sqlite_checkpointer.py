@@ -0,0 +1,576 @@
+"""
+SQLite Checkpointer for LangGraph
+Durable local checkpoint storage shared by all gunicorn workers on a node.
+
+The database runs in WAL mode, so any number of workers read concurrently while
+one writes. Each OS thread reads through its own connection. Writes go through
+a single writer thread per process that commits everything queued in one
+transaction (group commit): concurrent runs share a transaction instead of
+contending for the write lock, and put() still returns only after its data is
+committed, so the next request for a thread sees it on any worker.
+
+Old steps are pruned in the same transaction: only the latest N checkpoints of
+each thread and namespace are kept. compact() applies a RetentionPolicy
+(utils.checkpoint_retention) on top, deleting in batches through the same writer.
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+
+try:
+    from langgraph.checkpoint.base import get_checkpoint_metadata
+except ImportError:
+    def get_checkpoint_metadata(config: RunnableConfig, metadata: CheckpointMetadata) -> CheckpointMetadata:
+        return metadata
+
+from utils.checkpoint_retention import RetentionPolicy, is_run_start
+from utils.checkpoint_serde import CheckpointEntityCodec, get_checkpoint_codec
+
+logger = logging.getLogger(__name__)
+
+# Import settings with fallback
+try:
+    from config.settings import (
+        CHECKPOINT_SQLITE_PATH,
+        CHECKPOINT_SQLITE_MAX_PER_THREAD
+    )
+except ImportError:
+    CHECKPOINT_SQLITE_PATH = "./checkpoints.sqlite3"
+    CHECKPOINT_SQLITE_MAX_PER_THREAD = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    checkpoint_type TEXT NOT NULL,
+    checkpoint_codec TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    run_start INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    value_type TEXT NOT NULL,
+    value BLOB NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+) WITHOUT ROWID;
+"""
+
+_CHECKPOINT_COLUMNS = (
+    "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+    "checkpoint_type, checkpoint_codec, checkpoint, metadata_type, metadata"
+)
+
+
+class SQLiteCheckpointer(BaseCheckpointSaver[str]):
+    """
+    LangGraph checkpoint saver on a local SQLite database in WAL mode.
+    """
+
+    def __init__(
+        self,
+        path: str = "./checkpoints.sqlite3",
+        max_checkpoints_per_thread: int = 20,
+        *,
+        serde: Optional[Any] = None,
+        codec: Optional[CheckpointEntityCodec] = None
+    ):
+        """
+        Initialize the SQLite checkpointer (creates the database if missing).
+
+        Args:
+            path: Database file shared by the workers on this node
+            max_checkpoints_per_thread: Checkpoints kept per thread and namespace (0 = unlimited)
+            serde: LangGraph serializer (defaults to JsonPlusSerializer)
+            codec: Compression of checkpoint payloads (defaults to the configured codec)
+        """
+        super().__init__(serde=serde)
+        self.path = path
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+        self.codec = codec or get_checkpoint_codec()
+
+        self._local = threading.local()
+        self._writer_pid: Optional[int] = None
+        self._writer_lock = threading.Lock()
+        self._queue: "queue.Queue[Tuple[List[Tuple[str, tuple]], Future]]" = queue.Queue()
+        self._stats = {
+            "reads": 0,
+            "write_requests": 0,
+            "transactions": 0,
+            "pruned_checkpoints": 0,
+            "write_failures": 0,
+            "commit_ms_total": 0.0,
+            "compacted_checkpoints": 0,
+            "expired_threads": 0,
+        }
+        # Only threads written since the last pass under the same policy need another look
+        self._compacted: Tuple[Optional[RetentionPolicy], float] = (None, 0.0)
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        if "run_start" not in {row[1] for row in conn.execute("PRAGMA table_info(checkpoints)")}:
+            conn.execute("ALTER TABLE checkpoints ADD COLUMN run_start INTEGER NOT NULL DEFAULT 0")
+        logger.info(f"SQLite checkpointer initialized: {path}")
+
+    # --- connections and the writer thread -----------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: commits survive process crashes; only an OS crash can lose the last commits
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=10000")
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per OS thread, recreated after fork
+        if getattr(self._local, "pid", None) != os.getpid():
+            self._local.conn = self._connect()
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    def _ensure_writer(self):
+        if self._writer_pid == os.getpid():
+            return
+        with self._writer_lock:
+            if self._writer_pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            threading.Thread(target=self._write_loop, name="sqlite-checkpointer", daemon=True).start()
+            self._writer_pid = os.getpid()
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            start = time.perf_counter()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                prune = set()
+                for operations, _ in batch:
+                    for kind, params in operations:
+                        if kind == "checkpoint":
+                            conn.execute(
+                                f"INSERT OR REPLACE INTO checkpoints ({_CHECKPOINT_COLUMNS}, run_start, created_at) "
+                                f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                params + (time.time(),)
+                            )
+                            prune.add(params[:2])
+                        elif kind == "write":
+                            conn.execute(
+                                "INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", params
+                            )
+                        elif kind == "write_if_absent":
+                            conn.execute(
+                                "INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", params
+                            )
+                        elif kind == "delete_thread":
+                            conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", params)
+                            conn.execute("DELETE FROM writes WHERE thread_id = ?", params)
+                        elif kind == "expire_thread":
+                            # Skip threads written to since the compactor looked at them
+                            thread_id, cutoff = params
+                            newest = conn.execute(
+                                "SELECT MAX(created_at) FROM checkpoints WHERE thread_id = ?", (thread_id,)
+                            ).fetchone()[0]
+                            if newest is None or newest < cutoff:
+                                conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+                                conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+                        elif kind == "delete_checkpoint":
+                            conn.execute(
+                                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                                params
+                            )
+                            conn.execute(
+                                "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                                params
+                            )
+                        elif kind == "mark_run_start":
+                            conn.execute(
+                                "UPDATE checkpoints SET run_start = 1 "
+                                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                                params
+                            )
+                for thread_id, checkpoint_ns in prune:
+                    self._prune(conn, thread_id, checkpoint_ns)
+                conn.execute("COMMIT")
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                self._stats["write_failures"] += 1
+                logger.error(f"SQLite checkpoint write failed: {str(e)}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self._stats["transactions"] += 1
+            self._stats["commit_ms_total"] += (time.perf_counter() - start) * 1000
+            for _, future in batch:
+                future.set_result(None)
+
+    def _prune(self, conn: sqlite3.Connection, thread_id: str, checkpoint_ns: str):
+        if self.max_checkpoints_per_thread <= 0:
+            return
+        row = conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.max_checkpoints_per_thread - 1)
+        ).fetchone()
+        if row is None:
+            return
+        # Checkpoint ids are time-ordered: everything older than the Nth newest goes
+        cursor = conn.execute(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+            (thread_id, checkpoint_ns, row[0])
+        )
+        conn.execute(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+            (thread_id, checkpoint_ns, row[0])
+        )
+        self._stats["pruned_checkpoints"] += cursor.rowcount
+
+    def _submit(self, operations: List[Tuple[str, tuple]]) -> Future:
+        self._ensure_writer()
+        future: Future = Future()
+        self._stats["write_requests"] += 1
+        self._queue.put((operations, future))
+        return future
+
+    # --- encoding ------------------------------------------------------------
+
+    def _row_to_tuple(self, row: tuple, writes: List[tuple]) -> CheckpointTuple:
+        (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+         checkpoint_type, checkpoint_codec, checkpoint, metadata_type, metadata) = row
+
+        def config_for(checkpoint_id_):
+            return {
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id_,
+                }
+            }
+
+        return CheckpointTuple(
+            config=config_for(checkpoint_id),
+            checkpoint=self.serde.loads_typed((checkpoint_type, self.codec.decompress(checkpoint_codec, checkpoint))),
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=config_for(parent_checkpoint_id) if parent_checkpoint_id else None,
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value in writes
+            ],
+        )
+
+    def _load_writes(self, conn: sqlite3.Connection, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> List[tuple]:
+        return conn.execute(
+            "SELECT task_id, channel, value_type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id)
+        ).fetchall()
+
+    # --- LangGraph saver interface -------------------------------------------
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """
+        Retrieve a checkpoint tuple (latest for the thread unless checkpoint_id is set).
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        conn = self._connection()
+        self._stats["reads"] += 1
+
+        # One read transaction so the checkpoint and its writes are a consistent snapshot
+        conn.execute("BEGIN")
+        try:
+            if checkpoint_id:
+                row = conn.execute(
+                    f"SELECT {_CHECKPOINT_COLUMNS} FROM checkpoints "
+                    f"WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id)
+                ).fetchone()
+            else:
+                row = conn.execute(
+                    f"SELECT {_CHECKPOINT_COLUMNS} FROM checkpoints "
+                    f"WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns)
+                ).fetchone()
+            if row is None:
+                return None
+            writes = self._load_writes(conn, thread_id, checkpoint_ns, row[2])
+        finally:
+            conn.execute("COMMIT")
+        return self._row_to_tuple(row, writes)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[CheckpointTuple]:
+        """
+        List checkpoints newest first.
+        """
+        clauses, params = [], []
+        configurable = config["configurable"] if config else {}
+        if configurable.get("thread_id") is not None:
+            clauses.append("thread_id = ?")
+            params.append(configurable["thread_id"])
+        if configurable.get("checkpoint_ns") is not None:
+            clauses.append("checkpoint_ns = ?")
+            params.append(configurable["checkpoint_ns"])
+        if config and get_checkpoint_id(config):
+            clauses.append("checkpoint_id = ?")
+            params.append(get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            clauses.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        # Metadata filters are applied after decoding, so SQL LIMIT only applies without them
+        sql_limit = f"LIMIT {int(limit)}" if limit is not None and not filter else ""
+
+        conn = self._connection()
+        self._stats["reads"] += 1
+        conn.execute("BEGIN")
+        try:
+            rows = conn.execute(
+                f"SELECT {_CHECKPOINT_COLUMNS} FROM checkpoints {where} ORDER BY checkpoint_id DESC {sql_limit}",
+                params
+            ).fetchall()
+            results = []
+            for row in rows:
+                checkpoint_tuple = self._row_to_tuple(row, self._load_writes(conn, row[0], row[1], row[2]))
+                if filter and not all(checkpoint_tuple.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                results.append(checkpoint_tuple)
+                if limit is not None and len(results) >= limit:
+                    break
+        finally:
+            conn.execute("COMMIT")
+        yield from results
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[CheckpointTuple]:
+        results = await asyncio.to_thread(
+            lambda: [*self.list(config, filter=filter, before=before, limit=limit)]
+        )
+        for checkpoint_tuple in results:
+            yield checkpoint_tuple
+
+    def _put_operations(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_type, checkpoint_bytes = self.serde.dumps_typed(checkpoint)
+        checkpoint_codec, stored = self.codec.compress(checkpoint_bytes)
+        metadata_type, metadata_bytes = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        operations = [("checkpoint", (
+            thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+            checkpoint_type, checkpoint_codec, stored, metadata_type, metadata_bytes, int(is_run_start(metadata))
+        ))]
+        next_config = {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+        return operations, next_config
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        """
+        Store a checkpoint; returns once it is committed.
+        """
+        operations, next_config = self._put_operations(config, checkpoint, metadata)
+        self._submit(operations).result()
+        return next_config
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        operations, next_config = self._put_operations(config, checkpoint, metadata)
+        await asyncio.wrap_future(self._submit(operations))
+        return next_config
+
+    def _writes_operations(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        operations = []
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            value_type, value_bytes = self.serde.dumps_typed(value)
+            # Regular writes are idempotent per (task, idx); special channels overwrite
+            kind = "write_if_absent" if write_idx >= 0 else "write"
+            operations.append((kind, (
+                thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx,
+                channel, value_type, value_bytes, task_path
+            )))
+        return operations
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        """
+        Store intermediate writes for the checkpoint in config.
+        """
+        self._submit(self._writes_operations(config, writes, task_id, task_path)).result()
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        await asyncio.wrap_future(self._submit(self._writes_operations(config, writes, task_id, task_path)))
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._submit([("delete_thread", (thread_id,))]).result()
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.wrap_future(self._submit([("delete_thread", (thread_id,))]))
+
+    def compact(self, policy: RetentionPolicy, batch_size: int = 100) -> dict:
+        """
+        Apply a retention policy: delete expired threads and checkpoints the
+        policy does not keep. Deletes go through the writer in batches, so
+        request writes interleave with a long pass.
+
+        Args:
+            policy: What to keep
+            batch_size: Deletes per transaction
+
+        Returns:
+            Counts of threads scanned, checkpoints deleted and threads expired
+        """
+        started = time.time()
+        compacted_until = self._compacted[1] if self._compacted[0] == policy else 0.0
+        conn = self._connection()
+        groups = conn.execute(
+            "SELECT thread_id, checkpoint_ns, MAX(created_at), COUNT(*) FROM checkpoints "
+            "GROUP BY thread_id, checkpoint_ns"
+        ).fetchall()
+        last_updated: Dict[str, float] = {}
+        for thread_id, _, updated, _ in groups:
+            last_updated[thread_id] = max(updated, last_updated.get(thread_id, 0.0))
+        expired = {thread_id for thread_id, updated in last_updated.items() if policy.is_expired(updated, started)}
+
+        operations = [("expire_thread", (thread_id, started - policy.thread_ttl_seconds)) for thread_id in expired]
+        deleted = 0
+        for thread_id, checkpoint_ns, updated, count in groups:
+            if thread_id in expired or count <= 1 or updated < compacted_until:
+                continue
+            rows = conn.execute(
+                "SELECT checkpoint_id, run_start FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?",
+                (thread_id, checkpoint_ns)
+            ).fetchall()
+            delete, promote = policy.plan([(checkpoint_id, bool(run_start)) for checkpoint_id, run_start in rows])
+            operations += [("mark_run_start", (thread_id, checkpoint_ns, checkpoint_id)) for checkpoint_id in promote]
+            operations += [("delete_checkpoint", (thread_id, checkpoint_ns, checkpoint_id)) for checkpoint_id in delete]
+            deleted += len(delete)
+
+        for start in range(0, len(operations), max(1, batch_size)):
+            self._submit(operations[start:start + batch_size]).result()
+        self._compacted = (policy, started)
+        self._stats["compacted_checkpoints"] += deleted
+        self._stats["expired_threads"] += len(expired)
+        return {"threads_scanned": len(last_updated), "checkpoints_deleted": deleted, "threads_expired": len(expired)}
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    def get_stats(self) -> dict:
+        """
+        Report read/write counts, group-commit batching and database size.
+        """
+        stats = dict(self._stats, path=self.path, max_checkpoints_per_thread=self.max_checkpoints_per_thread)
+        transactions = stats["transactions"]
+        stats["writes_per_transaction"] = stats["write_requests"] / transactions if transactions else 0.0
+        stats["avg_commit_ms"] = stats["commit_ms_total"] / transactions if transactions else 0.0
+        for suffix in ("", "-wal"):
+            file = Path(self.path + suffix)
+            stats[f"db{suffix.replace('-', '_')}_bytes"] = file.stat().st_size if file.exists() else 0
+        return stats
+
+
+def get_sqlite_checkpointer() -> SQLiteCheckpointer:
+    """
+    Factory function for the configured SQLite checkpointer.
+
+    Returns:
+        SQLiteCheckpointer instance
+    """
+    return SQLiteCheckpointer(
+        path=CHECKPOINT_SQLITE_PATH,
+        max_checkpoints_per_thread=CHECKPOINT_SQLITE_MAX_PER_THREAD
+    )
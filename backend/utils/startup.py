@@ -0,0 +1,120 @@
+"""
+Warm Startup Tracking
+Runs the blocking startup steps off the event loop and records their state.
+
+The app binds its port immediately; the lifespan starts a warm-up task that
+runs independent steps in parallel (each in a worker thread). Every step is a
+component with a state (pending, warming, ready, skipped, failed) and timing,
+reported by /ready. The worker is ready once every required component is
+ready or skipped.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+from utils.metrics import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+WARMING = "warming"
+READY = "ready"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+class StartupTracker:
+    """
+    State and timings of the startup components of one worker process.
+    """
+
+    def __init__(self):
+        self._components: Dict[str, dict] = {}
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.finished_seconds: Optional[float] = None
+
+    def register(self, name: str, required: bool = True):
+        """
+        Declare a component up front so /ready lists it before it starts.
+
+        Args:
+            name: Component name
+            required: Whether readiness waits for it
+        """
+        self._components[name] = {"state": PENDING, "required": required, "seconds": None, "error": None}
+
+    def skip(self, name: str, reason: str):
+        self._components.setdefault(name, {"required": False})
+        self._components[name].update(state=SKIPPED, seconds=0.0, error=None, reason=reason)
+
+    async def run(self, name: str, fn: Callable[..., Any], *args) -> Any:
+        """
+        Run a blocking startup step in a worker thread and record its outcome.
+
+        Returns:
+            The step's result
+
+        Raises:
+            Whatever the step raised (after marking the component failed)
+        """
+        component = self._components.setdefault(name, {"required": True})
+        component.update(state=WARMING, error=None)
+        start = time.perf_counter()
+        try:
+            result = await asyncio.to_thread(fn, *args)
+        except Exception as e:
+            component.update(state=FAILED, seconds=round(time.perf_counter() - start, 3), error=str(e))
+            logger.error(f"Startup step {name} failed after {component['seconds']:.1f}s: {str(e)}")
+            raise
+        component.update(state=READY, seconds=round(time.perf_counter() - start, 3))
+        logger.info(f"✓ Startup step {name} ready in {component['seconds']:.1f}s")
+        return result
+
+    def mark_ready(self, name: str):
+        """
+        Mark a failed component ready after a late recovery (e.g. a retry that succeeded).
+        """
+        component = self._components.get(name)
+        if component and component["state"] == FAILED:
+            component.update(state=READY, error=None)
+            logger.info(f"✓ Startup component {name} recovered")
+
+    def finish(self):
+        self.finished_seconds = round(time.perf_counter() - self._started, 3)
+        phases = ", ".join(
+            f"{name} {component['state']} {component['seconds'] or 0:.1f}s"
+            for name, component in self._components.items()
+        )
+        logger.info(f"Startup finished in {self.finished_seconds:.1f}s ({phases})")
+
+    @property
+    def is_ready(self) -> bool:
+        return all(
+            component["state"] in (READY, SKIPPED)
+            for component in self._components.values()
+            if component.get("required")
+        )
+
+    @property
+    def is_finished(self) -> bool:
+        return self.finished_seconds is not None
+
+    def get_status(self) -> dict:
+        """
+        Report readiness, each component's state and timing, and the total warm-up time.
+        """
+        return {
+            "ready": self.is_ready,
+            "finished": self.is_finished,
+            "started_at": self.started_at,
+            "startup_seconds": self.finished_seconds,
+            "components": {name: dict(component) for name, component in self._components.items()},
+        }
+
+
+# Process-wide tracker used by the app lifespan and the /ready endpoint
+startup = StartupTracker()
+register_stats_provider("startup", startup.get_status)
@@ -0,0 +1,366 @@
+"""
+Telemetry Pipeline
+Buffers Application Insights telemetry in memory and exports it in batches
+from a background thread, off the request path.
+
+Request handlers (and the log handler) only append an item to a bounded
+queue; when the queue is full the item is dropped and counted, never waited
+for. The exporter thread sends up to batch_size items per request to the
+ingestion endpoint, at least every flush_interval_seconds. A failed batch is
+counted and discarded (no retries that could back up the queue).
+
+The applicationinsights SDK is only used to build envelopes; sending is done
+here, because the SDK's synchronous flush puts failed items back on its queue
+and retries them in a loop.
+
+Exceptions are reduced to their type name, message and stack frames when
+they are tracked: a queued traceback would keep every frame of the failed
+request (and all its locals) alive until the batch is exported.
+"""
+
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+import traceback
+import urllib.request
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+from utils.metrics import register_stats_provider
+
+logger = logging.getLogger(__name__)
+
+try:
+    from applicationinsights import TelemetryClient
+    from applicationinsights.channel import SynchronousQueue, TelemetryChannel, contracts
+    APPLICATION_INSIGHTS_AVAILABLE = True
+except ImportError:
+    APPLICATION_INSIGHTS_AVAILABLE = False
+    logger.warning("applicationinsights not installed. Install with: pip install applicationinsights")
+
+# Import settings with fallback
+try:
+    from config.settings import (
+        APPLICATIONINSIGHTS_CONNECTION_STRING,
+        TELEMETRY_QUEUE_SIZE,
+        TELEMETRY_BATCH_SIZE,
+        TELEMETRY_FLUSH_INTERVAL_SECONDS,
+        TELEMETRY_EXPORT_TIMEOUT_SECONDS
+    )
+except ImportError:
+    APPLICATIONINSIGHTS_CONNECTION_STRING = None
+    TELEMETRY_QUEUE_SIZE = 10000
+    TELEMETRY_BATCH_SIZE = 100
+    TELEMETRY_FLUSH_INTERVAL_SECONDS = 5.0
+    TELEMETRY_EXPORT_TIMEOUT_SECONDS = 10.0
+
+DEFAULT_INGESTION_ENDPOINT = "https://dc.services.visualstudio.com"
+
+
+class TelemetryItem(NamedTuple):
+    kind: str  # event | metric | exception | trace (TelemetryClient.track_<kind>)
+    timestamp: str
+    args: Tuple
+    kwargs: dict
+
+
+class ExceptionInfo(NamedTuple):
+    type_name: str
+    message: str
+    frames: List[Tuple[str, int, str]]  # (file, line, function), outermost first
+
+
+def capture_exception(type=None, value=None, tb=None) -> ExceptionInfo:
+    """
+    Plain-data copy of an exception (default: the one being handled), holding no frames.
+    """
+    if not (type and value and tb):
+        type, value, tb = sys.exc_info()
+    if type is None:
+        return ExceptionInfo("Exception", "Null", [])
+    return ExceptionInfo(
+        type.__name__,
+        str(value),
+        [(frame.filename, frame.lineno, frame.name) for frame in traceback.extract_tb(tb)]
+    )
+
+
+def parse_connection_string(connection_string: str) -> Tuple[str, str]:
+    """
+    Split an Application Insights connection string.
+
+    A bare instrumentation key is accepted as well.
+
+    Returns:
+        (instrumentation key, track URL)
+    """
+    if "=" not in connection_string:
+        return connection_string.strip(), f"{DEFAULT_INGESTION_ENDPOINT}/v2/track"
+    parts = dict(
+        part.split("=", 1) for part in connection_string.split(";") if "=" in part
+    )
+    endpoint = parts.get("IngestionEndpoint", DEFAULT_INGESTION_ENDPOINT).rstrip("/")
+    return parts["InstrumentationKey"], f"{endpoint}/v2/track"
+
+
+class ApplicationInsightsExporter:
+    """
+    Turns telemetry items into Application Insights envelopes and posts them in one request.
+    """
+
+    def __init__(self, connection_string: str, timeout_seconds: float = 10.0):
+        """
+        Initialize the exporter.
+
+        Args:
+            connection_string: Application Insights connection string (or instrumentation key)
+            timeout_seconds: Timeout of one ingestion request
+        """
+        instrumentation_key, self.url = parse_connection_string(connection_string)
+        self.timeout_seconds = timeout_seconds
+        # Without a sender the SDK queue never sends; export() takes each envelope back out
+        self._envelopes = SynchronousQueue(None)
+        self.client = TelemetryClient(instrumentation_key, TelemetryChannel(queue=self._envelopes))
+
+    def export(self, items: List[TelemetryItem]):
+        """
+        Send a batch.
+
+        Raises:
+            Exception: If the batch was not accepted (urllib errors, HTTP status >= 400)
+        """
+        envelopes = []
+        for item in items:
+            if item.kind == "exception":
+                self._track_exception(*item.args, **item.kwargs)
+            else:
+                getattr(self.client, f"track_{item.kind}")(*item.args, **item.kwargs)
+            envelope = self._envelopes.get()
+            if envelope is not None:
+                # Time of the call, not of the export
+                envelope.time = item.timestamp
+                envelopes.append(envelope)
+        if not envelopes:
+            return
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps([envelope.write() for envelope in envelopes]).encode("utf-8"),
+            headers={"Accept": "application/json", "Content-Type": "application/json; charset=utf-8"},
+            method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout_seconds) as response:
+            response.read()
+
+    def _track_exception(self, info: ExceptionInfo, properties: Optional[dict] = None):
+        # What TelemetryClient.track_exception builds from a live traceback
+        details = contracts.ExceptionDetails()
+        details.id = 1
+        details.outer_id = 0
+        details.type_name = info.type_name
+        details.message = info.message
+        details.has_full_stack = True
+        for level, (file_name, line, method) in enumerate(info.frames):
+            frame = contracts.StackFrame()
+            frame.assembly = "Unknown"
+            frame.file_name = file_name
+            frame.level = level
+            frame.line = line
+            frame.method = method
+            details.parsed_stack.append(frame)
+        details.parsed_stack.reverse()
+
+        data = contracts.ExceptionData()
+        data.handled_at = "UserCode"
+        data.exceptions.append(details)
+        if properties:
+            data.properties = properties
+        self.client.track(data, self.client.context)
+
+
+class TelemetryPipeline:
+    """
+    Bounded queue of telemetry items drained in batches by a background thread.
+
+    Exposes the TelemetryClient calls used by the app, so it can be used in its place.
+    """
+
+    def __init__(
+        self,
+        exporter: Any,
+        max_queue_size: int = 10000,
+        batch_size: int = 100,
+        flush_interval_seconds: float = 5.0
+    ):
+        """
+        Initialize the pipeline (call start() to begin exporting).
+
+        Args:
+            exporter: Object with export(items), e.g. ApplicationInsightsExporter
+            max_queue_size: Items buffered before new ones are dropped
+            batch_size: Maximum items per export
+            flush_interval_seconds: Maximum time an item waits for its batch to fill
+        """
+        self.exporter = exporter
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0,
+            "dropped": 0,
+            "exported": 0,
+            "failed": 0,
+            "batches": 0,
+            "last_export_ms": 0.0,
+            "last_error": None,
+        }
+
+    # TelemetryClient-compatible calls; none of them block or raise
+
+    def track_event(self, name: str, properties: Optional[dict] = None, measurements: Optional[dict] = None):
+        self._enqueue("event", (name, properties, measurements))
+
+    def track_metric(self, name: str, value: float, properties: Optional[dict] = None):
+        self._enqueue("metric", (name, value), {"properties": properties})
+
+    def track_exception(self, type=None, value=None, tb=None, properties: Optional[dict] = None):
+        # Captured here: sys.exc_info() is empty in the exporter thread
+        self._enqueue("exception", (capture_exception(type, value, tb),), {"properties": properties})
+
+    def track_trace(self, message: str, properties: Optional[dict] = None, severity: Optional[str] = None):
+        self._enqueue("trace", (message,), {"properties": properties, "severity": severity})
+
+    def _enqueue(self, kind: str, args: Tuple, kwargs: Optional[dict] = None):
+        item = TelemetryItem(kind, datetime.utcnow().isoformat() + "Z", args, kwargs or {})
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._stats_lock:
+                self._stats["dropped"] += 1
+            return
+        with self._stats_lock:
+            self._stats["enqueued"] += 1
+
+    def start(self):
+        """
+        Start the exporter thread. Must be called in each worker process.
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="telemetry-export", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """
+        Export what is queued and stop, waiting at most timeout seconds.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def flush(self):
+        # Exports happen on their own schedule; kept for TelemetryClient compatibility
+        pass
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._export(batch)
+            elif self._stop.is_set():
+                return
+
+    def _next_batch(self) -> List[TelemetryItem]:
+        try:
+            # Short wait so stop() is noticed promptly
+            batch = [self._queue.get(timeout=min(self.flush_interval_seconds, 1.0))]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval_seconds
+        while len(batch) < self.batch_size:
+            remaining = 0 if self._stop.is_set() else deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _export(self, batch: List[TelemetryItem]):
+        start = time.perf_counter()
+        try:
+            self.exporter.export(batch)
+        except Exception as e:
+            with self._stats_lock:
+                self._stats["failed"] += len(batch)
+                self._stats["last_error"] = str(e)
+            logger.warning(f"Telemetry export of {len(batch)} items failed: {str(e)}")
+            return
+        with self._stats_lock:
+            self._stats["exported"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["last_export_ms"] = (time.perf_counter() - start) * 1000
+
+    def get_stats(self) -> dict:
+        """
+        Report queued, exported, dropped and failed item counts.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update({
+            "queued": self._queue.qsize(),
+            "max_queue_size": self.max_queue_size,
+            "batch_size": self.batch_size,
+            "exporter_running": bool(self._thread and self._thread.is_alive()),
+        })
+        return stats
+
+
+class TelemetryLogHandler(logging.Handler):
+    """
+    Logging handler that forwards records to a TelemetryPipeline as traces.
+    """
+
+    def __init__(self, pipeline: TelemetryPipeline, level: int = logging.NOTSET):
+        super().__init__(level)
+        self.pipeline = pipeline
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.pipeline.track_trace(
+                self.format(record),
+                properties={"logger": record.name, "module": record.module},
+                severity=record.levelname
+            )
+        except Exception:
+            self.handleError(record)
+
+
+def get_telemetry_pipeline(connection_string: Optional[str] = None) -> Optional[TelemetryPipeline]:
+    """
+    Factory function for the Application Insights pipeline.
+
+    Args:
+        connection_string: Defaults to APPLICATIONINSIGHTS_CONNECTION_STRING
+
+    Returns:
+        TelemetryPipeline (not started), or None if not configured or the SDK is missing
+    """
+    connection_string = connection_string or APPLICATIONINSIGHTS_CONNECTION_STRING
+    if not connection_string or not APPLICATION_INSIGHTS_AVAILABLE:
+        return None
+    pipeline = TelemetryPipeline(
+        ApplicationInsightsExporter(connection_string, timeout_seconds=TELEMETRY_EXPORT_TIMEOUT_SECONDS),
+        max_queue_size=TELEMETRY_QUEUE_SIZE,
+        batch_size=TELEMETRY_BATCH_SIZE,
+        flush_interval_seconds=TELEMETRY_FLUSH_INTERVAL_SECONDS
+    )
+    register_stats_provider("telemetry", pipeline.get_stats)
+    return pipeline
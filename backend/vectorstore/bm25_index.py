@@ -0,0 +1,125 @@
+"""
+Local BM25 Inverted Index
+Keyword retrieval over the knowledge base, built alongside the Chroma collection.
+
+Scoring a query needs no embedding round-trip, so exact product terms
+("SDK", "invoice", "refund") can be matched locally in microseconds.
+"""
+
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from langchain.docstore.document import Document
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Small English stopword list; the "Question:"/"Answer:" labels present in
+# every knowledge base entry are dropped as well since they carry no signal.
+STOPWORDS = frozenset("""
+    a an and are as at be by can do does for from have how i in is it my of on or
+    our that the this to what when where which who why will with you your question answer
+""".split())
+
+
+def _stem(token: str) -> str:
+    # Light plural folding so "refunds" matches "refund"; applied to both sides
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase and split text into alphanumeric terms, dropping stopwords.
+    """
+    return [_stem(token) for token in _TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def matches_filter(metadata: dict, metadata_filter: Optional[dict]) -> bool:
+    """
+    Check document metadata against a Chroma-style equality filter.
+
+    Only plain ``{"field": value}`` equality filters are supported, which is
+    what the response nodes use for category filtering.
+    """
+    if not metadata_filter:
+        return True
+    return all(metadata.get(key) == value for key, value in metadata_filter.items())
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an in-memory inverted index of LangChain documents.
+    """
+
+    def __init__(self, documents: List[Document], k1: float = 1.5, b: float = 0.75):
+        """
+        Build the inverted index.
+
+        Args:
+            documents: Documents to index (same list used for the Chroma collection)
+            k1: Term frequency saturation parameter
+            b: Document length normalization parameter
+        """
+        self.documents = list(documents)
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._doc_lengths: List[int] = []
+
+        for doc_id, doc in enumerate(self.documents):
+            tokens = tokenize(doc.page_content)
+            self._doc_lengths.append(len(tokens))
+            for term, frequency in Counter(tokens).items():
+                self._postings[term].append((doc_id, frequency))
+
+        doc_count = len(self.documents)
+        self._avg_doc_length = (sum(self._doc_lengths) / doc_count) if doc_count else 0.0
+        self._idf = {
+            term: math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def search(
+        self,
+        query: str,
+        k: int = 3,
+        metadata_filter: Optional[dict] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Score documents against a query.
+
+        Args:
+            query: Free-text query
+            k: Maximum number of results
+            metadata_filter: Optional equality filter on document metadata
+
+        Returns:
+            List of (document, bm25_score) sorted by descending score
+        """
+        if not self._avg_doc_length:
+            return []
+
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, frequency in self._postings[term]:
+                length_norm = 1 - self.b + self.b * self._doc_lengths[doc_id] / self._avg_doc_length
+                scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+
+        results = []
+        for doc_id, score in sorted(scores.items(), key=lambda item: item[1], reverse=True):
+            doc = self.documents[doc_id]
+            if not matches_filter(doc.metadata, metadata_filter):
+                continue
+            results.append((doc, score))
+            if len(results) >= k:
+                break
+        return results
@@ -1,34 +1,157 @@
+from chromadb.api.client import SharedSystemClient
 from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
 from langchain_openai import AzureOpenAIEmbeddings
 import os
+import threading
+from utils.query_batch import prepared_query_embedding
 from config.settings import (
     AZURE_OPENAI_API_KEY,
     AZURE_OPENAI_ENDPOINT,
-    AZURE_DEPLOYMENT_NAME,
-    AZURE_API_VERSION
+    AZURE_API_VERSION,
+    EMBEDDING_DEPLOYMENT,
+    EMBEDDING_TIMEOUT_SECONDS
 )
 
-def create_vector_db(docs):
-    #os.environ["CHROMA_TELEMETRY_ENABLED"] = "True"
-    print("step1")
-    embed_model = AzureOpenAIEmbeddings(
-        azure_deployment="text-embedding-3-small",
+# Deployment of collections persisted before the deployment was recorded in their metadata
+DEFAULT_EMBEDDING_DEPLOYMENT = "text-embedding-3-small"
+
+# Retrieval defaults shared by every vector index format
+DEFAULT_SEARCH_KWARGS = {"k": 3, "score_threshold": 0.2}
+
+class ProcessLocalEmbeddings(Embeddings):
+    """
+    Embeddings that create their Azure OpenAI client on first use in each process.
+
+    A knowledge base loaded in the gunicorn master is shared with the forked
+    workers, including the embedding function inside the vector store; the
+    HTTP connections opened while warming it in the master must not be used
+    by several processes at once.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get(self) -> Embeddings:
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._client = self._factory()
+                    self._pid = pid
+        return self._client
+
+    def embed_documents(self, texts):
+        return self._get().embed_documents(texts)
+
+    def embed_query(self, text):
+        # Messages of a query batch are embedded together up front
+        vector = prepared_query_embedding(text)
+        if vector is not None:
+            return vector
+        return self._get().embed_query(text)
+
+    async def aembed_documents(self, texts):
+        return await self._get().aembed_documents(texts)
+
+    async def aembed_query(self, text):
+        return await self._get().aembed_query(text)
+
+_client_cache_pid = os.getpid()
+_client_cache_lock = threading.Lock()
+
+def reset_inherited_chroma_clients():
+    """
+    Forget Chroma clients created by the parent process (call before opening one after a fork).
+
+    chromadb keeps one client system per persist directory for the whole
+    process; a forked worker would otherwise get the master's, including its
+    SQLite connections.
+    """
+    global _client_cache_pid
+    pid = os.getpid()
+    if _client_cache_pid != pid:
+        with _client_cache_lock:
+            if _client_cache_pid != pid:
+                SharedSystemClient.clear_system_cache()
+                _client_cache_pid = pid
+
+class ProcessLocalChroma:
+    """
+    Chroma store that reopens its persisted collection on first use in each process.
+
+    A knowledge base preloaded in the gunicorn master is shared with the forked
+    workers; its documents and BM25/FAQ indexes are read-only and stay shared
+    copy-on-write, but the Chroma client and its SQLite connections must not
+    be used across processes. Each worker opens its own client on the same
+    collection.
+    """
+
+    def __init__(self, db: Chroma, collection_name: str, persist_directory: str):
+        self.collection_name = collection_name
+        self.persist_directory = persist_directory
+        self.embeddings = db.embeddings
+        self._db = db
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def _get(self) -> Chroma:
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    reset_inherited_chroma_clients()
+                    self._db = Chroma(
+                        collection_name=self.collection_name,
+                        embedding_function=self.embeddings,
+                        persist_directory=self.persist_directory
+                    )
+                    self._pid = pid
+        return self._db
+
+    def similarity_search_with_relevance_scores(self, query, k=4, **kwargs):
+        return self._get().similarity_search_with_relevance_scores(query, k=k, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+def create_embeddings():
+    return ProcessLocalEmbeddings(lambda: AzureOpenAIEmbeddings(
+        azure_deployment=EMBEDDING_DEPLOYMENT,
         azure_endpoint=AZURE_OPENAI_ENDPOINT,
         openai_api_version=AZURE_API_VERSION,
-        openai_api_key=AZURE_OPENAI_API_KEY
-    )
+        openai_api_key=AZURE_OPENAI_API_KEY,
+        timeout=EMBEDDING_TIMEOUT_SECONDS
+    ))
+
+def create_vector_db(docs, collection_name='knowledge_base', persist_directory="./knowledge_base"):
+    #os.environ["CHROMA_TELEMETRY_ENABLED"] = "True"
+    print("step1")
+    embed_model = create_embeddings()
     print("step2")
-    db = Chroma.from_documents(
-        documents=docs,
-        collection_name='knowledge_base',
-        embedding=embed_model,
-        collection_metadata={"hnsw:space": "cosine"},
-        persist_directory="./knowledge_base"
+    db = Chroma(
+        collection_name=collection_name,
+        embedding_function=embed_model,
+        collection_metadata={"hnsw:space": "cosine", "embedding_deployment": EMBEDDING_DEPLOYMENT},
+        persist_directory=persist_directory
     )
+    # Reuse a complete persisted collection instead of re-embedding (and
+    # duplicating) every document; rebuild a partial one from scratch, and one
+    # embedded by another deployment (collections from before this was recorded
+    # used the original default)
+    existing = len(db.get(include=[])["ids"])
+    built_with = (db._collection.metadata or {}).get("embedding_deployment", DEFAULT_EMBEDDING_DEPLOYMENT)
+    if existing != len(docs) or built_with != EMBEDDING_DEPLOYMENT:
+        if existing:
+            db.reset_collection()
+        db.add_documents(docs)
     print("step3")
     retriever = db.as_retriever(
         search_type="similarity_score_threshold",
-        search_kwargs={"k": 3, "score_threshold": 0.2}
+        search_kwargs=dict(DEFAULT_SEARCH_KWARGS)
     )
 
     return retriever
@@ -0,0 +1,147 @@
+"""
+FAQ Question Index
+Parses the "Question: ... Answer: ..." knowledge base entries at ingestion time
+and answers near-exact question matches directly, bypassing LLM generation.
+
+Similarity is TF-IDF cosine over question terms, computed locally, so a
+lookup costs no network round-trip.
+"""
+
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from langchain.docstore.document import Document
+
+from vectorstore.bm25_index import tokenize
+
+_FAQ_PATTERN = re.compile(r"^\s*Question:\s*(?P<question>.+?)\s*Answer:\s*(?P<answer>.+?)\s*$", re.DOTALL)
+
+
+class FAQMatch(NamedTuple):
+    question: str
+    answer: str
+    category: str
+    similarity: float
+
+
+def parse_faq_text(text: str) -> Optional[Tuple[str, str]]:
+    """
+    Split a knowledge base entry into its question and answer.
+
+    Returns:
+        (question, answer) or None if the text is not in FAQ form
+    """
+    match = _FAQ_PATTERN.match(text)
+    if not match:
+        return None
+    return match.group("question"), match.group("answer")
+
+
+class FAQIndex:
+    """
+    Precomputed TF-IDF index over stored FAQ questions.
+    """
+
+    def __init__(self, entries: List[Tuple[str, str, str]], threshold: float = 0.85):
+        """
+        Build the question index.
+
+        Args:
+            entries: (question, answer, category) tuples
+            threshold: Minimum cosine similarity for a direct answer
+        """
+        self.entries = entries
+        self.threshold = threshold
+
+        doc_freq: Counter = Counter()
+        term_counts = []
+        for question, _, _ in entries:
+            counts = Counter(tokenize(question))
+            term_counts.append(counts)
+            doc_freq.update(counts.keys())
+
+        entry_count = len(entries)
+        self._idf = {
+            term: math.log((1 + entry_count) / (1 + df)) + 1
+            for term, df in doc_freq.items()
+        }
+        # Terms never seen in a stored question get the maximum weight, so
+        # extra words in the query pull the similarity down
+        self._unknown_idf = math.log(1 + entry_count) + 1
+        self._vectors = [self._normalize(self._weigh(counts)) for counts in term_counts]
+
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"lookups": 0, "hits": 0})
+
+    @classmethod
+    def from_documents(cls, documents: List[Document], threshold: float = 0.85) -> "FAQIndex":
+        """
+        Build the index from knowledge base documents, skipping non-FAQ entries.
+        """
+        entries = []
+        for doc in documents:
+            parsed = parse_faq_text(doc.page_content)
+            if parsed:
+                entries.append((parsed[0], parsed[1], str(doc.metadata.get("category", "")).lower()))
+        return cls(entries, threshold=threshold)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _weigh(self, counts: Counter) -> Dict[str, float]:
+        return {term: count * self._idf.get(term, self._unknown_idf) for term, count in counts.items()}
+
+    @staticmethod
+    def _normalize(vector: Dict[str, float]) -> Dict[str, float]:
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+    def lookup(self, query: str, category: Optional[str] = None) -> Optional[FAQMatch]:
+        """
+        Find a stored question matching the query closely enough to reuse its answer.
+
+        Args:
+            query: Customer query
+            category: Restrict matches to this category (case-insensitive)
+
+        Returns:
+            FAQMatch above the threshold, or None
+        """
+        category = (category or "").lower()
+        query_vector = self._normalize(self._weigh(Counter(tokenize(query))))
+
+        best_index, best_similarity = None, 0.0
+        for index, (vector, entry) in enumerate(zip(self._vectors, self.entries)):
+            if category and entry[2] != category:
+                continue
+            similarity = sum(weight * vector.get(term, 0.0) for term, weight in query_vector.items())
+            if similarity > best_similarity:
+                best_index, best_similarity = index, similarity
+
+        hit = best_index is not None and best_similarity >= self.threshold
+        with self._stats_lock:
+            self._stats[category or "all"]["lookups"] += 1
+            if hit:
+                self._stats[category or "all"]["hits"] += 1
+
+        if not hit:
+            return None
+        question, answer, entry_category = self.entries[best_index]
+        return FAQMatch(question, answer, entry_category, best_similarity)
+
+    def get_stats(self) -> dict:
+        """
+        Report direct-answer hit rate per category.
+        """
+        with self._stats_lock:
+            per_category = {name: dict(counts) for name, counts in self._stats.items()}
+        for counts in per_category.values():
+            counts["hit_rate"] = counts["hits"] / counts["lookups"] if counts["lookups"] else 0.0
+        return {
+            "questions_indexed": len(self.entries),
+            "threshold": self.threshold,
+            "categories": per_category,
+        }
@@ -0,0 +1,255 @@
+"""
+Hybrid BM25 + Vector Retrieval
+Fuses local BM25 keyword results with Chroma similarity results using
+reciprocal rank fusion, with an optional lexical fast path that skips the
+query embedding entirely when the keyword match is decisive.
+
+Modes:
+    vector     - Chroma similarity search only (previous behaviour)
+    hybrid     - BM25 and vector results fused with reciprocal rank fusion
+    fast_path  - hybrid, but decisive BM25 matches are returned without embedding
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from langchain.docstore.document import Document
+
+from vectorstore.bm25_index import BM25Index
+from vectorstore.chroma_store import DEFAULT_SEARCH_KWARGS, ProcessLocalChroma, create_embeddings, create_vector_db
+
+logger = logging.getLogger(__name__)
+
+# Import settings with fallback
+try:
+    from config.settings import (
+        RETRIEVAL_MODE,
+        BM25_FAST_PATH_MIN_SCORE,
+        BM25_FAST_PATH_MARGIN,
+        VECTOR_INDEX_FORMAT,
+        VECTOR_INDEX_RERANK,
+        VECTOR_INDEX_RERANK_CANDIDATES
+    )
+except ImportError:
+    RETRIEVAL_MODE = "hybrid"
+    BM25_FAST_PATH_MIN_SCORE = 5.0
+    BM25_FAST_PATH_MARGIN = 1.5
+    VECTOR_INDEX_FORMAT = "chroma"
+    VECTOR_INDEX_RERANK = False
+    VECTOR_INDEX_RERANK_CANDIDATES = 12
+
+RETRIEVAL_MODES = ("vector", "hybrid", "fast_path")
+QUANTIZED_SUBDIRECTORY = "quantized"
+
+
+class HybridRetriever:
+    """
+    Retriever combining an in-memory BM25 index with a Chroma vector store.
+    """
+
+    def __init__(
+        self,
+        vectorstore,
+        documents: List[Document],
+        mode: str = "hybrid",
+        k: int = 3,
+        score_threshold: float = 0.2,
+        fetch_k: Optional[int] = None,
+        rrf_k: int = 60,
+        fast_path_min_score: float = 5.0,
+        fast_path_margin: float = 1.5
+    ):
+        """
+        Initialize the hybrid retriever.
+
+        Args:
+            vectorstore: LangChain vector store (Chroma) holding the same documents
+            documents: Documents to build the BM25 index from
+            mode: One of 'vector', 'hybrid' or 'fast_path'
+            k: Number of documents returned per query
+            score_threshold: Minimum relevance score for vector results
+            fetch_k: Candidates fetched from each retriever before fusion
+            rrf_k: Reciprocal rank fusion damping constant
+            fast_path_min_score: Minimum top BM25 score for a decisive lexical match
+            fast_path_margin: Required ratio between the top two BM25 scores
+        """
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}'. Expected one of {RETRIEVAL_MODES}")
+
+        self.vectorstore = vectorstore
+        self.bm25 = BM25Index(documents)
+        self.mode = mode
+        self.k = k
+        self.score_threshold = score_threshold
+        self.fetch_k = fetch_k or k * 2
+        self.rrf_k = rrf_k
+        self.fast_path_min_score = fast_path_min_score
+        self.fast_path_margin = fast_path_margin
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "queries": 0,
+            "fast_path_hits": 0,
+            "vector_searches": 0,
+            "lexical_ms_total": 0.0,
+            "vector_ms_total": 0.0,
+        }
+
+    def invoke(
+        self,
+        query: str,
+        metadata_filter: Optional[dict] = None,
+        k: Optional[int] = None
+    ) -> List[Document]:
+        """
+        Retrieve the most relevant documents for a query.
+
+        Args:
+            query: Customer query
+            metadata_filter: Optional equality filter, e.g. {'category': 'billing'}
+            k: Override for the number of documents returned
+
+        Returns:
+            Up to k documents, best first
+        """
+        k = k or self.k
+        fetch_k = max(self.fetch_k, k)
+        lexical: List[Tuple[Document, float]] = []
+        if self.mode != "vector":
+            start = time.perf_counter()
+            lexical = self.bm25.search(query, k=fetch_k, metadata_filter=metadata_filter)
+            self._record("lexical_ms_total", (time.perf_counter() - start) * 1000)
+
+            if self.mode == "fast_path" and self._is_decisive(lexical):
+                self._record("fast_path_hits", 1)
+                self._record("queries", 1)
+                logger.debug(f"Lexical fast path hit (top BM25 score {lexical[0][1]:.2f})")
+                return [doc for doc, _ in lexical[:k]]
+
+        start = time.perf_counter()
+        vector = self._vector_search(query, metadata_filter, fetch_k)
+        self._record("vector_ms_total", (time.perf_counter() - start) * 1000)
+        self._record("vector_searches", 1)
+        self._record("queries", 1)
+
+        if self.mode == "vector":
+            return [doc for doc, _ in vector[:k]]
+        return self._fuse(lexical, vector, k)
+
+    def _vector_search(
+        self,
+        query: str,
+        metadata_filter: Optional[dict],
+        fetch_k: int
+    ) -> List[Tuple[Document, float]]:
+        results = self.vectorstore.similarity_search_with_relevance_scores(
+            query, k=fetch_k, filter=metadata_filter
+        )
+        return [(doc, score) for doc, score in results if score >= self.score_threshold]
+
+    def _is_decisive(self, lexical: List[Tuple[Document, float]]) -> bool:
+        if not lexical or lexical[0][1] < self.fast_path_min_score:
+            return False
+        if len(lexical) == 1:
+            return True
+        return lexical[0][1] >= self.fast_path_margin * lexical[1][1]
+
+    def _fuse(
+        self,
+        lexical: List[Tuple[Document, float]],
+        vector: List[Tuple[Document, float]],
+        k: int
+    ) -> List[Document]:
+        fused_scores: Dict[str, float] = {}
+        docs_by_key: Dict[str, Document] = {}
+        for ranked in (lexical, vector):
+            for rank, (doc, _) in enumerate(ranked):
+                key = doc.page_content
+                fused_scores[key] = fused_scores.get(key, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+                docs_by_key.setdefault(key, doc)
+
+        best = sorted(fused_scores, key=fused_scores.get, reverse=True)[:k]
+        return [docs_by_key[key] for key in best]
+
+    def _record(self, key: str, value: float):
+        with self._stats_lock:
+            self._stats[key] += value
+
+    def get_stats(self) -> dict:
+        """
+        Report fast-path rate and retrieval latency.
+
+        Returns:
+            Dict of counters plus derived averages and estimated savings
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+
+        queries = stats["queries"]
+        vector_searches = stats["vector_searches"]
+        avg_vector_ms = stats["vector_ms_total"] / vector_searches if vector_searches else 0.0
+        stats.update({
+            "mode": self.mode,
+            "fast_path_rate": stats["fast_path_hits"] / queries if queries else 0.0,
+            "avg_lexical_ms": stats["lexical_ms_total"] / queries if queries else 0.0,
+            "avg_vector_ms": avg_vector_ms,
+            # Each fast path hit avoids one embedding round-trip plus vector search
+            "estimated_latency_saved_ms": stats["fast_path_hits"] * avg_vector_ms,
+        })
+        return stats
+
+
+def create_hybrid_retriever(
+    docs: List[Document],
+    mode: Optional[str] = None,
+    collection_name: str = "knowledge_base",
+    persist_directory: str = "./knowledge_base"
+) -> HybridRetriever:
+    """
+    Build the vector index and a BM25 index over the same documents.
+
+    The vector index is a Chroma collection (reopened by each process that
+    uses it, see ProcessLocalChroma), or a scalar-quantized index under
+    <persist_directory>/quantized/<collection_name> when VECTOR_INDEX_FORMAT is
+    float16 or int8.
+
+    Args:
+        docs: Knowledge base documents
+        mode: Retrieval mode; defaults to RETRIEVAL_MODE from settings
+        collection_name: Chroma collection (or quantized index directory) to create or reuse
+        persist_directory: Vector index persistence directory
+
+    Returns:
+        HybridRetriever instance
+    """
+    if VECTOR_INDEX_FORMAT == "chroma":
+        vectorstore = ProcessLocalChroma(
+            create_vector_db(docs, collection_name=collection_name, persist_directory=persist_directory).vectorstore,
+            collection_name=collection_name,
+            persist_directory=persist_directory
+        )
+    else:
+        from vectorstore.quantized_store import QuantizedVectorStore
+        vectorstore = QuantizedVectorStore.from_documents(
+            docs,
+            create_embeddings(),
+            directory=os.path.join(persist_directory, QUANTIZED_SUBDIRECTORY, collection_name),
+            index_format=VECTOR_INDEX_FORMAT,
+            rerank=VECTOR_INDEX_RERANK,
+            rerank_candidates=VECTOR_INDEX_RERANK_CANDIDATES
+        )
+
+    retriever = HybridRetriever(
+        vectorstore,
+        docs,
+        mode=mode or RETRIEVAL_MODE,
+        k=DEFAULT_SEARCH_KWARGS["k"],
+        score_threshold=DEFAULT_SEARCH_KWARGS["score_threshold"],
+        fast_path_min_score=BM25_FAST_PATH_MIN_SCORE,
+        fast_path_margin=BM25_FAST_PATH_MARGIN
+    )
+    logger.info(f"Hybrid retriever ready: {len(docs)} documents, mode={retriever.mode}")
+    return retriever
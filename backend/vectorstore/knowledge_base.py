@@ -0,0 +1,399 @@
+"""
+Knowledge Base Manager
+Owns the live retriever and FAQ index and swaps them atomically on reload.
+
+A reload builds a new versioned Chroma collection off the request path, warms
+it, then replaces the snapshot reference in a single assignment. Requests that
+already took the old snapshot keep using it until they finish; nothing on the
+request path waits for a reload.
+
+Gunicorn workers converge by each polling the source file from a watcher
+thread. Builds are serialized across workers with a file lock, so the first
+worker embeds the documents and the others reuse the persisted collection.
+
+Workers converge one watch interval apart, so a collection is only dropped
+once no worker uses it: each worker records the versions it serves (live and
+previous) in a marker file next to the build lock, on every reload and every
+watcher tick. Versions no running worker has recorded within
+LIVE_VERSION_TTL_INTERVALS watch intervals are dropped.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from data.load_documents import parse_documents
+from vectorstore.faq_index import FAQIndex
+from vectorstore.hybrid_retriever import QUANTIZED_SUBDIRECTORY, HybridRetriever, create_hybrid_retriever
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:
+    # Windows local development runs a single process; no cross-worker lock needed
+    fcntl = None
+
+# Import settings with fallback
+try:
+    from config.settings import (
+        KB_SOURCE_PATH,
+        KB_PERSIST_DIRECTORY,
+        KB_WATCH_INTERVAL_SECONDS,
+        FAQ_MATCH_THRESHOLD
+    )
+except ImportError:
+    KB_SOURCE_PATH = "./data/router_agent_documents.json"
+    KB_PERSIST_DIRECTORY = "./knowledge_base"
+    KB_WATCH_INTERVAL_SECONDS = 30.0
+    FAQ_MATCH_THRESHOLD = 0.85
+
+COLLECTION_PREFIX = "knowledge_base_"
+BUILD_LOCK_FILE = ".kb_build.lock"
+LIVE_VERSIONS_FILE = ".kb_live_versions.json"
+# A worker's recorded versions count as in use for this many watch intervals
+# after it last recorded them (it re-records them every interval)
+LIVE_VERSION_TTL_INTERVALS = 2
+
+
+def _process_alive(pid: int) -> bool:
+    if fcntl is None:
+        # Windows: single process, and os.kill would terminate it
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class KnowledgeBaseSnapshot(NamedTuple):
+    version: str
+    retriever: HybridRetriever
+    faq_index: FAQIndex
+    document_count: int
+    loaded_at: str
+
+
+class KnowledgeBaseManager:
+    """
+    Holds the current knowledge base snapshot and rebuilds it in the background.
+    """
+
+    def __init__(
+        self,
+        source_path: str = "./data/router_agent_documents.json",
+        persist_directory: str = "./knowledge_base",
+        watch_interval: float = 30.0,
+        faq_threshold: float = 0.85
+    ):
+        """
+        Initialize the manager (nothing is loaded until load() is called).
+
+        Args:
+            source_path: JSON file with the knowledge base documents
+            persist_directory: Chroma persistence directory
+            watch_interval: Seconds between source file checks; 0 disables the watcher
+            faq_threshold: Similarity threshold for FAQ direct answers
+        """
+        self.source_path = Path(source_path)
+        self.persist_directory = Path(persist_directory)
+        self.watch_interval = watch_interval
+        self.faq_threshold = faq_threshold
+
+        self._snapshot: Optional[KnowledgeBaseSnapshot] = None
+        # Version the live snapshot replaced; requests that took it may still be running
+        self._previous_version: Optional[str] = None
+        self._source_fingerprint: Optional[Tuple[int, int]] = None
+        self._reload_lock = threading.Lock()
+        self._stop_watching = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._reload_listeners: List[Callable[[str], None]] = []
+        self._stats = {
+            "reloads": 0,
+            "reload_failures": 0,
+            "last_reload_seconds": 0.0,
+            "last_reload_error": None,
+        }
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._snapshot is not None
+
+    def current(self) -> KnowledgeBaseSnapshot:
+        """
+        Return the live snapshot. Callers should take it once per request.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            raise RuntimeError("Knowledge base has not been loaded")
+        return snapshot
+
+    def load(self) -> KnowledgeBaseSnapshot:
+        """
+        Load the knowledge base synchronously (startup path).
+        """
+        self.reload()
+        return self.current()
+
+    def reload(self) -> bool:
+        """
+        Rebuild from the source file if its content changed, then swap it in.
+
+        Returns:
+            True if a new snapshot was swapped in
+        """
+        with self._reload_lock:
+            start = time.perf_counter()
+            try:
+                fingerprint = self._fingerprint_source()
+                raw = self.source_path.read_bytes()
+                version = hashlib.sha256(raw).hexdigest()[:12]
+                if self._snapshot and self._snapshot.version == version:
+                    self._source_fingerprint = fingerprint
+                    return False
+
+                snapshot = self._build(version, raw)
+                self._warm(snapshot)
+
+                previous = self._snapshot
+                self._snapshot = snapshot
+                self._previous_version = previous.version if previous else None
+                self._source_fingerprint = fingerprint
+
+                elapsed = time.perf_counter() - start
+                self._stats["reloads"] += 1
+                self._stats["last_reload_seconds"] = elapsed
+                self._stats["last_reload_error"] = None
+                logger.info(
+                    f"✓ Knowledge base version {version} live "
+                    f"({snapshot.document_count} documents, {elapsed:.1f}s)"
+                )
+
+                self._drop_stale_collections()
+                for listener in self._reload_listeners:
+                    try:
+                        listener(version)
+                    except Exception as e:
+                        logger.warning(f"Knowledge base reload listener failed: {str(e)}")
+                return True
+            except Exception as e:
+                self._stats["reload_failures"] += 1
+                self._stats["last_reload_error"] = str(e)
+                if self._snapshot is None:
+                    raise
+                logger.error(f"Knowledge base reload failed, keeping version {self._snapshot.version}: {str(e)}")
+                return False
+
+    def request_reload(self) -> bool:
+        """
+        Start a reload on a background thread.
+
+        Returns:
+            False if a reload is already running
+        """
+        if self._reload_lock.locked():
+            return False
+        threading.Thread(target=self.reload, name="kb-reload", daemon=True).start()
+        return True
+
+    def add_reload_listener(self, callback: Callable[[str], None]):
+        """
+        Call callback(version) after each new snapshot is live and stale collections are dropped.
+        """
+        self._reload_listeners.append(callback)
+
+    @contextmanager
+    def index_lock(self):
+        """
+        Hold off builds and collection drops (in every worker) while the caller
+        reads the persisted index files. Queries are not blocked.
+        """
+        with self._build_lock():
+            yield
+
+    def start_watcher(self):
+        """
+        Poll the source file for changes. Must be called in each worker process.
+        """
+        if self.watch_interval <= 0 or (self._watcher and self._watcher.is_alive()):
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch, name="kb-watcher", daemon=True)
+        self._watcher.start()
+        logger.info(f"Knowledge base watcher started (every {self.watch_interval:.0f}s)")
+
+    def stop_watcher(self):
+        self._stop_watching.set()
+        # This worker is going away; its versions no longer hold back collection drops
+        try:
+            self._update_live_versions(remove=True)
+        except Exception as e:
+            logger.warning(f"Failed to clear live knowledge base versions: {str(e)}")
+
+    def _watch(self):
+        while not self._stop_watching.wait(self.watch_interval):
+            try:
+                if self._snapshot is not None:
+                    self._update_live_versions()
+                if self._fingerprint_source() != self._source_fingerprint:
+                    logger.info(f"Knowledge base source changed: {self.source_path}")
+                    self.reload()
+            except Exception as e:
+                logger.warning(f"Knowledge base watcher error: {str(e)}")
+
+    def _fingerprint_source(self) -> Tuple[int, int]:
+        stat = self.source_path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def _build(self, version: str, raw: bytes) -> KnowledgeBaseSnapshot:
+        docs = parse_documents(json.loads(raw))
+        with self._build_lock():
+            retriever = create_hybrid_retriever(
+                docs,
+                collection_name=f"{COLLECTION_PREFIX}{version}",
+                persist_directory=str(self.persist_directory)
+            )
+        return KnowledgeBaseSnapshot(
+            version=version,
+            retriever=retriever,
+            faq_index=FAQIndex.from_documents(docs, threshold=self.faq_threshold),
+            document_count=len(docs),
+            loaded_at=datetime.utcnow().isoformat()
+        )
+
+    @staticmethod
+    def _warm(snapshot: KnowledgeBaseSnapshot):
+        # Touch the vector index and the embedding client before taking traffic
+        sample = snapshot.faq_index.entries[0][0] if len(snapshot.faq_index) else "support"
+        snapshot.retriever.invoke(sample)
+
+    @contextmanager
+    def _build_lock(self):
+        self.persist_directory.mkdir(parents=True, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(self.persist_directory / BUILD_LOCK_FILE, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _own_versions(self) -> List[str]:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return []
+        return [snapshot.version] + ([self._previous_version] if self._previous_version else [])
+
+    def _update_live_versions(self, remove: bool = False) -> Optional[set]:
+        """
+        Record this worker's versions in the marker file and return every version in use.
+
+        The marker file is locked on its own, so recording never waits for a
+        build or backup holding the build lock. Entries of workers that exited
+        or stopped recording are removed.
+
+        Args:
+            remove: Remove this worker's entry instead of refreshing it
+
+        Returns:
+            Versions recorded by running workers (including this one) within the TTL,
+            or None if the file was unreadable (other workers' versions are unknown)
+        """
+        self.persist_directory.mkdir(parents=True, exist_ok=True)
+        with open(self.persist_directory / LIVE_VERSIONS_FILE, "a+") as marker:
+            if fcntl is not None:
+                fcntl.flock(marker, fcntl.LOCK_EX)
+            marker.seek(0)
+            content = marker.read()
+            try:
+                workers = json.loads(content) if content else {}
+                readable = isinstance(workers, dict)
+            except ValueError:
+                readable = False
+            if not readable:
+                workers = {}
+
+            now = time.time()
+            # Without a watcher nobody re-records: entries last as long as their process
+            ttl = self.watch_interval * LIVE_VERSION_TTL_INTERVALS if self.watch_interval > 0 else None
+            live = {
+                pid: entry for pid, entry in workers.items()
+                if isinstance(entry, dict) and _process_alive(int(pid))
+                and (ttl is None or now - entry.get("recorded_at", 0) <= ttl)
+            }
+            live.pop(str(os.getpid()), None)
+            if not remove and self._snapshot is not None:
+                live[str(os.getpid())] = {"versions": self._own_versions(), "recorded_at": now}
+
+            marker.seek(0)
+            marker.truncate()
+            marker.write(json.dumps(live))
+            marker.flush()
+        if not readable:
+            return None
+        return {version for entry in live.values() for version in entry.get("versions", [])}
+
+    def _drop_stale_collections(self):
+        try:
+            with self._build_lock():
+                in_use = self._update_live_versions()
+                if in_use is None:
+                    logger.warning("Live knowledge base versions unreadable, not dropping collections this time")
+                    return
+                keep = in_use | set(self._own_versions())
+                if (self.persist_directory / "chroma.sqlite3").exists():
+                    import chromadb
+                    from vectorstore.chroma_store import reset_inherited_chroma_clients
+                    reset_inherited_chroma_clients()
+                    client = chromadb.PersistentClient(path=str(self.persist_directory))
+                    for collection in client.list_collections():
+                        name = getattr(collection, "name", collection)
+                        if name.startswith(COLLECTION_PREFIX) and name[len(COLLECTION_PREFIX):] not in keep:
+                            client.delete_collection(name)
+                            logger.info(f"Dropped stale knowledge base collection: {name}")
+
+                quantized_root = self.persist_directory / QUANTIZED_SUBDIRECTORY
+                if quantized_root.exists():
+                    for index_dir in quantized_root.iterdir():
+                        name = index_dir.name
+                        if name.startswith(COLLECTION_PREFIX) and name[len(COLLECTION_PREFIX):] not in keep:
+                            shutil.rmtree(index_dir, ignore_errors=True)
+                            logger.info(f"Dropped stale quantized index: {name}")
+        except Exception as e:
+            logger.warning(f"Failed to drop stale knowledge base collections: {str(e)}")
+
+    def get_stats(self) -> dict:
+        """
+        Report the live version and reload history.
+        """
+        snapshot = self._snapshot
+        return {
+            **self._stats,
+            "version": snapshot.version if snapshot else None,
+            "document_count": snapshot.document_count if snapshot else 0,
+            "loaded_at": snapshot.loaded_at if snapshot else None,
+            "reload_in_progress": self._reload_lock.locked(),
+            "pid": os.getpid(),
+        }
+
+
+# Process-wide knowledge base shared by the response nodes and admin endpoints
+knowledge_base = KnowledgeBaseManager(
+    source_path=KB_SOURCE_PATH,
+    persist_directory=KB_PERSIST_DIRECTORY,
+    watch_interval=KB_WATCH_INTERVAL_SECONDS,
+    faq_threshold=FAQ_MATCH_THRESHOLD
+)
@@ -0,0 +1,247 @@
+"""
+Quantized Vector Store
+Compact alternative to the Chroma/HNSW index for the knowledge base: vectors are
+stored as float16 or int8 with a per-vector scale, cutting memory, disk and
+Blob backup size by 2-4x versus float32.
+
+Search is an exact scan over the quantized vectors (the knowledge base is small
+enough that this beats HNSW), optionally followed by an exact float32 re-rank of
+the top candidates. Re-ranking is off by default: it needs a float32 copy of
+every vector on disk, which makes the index larger than plain float32. The copy
+is memory-mapped, so only the candidate rows are paged in, and it is never
+backed up to Blob Storage (utils.azure_blob_sync), so a restored index searches
+without re-ranking until it is rebuilt.
+
+On-disk layout (one directory per knowledge base version):
+    manifest.json      format, dimension, count, layout version
+    documents.json     page_content + metadata per row
+    vectors.npy        float16 or int8 [count, dim]
+    scales.npy         int8 only: float32 dequantization scale per row
+    norms.npy          float32 norm of each dequantized row
+    vectors_f32.npy    only when re-ranking is enabled (local only)
+"""
+
+import json
+import logging
+import shutil
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain.docstore.document import Document
+
+from vectorstore.bm25_index import matches_filter
+
+logger = logging.getLogger(__name__)
+
+QUANTIZED_FORMATS = ("float16", "int8")
+LAYOUT_VERSION = 1
+EXACT_VECTORS_FILE = "vectors_f32.npy"
+
+
+def quantize(vectors: np.ndarray, index_format: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Quantize float32 row vectors.
+
+    Args:
+        vectors: float32 array [count, dim]
+        index_format: 'float16' or 'int8'
+
+    Returns:
+        (quantized vectors, per-row scales or None for float16)
+    """
+    if index_format == "float16":
+        return vectors.astype(np.float16), None
+    if index_format == "int8":
+        # Symmetric per-vector scaling: the largest magnitude maps to 127
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+    raise ValueError(f"Unknown quantized format '{index_format}'. Expected one of {QUANTIZED_FORMATS}")
+
+
+def dequantize(quantized: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    vectors = quantized.astype(np.float32)
+    if scales is not None:
+        vectors *= scales[:, None]
+    return vectors
+
+
+class QuantizedVectorStore:
+    """
+    Scalar-quantized vector index exposing the vector store calls used by HybridRetriever.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        embedding,
+        rerank: bool = False,
+        rerank_candidates: int = 12
+    ):
+        """
+        Open a persisted quantized index.
+
+        Args:
+            directory: Index directory written by build()
+            embedding: LangChain embeddings used for queries
+            rerank: Re-rank top candidates with exact float32 vectors (if stored)
+            rerank_candidates: Candidates re-ranked per query
+        """
+        self.directory = Path(directory)
+        self._embedding = embedding
+        self.rerank_candidates = rerank_candidates
+
+        manifest = json.loads((self.directory / "manifest.json").read_text())
+        self.index_format = manifest["format"]
+        self.documents = [
+            Document(page_content=item["page_content"], metadata=item["metadata"])
+            for item in json.loads((self.directory / "documents.json").read_text())
+        ]
+        self._vectors = np.load(self.directory / "vectors.npy")
+        self._scales = np.load(self.directory / "scales.npy") if self.index_format == "int8" else None
+        self._norms = np.load(self.directory / "norms.npy")
+
+        exact_path = self.directory / EXACT_VECTORS_FILE
+        self._exact = np.load(exact_path, mmap_mode="r") if rerank and exact_path.exists() else None
+        if rerank and self._exact is None:
+            logger.warning(f"No float32 vectors in {self.directory} (restored from a backup?); searching without re-ranking")
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    @classmethod
+    def build(
+        cls,
+        docs: List[Document],
+        vectors: np.ndarray,
+        directory: str,
+        index_format: str = "int8",
+        keep_exact: bool = False
+    ):
+        """
+        Quantize precomputed embeddings and persist them atomically.
+
+        Args:
+            docs: Documents, one per row of vectors
+            vectors: float32 embeddings [count, dim]
+            directory: Target index directory
+            index_format: 'float16' or 'int8'
+            keep_exact: Also store float32 vectors for re-ranking
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        quantized, scales = quantize(vectors, index_format)
+        norms = np.linalg.norm(dequantize(quantized, scales), axis=1).astype(np.float32)
+
+        target = Path(directory)
+        staging = target.with_name(target.name + ".tmp")
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+
+        np.save(staging / "vectors.npy", quantized)
+        np.save(staging / "norms.npy", norms)
+        if scales is not None:
+            np.save(staging / "scales.npy", scales)
+        if keep_exact:
+            np.save(staging / EXACT_VECTORS_FILE, vectors)
+        (staging / "documents.json").write_text(json.dumps([
+            {"page_content": doc.page_content, "metadata": doc.metadata} for doc in docs
+        ]))
+        # Manifest last: its presence marks a complete index
+        (staging / "manifest.json").write_text(json.dumps({
+            "layout_version": LAYOUT_VERSION,
+            "format": index_format,
+            "dimension": int(vectors.shape[1]),
+            "count": int(vectors.shape[0]),
+            "exact_vectors": keep_exact,
+        }))
+
+        shutil.rmtree(target, ignore_errors=True)
+        staging.rename(target)
+
+    @classmethod
+    def from_documents(
+        cls,
+        docs: List[Document],
+        embedding,
+        directory: str,
+        index_format: str = "int8",
+        rerank: bool = False,
+        rerank_candidates: int = 12
+    ) -> "QuantizedVectorStore":
+        """
+        Open the index in directory, embedding and building it first if it is
+        missing, incomplete or in a different format.
+        """
+        manifest_path = Path(directory) / "manifest.json"
+        manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+        if (
+            manifest.get("layout_version") != LAYOUT_VERSION
+            or manifest.get("format") != index_format
+            or manifest.get("count") != len(docs)
+            or (rerank and not manifest.get("exact_vectors"))
+        ):
+            logger.info(f"Building {index_format} quantized index for {len(docs)} documents")
+            vectors = np.array(embedding.embed_documents([doc.page_content for doc in docs]), dtype=np.float32)
+            cls.build(docs, vectors, directory, index_format=index_format, keep_exact=rerank)
+
+        return cls(directory, embedding, rerank=rerank, rerank_candidates=rerank_candidates)
+
+    def similarity_search_with_relevance_scores(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[dict] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Cosine similarity search, matching Chroma's relevance scores for cosine space.
+        """
+        return self.similarity_search_by_vector_with_relevance_scores(
+            self._embedding.embed_query(query), k=k, filter=filter
+        )
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[dict] = None
+    ) -> List[Tuple[Document, float]]:
+        query = np.asarray(embedding, dtype=np.float32)
+        query_norm = float(np.linalg.norm(query)) or 1.0
+
+        approx = self._vectors.astype(np.float32) @ query
+        if self._scales is not None:
+            approx *= self._scales
+        approx /= np.maximum(self._norms, 1e-12) * query_norm
+
+        if filter:
+            allowed = np.array([matches_filter(doc.metadata, filter) for doc in self.documents])
+            approx = np.where(allowed, approx, -np.inf)
+
+        candidate_count = min(len(self.documents), max(k, self.rerank_candidates if self._exact is not None else k))
+        candidates = np.argsort(-approx)[:candidate_count]
+        candidates = candidates[np.isfinite(approx[candidates])]
+        scores = approx[candidates]
+
+        if self._exact is not None and len(candidates):
+            rows = np.asarray(self._exact[candidates], dtype=np.float32)
+            scores = (rows @ query) / (np.maximum(np.linalg.norm(rows, axis=1), 1e-12) * query_norm)
+            ranked = np.argsort(-scores)
+            candidates, scores = candidates[ranked], scores[ranked]
+
+        return [(self.documents[i], float(score)) for i, score in zip(candidates[:k], scores[:k])]
+
+    def nbytes(self) -> dict:
+        """
+        In-memory and on-disk footprint of the index.
+        """
+        resident = self._vectors.nbytes + self._norms.nbytes + (self._scales.nbytes if self._scales is not None else 0)
+        on_disk = sum(path.stat().st_size for path in self.directory.iterdir() if path.is_file())
+        return {
+            "format": self.index_format,
+            "resident_bytes": int(resident),
+            "float32_equivalent_bytes": int(self._vectors.size * 4),
+            "disk_bytes": int(on_disk),
+        }
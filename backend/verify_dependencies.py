@@ -99,7 +99,6 @@ def main():
         ("azure.data.tables", "Azure Data Tables", True),
         ("azure.storage.blob", "Azure Storage Blob", True),
         ("azure.identity", "Azure Identity", True),
-        ("opencensus.ext.azure.log_exporter", "OpenCensus Azure", True),
         ("applicationinsights", "Application Insights", True),
     ]
     
@@ -2,7 +2,7 @@ import { useState, useEffect, useRef } from 'react'
 import './App.css'
 import ChatMessage from './components/ChatMessage'
 import ChatInput from './components/ChatInput'
-import { sendMessage } from './services/api'
+import { Conversation, ConversationEvent, openConversation, sendMessage } from './services/api'
 
 export interface Message {
   id: string;
@@ -15,6 +15,7 @@ function App() {
   const [messages, setMessages] = useState<Message[]>([])
   const [isLoading, setIsLoading] = useState(false)
   const [userId] = useState(() => `user_${Date.now()}`)
+  const [conversation, setConversation] = useState<Conversation | null>(null)
   const messagesEndRef = useRef<HTMLDivElement>(null)
 
   const scrollToBottom = () => {
@@ -36,8 +37,60 @@ function App() {
     setMessages([welcomeMessage])
   }, [])
 
+  useEffect(() => {
+    // Keep the conversation open over a WebSocket; fall back to /query if it can't connect
+    const handleConversationEvent = (event: ConversationEvent) => {
+      if (event.type === 'token' || event.type === 'response') {
+        // Tokens build up the reply of their turn; the final response replaces them
+        const id = `agent_turn_${event.turn}`
+        const text = event.type === 'token' ? event.content : event.response
+        setMessages(prev => {
+          const existing = prev.find(message => message.id === id)
+          if (!existing) {
+            return [...prev, { id, text, sender: 'agent', timestamp: new Date() }]
+          }
+          return prev.map(message => message.id === id
+            ? { ...message, text: event.type === 'token' ? message.text + text : text }
+            : message)
+        })
+        setIsLoading(false)
+      } else if (event.type === 'error') {
+        console.error('Conversation error:', event.detail)
+        setMessages(prev => [...prev, {
+          id: `error_${Date.now()}`,
+          text: 'Sorry, I encountered an error. Please try again.',
+          sender: 'agent',
+          timestamp: new Date()
+        }])
+        setIsLoading(false)
+      }
+      // cancelled: a newer message superseded the turn, whose reply stays as far as it got
+    }
+
+    let closed = false
+    let current: Conversation | null = null
+    openConversation(userId, handleConversationEvent, () => {
+      setConversation(null)
+      setIsLoading(false)
+    })
+      .then(opened => {
+        current = opened
+        if (closed) {
+          opened.close()
+        } else {
+          setConversation(opened)
+        }
+      })
+      .catch(error => console.warn('Streaming conversation unavailable, using HTTP:', error))
+    return () => {
+      closed = true
+      current?.close()
+    }
+  }, [userId])
+
   const handleSendMessage = async (text: string) => {
-    if (!text.trim() || isLoading) return
+    // While a reply streams, a new message cancels it
+    if (!text.trim() || (isLoading && !conversation)) return
 
     // Add user message
     const userMessage: Message = {
@@ -49,6 +102,11 @@ function App() {
     setMessages(prev => [...prev, userMessage])
     setIsLoading(true)
 
+    if (conversation) {
+      conversation.send(text)
+      return
+    }
+
     try {
       // Call backend API
       const response = await sendMessage(text, userId)
@@ -103,7 +161,7 @@ function App() {
           <div ref={messagesEndRef} />
         </div>
 
-        <ChatInput onSend={handleSendMessage} disabled={isLoading} />
+        <ChatInput onSend={handleSendMessage} disabled={isLoading && !conversation} />
       </div>
     </div>
   )
@@ -25,24 +25,64 @@ export const sendMessage = async (query: string, userId: string): Promise<string
 
     return response.data.response || 'No response from agent'
   } catch (error) {
+    // No retry against another endpoint: it would run the whole agent a second time
     console.error('API Error:', error)
-    
-    // Try fallback to legacy endpoint if new one fails
-    try {
-      console.log('Trying legacy endpoint...')
-      const fallbackResponse = await axios.post(`${API_BASE_URL}/support-agent`, null, {
-        params: {
-          query,
-          uid: userId
-        },
-        timeout: 60000
-      })
-      return fallbackResponse.data.result || 'No response from agent'
-    } catch (fallbackError) {
-      console.error('Fallback API Error:', fallbackError)
-      throw new Error('Failed to get response from support agent')
-    }
+    throw new Error('Failed to get response from support agent')
+  }
+}
+
+export type ConversationEvent =
+  | { type: 'ready'; thread_id: string }
+  | { type: 'started'; turn: number }
+  | { type: 'progress'; turn: number; node: string; category?: string; sentiment?: string }
+  | { type: 'token'; turn: number; content: string }
+  | { type: 'response'; turn: number; response: string; category?: string; sentiment?: string; seconds: number }
+  | { type: 'cancelled'; turn: number }
+  | { type: 'error'; turn?: number; detail: string }
+
+export interface Conversation {
+  send: (message: string) => void
+  cancel: () => void
+  close: () => void
+}
+
+// One WebSocket per thread (/ws/{thread_id}): the backend keeps the thread's
+// checkpoint in memory while it is open and streams each reply as tokens.
+// Sending a message while a reply is streaming cancels that reply.
+export const openConversation = (
+  threadId: string,
+  onEvent: (event: ConversationEvent) => void,
+  onClose: () => void
+): Promise<Conversation> => {
+  const socket = new WebSocket(`${API_BASE_URL.replace(/^http/, 'ws')}/ws/${encodeURIComponent(threadId)}`)
+  const conversation: Conversation = {
+    send: (message: string) => socket.send(JSON.stringify({ type: 'message', message })),
+    cancel: () => socket.send(JSON.stringify({ type: 'cancel' })),
+    close: () => socket.close()
   }
+
+  return new Promise((resolve, reject) => {
+    let ready = false
+    socket.onmessage = (message) => {
+      const event = JSON.parse(message.data) as ConversationEvent
+      if (event.type === 'ready') {
+        ready = true
+        resolve(conversation)
+      } else if (!ready) {
+        // e.g. the backend is still warming up
+        reject(new Error(event.type === 'error' ? event.detail : `Unexpected ${event.type} event`))
+      } else {
+        onEvent(event)
+      }
+    }
+    socket.onclose = () => {
+      if (ready) {
+        onClose()
+      } else {
+        reject(new Error('Conversation connection failed'))
+      }
+    }
+  })
 }
 
 // Health check function for monitoring